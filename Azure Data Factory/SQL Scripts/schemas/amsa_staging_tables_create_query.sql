@@ -14,6 +14,7 @@ IF OBJECT_ID('stg_fact_production_coil', 'U') IS NOT NULL DROP TABLE stg_fact_pr
 IF OBJECT_ID('stg_fact_maintenance_event', 'U') IS NOT NULL DROP TABLE stg_fact_maintenance_event;
 IF OBJECT_ID('stg_fact_coil_operation_cycle', 'U') IS NOT NULL DROP TABLE stg_fact_coil_operation_cycle;
 IF OBJECT_ID('stg_fact_equipment_event_log', 'U') IS NOT NULL DROP TABLE stg_fact_equipment_event_log;
+IF OBJECT_ID('stg_fact_equipment_event_log_changes', 'U') IS NOT NULL DROP TABLE stg_fact_equipment_event_log_changes;
 GO
 
 -- =============================================
@@ -124,8 +125,34 @@ GO
 -- =============================================
 -- STAGING TABLE 6: fact_equipment_event_log
 -- =============================================
--- CSV Schema: 13 columns, all String type
+-- CSV Schema: 14 columns, all String type
 CREATE TABLE stg_fact_equipment_event_log (
+    event_id NVARCHAR(50),
+    equipment_id NVARCHAR(50),
+    equipment_name NVARCHAR(200),
+    event_type NVARCHAR(50),
+    event_start_ts NVARCHAR(50),
+    event_end_ts NVARCHAR(50),
+    event_duration_sec NVARCHAR(50),
+    coil_id NVARCHAR(100),
+    parent_coil_id NVARCHAR(100),
+    shift_code NVARCHAR(10),
+    type_code NVARCHAR(50),
+    is_prime NVARCHAR(10),
+    is_scrap NVARCHAR(10),
+    event_date NVARCHAR(50),
+    loaded_date DATETIME2 DEFAULT GETDATE()
+);
+GO
+
+-- =============================================
+-- STAGING TABLE 7: fact_equipment_event_log_changes
+-- =============================================
+-- CSV Schema: 15 columns, all String type
+-- change_type I/U/D; delete rows carry only event_id
+CREATE TABLE stg_fact_equipment_event_log_changes (
+    change_type NVARCHAR(10),
+    event_id NVARCHAR(50),
     equipment_id NVARCHAR(50),
     equipment_name NVARCHAR(200),
     event_type NVARCHAR(50),
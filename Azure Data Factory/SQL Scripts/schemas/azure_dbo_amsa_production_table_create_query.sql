@@ -95,7 +95,7 @@ CREATE TABLE fact_coil_operation_cycle (
 -- Create fact_equipment_event_log
 -- =============================================
 CREATE TABLE fact_equipment_event_log (
-    log_id INT IDENTITY(1,1) PRIMARY KEY,
+    event_id BIGINT PRIMARY KEY, -- stable hash key from the pipeline (not IDENTITY)
     equipment_id INT,
     equipment_name NVARCHAR(100),
     event_type NVARCHAR(20), -- RUN, IDLE, FAULT
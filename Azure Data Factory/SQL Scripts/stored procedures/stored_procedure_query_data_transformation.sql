@@ -356,6 +356,7 @@ BEGIN
         
         -- Transform and load
         INSERT INTO fact_equipment_event_log (
+            event_id,
             equipment_id,
             equipment_name,
             event_type,
@@ -371,6 +372,7 @@ BEGIN
             is_scrap
         )
         SELECT 
+            TRY_CAST(s.event_id AS BIGINT) AS event_id,
             TRY_CAST(s.equipment_id AS INT) AS equipment_id,
             LTRIM(RTRIM(s.equipment_name)) AS equipment_name,
             LTRIM(RTRIM(s.event_type)) AS event_type,
@@ -391,7 +393,8 @@ BEGIN
                 ELSE 0 
             END AS is_scrap
         FROM stg_fact_equipment_event_log s
-        WHERE s.equipment_id IS NOT NULL 
+        WHERE TRY_CAST(s.event_id AS BIGINT) IS NOT NULL
+          AND s.equipment_id IS NOT NULL 
           AND s.equipment_id <> ''
           AND TRY_CAST(s.equipment_id AS INT) IS NOT NULL
           -- Ensure FK to equipment exists
@@ -416,10 +419,101 @@ BEGIN
 END;
 GO
 
+-- =============================================
+-- STORED PROCEDURE 7: Apply fact_equipment_event_log change set
+-- =============================================
+-- Incremental load used by usp_Master_Load_All_Tables: only inserted (I),
+-- updated (U) and deleted (D) events are touched. The change set is relative
+-- to the previously published pipeline run, so every published run must be
+-- applied in order; after a skipped run, reload the full log once
+-- (@EventLogFullReload = 1, usp_Load_fact_equipment_event_log)
+CREATE OR ALTER PROCEDURE usp_Apply_fact_equipment_event_log_changes
+AS
+BEGIN
+    SET NOCOUNT ON;
+    
+    BEGIN TRY
+        BEGIN TRANSACTION;
+        
+        -- Deletes
+        DELETE t
+        FROM fact_equipment_event_log t
+        JOIN stg_fact_equipment_event_log_changes s
+          ON t.event_id = TRY_CAST(s.event_id AS BIGINT)
+        WHERE LTRIM(RTRIM(s.change_type)) = 'D';
+        
+        -- Inserts and updates
+        MERGE fact_equipment_event_log AS t
+        USING (
+            SELECT 
+                TRY_CAST(s.event_id AS BIGINT) AS event_id,
+                TRY_CAST(s.equipment_id AS INT) AS equipment_id,
+                LTRIM(RTRIM(s.equipment_name)) AS equipment_name,
+                LTRIM(RTRIM(s.event_type)) AS event_type,
+                TRY_CAST(s.event_start_ts AS DATETIME2) AS event_start_ts,
+                TRY_CAST(s.event_end_ts AS DATETIME2) AS event_end_ts,
+                TRY_CAST(s.event_duration_sec AS DECIMAL(10,2)) AS event_duration_sec,
+                TRY_CAST(s.event_date AS DATE) AS event_date,
+                LTRIM(RTRIM(s.coil_id)) AS coil_id,
+                LTRIM(RTRIM(s.parent_coil_id)) AS parent_coil_id,
+                LTRIM(RTRIM(s.shift_code)) AS shift_code,
+                LTRIM(RTRIM(s.type_code)) AS type_code,
+                CASE WHEN LOWER(LTRIM(RTRIM(s.is_prime))) IN ('true', '1', 'yes') THEN 1 ELSE 0 END AS is_prime,
+                CASE WHEN LOWER(LTRIM(RTRIM(s.is_scrap))) IN ('true', '1', 'yes') THEN 1 ELSE 0 END AS is_scrap
+            FROM stg_fact_equipment_event_log_changes s
+            WHERE LTRIM(RTRIM(s.change_type)) IN ('I', 'U')
+              AND TRY_CAST(s.event_id AS BIGINT) IS NOT NULL
+              AND EXISTS (
+                  SELECT 1 FROM dim_equipment e 
+                  WHERE e.equipment_id = TRY_CAST(s.equipment_id AS INT)
+              )
+        ) AS s
+        ON t.event_id = s.event_id
+        WHEN MATCHED THEN UPDATE SET
+            equipment_id = s.equipment_id,
+            equipment_name = s.equipment_name,
+            event_type = s.event_type,
+            event_start_ts = s.event_start_ts,
+            event_end_ts = s.event_end_ts,
+            event_duration_sec = s.event_duration_sec,
+            event_date = s.event_date,
+            coil_id = s.coil_id,
+            parent_coil_id = s.parent_coil_id,
+            shift_code = s.shift_code,
+            type_code = s.type_code,
+            is_prime = s.is_prime,
+            is_scrap = s.is_scrap
+        WHEN NOT MATCHED THEN INSERT (
+            event_id, equipment_id, equipment_name, event_type, event_start_ts, event_end_ts,
+            event_duration_sec, event_date, coil_id, parent_coil_id, shift_code, type_code,
+            is_prime, is_scrap
+        ) VALUES (
+            s.event_id, s.equipment_id, s.equipment_name, s.event_type, s.event_start_ts, s.event_end_ts,
+            s.event_duration_sec, s.event_date, s.coil_id, s.parent_coil_id, s.shift_code, s.type_code,
+            s.is_prime, s.is_scrap
+        );
+        
+        COMMIT TRANSACTION;
+        
+        PRINT 'fact_equipment_event_log changes applied successfully.';
+    END TRY
+    BEGIN CATCH
+        IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+        
+        DECLARE @ErrorMessage NVARCHAR(4000) = ERROR_MESSAGE();
+        DECLARE @ErrorSeverity INT = ERROR_SEVERITY();
+        DECLARE @ErrorState INT = ERROR_STATE();
+        
+        RAISERROR(@ErrorMessage, @ErrorSeverity, @ErrorState);
+    END CATCH
+END;
+GO
+
 -- =============================================
 -- MASTER STORED PROCEDURE: Execute All Loads in Order
 -- =============================================
 CREATE OR ALTER PROCEDURE usp_Master_Load_All_Tables
+    @EventLogFullReload BIT = 0  -- 1: reload fact_equipment_event_log from stg_fact_equipment_event_log
 AS
 BEGIN
     SET NOCOUNT ON;
@@ -493,8 +587,16 @@ BEGIN
         END CATCH
         
         BEGIN TRY
-            PRINT '6. Loading fact_equipment_event_log...';
-            EXEC usp_Load_fact_equipment_event_log;
+            IF @EventLogFullReload = 1
+            BEGIN
+                PRINT '6. Reloading fact_equipment_event_log (full)...';
+                EXEC usp_Load_fact_equipment_event_log;
+            END
+            ELSE
+            BEGIN
+                PRINT '6. Applying fact_equipment_event_log changes...';
+                EXEC usp_Apply_fact_equipment_event_log_changes;
+            END
             PRINT 'SUCCESS';
             PRINT '';
         END TRY
@@ -544,7 +646,8 @@ SELECT
    WHERE name LIKE 'usp_%'
    ORDER BY name;
    
-   -- Should show 7 procedures:
+   -- Should show 8 procedures:
+   -- usp_Apply_fact_equipment_event_log_changes
    -- usp_Load_dim_date_crew_schedule
    -- usp_Load_dim_equipment
    -- usp_Load_fact_coil_operation_cycle
@@ -7,19 +7,29 @@ from datetime import datetime, time, timedelta
 # 1. LOAD RAW DATA
 # ============================
 
-df_prod_raw = pd.read_csv(
-    "coil_production_mar_september_2024.csv",
-    encoding="utf-8-sig"
+# Extract files, production window and column projections live in raw_scan.py
+# (date filter and projection are applied inside the CSV scan)
+from raw_scan import (
+    PROD_FILE, MAINT_FILE, FILTER_START, FILTER_END, PROD_COLUMNS, MAINT_COLUMNS, scan_csv,
+    unprojected_columns,
 )
 
-df_maint_raw = pd.read_csv(
-    "maintenance_downtime_jan_oct_2024.csv",
-    encoding="utf-8-sig"
+# Carry-over state for out-of-core (month-partitioned) runs; set by backfill.py
+backfill_state = None
+
+df_prod, prod_rows_scanned = scan_csv(
+    PROD_FILE, PROD_COLUMNS, "Production Date", FILTER_START, FILTER_END
+)
+
+df_maint, maint_rows_scanned = scan_csv(
+    MAINT_FILE, MAINT_COLUMNS, "Start", FILTER_START, FILTER_END
 )
 
-# Strip whitespace from column names
-df_prod_raw.columns = df_prod_raw.columns.str.strip()
-df_maint_raw.columns = df_maint_raw.columns.str.strip()
+print("Production columns:", df_prod.columns.tolist())
+print("Maintenance columns:", df_maint.columns.tolist())
 
-print("Production columns:", df_prod_raw.columns.tolist())
-print("Maintenance columns:", df_maint_raw.columns.tolist())
\ No newline at end of file
+# Extract columns outside the projection are not read (and not in raw_*_filtered)
+for extract_file, projection in [(PROD_FILE, PROD_COLUMNS), (MAINT_FILE, MAINT_COLUMNS)]:
+    skipped = unprojected_columns(extract_file, projection)
+    if skipped:
+        print(f"Not projected from {extract_file}: {skipped}")
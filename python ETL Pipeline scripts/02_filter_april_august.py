@@ -1,34 +1,15 @@
-# Parse datetime columns for filtering
-df_prod_raw["Production Date"] = pd.to_datetime(
-    df_prod_raw["Production Date"],
-    format="%m/%d/%y %H:%M",
-    errors="coerce"
-)
-
-df_maint_raw["Start"] = pd.to_datetime(
-    df_maint_raw["Start"],
-    format="%m/%d/%y %H:%M",
-    errors="coerce"
-)
-
-# Filter to May–September 2024 production window
-df_prod = df_prod_raw[
-    (df_prod_raw["Production Date"] >= "2024-05-01") &
-    (df_prod_raw["Production Date"] <= "2024-09-30")
-].copy()
-
-df_maint = df_maint_raw[
-    (df_maint_raw["Start"] >= "2024-05-01") &
-    (df_maint_raw["Start"] <= "2024-09-30")
-].copy()
+# Filter production and maintenance records to the analysis window
+#
+# May–September 2024 production window is pushed down into the CSV scan (01):
+# "Production Date" and "Start" are already parsed and filtered here
 
 # Filtered dataset summary
 print(f"Production Records: {len(df_prod):,} coils")
 print(f"  Date Range: {df_prod['Production Date'].min().strftime('%Y-%m-%d')} to {df_prod['Production Date'].max().strftime('%Y-%m-%d')}")
 print(f"  Unique Parent Coils (CID): {df_prod['CID'].nunique():,}")
-print(f"  Records Excluded: {len(df_prod_raw) - len(df_prod):,} ({(len(df_prod_raw) - len(df_prod))/len(df_prod_raw)*100:.1f}%)")
+print(f"  Records Excluded: {prod_rows_scanned - len(df_prod):,} ({(prod_rows_scanned - len(df_prod))/prod_rows_scanned*100:.1f}%)")
 
 print(f"\nMaintenance Events: {len(df_maint):,} logged incidents")
 print(f"  Date Range: {df_maint['Start'].min().strftime('%Y-%m-%d')} to {df_maint['Start'].max().strftime('%Y-%m-%d')}")
 print(f"  Equipment Tracked: {df_maint['Hierachy'].nunique()} units")
-print(f"  Events Excluded: {len(df_maint_raw) - len(df_maint):,} ({(len(df_maint_raw) - len(df_maint))/len(df_maint_raw)*100:.1f}%)")
\ No newline at end of file
+print(f"  Events Excluded: {maint_rows_scanned - len(df_maint):,} ({(maint_rows_scanned - len(df_maint))/maint_rows_scanned*100:.1f}%)")
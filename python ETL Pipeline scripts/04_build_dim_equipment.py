@@ -64,15 +64,11 @@ process_order_map = {
     "Strapping Machine": 17,
 }
 
-# Identify known bottleneck equipment
-bottleneck_map = {
-    "Temper Mill Unit": True,
-    "Decoiler": True,
-    "Recoiler": True,
-    "Exit Coil Car": True,
-    "Crop Shear": True,
-    "Scale M65 (conveyor)": True,
-}
+# Modelled constraint equipment (prior for synthetic durations in 09;
+# is_bottleneck_candidate is re-derived from the event log in 10)
+from line_model import MODELLED_CONSTRAINTS
+
+bottleneck_map = MODELLED_CONSTRAINTS
 
 # Apply process order and bottleneck flags
 dim_equipment["process_order"] = dim_equipment["equipment_name"].map(process_order_map)
@@ -1,33 +1,42 @@
 # Build production fact table with real MES completion timestamps
-prod = df_prod.copy()
+# (new frame from the needed columns only; df_prod stays untouched for raw export,
+# pass-through columns such as Cast/Slab are attached from it at export)
 
 # Extract thickness measurement (handle column name variations)
-if "Thickess" in prod.columns and prod["Thickess"].notna().any():
-    prod["thickness_mm"] = prod["Thickess"]
-elif "Thick" in prod.columns:
-    prod["thickness_mm"] = prod["Thick"]
+# (decided over the whole extract in backfill runs, not per month partition)
+if backfill_state is not None:
+    thickness_col = backfill_state["thickness_col"]
+elif "Thickess" in df_prod.columns and df_prod["Thickess"].notna().any():
+    thickness_col = "Thickess"
+elif "Thick" in df_prod.columns:
+    thickness_col = "Thick"
 else:
     raise ValueError("No thickness column found in production data")
 
-# Map product dimensions and mass
-prod["width_mm"] = prod["Width"]
-prod["mass_out_tons"] = prod["Mass out tons"]
-
-# Parse completion timestamps from MES system
-prod["Production Date"] = pd.to_datetime(
-    prod["Production Date"], 
-    format='%m/%d/%y %H:%M', 
-    errors='coerce'
-)
-
-prod["production_date"] = prod["Production Date"].dt.date
-prod["coil_id"] = prod["UID"].astype(str)
-prod["parent_coil_id"] = prod["CID"].astype(str)
-prod["completion_ts"] = prod["Production Date"]
+# Completion timestamps from MES system (parsed once in the CSV scan)
+# production_date is an int32 day number (time_model.py), converted at export
+from time_model import to_epoch_ms, to_day_number, day_label
+from raw_scan import PASSTHROUGH_COLUMNS, SOURCE_ROW
+
+completion_ts = df_prod["Production Date"]
+
+prod = pd.DataFrame({
+    "coil_id": df_prod["UID"].astype(str),
+    "parent_coil_id": df_prod["CID"].astype(str),
+    "production_date": to_day_number(to_epoch_ms(completion_ts)),
+    "completion_ts": completion_ts,
+    "thickness_mm": df_prod[thickness_col],
+    "width_mm": df_prod["Width"],
+    "mass_out_tons": df_prod["Mass out tons"],
+    "Hours": df_prod["Hours"],
+    "Grade": df_prod["Grade"],
+    "NextProcess": df_prod["NextProcess"],
+    SOURCE_ROW: np.arange(len(df_prod), dtype=np.int32),
+})
 
 # Classify product types (prime vs scrap)
-if "Type" in prod.columns:
-    prod["type_code"] = prod["Type"].astype(str).str.strip().str.upper()
+if "Type" in df_prod.columns:
+    prod["type_code"] = df_prod["Type"].astype(str).str.strip().str.upper()
     prime_types = ["HL", "HM", "98", "71", "72", "74", "75", "76", "77", "70"]
     scrap_types = ["HX", "HY", "HZ", "HC", "HH", "HR"]
     prod["is_prime"] = prod["type_code"].isin(prime_types)
@@ -37,43 +46,47 @@ else:
     prod["is_prime"] = False
     prod["is_scrap"] = False
 
-# Sort by completion time for tempo analysis
-prod = prod.sort_values("completion_ts").reset_index(drop=True)
+# Product mix band (thickness × width), reused by the generator and validation
+from product_bands import band_codes, band_labels
+
+prod["product_band"] = band_labels(band_codes(prod["thickness_mm"], prod["width_mm"]))
+
+# Sort by completion time for tempo analysis (stable: ties keep extract order)
+prod = prod.sort_values("completion_ts", kind="stable").reset_index(drop=True)
 
 # Calculate inter-coil gaps (tempo measurement)
+# (a month partition continues from the previous partition's last completion)
 prod["prev_completion_ts"] = prod["completion_ts"].shift(1)
+if backfill_state is not None and len(prod):
+    prod.loc[0, "prev_completion_ts"] = backfill_state["last_completion_ts"]
 prod["gap_from_prev_completion_min"] = (
     (prod["completion_ts"] - prod["prev_completion_ts"]).dt.total_seconds() / 60.0
 )
 
-# Calculate parent coil transition times
-parent_timing = (
-    prod.groupby("parent_coil_id")["completion_ts"]
-    .agg(['min', 'max'])
-    .rename(columns={'min': 'parent_first_completion_ts', 'max': 'parent_last_completion_ts'})
-    .reset_index()
-    .sort_values("parent_first_completion_ts")
-    .reset_index(drop=True)
-)
+# Parent coil rollup (timing, yield and transition gaps in one sorted pass)
+from coil_rollup import build_parent_coil_rollup
 
-parent_timing["prev_parent_last_completion_ts"] = parent_timing["parent_last_completion_ts"].shift(1)
-parent_timing["gap_from_prev_parent_min"] = (
-    (parent_timing["parent_first_completion_ts"] - parent_timing["prev_parent_last_completion_ts"])
-    .dt.total_seconds() / 60.0
-)
+dim_parent_coil = build_parent_coil_rollup(prod)
 
-# Merge parent-level gaps back to coil records
-prod = prod.merge(
-    parent_timing[["parent_coil_id", "gap_from_prev_parent_min"]],
-    on="parent_coil_id",
-    how="left"
+# Map parent-level gaps back to coil records (index lookup, no merge)
+# (backfill runs use the lookup built from whole-history parent spans)
+if backfill_state is not None:
+    parent_gap_lookup = backfill_state["parent_gap_lookup"]
+else:
+    parent_gap_lookup = pd.Series(
+        dim_parent_coil["gap_from_prev_parent_min"].to_numpy(),
+        index=dim_parent_coil["parent_coil_id"]
+    )
+prod["gap_from_prev_parent_min"] = (
+    parent_gap_lookup.reindex(prod["parent_coil_id"]).to_numpy()
 )
 
 # Placeholder shift assignment (will be updated with crew rotation)
 prod["shift_code"] = "A"
 
-# Build production fact table
-fact_production_coil = prod[[
+# Build production fact table (exported column order; the pass-through
+# columns stay in df_prod until 13 and source_row stands in for them)
+FACT_PRODUCTION_COLUMNS = [
     "coil_id",
     "parent_coil_id",
     "production_date",
@@ -81,6 +94,7 @@ fact_production_coil = prod[[
     "shift_code",
     "thickness_mm",
     "width_mm",
+    "product_band",
     "mass_out_tons",
     "Hours",
     "Grade",
@@ -92,12 +106,15 @@ fact_production_coil = prod[[
     "gap_from_prev_parent_min",
     "Cast",
     "Slab",
-]].copy()
+]
+fact_production_coil = prod[[
+    col for col in FACT_PRODUCTION_COLUMNS if col not in PASSTHROUGH_COLUMNS["fact_production_coil"]
+] + [SOURCE_ROW]]
 
 print(f"Production fact table created: {len(fact_production_coil):,} records")
 print(f"  Unique output pieces (UID): {fact_production_coil['coil_id'].nunique():,}")
 print(f"  Unique parent coils (CID): {fact_production_coil['parent_coil_id'].nunique():,}")
-print(f"  Date range: {fact_production_coil['production_date'].min()} to {fact_production_coil['production_date'].max()}")
+print(f"  Date range: {day_label(fact_production_coil['production_date'].min())} to {day_label(fact_production_coil['production_date'].max())}")
 
 print("\nProduct type distribution:")
 print(fact_production_coil['type_code'].value_counts().head(10))
@@ -106,6 +123,9 @@ print("\nPrime vs Scrap classification:")
 print(f"  Prime: {fact_production_coil['is_prime'].sum():,} ({100*fact_production_coil['is_prime'].mean():.1f}%)")
 print(f"  Scrap: {fact_production_coil['is_scrap'].sum():,} ({100*fact_production_coil['is_scrap'].mean():.1f}%)")
 
+print("\nProduct mix bands:")
+print(fact_production_coil['product_band'].value_counts())
+
 print("\nTempo analysis - Inter-coil gaps (minutes):")
 gap_stats = fact_production_coil['gap_from_prev_completion_min'].describe()
 print(f"  Mean: {gap_stats['mean']:.1f} min")
@@ -118,24 +138,12 @@ print(f"  Mean: {parent_gap_stats['mean']:.1f} min")
 print(f"  Median: {parent_gap_stats['50%']:.1f} min")
 
 # Parent coil yield analysis
-parent_yield = (
-    fact_production_coil
-    .groupby('parent_coil_id')
-    .agg({
-        'coil_id': 'count',
-        'is_prime': 'sum',
-        'is_scrap': 'sum'
-    })
-    .rename(columns={'coil_id': 'total_pieces', 'is_prime': 'prime_pieces', 'is_scrap': 'scrap_pieces'})
-)
-
-parent_yield['prime_rate_%'] = 100 * parent_yield['prime_pieces'] / parent_yield['total_pieces']
-
 print("\nParent coil yield metrics:")
-print(f"  Avg pieces per parent: {parent_yield['total_pieces'].mean():.2f}")
-print(f"  Avg prime pieces: {parent_yield['prime_pieces'].mean():.2f}")
-print(f"  Avg scrap pieces: {parent_yield['scrap_pieces'].mean():.2f}")
-print(f"  Avg prime rate: {parent_yield['prime_rate_%'].mean():.1f}%")
+print(f"  Parent coil rollup: {len(dim_parent_coil):,} records")
+print(f"  Avg pieces per parent: {dim_parent_coil['total_pieces'].mean():.2f}")
+print(f"  Avg prime pieces: {dim_parent_coil['prime_pieces'].mean():.2f}")
+print(f"  Avg scrap pieces: {dim_parent_coil['scrap_pieces'].mean():.2f}")
+print(f"  Avg prime rate: {dim_parent_coil['prime_rate_pct'].mean():.1f}%")
 
 print("\nSample records with completion times and gaps:")
 print(fact_production_coil[[
@@ -1,33 +1,35 @@
 # Build maintenance event fact table
-maint = df_maint.copy()
+# (new frame from the needed columns only; df_maint stays untouched for raw export,
+# the description / responsibility text is attached from it at export)
+from raw_scan import PASSTHROUGH_COLUMNS, SOURCE_ROW
 
-# Parse maintenance event timestamps
-maint["start_datetime"] = pd.to_datetime(
-    maint["Start"], 
-    format='%m/%d/%y %H:%M', 
-    errors='coerce'
-)
+# Map cleaned equipment names
+if "SubArea_Clean" not in df_maint.columns:
+    raise ValueError("SubArea_Clean column missing - run cleaning step first")
+
+# Maintenance event timestamps (parsed once in the CSV scan)
+maint = pd.DataFrame({"start_datetime": df_maint["Start"]})
+maint[SOURCE_ROW] = np.arange(len(df_maint), dtype=np.int32)
 
 # Extract duration (hours and minutes)
-if "Time (Hours)" in maint.columns:
-    maint["duration_hours"] = pd.to_numeric(maint["Time (Hours)"], errors="coerce")
+if "Time (Hours)" in df_maint.columns:
+    maint["duration_hours"] = pd.to_numeric(df_maint["Time (Hours)"], errors="coerce")
 else:
-    if "Duration" in maint.columns:
-        maint["duration_timedelta"] = pd.to_timedelta(maint["Duration"], errors='coerce')
-        maint["duration_hours"] = maint["duration_timedelta"].dt.total_seconds() / 3600
+    if "Duration" in df_maint.columns:
+        duration_timedelta = pd.to_timedelta(df_maint["Duration"], errors='coerce')
+        maint["duration_hours"] = duration_timedelta.dt.total_seconds() / 3600
     else:
         raise ValueError("No valid duration column found in maintenance data")
 
 maint["duration_min"] = maint["duration_hours"] * 60
+maint["equipment_name"] = df_maint["SubArea_Clean"].astype(str).str.strip()
 
-# Map cleaned equipment names
-if "SubArea_Clean" not in maint.columns:
-    raise ValueError("SubArea_Clean column missing - run cleaning step first")
+for col in ["Crew", "Shifts", "Category", "Delay Type", "Area", "Sub Area", "Hierachy", "Day"]:
+    maint[col] = df_maint[col]
 
-maint["equipment_name"] = maint["SubArea_Clean"].astype(str).str.strip()
-
-# Build maintenance fact table
-fact_maintenance_event = maint[[
+# Build maintenance fact table (exported column order; source_row stands in
+# for the pass-through text columns until 13)
+FACT_MAINTENANCE_COLUMNS = [
     "start_datetime",
     "duration_hours",
     "duration_min",
@@ -43,7 +45,10 @@ fact_maintenance_event = maint[[
     "Day",
     "Reasponsible",
     "Responsible"
-]].copy()
+]
+fact_maintenance_event = maint[[
+    col for col in FACT_MAINTENANCE_COLUMNS if col not in PASSTHROUGH_COLUMNS["fact_maintenance_event"]
+] + [SOURCE_ROW]]
 
 # Remove incomplete records
 fact_maintenance_event = fact_maintenance_event.dropna(
@@ -73,4 +78,144 @@ print("\nSample maintenance events:")
 print(fact_maintenance_event[[
     'start_datetime', 'equipment_name', 'duration_hours', 
     'Category', 'Delay Type'
-]].head(10))
\ No newline at end of file
+]].head(10))
+
+# Equipment reliability KPIs (MTBF, MTTR, failure rate, Weibull fit)
+RELIABILITY_GROUPINGS = {
+    "equipment": ["equipment_name"],
+    "equipment_category": ["equipment_name", "Category"],
+    "equipment_delay_type": ["equipment_name", "Delay Type"],
+}
+RELIABILITY_COLUMNS = [
+    "grouping_level", "equipment_name", "Category", "Delay Type",
+    "raw_events", "failures", "total_downtime_hours", "observation_hours", "uptime_hours",
+    "mtbf_hours", "mttr_hours", "failure_rate_per_1000h", "availability_pct",
+    "weibull_shape", "weibull_scale_hours",
+]
+
+def _grouped_segments(codes: np.ndarray):
+    """Start offsets of runs of equal codes in a sorted code array"""
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+def build_equipment_reliability(events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reliability KPIs per grouping level:
+    - One sort by (equipment_name, start_datetime); sub-groupings reuse it
+      with a stable sort on the extra key only
+    - Overlapping or adjacent events merge into one failure incident
+    - MTBF/MTTR/failure rate from vectorized diffs and segment reductions
+    - Weibull shape/scale of time-between-failures via median rank regression
+    """
+    events = events.dropna(subset=["equipment_name", "start_datetime", "duration_min"])
+    start_ns = events["start_datetime"].to_numpy(dtype="datetime64[ns]").view("int64")
+    end_ns = start_ns + (events["duration_min"].to_numpy(dtype=np.float64) * 60e9).astype(np.int64)
+    if len(events) == 0:
+        return pd.DataFrame(columns=RELIABILITY_COLUMNS)
+
+    observation_hours = (end_ns.max() - start_ns.min()) / 3.6e12
+
+    equip_codes, equip_names = pd.factorize(events["equipment_name"], sort=True)
+    base_order = np.lexsort((start_ns, equip_codes))
+
+    results = []
+
+    for level, keys in RELIABILITY_GROUPINGS.items():
+        if len(keys) == 1:
+            order = base_order
+            group_codes = equip_codes[order]
+            key_frame = pd.DataFrame({"equipment_name": equip_names})
+        else:
+            sub_codes, sub_names = pd.factorize(events[keys[1]].fillna("Unknown"), sort=True)
+            combined = equip_codes.astype(np.int64) * len(sub_names) + sub_codes
+            order = base_order[np.argsort(combined[base_order], kind="stable")]
+            group_codes = combined[order]
+            key_frame = None
+
+        s, e = start_ns[order], end_ns[order]
+
+        # Merge overlapping / adjacent events into incidents
+        running_end = pd.Series(e).groupby(group_codes).cummax().to_numpy()
+        new_group = np.r_[True, group_codes[1:] != group_codes[:-1]]
+        new_incident = new_group.copy()
+        new_incident[1:] |= s[1:] > running_end[:-1]
+
+        inc_idx = np.flatnonzero(new_incident)
+        inc_codes = group_codes[inc_idx]
+        inc_start = s[inc_idx]
+        inc_end = np.maximum.reduceat(e, inc_idx)
+        inc_repair_h = (inc_end - inc_start) / 3.6e12
+
+        # Time between failures: previous incident end -> next incident start (same group)
+        same_group = np.r_[False, inc_codes[1:] == inc_codes[:-1]]
+        tbf_h = np.where(same_group, (inc_start - np.r_[0, inc_end[:-1]]) / 3.6e12, np.nan)
+
+        seg = _grouped_segments(inc_codes)
+        failures = np.diff(np.r_[seg, len(inc_codes)])
+        downtime_h = np.add.reduceat(inc_repair_h, seg)
+        raw_events = np.diff(np.r_[_grouped_segments(group_codes), len(group_codes)])
+
+        # Weibull (median rank regression on ln t vs ln(-ln(1 - F)))
+        tbf_frame = pd.DataFrame({"g": inc_codes, "t": tbf_h})
+        tbf_frame = tbf_frame[tbf_frame["t"] > 0].sort_values(["g", "t"])
+        n = tbf_frame.groupby("g")["t"].transform("size").to_numpy()
+        rank = tbf_frame.groupby("g").cumcount().to_numpy() + 1
+        tbf_frame["x"] = np.log(tbf_frame["t"].to_numpy())
+        tbf_frame["y"] = np.log(-np.log(1 - (rank - 0.3) / (n + 0.4)))
+        tbf_frame["xy"] = tbf_frame["x"] * tbf_frame["y"]
+        tbf_frame["xx"] = tbf_frame["x"] ** 2
+        sums = tbf_frame.groupby("g")[["x", "y", "xy", "xx"]].agg(["sum"]).droplevel(1, axis=1)
+        sums["n"] = tbf_frame.groupby("g").size()
+        sums = sums[sums["n"] >= 3]
+        slope = (
+            (sums["n"] * sums["xy"] - sums["x"] * sums["y"])
+            / (sums["n"] * sums["xx"] - sums["x"] ** 2)
+        )
+        intercept = (sums["y"] - slope * sums["x"]) / sums["n"]
+        weibull_shape = slope.where(slope > 0)
+        weibull_scale = np.exp(-intercept / weibull_shape)
+
+        group_ids = inc_codes[seg]
+        if key_frame is not None:
+            level_keys = key_frame.iloc[group_ids].reset_index(drop=True)
+        else:
+            level_keys = pd.DataFrame({
+                "equipment_name": equip_names[group_ids // len(sub_names)],
+                keys[1]: sub_names[group_ids % len(sub_names)],
+            })
+
+        uptime_h = np.clip(observation_hours - downtime_h, 0, None)
+
+        level_result = level_keys.assign(
+            grouping_level=level,
+            raw_events=raw_events,
+            failures=failures,
+            total_downtime_hours=downtime_h,
+            observation_hours=observation_hours,
+            uptime_hours=uptime_h,
+            mtbf_hours=uptime_h / failures,
+            mttr_hours=downtime_h / failures,
+            failure_rate_per_1000h=1000 * failures / np.where(uptime_h > 0, uptime_h, np.nan),
+            availability_pct=100 * uptime_h / observation_hours,
+            weibull_shape=weibull_shape.reindex(group_ids).to_numpy(),
+            weibull_scale_hours=weibull_scale.reindex(group_ids).to_numpy(),
+        )
+        results.append(level_result)
+
+    reliability = pd.concat(results, ignore_index=True)
+    return reliability[RELIABILITY_COLUMNS]
+
+fact_equipment_reliability = build_equipment_reliability(fact_maintenance_event)
+
+equipment_reliability = fact_equipment_reliability[
+    fact_equipment_reliability["grouping_level"] == "equipment"
+].sort_values("total_downtime_hours", ascending=False)
+
+print(f"\nEquipment reliability table created: {len(fact_equipment_reliability):,} records")
+print(f"  Equipment-level rows: {len(equipment_reliability):,}")
+print(f"  Events merged into incidents: {int((equipment_reliability['raw_events'] - equipment_reliability['failures']).sum()):,}")
+
+print("\nReliability KPIs (top 10 equipment by downtime):")
+print(equipment_reliability[[
+    "equipment_name", "failures", "mtbf_hours", "mttr_hours",
+    "availability_pct", "weibull_shape", "weibull_scale_hours"
+]].round(2).head(10).to_string(index=False))
@@ -1,5 +1,7 @@
-# Build 4-crew 12-hour rotation schedule
-unique_dates = sorted(fact_production_coil["production_date"].unique())
+# Build 4-crew 12-hour rotation schedule (keyed by production day number)
+from time_model import day_label
+
+unique_dates = sorted(int(d) for d in fact_production_coil["production_date"].unique())
 crew_codes = ["A", "B", "C", "D"]
 
 # Assign day and night crews for each production date
@@ -9,15 +11,22 @@ for idx, d in enumerate(unique_dates):
     night_crew = crew_codes[(idx + 1) % 4]
     date_to_crews[d] = (day_crew, night_crew)
 
+# Crew schedule dimension (exported by 13)
+dim_date_crew_schedule = pd.DataFrame({
+    "production_date": np.array(list(date_to_crews), dtype=np.int32),
+    "day_crew": [v[0] for v in date_to_crews.values()],
+    "night_crew": [v[1] for v in date_to_crews.values()],
+})
+
 print(f"Crew rotation schedule created: {len(unique_dates)} production days")
 print(f"Rotation pattern: {' → '.join(crew_codes)} (4-crew, 12-hour shifts)")
 
 print("\nFirst 10 days:")
 for i, d in enumerate(unique_dates[:10]):
     day_c, night_c = date_to_crews[d]
-    print(f"  {d}: Day={day_c}, Night={night_c}")
+    print(f"  {day_label(d)}: Day={day_c}, Night={night_c}")
 
 print("\nLast 5 days:")
 for d in unique_dates[-5:]:
     day_c, night_c = date_to_crews[d]
-    print(f"  {d}: Day={day_c}, Night={night_c}")
\ No newline at end of file
+    print(f"  {day_label(d)}: Day={day_c}, Night={night_c}")
\ No newline at end of file
@@ -1,85 +1,53 @@
 # Configure equipment operation durations and product-specific multipliers
 
-# Base operation durations (seconds) before adjustments
-DURATION_RANGES = {
-    "Entry Coil Car": (40, 80),
-    "Coil Prep Sattion": (30, 60),
-    "Decoiler": (60, 120),
-    "Entry Guide Table": (10, 20),
-    "Entry SnubberHold Down & Pressure Rolls": (20, 40),
-    "Entry & Exit Feed Table": (20, 40),
-    "Pinch Roll & Bending Unit": (30, 60),
-    "Flattener, Pinch & Deflator Rolls": (40, 90),
-    "Temper Mill Unit": (120, 240),
-    "Crop Shear": (20, 40),
-    "Recoiler": (60, 120),
-    "First Conveyor": (10, 20),
-    "Second Conveyor": (10, 20),
-    "Scale M65 (conveyor)": (40, 90),
-    "Delivery Conveyor": (20, 40),
-    "Exit Coil Car": (60, 120),
-    "Strapping Machine": (40, 80),
-}
-
-DEFAULT_RANGE = (20, 40)
+# Base duration ranges, shift multipliers and product mix bands live in line_model.py
+from line_model import (
+    DURATION_RANGES, DEFAULT_RANGE, SHIFT_MULTIPLIER, BOTTLENECK_DURATION_FACTOR, MIX_FACTOR_RANGES,
+    IDLE_PROBABILITY, IDLE_MEAN_MIN,
+)
+from product_bands import MIX_BANDS
 
 def get_duration_range(equipment_name: str):
     """Retrieve base duration range for equipment"""
     return DURATION_RANGES.get(equipment_name, DEFAULT_RANGE)
 
-# Shift performance multipliers
-SHIFT_MULTIPLIER = {
-    "A": 1.05,
-    "B": 1.00,
-    "C": 0.95,
-    "D": 1.00,
-}
-
-def product_mix_factor(thickness_mm: float, width_mm: float) -> float:
-    """
-    Calculate speed multiplier based on product dimensions:
-    - Thin (≤2.0mm) & narrow (≤1300mm): 0.5-0.7× (faster processing)
-    - Thick (>3.0mm) & wide (>1400mm): 1.1-1.3× (slower processing)
-    - Other combinations: 0.9-1.1× (baseline)
-    """
-    if pd.isna(thickness_mm) or pd.isna(width_mm):
-        return 1.0
-
-    t = float(thickness_mm)
-    w = float(width_mm)
-
-    is_thin = t <= 2.0
-    is_narrow = w <= 1300
-    is_thick = t > 3.0
-    is_wide = w > 1400
+# Duration model and keyed draws live in operation_model.py (shared with the
+# scenario runner and the calibration). The runner sets generator_seed (--seed);
+# stages executed in a plain shared namespace use key 0, as the runner's default
+from operation_model import coil_duration_units, operation_durations
 
-    if is_thin and is_narrow:
-        return np.random.uniform(0.5, 0.7)
-    elif is_thick and is_wide:
-        return np.random.uniform(1.1, 1.3)
-    else:
-        return np.random.uniform(0.9, 1.1)
+generator_seed = globals().get("generator_seed", 0)
 
-def draw_duration_seconds(equipment_name: str,
-                          is_bottleneck: bool,
-                          shift_code: str,
-                          thickness_mm: float,
-                          width_mm: float) -> float:
+def draw_duration_matrix(equipment_names: list,
+                         is_bottleneck,
+                         shift_codes,
+                         band_codes,
+                         coil_ids,
+                         seed: int = generator_seed) -> np.ndarray:
     """
-    Generate operation duration (seconds) with adjustments for:
-    - Equipment base range
-    - Product mix (thickness × width)
-    - Shift performance
-    - Bottleneck behavior
+    Generate operation durations (seconds, coils × stations) in one pass:
+    - Equipment base range and product mix band multiplier, both scaled from
+      unit-uniform draws keyed by coil (coil_unit_draws), so a coil's
+      durations do not depend on the run, batching or the other coils
+    - Shift performance per coil
+    - Bottleneck behavior per station
     """
-    low, high = get_duration_range(equipment_name)
-    base = np.random.uniform(low, high)
-
-    mix_factor = product_mix_factor(thickness_mm, width_mm)
-    shift_factor = SHIFT_MULTIPLIER.get(shift_code, 1.0)
-    bottleneck_factor = 1.10 if is_bottleneck else 1.0
-
-    return base * mix_factor * shift_factor * bottleneck_factor
+    unit = coil_duration_units(coil_ids, len(equipment_names), seed)
+    shift_factor = pd.Series(shift_codes).map(SHIFT_MULTIPLIER).fillna(1.0).to_numpy()
+    bottleneck_factor = np.where(np.asarray(is_bottleneck, dtype=bool), BOTTLENECK_DURATION_FACTOR, 1.0)
+    return operation_durations(
+        unit, [get_duration_range(name) for name in equipment_names], MIX_FACTOR_RANGES,
+        band_codes, shift_factor, bottleneck_factor,
+    )
+
+# Upper bound of one coil's cycle (every station at its slowest draw); 10 uses it
+# to decide when a station's timeline can no longer change across month partitions
+MAX_COIL_CYCLE_SEC = (
+    sum(get_duration_range(name)[1] for name in line_equipment["equipment_name"])
+    * max(high for _, high in MIX_FACTOR_RANGES.values())
+    * max(1.0, *SHIFT_MULTIPLIER.values())
+    * max(1.0, BOTTLENECK_DURATION_FACTOR)
+)
 
 def draw_queue_seconds(is_bottleneck: bool) -> float:
     """
@@ -98,8 +66,10 @@ for eq, (low, high) in sorted(DURATION_RANGES.items(), key=lambda x: x[1][0]):
     print(f"  {eq:45} {low_min:.1f}–{high_min:.1f} min")
 
 print(f"\nShift performance multipliers: {SHIFT_MULTIPLIER}")
+print(f"Line idle before entry: {IDLE_PROBABILITY:.0%} of coils, mean {IDLE_MEAN_MIN:.1f} min")
+print(f"Max coil cycle bound: {MAX_COIL_CYCLE_SEC/60:.1f} min")
 
 print("\nProduct mix speed factors:")
-print("  Thin (≤2.0mm) & Narrow (≤1300mm): 0.5–0.7× baseline (faster)")
-print("  Thick (>3.0mm) & Wide (>1400mm):  1.1–1.3× baseline (slower)")
-print("  Other combinations:                0.9–1.1× baseline")
\ No newline at end of file
+for band in MIX_BANDS:
+    low, high = MIX_FACTOR_RANGES[band]
+    print(f"  {band:12} {low:.1f}–{high:.1f}× baseline")
\ No newline at end of file
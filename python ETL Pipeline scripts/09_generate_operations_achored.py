@@ -1,103 +1,79 @@
 # Generate synthetic equipment operations anchored to real MES completion times
-
-fact_coil_ops_rows = []
+# (all timing arithmetic on int64 epoch-ms arrays, see time_model.py)
+from time_model import MS_PER_SEC, MS_PER_MIN, NAT_MS, to_epoch_ms, from_epoch_ms
 
 # Sort by completion time for sequential processing
-fact_production_coil = fact_production_coil.sort_values("completion_ts").reset_index(drop=True)
-
-# Initialize synthetic timing columns
-fact_production_coil["start_datetime"] = pd.NaT
-fact_production_coil["end_datetime"] = pd.NaT
+fact_production_coil = fact_production_coil.sort_values("completion_ts", kind="stable").reset_index(drop=True)
 
 print(f"Processing {len(fact_production_coil):,} coil records...")
 print("Anchoring synthetic operations to MES completion timestamps\n")
 
-processed_count = 0
-
-for idx, coil in fact_production_coil.iterrows():
-    coil_id = coil["coil_id"]
-    d = coil["production_date"]
-    thickness_mm = coil["thickness_mm"]
-    width_mm = coil["width_mm"]
-    completion_ts = coil["completion_ts"]
-    
-    if pd.isna(completion_ts):
-        continue
-
-    # Assign shift based on completion hour
-    day_crew, night_crew = date_to_crews.get(d, ("A", "B"))
-    if 6 <= completion_ts.hour < 18:
-        shift_code = day_crew
-    else:
-        shift_code = night_crew
-
-    # Generate equipment-specific durations
-    durations = []
-    for _, eq_row in line_equipment.iterrows():
-        equip_name = eq_row["equipment_name"]
-        is_bottle = bool(eq_row["is_bottleneck_candidate"])
-
-        dur_sec = draw_duration_seconds(
-            equip_name,
-            is_bottle,
-            shift_code,
-            thickness_mm,
-            width_mm,
-        )
-        durations.append(dur_sec)
-
-    total_sec = float(np.sum(durations))
-
-    # Anchor operation window to real completion time
-    coil_end_ts = completion_ts
-    coil_start_ts = coil_end_ts - timedelta(seconds=total_sec)
-
-    fact_production_coil.at[idx, "start_datetime"] = coil_start_ts
-    fact_production_coil.at[idx, "end_datetime"] = coil_end_ts
-    fact_production_coil.at[idx, "shift_code"] = shift_code
-
-    # Build equipment operation timeline
-    ts = coil_start_ts
-    for (_, eq_row), dur_sec in zip(line_equipment.iterrows(), durations):
-        equipment_id = eq_row["equipment_id"]
-        equip_name = eq_row["equipment_name"]
-        is_bottle = bool(eq_row["is_bottleneck_candidate"])
-
-        op_start_ts = ts
-        op_end_ts = ts + timedelta(seconds=dur_sec)
-
-        fact_coil_ops_rows.append({
-            "coil_id": coil_id,
-            "parent_coil_id": coil["parent_coil_id"],
-            "equipment_id": equipment_id,
-            "equipment_name": equip_name,
-            "production_date": d,
-            "shift_code": shift_code,
-            "operation_start_ts": op_start_ts,
-            "operation_end_ts": op_end_ts,
-            "operation_duration_sec": dur_sec,
-            "queue_time_sec": 0.0,
-            "is_bottleneck_step": is_bottle,
-            "type_code": coil["type_code"],
-            "is_prime": coil["is_prime"],
-            "is_scrap": coil["is_scrap"],
-        })
-
-        ts = op_end_ts
-
-    processed_count += 1
-    
-    if (processed_count % 1000 == 0):
-        print(f"  Processed {processed_count:,} / {len(fact_production_coil):,} coils")
-
-# Build operation cycle fact table
-fact_coil_operation_cycle = pd.DataFrame(fact_coil_ops_rows)
+completion_ms = to_epoch_ms(fact_production_coil["completion_ts"])
+valid = completion_ms != NAT_MS
+
+# Assign shift based on completion hour (day crew 06:00-18:00)
+completion_hour = fact_production_coil["completion_ts"].dt.hour
+day_crews = fact_production_coil["production_date"].map({d: c[0] for d, c in date_to_crews.items()}).fillna("A")
+night_crews = fact_production_coil["production_date"].map({d: c[1] for d, c in date_to_crews.items()}).fillna("B")
+coil_shift_codes = np.where((completion_hour >= 6) & (completion_hour < 18), day_crews, night_crews)
+
+# Generate equipment-specific durations for all coils × stations at once
+coil_durations = draw_duration_matrix(
+    line_equipment["equipment_name"].tolist(),
+    line_equipment["is_bottleneck_candidate"].to_numpy(),
+    coil_shift_codes,
+    fact_production_coil["product_band"].cat.codes.to_numpy(),
+    fact_production_coil["coil_id"].to_numpy(),
+)
+
+# Anchor each coil's operation window to its real completion time:
+# operations run back to back, the last one ends at completion
+duration_ms = np.rint(coil_durations[valid] * MS_PER_SEC).astype(np.int64)
+elapsed_ms = np.cumsum(duration_ms, axis=1)
+coil_start_ms = completion_ms[valid] - elapsed_ms[:, -1]
+op_end_ms = coil_start_ms[:, None] + elapsed_ms
+op_start_ms = op_end_ms - duration_ms
+
+n_coils, n_stations = duration_ms.shape
+coils = fact_production_coil[valid]
+
+start_ms = np.full(len(fact_production_coil), NAT_MS, dtype=np.int64)
+end_ms = np.full(len(fact_production_coil), NAT_MS, dtype=np.int64)
+start_ms[valid] = coil_start_ms
+end_ms[valid] = completion_ms[valid]
+
+fact_production_coil["start_datetime"] = from_epoch_ms(start_ms)
+fact_production_coil["end_datetime"] = from_epoch_ms(end_ms)
+fact_production_coil["shift_code"] = np.where(valid, coil_shift_codes, fact_production_coil["shift_code"])
+
+# Build operation cycle fact table (coil-major, stations in process order)
+def per_operation(values):
+    return np.repeat(np.asarray(values), n_stations)
+
+def per_station(values):
+    return np.tile(np.asarray(values), n_coils)
+
+fact_coil_operation_cycle = pd.DataFrame({
+    "coil_id": per_operation(coils["coil_id"]),
+    "parent_coil_id": per_operation(coils["parent_coil_id"]),
+    "equipment_id": per_station(line_equipment["equipment_id"]),
+    "equipment_name": per_station(line_equipment["equipment_name"]),
+    "production_date": per_operation(coils["production_date"]),
+    "shift_code": per_operation(coil_shift_codes[valid]),
+    "operation_start_ts": from_epoch_ms(op_start_ms.ravel()),
+    "operation_end_ts": from_epoch_ms(op_end_ms.ravel()),
+    "operation_duration_sec": duration_ms.ravel() / MS_PER_SEC,
+    "queue_time_sec": 0.0,
+    "is_bottleneck_step": per_station(line_equipment["is_bottleneck_candidate"].astype(bool)),
+    "type_code": per_operation(coils["type_code"]),
+    "is_prime": per_operation(coils["is_prime"]),
+    "is_scrap": per_operation(coils["is_scrap"]),
+})
+
+processed_count = n_coils
 
 # Calculate total cycle time per coil
-fact_production_coil["total_cycle_time_min"] = (
-    (fact_production_coil["end_datetime"] - fact_production_coil["start_datetime"])
-    .dt.total_seconds() / 60.0
-)
+fact_production_coil["total_cycle_time_min"] = np.where(valid, (end_ms - start_ms) / MS_PER_MIN, np.nan)
 
 print(f"\nGenerated {len(fact_coil_operation_cycle):,} operation records")
 print(f"Processed {processed_count:,} coils with valid completion times")
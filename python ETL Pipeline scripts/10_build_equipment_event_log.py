@@ -1,63 +1,85 @@
 # Build equipment event log (RUN/IDLE/FAULT timeline)
+# (int64 epoch-ms arrays throughout, see time_model.py)
+from time_model import (
+    MS_PER_SEC, MS_PER_MIN, NAT_MS, from_epoch_ms, to_day_number, to_epoch_ms,
+    to_month_number, day_to_month_number,
+)
 
-event_rows = []
+# Events are grouped by the month they become final in (backfill.py runs one
+# month partition at a time; single-shot runs use the same grouping so both
+# produce the same log):
+# - RUN: completion month of its coil
+# - FAULT: start month
+# - IDLE: month of (next RUN start + max coil cycle); after that point no later
+#   coil can start an operation in between
+max_cycle_ms = int(np.ceil(MAX_COIL_CYCLE_SEC * MS_PER_SEC))
 
 # Generate RUN and IDLE events from synthetic coil operations
 print("Generating RUN and IDLE events from coil operations...")
 
-run_df = fact_coil_operation_cycle.copy()
-run_df["event_start_ts"] = run_df["operation_start_ts"]
-run_df["event_end_ts"] = run_df["operation_end_ts"]
-
-run_count = 0
-idle_count = 0
-
-for eq_id, g in run_df.groupby("equipment_id"):
-    g = g.sort_values("event_start_ts").reset_index(drop=True)
-    equip_name = g["equipment_name"].iloc[0]
-
-    # RUN events (one per coil at this equipment)
-    for _, r in g.iterrows():
-        event_rows.append({
-            "equipment_id": eq_id,
-            "equipment_name": equip_name,
-            "event_type": "RUN",
-            "event_start_ts": r["event_start_ts"],
-            "event_end_ts": r["event_end_ts"],
-            "event_duration_sec": (r["event_end_ts"] - r["event_start_ts"]).total_seconds(),
-            "coil_id": r["coil_id"],
-            "parent_coil_id": r["parent_coil_id"],
-            "shift_code": r["shift_code"],
-            "type_code": r.get("type_code"),
-            "is_prime": r.get("is_prime", False),
-            "is_scrap": r.get("is_scrap", False),
-        })
-        run_count += 1
-
-    # IDLE events (gaps between RUN events)
-    min_idle_sec = 30
-
-    for i in range(len(g) - 1):
-        end_curr = g.loc[i, "event_end_ts"]
-        start_next = g.loc[i + 1, "event_start_ts"]
-
-        gap = (start_next - end_curr).total_seconds()
-        if gap > min_idle_sec:
-            event_rows.append({
-                "equipment_id": eq_id,
-                "equipment_name": equip_name,
-                "event_type": "IDLE",
-                "event_start_ts": end_curr,
-                "event_end_ts": start_next,
-                "event_duration_sec": gap,
-                "coil_id": None,
-                "parent_coil_id": None,
-                "shift_code": None,
-                "type_code": None,
-                "is_prime": False,
-                "is_scrap": False,
-            })
-            idle_count += 1
+# Operations are read directly (no copy); RUN events reuse operation start/end
+run_df = fact_coil_operation_cycle
+
+op_equipment = run_df["equipment_id"].to_numpy(dtype=np.int64)
+op_start_ms = to_epoch_ms(run_df["operation_start_ts"])
+op_end_ms = to_epoch_ms(run_df["operation_end_ts"])
+op_month = day_to_month_number(run_df["production_date"])
+op_seq = np.arange(len(run_df), dtype=np.int64)
+if backfill_state is not None:
+    op_seq += backfill_state["op_offset"]
+
+# One sort by (equipment_id, operation_start_ts)
+op_order = np.lexsort((op_seq, op_start_ms, op_equipment))
+op_equipment, op_start_ms, op_end_ms = op_equipment[op_order], op_start_ms[op_order], op_end_ms[op_order]
+op_month, op_seq = op_month[op_order], op_seq[op_order]
+op_name = run_df["equipment_name"].to_numpy()[op_order]
+
+# Station timelines continue from the operations carried over from the
+# previous partition (whose following IDLE gap was not final yet)
+station_tail = backfill_state["station_tail"] if backfill_state is not None else None
+if station_tail is not None:
+    tl_equipment = np.r_[station_tail["equipment_id"], op_equipment]
+    tl_start_ms = np.r_[station_tail["start_ms"], op_start_ms]
+    tl_end_ms = np.r_[station_tail["end_ms"], op_end_ms]
+    tl_seq = np.r_[station_tail["seq"], op_seq]
+    tl_name = np.r_[station_tail["equipment_name"], op_name]
+    tl_order = np.lexsort((tl_seq, tl_start_ms, tl_equipment))
+    tl_equipment, tl_start_ms, tl_end_ms = tl_equipment[tl_order], tl_start_ms[tl_order], tl_end_ms[tl_order]
+    tl_seq, tl_name = tl_seq[tl_order], tl_name[tl_order]
+else:
+    tl_equipment, tl_start_ms, tl_end_ms, tl_seq, tl_name = op_equipment, op_start_ms, op_end_ms, op_seq, op_name
+
+# IDLE events (gaps between consecutive RUN events at the same equipment)
+min_idle_sec = 30
+
+same_station = tl_equipment[1:] == tl_equipment[:-1]
+gap_ms = tl_start_ms[1:] - tl_end_ms[:-1]
+idle_month_all = to_month_number(tl_start_ms[1:] + max_cycle_ms)
+is_idle = same_station & (gap_ms > min_idle_sec * MS_PER_SEC)
+
+if backfill_state is not None:
+    # Only gaps that are final by the end of this partition; each station
+    # carries its timeline from the last final gap's following RUN onwards
+    is_final = idle_month_all <= backfill_state["month"]
+    is_idle &= is_final
+    position = np.arange(len(tl_seq))
+    is_anchor = np.ones(len(tl_seq), dtype=bool)
+    is_anchor[1:] = ~same_station | is_final
+    is_station_end = np.ones(len(tl_seq), dtype=bool)
+    is_station_end[:-1] = ~same_station
+    anchor = np.maximum.accumulate(np.where(is_anchor, position, -1)) if len(position) else position
+    station_end = np.flatnonzero(is_station_end)
+    keep = position >= np.repeat(anchor[station_end], np.diff(np.r_[-1, station_end]))
+    backfill_state["station_tail"] = {
+        "equipment_id": tl_equipment[keep], "equipment_name": tl_name[keep],
+        "start_ms": tl_start_ms[keep], "end_ms": tl_end_ms[keep], "seq": tl_seq[keep],
+    }
+
+idle_after = np.flatnonzero(is_idle)
+idle_month = idle_month_all[idle_after]
+
+run_count = len(op_order)
+idle_count = len(idle_after)
 
 print(f"  Generated {run_count:,} RUN events")
 print(f"  Generated {idle_count:,} IDLE events (>30s gaps)")
@@ -65,51 +87,121 @@ print(f"  Generated {idle_count:,} IDLE events (>30s gaps)")
 # Generate FAULT events from maintenance data
 print("\nGenerating FAULT events from maintenance data...")
 
-faults = fact_maintenance_event.merge(
-    dim_equipment[["equipment_id", "equipment_name"]],
-    on="equipment_name",
-    how="left"
-)
+# Maintenance names → equipment (fuzzy against the line stations, cached mappings)
+from equipment_resolver import EquipmentResolver
 
-faults["fault_start_ts"] = faults["start_datetime"]
-faults["fault_end_ts"] = faults["start_datetime"] + pd.to_timedelta(
-    faults["duration_min"], unit="m"
+equipment_resolver = EquipmentResolver(dim_equipment, line_equipment)
+fault_match = equipment_resolver.resolve(
+    fact_maintenance_event["equipment_name"], fallback_names=fact_maintenance_event["Hierachy"]
 )
+faults = fact_maintenance_event.assign(
+    equipment_id=fault_match["equipment_id"], equipment_name=fault_match["equipment_name"]
+)
+
+in_line = faults["equipment_id"].notna().to_numpy()
+fault_skipped = int((~in_line).sum())
+faults = faults[in_line]
 
-fault_count = 0
-fault_skipped = 0
+match_counts = fault_match["match_status"].value_counts()
+print(f"  Maintenance rows by name match: " + ", ".join(f"{status} {count:,}" for status, count in match_counts.items())
+      + f" (newly scored names: {equipment_resolver.scored:,})")
+fuzzy_matches = fault_match[fault_match["match_status"] == "auto"]
+if len(fuzzy_matches):
+    fuzzy_names = pd.DataFrame({
+        "raw_name": fact_maintenance_event["equipment_name"][fuzzy_matches.index],
+        "equipment_name": fuzzy_matches["equipment_name"], "match_score": fuzzy_matches["match_score"],
+    }).drop_duplicates("raw_name")
+    for row in fuzzy_names.itertuples(index=False):
+        print(f"    '{row.raw_name}' → '{row.equipment_name}' (confidence {row.match_score:.2f})")
+review = equipment_resolver.review_names(fact_maintenance_event["equipment_name"])
+if len(review):
+    print(f"  Names awaiting review in {equipment_resolver.cache_path} (not applied): {len(review)}")
+    for row in review.head(10).itertuples(index=False):
+        print(f"    '{row.raw_name}' → '{row.equipment_name}'? (confidence {row.score:.2f})")
 
-for _, row in faults.iterrows():
-    eq_id = row["equipment_id"]
-    equip_name = row["equipment_name"]
+fault_start_ms = to_epoch_ms(faults["start_datetime"])
+fault_month = to_month_number(fault_start_ms)
+if backfill_state is not None:
+    in_month = fault_month == backfill_state["month"]
+    faults, fault_start_ms, fault_month = faults[in_month], fault_start_ms[in_month], fault_month[in_month]
+fault_count = len(faults)
 
-    if pd.isna(eq_id):
-        fault_skipped += 1
-        continue
+fault_duration_ms = np.rint(faults["duration_min"].to_numpy(dtype=np.float64) * MS_PER_MIN)
+fault_end_ms = np.where(
+    (fault_start_ms == NAT_MS) | np.isnan(fault_duration_ms),
+    NAT_MS,
+    fault_start_ms + np.nan_to_num(fault_duration_ms).astype(np.int64),
+)
+
+print(f"  Generated {fault_count:,} FAULT events")
+print(f"  Skipped {fault_skipped:,} faults (equipment not in line)")
 
-    event_rows.append({
-        "equipment_id": eq_id,
-        "equipment_name": equip_name,
-        "event_type": "FAULT",
-        "event_start_ts": row["fault_start_ts"],
-        "event_end_ts": row["fault_end_ts"],
-        "event_duration_sec": (row["fault_end_ts"] - row["fault_start_ts"]).total_seconds(),
+# Build equipment event log fact table, month by month: per equipment its RUN
+# events, then its IDLE events, then the month's FAULT events
+def event_frame(event_type, equipment_id, equipment_name, start_ms, end_ms, **attrs):
+    duration_sec = np.where(
+        (start_ms == NAT_MS) | (end_ms == NAT_MS), np.nan, (end_ms - start_ms) / MS_PER_SEC
+    )
+    frame = pd.DataFrame({
+        "equipment_id": equipment_id,
+        "equipment_name": equipment_name,
+        "event_type": event_type,
+        "event_start_ts": from_epoch_ms(start_ms),
+        "event_end_ts": from_epoch_ms(end_ms),
+        "event_duration_sec": duration_sec,
         "coil_id": None,
         "parent_coil_id": None,
-        "shift_code": row["Shifts"] if "Shifts" in faults.columns else None,
+        "shift_code": None,
         "type_code": None,
         "is_prime": False,
         "is_scrap": False,
     })
-    fault_count += 1
+    for col, values in attrs.items():
+        frame[col] = values
+    return frame
 
-print(f"  Generated {fault_count:,} FAULT events")
-print(f"  Skipped {fault_skipped:,} faults (equipment not in line)")
+run_rows = run_df.iloc[op_order]
+run_events = event_frame(
+    "RUN", op_equipment, op_name, op_start_ms, op_end_ms,
+    coil_id=run_rows["coil_id"].to_numpy(),
+    parent_coil_id=run_rows["parent_coil_id"].to_numpy(),
+    shift_code=run_rows["shift_code"].to_numpy(),
+    type_code=run_rows["type_code"].to_numpy(),
+    is_prime=run_rows["is_prime"].to_numpy(),
+    is_scrap=run_rows["is_scrap"].to_numpy(),
+)
+idle_events = event_frame(
+    "IDLE", tl_equipment[idle_after], tl_name[idle_after],
+    tl_end_ms[idle_after], tl_start_ms[idle_after + 1],
+)
+fault_events = event_frame(
+    "FAULT", faults["equipment_id"].to_numpy(dtype=np.int64), faults["equipment_name"].to_numpy(),
+    fault_start_ms, fault_end_ms,
+    shift_code=faults["Shifts"].to_numpy() if "Shifts" in faults.columns else None,
+)
+
+# IDLE events sort by their following RUN; FAULT events keep maintenance order
+is_fault = np.r_[np.zeros(run_count + idle_count, dtype=np.int8), np.ones(fault_count, dtype=np.int8)]
+no_key = np.zeros(fault_count, dtype=np.int64)
+timeline_order = np.lexsort((
+    np.r_[op_seq, tl_seq[idle_after + 1], np.arange(fault_count)],
+    np.r_[op_start_ms, tl_start_ms[idle_after + 1], no_key],
+    np.r_[np.zeros(run_count, dtype=np.int8), np.ones(idle_count, dtype=np.int8), no_key],
+    np.r_[op_equipment, tl_equipment[idle_after], no_key],
+    is_fault,
+    np.r_[op_month, idle_month, fault_month],
+))
+fact_equipment_event_log = pd.concat(
+    [run_events, idle_events, fault_events], ignore_index=True
+).iloc[timeline_order].reset_index(drop=True)
+fact_equipment_event_log["event_date"] = to_day_number(
+    fact_equipment_event_log["event_start_ts"].to_numpy().view(np.int64)
+)
 
-# Build equipment event log fact table
-fact_equipment_event_log = pd.DataFrame(event_rows)
-fact_equipment_event_log["event_date"] = fact_equipment_event_log["event_start_ts"].dt.date
+# Stable surrogate key (same event → same event_id in every run)
+from event_keys import assign_event_ids
 
+fact_equipment_event_log.insert(0, "event_id", assign_event_ids(fact_equipment_event_log))
 print(f"\nEquipment event log created: {len(fact_equipment_event_log):,} events")
 print(f"  RUN: {(fact_equipment_event_log['event_type'] == 'RUN').sum():,}")
 print(f"  IDLE: {(fact_equipment_event_log['event_type'] == 'IDLE').sum():,}")
@@ -143,4 +235,32 @@ print("\nSample event records:")
 print(fact_equipment_event_log[[
     'equipment_name', 'event_type', 'event_start_ts', 'event_end_ts', 
     'coil_id', 'type_code', 'is_prime'
-]].head(15))
\ No newline at end of file
+]].head(15))
+
+# Data-driven bottleneck detection (active-period method, per crew shift)
+# (needs the whole timeline: backfill.py runs it incrementally across partitions)
+if backfill_state is None:
+    print("\nDetecting momentary and shifting bottlenecks (active-period method)...")
+
+    from bottleneck_engine import detect_bottlenecks, bottleneck_candidates
+
+    fact_bottleneck_window = detect_bottlenecks(fact_equipment_event_log)
+    bottleneck_ranking = bottleneck_candidates(fact_bottleneck_window)
+
+    equipment_names = dim_equipment.set_index("equipment_id")["equipment_name"]
+    fact_bottleneck_window["equipment_name"] = fact_bottleneck_window["equipment_id"].map(equipment_names)
+    bottleneck_ranking["equipment_name"] = bottleneck_ranking["equipment_id"].map(equipment_names)
+
+    # Replace configured flags with detected candidates
+    detected_ids = bottleneck_ranking.loc[bottleneck_ranking["is_bottleneck_candidate"], "equipment_id"]
+    dim_equipment["is_bottleneck_candidate"] = dim_equipment["equipment_id"].isin(detected_ids)
+    line_equipment["is_bottleneck_candidate"] = line_equipment["equipment_id"].isin(detected_ids)
+    fact_coil_operation_cycle["is_bottleneck_step"] = fact_coil_operation_cycle["equipment_id"].isin(detected_ids)
+
+    print(f"  Windows analysed: {fact_bottleneck_window['window_start'].nunique():,}")
+    print(f"  Bottleneck candidates detected: {len(detected_ids)}")
+
+    print("\nBottleneck ranking (share of total bottleneck time):")
+    print(bottleneck_ranking[[
+        "equipment_name", "share_of_bottleneck_time_pct", "windows_as_primary", "is_bottleneck_candidate"
+    ]].round(2).head(10).to_string(index=False))
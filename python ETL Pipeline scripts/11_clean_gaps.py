@@ -1,6 +1,101 @@
 # Clean gap data by removing outliers and handling edge cases
 
-df_clean = fact_production_coil.copy()
+# Declarative data quality rules (evaluated as one fused mask per column)
+# kind: range (min/max bounds), null, monotonic (non-decreasing), referential (value in reference set)
+# action: nullify (set violating values to NaN) or flag (count only)
+GAP_QUALITY_RULES = [
+    {"name": "completion_gap_negative", "column": "gap_from_prev_completion_min",
+     "kind": "range", "min": 0, "action": "nullify"},
+    {"name": "completion_gap_over_6h", "column": "gap_from_prev_completion_min",
+     "kind": "range", "max": 360, "action": "nullify"},
+    {"name": "parent_gap_negative", "column": "gap_from_prev_parent_min",
+     "kind": "range", "min": 0, "action": "nullify"},
+    {"name": "parent_gap_over_30min", "column": "gap_from_prev_parent_min",
+     "kind": "range", "max": 30, "action": "nullify"},
+    {"name": "completion_ts_missing", "column": "completion_ts",
+     "kind": "null", "action": "flag"},
+    {"name": "completion_ts_out_of_order", "column": "completion_ts",
+     "kind": "monotonic", "action": "flag"},
+    {"name": "parent_coil_unknown", "column": "parent_coil_id",
+     "kind": "referential", "ref": "dim_parent_coil.parent_coil_id", "action": "flag"},
+]
+
+def _column_values(frame: pd.DataFrame, column: str):
+    """Return column as a NumPy array plus null mask (datetimes as int64)"""
+    series = frame[column]
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = series.to_numpy(dtype="datetime64[ns]").view("int64")
+        return values, values == np.iinfo(np.int64).min
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype=np.float64)
+        return values, np.isnan(values)
+    values = series.to_numpy()
+    return values, pd.isna(values)
+
+def _rule_mask(rule: dict, values, is_null, references: dict):
+    """Evaluate a single rule against column values; True marks a violation"""
+    kind = rule["kind"]
+    if kind == "null":
+        return is_null
+    if kind == "range":
+        mask = np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if rule.get("min") is not None:
+                mask |= values < rule["min"]
+            if rule.get("max") is not None:
+                mask |= values > rule["max"]
+        return mask & ~is_null
+    if kind == "monotonic":
+        mask = np.zeros(len(values), dtype=bool)
+        mask[1:] = (values[1:] < values[:-1]) & ~is_null[1:] & ~is_null[:-1]
+        return mask
+    if kind == "referential":
+        return ~np.isin(values, references[rule["ref"]]) & ~is_null
+    raise ValueError(f"Unknown data quality rule kind: {kind}")
+
+def apply_quality_rules(frame: pd.DataFrame, rules: list, references: dict = None) -> pd.DataFrame:
+    """
+    Apply declarative rules to frame in place:
+    - Rules are grouped by column and evaluated on one extracted array
+    - Nullify rules are fused into a single mask and written once per column
+    - Returns per-rule violation counts as a metrics table
+    """
+    references = references or {}
+    metrics = []
+
+    rules_by_column = {}
+    for rule in rules:
+        if rule["column"] in frame.columns:
+            rules_by_column.setdefault(rule["column"], []).append(rule)
+
+    for column, column_rules in rules_by_column.items():
+        values, is_null = _column_values(frame, column)
+        fused_mask = np.zeros(len(frame), dtype=bool)
+
+        for rule in column_rules:
+            mask = _rule_mask(rule, values, is_null, references)
+            metrics.append({
+                "rule_name": rule["name"],
+                "column": column,
+                "kind": rule["kind"],
+                "action": rule["action"],
+                "rows_checked": len(frame),
+                "violations": int(mask.sum()),
+            })
+            if rule["action"] == "nullify":
+                fused_mask |= mask
+
+        if fused_mask.any():
+            frame.loc[fused_mask, column] = np.nan
+
+    metrics = pd.DataFrame(metrics, columns=[
+        "rule_name", "column", "kind", "action", "rows_checked", "violations"
+    ])
+    metrics["violation_pct"] = 100 * metrics["violations"] / metrics["rows_checked"].clip(lower=1)
+    return metrics
+
+# Rules are applied in place (no full-table copy)
+df_clean = fact_production_coil
 
 print("Cleaning gap data - removing outliers and data quality issues\n")
 
@@ -17,29 +112,17 @@ print(f"  Total: {total_records:,}")
 print(f"  With completion gaps: {original_completion_gaps:,}")
 print(f"  With parent gaps: {original_parent_gaps:,}")
 
-# Remove negative gaps (data quality issues)
-negative_completion = (df_clean["gap_from_prev_completion_min"] < 0).sum()
-negative_parent = (df_clean["gap_from_prev_parent_min"] < 0).sum()
-
-if negative_completion > 0 or negative_parent > 0:
-    print(f"\nRemoving negative gaps:")
-    print(f"  Completion gaps < 0: {negative_completion}")
-    print(f"  Parent gaps < 0: {negative_parent}")
-    
-    df_clean.loc[df_clean["gap_from_prev_completion_min"] < 0, "gap_from_prev_completion_min"] = np.nan
-    df_clean.loc[df_clean["gap_from_prev_parent_min"] < 0, "gap_from_prev_parent_min"] = np.nan
-
-# Cap completion gaps above 6 hours (likely shift changes or extended downtime)
-completion_outliers = (df_clean["gap_from_prev_completion_min"] > 360).sum()
-if completion_outliers > 0:
-    print(f"\nCapping completion gaps > 360 min (6 hours): {completion_outliers} records")
-    df_clean.loc[df_clean["gap_from_prev_completion_min"] > 360, "gap_from_prev_completion_min"] = np.nan
-
-# Cap parent coil gaps above 30 minutes (pieces from same parent should be close)
-parent_outliers = (df_clean["gap_from_prev_parent_min"] > 30).sum()
-if parent_outliers > 0:
-    print(f"\nCapping parent gaps > 30 min: {parent_outliers} records")
-    df_clean.loc[df_clean["gap_from_prev_parent_min"] > 30, "gap_from_prev_parent_min"] = np.nan
+dq_references = {
+    "dim_parent_coil.parent_coil_id": dim_parent_coil["parent_coil_id"].to_numpy(),
+}
+
+dq_rule_metrics = apply_quality_rules(df_clean, GAP_QUALITY_RULES, dq_references)
+
+# Apply the same parent gap rules to the parent coil rollup
+apply_quality_rules(dim_parent_coil, GAP_QUALITY_RULES, dq_references)
+
+print("\nData quality rule violations:")
+print(dq_rule_metrics[["rule_name", "action", "violations", "violation_pct"]].round(2).to_string(index=False))
 
 # Analyze scrap vs prime piece gaps
 scrap_gaps = df_clean[df_clean["is_scrap"] == True]["gap_from_prev_completion_min"]
@@ -86,7 +169,18 @@ parent_dist = pd.cut(
 ).value_counts().sort_index()
 print(parent_dist)
 
-# Update main fact table
-fact_production_coil = df_clean
+# Rolling tempo per coil (15 min, 1 h, running shift) for line, crew and type_code
+# (a month partition continues the windows from the previous partition's last shift)
+from rolling_metrics import build_tempo_rolling
+
+fact_tempo_rolling, tempo_history = build_tempo_rolling(
+    df_clean, backfill_state["tempo_history"] if backfill_state is not None else None
+)
+if backfill_state is not None:
+    backfill_state["tempo_history"] = tempo_history
+
+print(f"\nRolling tempo table: {len(fact_tempo_rolling):,} rows")
+print(fact_tempo_rolling[fact_tempo_rolling["scope"] == "line"].groupby("window")["pieces_per_hour"]
+      .describe(percentiles=[0.1, 0.5, 0.9])[["mean", "10%", "50%", "90%", "max"]].round(2))
 
-print("\n✓ Gap cleaning complete - fact_production_coil updated")
\ No newline at end of file
+print("\n✓ Gap cleaning complete - fact_production_coil updated in place")
\ No newline at end of file
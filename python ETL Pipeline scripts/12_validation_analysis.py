@@ -21,26 +21,12 @@ print(prime_scrap_cycle)
 print("\n2. Product Mix Band Analysis")
 print("-" * 60)
 
-def classify_product(row):
-    t = row["thickness_mm"]
-    w = row["width_mm"]
-    if pd.isna(t) or pd.isna(w):
-        return "unknown"
-    
-    is_thin = t <= 2.0
-    is_narrow = w <= 1300
-    
-    if is_thin and is_narrow:
-        return "thin & narrow (fast band)"
-    else:
-        return "other mix"
-
-prod_with_band = fact_production_coil.copy()
-prod_with_band["product_band"] = prod_with_band.apply(classify_product, axis=1)
+# Band persisted in fact_production_coil by 05 (same bands the generator used)
+product_band = fact_production_coil["product_band"]
 
 cycle_summary = (
-    prod_with_band
-    .groupby("product_band")["total_cycle_time_min"]
+    fact_production_coil["total_cycle_time_min"]
+    .groupby(product_band, observed=True)
     .agg(["count", "mean", "std"])
     .sort_values("mean")
 )
@@ -61,28 +47,14 @@ print(f"  Implied tempo: {global_pieces_per_hour:.2f} pieces/hour")
 print("\n3. Parent Coil Yield Analysis")
 print("-" * 60)
 
-parent_analysis = (
-    fact_production_coil
-    .groupby('parent_coil_id')
-    .agg({
-        'coil_id': 'count',
-        'is_prime': 'sum',
-        'is_scrap': 'sum',
-        'completion_ts': ['min', 'max']
-    })
-)
-
-parent_analysis.columns = ['total_pieces', 'prime_pieces', 'scrap_pieces', 'first_completion', 'last_completion']
-parent_analysis['prime_rate_%'] = 100 * parent_analysis['prime_pieces'] / parent_analysis['total_pieces']
-parent_analysis['parent_cycle_min'] = (
-    (parent_analysis['last_completion'] - parent_analysis['first_completion']).dt.total_seconds() / 60.0
-)
+# Reuse parent coil rollup built in 05 (no re-aggregation of coil records)
+parent_analysis = dim_parent_coil
 
 print("\nParent coil statistics:")
 print(f"  Avg pieces per parent: {parent_analysis['total_pieces'].mean():.2f}")
 print(f"  Avg prime pieces: {parent_analysis['prime_pieces'].mean():.2f}")
 print(f"  Avg scrap pieces: {parent_analysis['scrap_pieces'].mean():.2f}")
-print(f"  Avg prime rate: {parent_analysis['prime_rate_%'].mean():.1f}%")
+print(f"  Avg prime rate: {parent_analysis['prime_rate_pct'].mean():.1f}%")
 print(f"  Avg parent cycle time: {parent_analysis['parent_cycle_min'].mean():.2f} min")
 
 # Gap analysis (tempo validation)
@@ -131,6 +103,11 @@ equip_share = equip_share.sort_values("share_of_line_%", ascending=False)
 print("\nEquipment share of total line time (bottleneck indicators):")
 print(equip_share[["share_of_line_%"]].head(10))
 
+print("\nActive-period bottleneck ranking (sole + shifting):")
+print(bottleneck_ranking.set_index("equipment_name")[[
+    "share_of_bottleneck_time_pct", "windows_as_primary", "is_bottleneck_candidate"
+]].round(2).head(10))
+
 # Equipment event analysis
 print("\n6. Equipment Event Analysis (RUN/IDLE/FAULT)")
 print("-" * 60)
@@ -163,8 +140,27 @@ for col in ["RUN", "IDLE", "FAULT"]:
 print("\nEquipment utilization (top 10 by total time):")
 print(equip_event_pivot[["RUN_%", "IDLE_%", "FAULT_%"]].sort_values("RUN_%", ascending=False).head(10))
 
+# Rolling tempo curves (fact_tempo_rolling built in 11)
+print("\n7. Rolling Tempo by Crew Shift")
+print("-" * 60)
+
+line_tempo = fact_tempo_rolling[fact_tempo_rolling["scope"] == "line"]
+
+# Running shift window at the shift's last coil = tempo over the whole shift
+shift_end_tempo = line_tempo[line_tempo["window"] == "shift"].groupby("window_start_ts").tail(1)
+crew_tempo = shift_end_tempo.groupby("shift_code")[["pieces_per_hour", "mass_tons_per_hour", "prime_rate_pct"]].mean()
+crew_tempo.insert(0, "shifts", shift_end_tempo.groupby("shift_code").size())
+
+print("\nShift-end tempo by crew (mean over shifts):")
+print(crew_tempo.round(2))
+
+hourly_tempo = line_tempo.loc[line_tempo["window"] == "1h", "pieces_per_hour"]
+print(f"\nRolling 1 h tempo: median {hourly_tempo.median():.2f} | "
+      f"p10 {hourly_tempo.quantile(0.10):.2f} | p90 {hourly_tempo.quantile(0.90):.2f} pieces/hour "
+      f"(global {global_pieces_per_hour:.2f})")
+
 # Real vs synthetic time validation
-print("\n7. Synthetic vs Real Completion Time Validation")
+print("\n8. Synthetic vs Real Completion Time Validation")
 print("-" * 60)
 
 time_diff = (fact_production_coil['end_datetime'] - fact_production_coil['completion_ts']).dt.total_seconds()
@@ -195,7 +191,7 @@ print(f"  Prime pieces: {prime_pieces:,} ({100*prime_pieces/total_pieces:.1f}%)"
 print(f"  Scrap pieces: {scrap_pieces:,} ({100*scrap_pieces/total_pieces:.1f}%)")
 
 print(f"\n✓ Product mix:")
-fast_band_count = (prod_with_band['product_band'] == 'thin & narrow (fast band)').sum()
+fast_band_count = (product_band == 'thin_narrow').sum()
 print(f"  Fast band (thin & narrow): {fast_band_count:,} pieces")
 print(f"  Other mix: {total_pieces - fast_band_count:,} pieces")
 
@@ -205,6 +201,8 @@ print(f"  Range: {fact_production_coil['total_cycle_time_min'].min():.2f} - {fac
 
 print(f"\n✓ Equipment bottlenecks:")
 print(f"  Top time consumer: {equip_share.index[0]} ({equip_share.iloc[0]['share_of_line_%']:.1f}%)")
+print(f"  Top active-period bottleneck: {bottleneck_ranking.iloc[0]['equipment_name']} ({bottleneck_ranking.iloc[0]['share_of_bottleneck_time_pct']:.1f}% of bottleneck time)")
+print(f"  Detected candidates: {int(bottleneck_ranking['is_bottleneck_candidate'].sum())}")
 
 print(f"\n✓ Event log:")
 print(f"  Total events: {len(fact_equipment_event_log):,}")
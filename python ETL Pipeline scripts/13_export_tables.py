@@ -15,39 +15,134 @@ else:
 # Define tables for export
 tables_to_export = {
     "dim_equipment": dim_equipment,
-    "dim_date_crew_schedule": pd.DataFrame([
-        {"production_date": k, "day_crew": v[0], "night_crew": v[1]}
-        for k, v in date_to_crews.items()
-    ]),
+    "dim_date_crew_schedule": dim_date_crew_schedule,
+    "dim_parent_coil": dim_parent_coil,
     "fact_production_coil": fact_production_coil,
     "fact_maintenance_event": fact_maintenance_event,
+    "fact_equipment_reliability": fact_equipment_reliability,
+    "dq_rule_metrics": dq_rule_metrics,
     "fact_coil_operation_cycle": fact_coil_operation_cycle,
     "fact_equipment_event_log": fact_equipment_event_log,
+    "fact_bottleneck_window": fact_bottleneck_window,
+    "fact_tempo_rolling": fact_tempo_rolling,
     "raw_production_filtered": df_prod,
     "raw_maintenance_filtered": df_maint,
 }
 
+# Tables attached from shared memory (--concurrent) hold string columns as
+# categoricals: back to the producer dtypes before anything is persisted, so
+# the manifest schema, time index blocks and keys match a sequential run
+from stage_handoff import restore_source_dtypes
+
+tables_to_export = {name: restore_source_dtypes(table_df) for name, table_df in tables_to_export.items()}
+dim_equipment = tables_to_export["dim_equipment"]
+fact_production_coil = tables_to_export["fact_production_coil"]
+fact_maintenance_event = tables_to_export["fact_maintenance_event"]
+fact_equipment_event_log = tables_to_export["fact_equipment_event_log"]
+df_prod = tables_to_export["raw_production_filtered"]
+df_maint = tables_to_export["raw_maintenance_filtered"]
+
+# Pass-through extract columns (Cast/Slab, description text) rejoin the facts here
+from raw_scan import attach_passthrough
+
+tables_to_export["fact_production_coil"] = attach_passthrough(
+    fact_production_coil, df_prod, "fact_production_coil", FACT_PRODUCTION_COLUMNS
+)
+tables_to_export["fact_maintenance_event"] = attach_passthrough(
+    fact_maintenance_event, df_maint, "fact_maintenance_event", FACT_MAINTENANCE_COLUMNS
+)
+
+# Event log change set against the active run (sorted merge on event_id)
+from publish import stage_run, commit_run, current_run_id, resolve_current
+from event_keys import event_log_changes, load_event_keys, save_event_keys
+
+previous_event_keys = load_event_keys(resolve_current(output_dir)) if current_run_id(output_dir) else None
+fact_equipment_event_log_changes, event_change_counts = event_log_changes(
+    fact_equipment_event_log, previous_event_keys
+)
+tables_to_export["fact_equipment_event_log_changes"] = fact_equipment_event_log_changes
+
+# Day numbers → dates (the only conversion out of the internal time model)
+from time_model import export_frame
+
+tables_to_export = {name: export_frame(table_df) for name, table_df in tables_to_export.items()}
+
+print(f"\nEvent log changes vs {current_run_id(output_dir) or 'empty target (initial load)'}:")
+print(f"  Inserts: {event_change_counts['inserts']:,} | Updates: {event_change_counts['updates']:,} | "
+      f"Deletes: {event_change_counts['deletes']:,} | Unchanged: {event_change_counts['unchanged']:,}")
+
 print(f"\nExporting {len(tables_to_export)} tables:")
 
+# Stage a new versioned run (unchanged tables are hard-linked from the active run)
+PUBLISH_RETENTION = 5
+
+staging_dir, run_manifest = stage_run(tables_to_export, output_dir)
+save_event_keys(staging_dir, fact_equipment_event_log)
+
+# Compact event timeline (per-station state streams referencing fact_production_coil rows)
+from event_timeline import EventTimeline
+from time_model import MS_PER_SEC
+
+event_timeline = EventTimeline.encode(
+    fact_equipment_event_log, fact_production_coil, max_cycle_ms=int(np.ceil(MAX_COIL_CYCLE_SEC * MS_PER_SEC))
+)
+event_timeline_path = event_timeline.save(staging_dir)
+
 exported_files = []
 
-for table_name, table_df in tables_to_export.items():
-    filepath = os.path.join(output_dir, f"{table_name}.csv")
-    
-    table_df.to_csv(filepath, index=False, encoding='utf-8')
-    
-    file_size_kb = os.path.getsize(filepath) / 1024
-    
+for table_name, entry in run_manifest["tables"].items():
+    file_size_kb = entry["size_bytes"] / 1024
+    reuse_note = f" | Reused from {entry['reused_from']}" if entry["reused_from"] else ""
+
     print(f"\n✓ {table_name}")
-    print(f"  Rows: {len(table_df):,} | Columns: {len(table_df.columns)} | Size: {file_size_kb:.2f} KB")
-    
-    exported_files.append(filepath)
+    print(f"  Rows: {entry['rows']:,} | Columns: {entry['columns']} | Size: {file_size_kb:.2f} KB{reuse_note}")
+
+    exported_files.append(entry["file"])
+
+# Build block-partitioned time index (zone maps) for fast range queries
+from time_index import build_time_index
+
+time_index_summary = build_time_index(tables_to_export, staging_dir)
+
+print(f"\n✓ Time index built")
+print(time_index_summary.to_string(index=False))
+
+# Inverted token index over maintenance descriptions (unchanged rows reuse the active run's tokens)
+from text_index import build_text_index
+
+text_index_summary = build_text_index(
+    tables_to_export["fact_maintenance_event"], staging_dir,
+    previous_dir=resolve_current(output_dir) if current_run_id(output_dir) else None,
+)
+
+# Roaring-style bitmap indexes on the low-cardinality filter columns (rows of the exported tables)
+from bitmap_index import build_bitmap_indexes
+
+bitmap_index_summary = build_bitmap_indexes(tables_to_export, staging_dir, dim_equipment)
+
+event_log_bytes = run_manifest["tables"]["fact_equipment_event_log"]["size_bytes"]
+print(f"\n✓ Event timeline encoded: {len(event_timeline):,} events | "
+      f"{event_timeline.nbytes / 1024:,.1f} KB in memory, {os.path.getsize(event_timeline_path) / 1024:,.1f} KB on disk "
+      f"(event log CSV {event_log_bytes / 1024:,.1f} KB)")
+
+print(f"\n✓ Text index built")
+print(f"  Documents: {text_index_summary['documents']:,} | Reused: {text_index_summary['reused_documents']:,} | "
+      f"Tokenized: {text_index_summary['tokenized_documents']:,} | Terms: {text_index_summary['text_terms']:,} | "
+      f"Postings: {text_index_summary['postings']:,}")
+
+print(f"\n✓ Bitmap indexes built")
+print(bitmap_index_summary.to_string(index=False))
+
+# Atomically switch readers to the new run
+run_dir = commit_run(staging_dir, run_manifest, output_dir, retention=PUBLISH_RETENTION)
+
+print(f"\n✓ Published run {run_manifest['run_id']} → {output_dir}/CURRENT")
 
 print(f"\n{'='*80}")
 print("EXPORT SUMMARY")
 print(f"{'='*80}")
 
-print(f"\n✓ Exported {len(exported_files)} CSV files to: {output_dir}/")
+print(f"\n✓ Exported {len(exported_files)} CSV files to: {run_dir}/")
 
 print("\nKey table descriptions:")
 
@@ -68,22 +163,41 @@ print(f"  FAULT: {(fact_equipment_event_log['event_type'] == 'FAULT').sum():,}")
 print(f"\nfact_maintenance_event:")
 print(f"  {len(fact_maintenance_event):,} records | Cleaned and filtered to Apr-Aug 2024")
 
+print(f"\nraw_production_filtered / raw_maintenance_filtered:")
+print(f"  {len(df_prod):,} / {len(df_maint):,} records | Projected extract columns only (raw_scan.py)")
+
 print("\nData model relationships:")
 print("""
   fact_production_coil
     └─ coil_id (PK), parent_coil_id, completion_ts (real MES timestamp)
     
+  dim_parent_coil
+    └─ parent_coil_id (PK), first/last completion, piece counts, gap_from_prev_parent_min
+    
   fact_coil_operation_cycle
     └─ coil_id → fact_production_coil.coil_id
     └─ equipment_id → dim_equipment.equipment_id
     
   fact_equipment_event_log
+    └─ event_id (PK, stable hash of equipment_id, event_type, event_start_ts, coil_id)
     └─ equipment_id → dim_equipment.equipment_id
     └─ coil_id (when event_type = 'RUN')
     
+  fact_equipment_event_log_changes
+    └─ change_type (I/U/D), event_id → fact_equipment_event_log.event_id (changes since previous run)
+    
+  fact_bottleneck_window
+    └─ equipment_id → dim_equipment.equipment_id (sole/shifting bottleneck time per shift window)
+    
+  fact_tempo_rolling
+    └─ coil_id → fact_production_coil.coil_id (pieces/h, t/h, prime rate, gaps per scope × window)
+    
   fact_maintenance_event
     └─ equipment_name → dim_equipment.equipment_name
     
+  fact_equipment_reliability
+    └─ equipment_name → dim_equipment.equipment_name (MTBF/MTTR per equipment, category, delay type)
+    
   dim_equipment
     └─ equipment_id (PK), process_order, section, is_bottleneck_candidate
     
@@ -95,4 +209,4 @@ print(f"\n{'='*80}")
 print("EXPORT COMPLETE")
 print(f"{'='*80}")
 print(f"\nFiles ready for Power BI, Tableau, or Azure SQL Database import")
-print(f"Location: {output_dir}/")
\ No newline at end of file
+print(f"Location: {output_dir}/latest/ (run {run_manifest['run_id']})")
\ No newline at end of file
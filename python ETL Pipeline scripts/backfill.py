@@ -0,0 +1,478 @@
+# Out-of-core backfill: run the pipeline month by month over long histories
+#
+# A single-shot run (01-13) holds the whole production extract and every
+# derived table in memory. The backfill bounds memory by one calendar month:
+#
+# Pass 1 streams the production extract once (raw_scan.iter_scan_chunks),
+# spills each (chunk, month) slice to disk and collects the few whole-history
+# facts a month cannot see on its own: parent coil first/last completion (for
+# transition gaps), production days (crew rotation), the thickness column and
+# the dtypes the single-shot concat would produce.
+#
+# Pass 2 runs the maintenance stages (03, 04, 06, 08) and the crew rotation
+# (07) once, then executes 05, 09, 10 and 11 per month in a namespace seeded
+# with backfill_state. Only boundary state is carried from month to month:
+# - the previous coil's completion (first inter-coil gap of the month)
+# - open parent coils (their pieces are held until the parent's last month)
+# - each station's operations after its last final IDLE gap (station_tail)
+# - active events of shift windows that can still change (bottleneck detection)
+# - the last shift of coils (rolling tempo windows)
+# FAULT windows are complete in their start month, where 10 emits them.
+#
+# Tables are identical to a single-shot run with the same seed. The event log
+# change set, the encoded event timeline and the time index are not built here
+# (the next 13 run does); the event keys are (event_id and row_hash collected
+# per partition, so the next 13 run diffs against the backfill), the
+# maintenance text index is (fact_maintenance_event is held in memory), and so
+# are the bitmap indexes (from the indexed columns of the written tables).
+#
+# Usage (in the directory holding the raw extracts):
+#   python backfill.py --output-dir output_tables --seed 2024
+
+import os
+import re
+import glob
+import shutil
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from raw_scan import (
+    PROD_FILE, MAINT_FILE, FILTER_START, FILTER_END, PROD_COLUMNS, MAINT_COLUMNS,
+    iter_scan_chunks, scan_csv, attach_passthrough,
+)
+from coil_rollup import add_transition_gaps, build_parent_coil_rollup
+from bottleneck_engine import (
+    ACTIVE_EVENT_TYPES, ACTIVE_MERGE_GAP_SEC, detect_bottlenecks, bottleneck_candidates, window_edges,
+)
+from publish import open_staging, stage_table, stage_table_file, commit_run, current_run_id, resolve_current
+from text_index import build_text_index
+from event_keys import row_hashes, write_event_keys
+from bitmap_index import build_bitmap_indexes, read_index_columns
+from time_model import (
+    MS_PER_SEC, NAT_MS, export_frame, month_label, month_start_ms, to_day_number, to_epoch_ms,
+    to_month_number,
+)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Parents merge across chunks this often during the scan (bounds span memory)
+SPAN_MERGE_CHUNKS = 32
+
+ROLLUP_COLUMNS = ["parent_coil_id", "completion_ts", "is_prime", "is_scrap", "mass_out_tons"]
+BOTTLENECK_COLUMNS = ["equipment_id", "event_type", "event_start_ts", "event_end_ts"]
+
+EMPTY_OPERATIONS = pd.DataFrame({
+    "coil_id": pd.Series(dtype=object),
+    "parent_coil_id": pd.Series(dtype=object),
+    "equipment_id": pd.Series(dtype=np.int64),
+    "equipment_name": pd.Series(dtype=object),
+    "production_date": pd.Series(dtype=np.int32),
+    "shift_code": pd.Series(dtype=object),
+    "operation_start_ts": pd.Series(dtype="datetime64[ms]"),
+    "operation_end_ts": pd.Series(dtype="datetime64[ms]"),
+    "type_code": pd.Series(dtype=object),
+    "is_prime": pd.Series(dtype=bool),
+    "is_scrap": pd.Series(dtype=bool),
+})
+
+
+def stage_code(number: str):
+    """Compiled pipeline stage script by its number (e.g. "05")"""
+    path = glob.glob(os.path.join(SCRIPTS_DIR, f"{number}_*.py"))[0]
+    with open(path, encoding="utf-8") as fh:
+        return compile(fh.read(), path, "exec")
+
+
+@contextlib.contextmanager
+def quiet_stdout(verbose: bool = False):
+    """Discard stage prints unless verbose (the null device is closed on exit)"""
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        yield
+
+
+def _merge_spans(spans: list) -> pd.DataFrame:
+    merged = pd.concat(spans)
+    return merged.groupby(level=0, dropna=False).agg({"first": "min", "last": "max"})
+
+
+def spill_production(spill_dir: str) -> dict:
+    """
+    Pass 1: stream the production extract and spill (chunk, month) slices.
+    Parent spans are keyed by the raw CID value; they become string ids once
+    the common dtype is known (same conversion as 05 after the concat).
+    """
+    pieces = {}         # month -> [(chunk_no, path)]
+    chunk_pieces = {}   # chunk_no -> [path]
+    spans, dtype_samples, days = [], [], set()
+    has_thickess = has_thick = thickess_values = False
+    scanned_rows = 0
+
+    for chunk_no, (chunk, rows) in enumerate(
+        iter_scan_chunks(PROD_FILE, PROD_COLUMNS, "Production Date", FILTER_START, FILTER_END)
+    ):
+        scanned_rows += rows
+        dtype_samples.append(chunk.iloc[:0])
+        has_thickess |= "Thickess" in chunk.columns
+        has_thick |= "Thick" in chunk.columns
+        if "Thickess" in chunk.columns:
+            thickess_values |= bool(chunk["Thickess"].notna().any())
+
+        completion_ms = to_epoch_ms(chunk["Production Date"])
+        months = to_month_number(completion_ms)
+        for month in np.unique(months):
+            path = os.path.join(spill_dir, f"prod_{month}_{chunk_no:06d}.pkl")
+            chunk[months == month].to_pickle(path)
+            pieces.setdefault(int(month), []).append((chunk_no, path))
+            chunk_pieces.setdefault(chunk_no, []).append(path)
+
+        days.update(np.unique(to_day_number(completion_ms)).tolist())
+        spans.append(
+            chunk.groupby("CID", dropna=False)["Production Date"].agg(["min", "max"])
+            .rename(columns={"min": "first", "max": "last"})
+        )
+        if len(spans) >= SPAN_MERGE_CHUNKS:
+            spans = [_merge_spans(spans)]
+
+    if thickess_values:
+        thickness_col = "Thickess"
+    elif has_thick:
+        thickness_col = "Thick"
+    else:
+        raise ValueError("No thickness column found in production data")
+
+    dtypes = pd.concat(dtype_samples).dtypes
+    spans = _merge_spans(spans)
+    spans.index = pd.Series(spans.index).astype(dtypes["CID"]).astype(str).to_numpy()
+
+    return {
+        "pieces": pieces, "chunk_pieces": chunk_pieces, "dtypes": dtypes, "spans": spans,
+        "days": sorted(days), "thickness_col": thickness_col, "scanned_rows": scanned_rows,
+    }
+
+
+def parent_gap_lookup(spans: pd.DataFrame) -> pd.Series:
+    """Transition gap per parent from whole-history first/last completion (as in 05)"""
+    rollup = pd.DataFrame({
+        "parent_coil_id": spans.index.to_numpy(),
+        "parent_first_completion_ts": spans["first"].to_numpy(dtype="datetime64[ns]"),
+        "parent_last_completion_ts": spans["last"].to_numpy(dtype="datetime64[ns]"),
+    }).sort_values("parent_coil_id", kind="stable")
+    rollup = add_transition_gaps(rollup)
+    return pd.Series(rollup["gap_from_prev_parent_min"].to_numpy(), index=rollup["parent_coil_id"])
+
+
+def load_partition(scan: dict, month: int):
+    """Spilled rows of one month in extract order, cast to the whole-extract dtypes"""
+    paths = [path for _, path in sorted(scan["pieces"].get(month, []))]
+    if not paths:
+        return None
+    frame = pd.concat([pd.read_pickle(path) for path in paths], ignore_index=True)
+    return frame.astype(scan["dtypes"].to_dict())
+
+
+class PartitionedTable:
+    """
+    Output table produced month by month. Partitions are spilled and written
+    as one CSV at the end: pandas picks a datetime column's text format from
+    all of its values (date only, seconds, fractions), so each partition is
+    formatted together with witness values carrying the whole table's precision.
+    """
+
+    # A witness is kept for the first value with each of these properties (ns)
+    PRECISION_MODULI = [86_400 * 10**9, 10**9, 10**6, 10**3]
+
+    def __init__(self, spill_dir: str, table_name: str):
+        self.table_name = table_name
+        self.spill_prefix = os.path.join(spill_dir, f"out_{table_name}_")
+        self.partitions = 0
+        self.rows = 0
+        self.schema = None
+        self.witnesses = {}
+
+    def add(self, table_df: pd.DataFrame):
+        table_df = export_frame(table_df)
+        if self.schema is None:
+            self.schema = table_df.dtypes.to_dict()
+        for col in table_df.columns:
+            if pd.api.types.is_datetime64_any_dtype(table_df[col]):
+                self._update_witnesses(col, table_df[col])
+        table_df.to_pickle(f"{self.spill_prefix}{self.partitions:06d}.pkl")
+        self.partitions += 1
+        self.rows += len(table_df)
+
+    def _update_witnesses(self, col: str, values: pd.Series):
+        ns = values.to_numpy(dtype="datetime64[ns]").view("int64")
+        valid = ns != NAT_MS
+        found = self.witnesses.setdefault(col, {})
+        for modulus in self.PRECISION_MODULI:
+            for unit in (1, 10**3, 10**6):
+                key = (modulus, unit)
+                if key in found or unit >= modulus:
+                    continue
+                hits = np.flatnonzero(valid & ((ns // unit) % (modulus // unit) != 0))
+                if len(hits):
+                    found[key] = values.iloc[hits[0]]
+
+    def _formatted(self, col: str, values: pd.Series) -> np.ndarray:
+        """Datetime column as the text the single-frame export would write"""
+        witness = pd.Series(list(self.witnesses.get(col, {}).values()), dtype=values.dtype)
+        text = pd.concat([witness, values], ignore_index=True).to_frame().to_csv(
+            index=False, header=False, lineterminator="\n"
+        )
+        lines = text.split("\n")[len(witness):len(witness) + len(values)]
+        return np.array(["" if line == '""' else line for line in lines], dtype=object)
+
+    def write(self, path: str, finalize=None):
+        """Write all partitions as one CSV; finalize (frame -> frame) patches
+        columns that are only known once the whole history has been seen"""
+        for part in range(self.partitions):
+            spill_path = f"{self.spill_prefix}{part:06d}.pkl"
+            table_df = pd.read_pickle(spill_path)
+            if finalize is not None:
+                table_df = finalize(table_df)
+            table_df = table_df.assign(**{
+                col: self._formatted(col, table_df[col]) for col in self.witnesses
+            })
+            table_df.to_csv(path, mode="w" if part == 0 else "a", header=part == 0,
+                            index=False, encoding="utf-8")
+            os.remove(spill_path)
+
+
+def close_bottleneck_windows(active_events: pd.DataFrame, closed_until_ns: int, close_until_ns):
+    """
+    Windows in [closed_until_ns, close_until_ns) from the buffered active
+    events; events that cannot reach a later window are dropped from the buffer.
+    """
+    windows = detect_bottlenecks(active_events)
+    window_start = windows["window_start"].to_numpy(dtype="datetime64[ns]").view("int64")
+    window_end = windows["window_end"].to_numpy(dtype="datetime64[ns]").view("int64")
+    final = window_start >= closed_until_ns
+    if close_until_ns is not None:
+        final &= window_end <= close_until_ns
+        end_ns = active_events["event_end_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+        reach_ns = close_until_ns - int(ACTIVE_MERGE_GAP_SEC * 1e9)
+        active_events = active_events[(end_ns != NAT_MS) & (end_ns >= reach_ns)]
+    return windows[final], active_events
+
+
+def run_backfill(output_dir: str, spill_dir: str = None, seed: int = None, verbose: bool = False) -> str:
+    own_spill = spill_dir is None
+    spill_dir = spill_dir or tempfile.mkdtemp(prefix="backfill_spill_")
+    os.makedirs(spill_dir, exist_ok=True)
+
+    try:
+        print("Pass 1: scanning production extract...")
+        scan = spill_production(spill_dir)
+        print(f"  Rows scanned: {scan['scanned_rows']:,} | Months: {len(scan['pieces'])} | "
+              f"Parent coils: {len(scan['spans']):,} | Production days: {len(scan['days'])}")
+
+        spans_last_month = pd.Series(
+            to_month_number(to_epoch_ms(scan["spans"]["last"])), index=scan["spans"].index
+        )
+
+        # Shared dimensions: maintenance stages, line model and crew rotation (once)
+        base = {"__name__": "__main__", "pd": pd, "np": np, "re": re,
+                "datetime": datetime, "time": time, "timedelta": timedelta, "backfill_state": None,
+                "generator_seed": seed or 0}
+        base["df_maint"], base["maint_rows_scanned"] = scan_csv(
+            MAINT_FILE, MAINT_COLUMNS, "Start", FILTER_START, FILTER_END
+        )
+        base["prod_rows_scanned"] = scan["scanned_rows"]
+        with quiet_stdout(verbose):
+            for number in ["03", "04", "06", "08"]:
+                exec(stage_code(number), base)
+            base["fact_production_coil"] = pd.DataFrame({"production_date": np.array(scan["days"], dtype=np.int32)})
+            exec(stage_code("07"), base)
+            del base["fact_production_coil"]
+
+        codes = {number: stage_code(number) for number in ["05", "09", "10", "11"]}
+        max_cycle_ms = int(np.ceil(base["MAX_COIL_CYCLE_SEC"] * MS_PER_SEC))
+
+        fault_months = to_month_number(to_epoch_ms(base["fact_maintenance_event"]["start_datetime"]))
+        all_months = list(scan["pieces"]) + fault_months.tolist()
+        # One extra month flushes IDLE gaps that become final after the last coil
+        months = range(min(all_months), max(all_months) + 2) if all_months else range(0)
+
+        partitioned = {name: PartitionedTable(spill_dir, name) for name in [
+            "fact_production_coil", "fact_coil_operation_cycle", "fact_equipment_event_log",
+            "fact_tempo_rolling", "raw_production_filtered",
+        ]}
+
+        state = {
+            "month": None, "op_offset": 0, "last_completion_ts": pd.NaT, "station_tail": None,
+            "tempo_history": None,
+            "thickness_col": scan["thickness_col"], "parent_gap_lookup": parent_gap_lookup(scan["spans"]),
+        }
+        open_parents = None
+        parent_rollups, dq_metrics, bottleneck_windows = [], [], []
+        event_ids, event_hashes = [], []
+        active_events = pd.DataFrame(columns=BOTTLENECK_COLUMNS)
+        closed_until_ns = np.iinfo(np.int64).min
+        rules_ns = None
+
+        print("\nPass 2: processing month partitions...")
+        for month in months:
+            state["month"] = month
+            ns = dict(base, backfill_state=state)
+            df_prod = load_partition(scan, month)
+
+            with quiet_stdout(verbose):
+                if df_prod is not None:
+                    ns["df_prod"] = df_prod
+                    exec(codes["05"], ns)
+                    exec(codes["09"], ns)
+                else:
+                    ns["fact_coil_operation_cycle"] = EMPTY_OPERATIONS
+                exec(codes["10"], ns)
+                if df_prod is not None:
+                    exec(codes["11"], ns)
+                    rules_ns = ns
+
+            events = ns["fact_equipment_event_log"]
+            partitioned["fact_equipment_event_log"].add(events)
+            event_ids.append(events["event_id"].to_numpy(dtype=np.int64))
+            event_hashes.append(row_hashes(events))
+            state["op_offset"] += len(ns["fact_coil_operation_cycle"])
+            coil_count = 0
+
+            if df_prod is not None:
+                coils = ns["fact_production_coil"]
+                coil_count = len(coils)
+                partitioned["fact_production_coil"].add(attach_passthrough(
+                    coils, ns["df_prod"], "fact_production_coil", ns["FACT_PRODUCTION_COLUMNS"]
+                ))
+                partitioned["fact_coil_operation_cycle"].add(ns["fact_coil_operation_cycle"])
+                partitioned["fact_tempo_rolling"].add(ns["fact_tempo_rolling"])
+                dq_metrics.append(ns["dq_rule_metrics"])
+                state["last_completion_ts"] = coils["completion_ts"].iloc[-1]
+
+                # Parents whose last piece is in this month are complete
+                pending = coils[ROLLUP_COLUMNS] if open_parents is None else pd.concat(
+                    [open_parents, coils[ROLLUP_COLUMNS]], ignore_index=True
+                )
+                closing = (pending["parent_coil_id"].map(spans_last_month) <= month).to_numpy()
+                parent_rollups.append(build_parent_coil_rollup(pending[closing]))
+                open_parents = pending[~closing]
+
+            # Shift windows before the earliest start any later event can have are final
+            active = events[events["event_type"].isin(ACTIVE_EVENT_TYPES)][BOTTLENECK_COLUMNS]
+            active_events = pd.concat([active_events, active], ignore_index=True) if len(active_events) else active
+            if month == months[-1]:
+                close_until_ns = None
+            else:
+                later_start_ms = int(month_start_ms(month + 1)) - max_cycle_ms
+                later_start_ns = later_start_ms * 1_000_000 - int(ACTIVE_MERGE_GAP_SEC * 1e9)
+                close_until_ns = int(window_edges(later_start_ns, later_start_ns)[0])
+            if len(active_events):
+                windows, active_events = close_bottleneck_windows(active_events, closed_until_ns, close_until_ns)
+                bottleneck_windows.append(windows)
+            if close_until_ns is not None:
+                closed_until_ns = max(closed_until_ns, close_until_ns)
+
+            print(f"  {month_label(month)}: {coil_count:,} coils | {len(events):,} events | "
+                  f"open parents {0 if open_parents is None else open_parents['parent_coil_id'].nunique():,} | "
+                  f"station tail {0 if state['station_tail'] is None else len(state['station_tail']['seq']):,} | "
+                  f"buffered active events {len(active_events):,}")
+
+        # Raw production rows in extract order
+        for chunk_no in sorted(scan["chunk_pieces"]):
+            raw = pd.concat([pd.read_pickle(path) for path in scan["chunk_pieces"][chunk_no]]).sort_index()
+            partitioned["raw_production_filtered"].add(raw.astype(scan["dtypes"].to_dict()))
+
+        # Whole-history tables
+        dim_parent_coil = add_transition_gaps(
+            pd.concat(parent_rollups, ignore_index=True).sort_values("parent_coil_id", kind="stable")
+        )
+        if rules_ns is not None:
+            rules_ns["apply_quality_rules"](
+                dim_parent_coil, rules_ns["GAP_QUALITY_RULES"],
+                {"dim_parent_coil.parent_coil_id": dim_parent_coil["parent_coil_id"].to_numpy()},
+            )
+
+        dq_rule_metrics = (
+            pd.concat(dq_metrics, ignore_index=True)
+            .groupby(["rule_name", "column", "kind", "action"], sort=False, as_index=False)[["rows_checked", "violations"]]
+            .sum()
+        )
+        dq_rule_metrics["violation_pct"] = 100 * dq_rule_metrics["violations"] / dq_rule_metrics["rows_checked"].clip(lower=1)
+
+        fact_bottleneck_window = pd.concat(bottleneck_windows, ignore_index=True)
+        bottleneck_ranking = bottleneck_candidates(fact_bottleneck_window)
+
+        dim_equipment, line_equipment = base["dim_equipment"], base["line_equipment"]
+        equipment_names = dim_equipment.set_index("equipment_id")["equipment_name"]
+        fact_bottleneck_window["equipment_name"] = fact_bottleneck_window["equipment_id"].map(equipment_names)
+        detected_ids = bottleneck_ranking.loc[bottleneck_ranking["is_bottleneck_candidate"], "equipment_id"]
+        dim_equipment["is_bottleneck_candidate"] = dim_equipment["equipment_id"].isin(detected_ids)
+        line_equipment["is_bottleneck_candidate"] = line_equipment["equipment_id"].isin(detected_ids)
+        finalizers = {
+            "fact_coil_operation_cycle":
+                lambda ops: ops.assign(is_bottleneck_step=ops["equipment_id"].isin(detected_ids)),
+        }
+
+        fact_maintenance_event = attach_passthrough(
+            base["fact_maintenance_event"], base["df_maint"], "fact_maintenance_event",
+            base["FACT_MAINTENANCE_COLUMNS"],
+        )
+        tables = {
+            "dim_equipment": dim_equipment,
+            "dim_date_crew_schedule": base["dim_date_crew_schedule"],
+            "dim_parent_coil": dim_parent_coil,
+            "fact_production_coil": None,
+            "fact_maintenance_event": fact_maintenance_event,
+            "fact_equipment_reliability": base["fact_equipment_reliability"],
+            "dq_rule_metrics": dq_rule_metrics,
+            "fact_coil_operation_cycle": None,
+            "fact_equipment_event_log": None,
+            "fact_bottleneck_window": fact_bottleneck_window,
+            "fact_tempo_rolling": None,
+            "raw_production_filtered": None,
+            "raw_maintenance_filtered": base["df_maint"],
+        }
+        staging_dir, run_manifest = open_staging(output_dir)
+        for table_name, table_df in tables.items():
+            if table_df is None:
+                table = partitioned[table_name]
+                table.write(os.path.join(staging_dir, f"{table_name}.csv"), finalizers.get(table_name))
+                stage_table_file(staging_dir, run_manifest, table_name, table.rows, table.schema)
+            else:
+                stage_table(staging_dir, run_manifest, output_dir, table_name, export_frame(table_df))
+        build_bitmap_indexes(read_index_columns(staging_dir), staging_dir, dim_equipment)
+        write_event_keys(
+            staging_dir,
+            np.concatenate(event_ids) if event_ids else np.empty(0, dtype=np.int64),
+            np.concatenate(event_hashes) if event_hashes else np.empty(0, dtype=np.uint64),
+        )
+        build_text_index(
+            export_frame(fact_maintenance_event), staging_dir,
+            previous_dir=resolve_current(output_dir) if current_run_id(output_dir) else None,
+        )
+
+        run_dir = commit_run(staging_dir, run_manifest, output_dir)
+    finally:
+        if own_spill:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    print(f"\n✓ Published backfill run {run_manifest['run_id']} → {output_dir}/CURRENT")
+    for table_name, entry in run_manifest["tables"].items():
+        print(f"  {table_name:32} {entry['rows']:>12,} rows")
+    return run_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Month-partitioned (out-of-core) pipeline backfill")
+    parser.add_argument("--output-dir", default="output_tables")
+    parser.add_argument("--spill-dir", default=None, help="Partition spill directory (default: temporary, removed)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="Show the stage scripts' output")
+    args = parser.parse_args()
+
+    run_backfill(args.output_dir, args.spill_dir, args.seed, args.verbose)
@@ -0,0 +1,408 @@
+# Compressed bitmap indexes on low-cardinality fact columns
+#
+# Every distinct value of an indexed column gets a bitmap of the table's row
+# positions (row order of the exported CSV). Bitmaps are roaring-style: the row
+# space is cut into 65,536-row chunks and each non-empty chunk of a bitmap is
+# one container, stored in the smallest of three forms:
+# - array: sorted uint16 row offsets (sparse values; at most ARRAY_MAX_CARD
+#   rows, denser chunks decode as block copies instead of per-row bit sets)
+# - bitmap: 1,024 uint64 words (dense values)
+# - run: (start, length - 1) uint16 pairs (long stretches, e.g. coil-major
+#   operation rows or a day's shift)
+# Containers of all bitmaps of a table share flat arrays (one .npz per table).
+# section has no fact column; it is indexed per row through dim_equipment.
+#
+# Filters evaluate AND / OR / NOT on the bitmaps before any column is read:
+# each term is decoded into dense row words (n_rows / 64 uint64, only its own
+# containers are touched), terms combine with word-wide &, |, ~ and only the
+# selected rows are extracted at the end.
+#
+# Usage (ad-hoc analysis):
+#   from bitmap_index import BitmapIndex
+#   idx = BitmapIndex("output_tables", "fact_equipment_event_log")
+#   rows = idx.eq("shift_code", "A", "B") & idx.eq("section", "Exit") & ~idx.eq("event_type", "IDLE")
+#   rows.count(); events.iloc[rows.rows()]
+#   idx.where({"type_code": ["HL", "HM"], "is_prime": True}, exclude={"event_type": "IDLE"})
+
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from publish import resolve_current
+
+BITMAP_INDEX_DIR = "bitmap_index"
+META_FILE = "meta.json"
+
+# Fact table -> indexed columns (section through dim_equipment.equipment_id)
+BITMAP_COLUMNS = {
+    "fact_production_coil": ["shift_code", "type_code", "is_prime", "is_scrap"],
+    "fact_coil_operation_cycle": ["shift_code", "type_code", "is_prime", "is_scrap", "equipment_id", "section"],
+    "fact_equipment_event_log": [
+        "shift_code", "type_code", "is_prime", "is_scrap", "equipment_id", "event_type", "section",
+    ],
+}
+DERIVED_COLUMNS = {"section"}
+
+CHUNK_BITS = 16
+CHUNK_ROWS = 1 << CHUNK_BITS
+CHUNK_WORDS = CHUNK_ROWS // 64
+BITMAP_BYTES = CHUNK_WORDS * 8
+ARRAY_MAX_CARD = 512
+ARRAY, BITMAP, RUN = 0, 1, 2
+CONTAINER_KINDS = ["array", "bitmap", "run"]
+
+ALL_BITS = np.uint64(0xFFFFFFFFFFFFFFFF)
+BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def value_key(value) -> str:
+    """Bitmap key of a column value as written to CSV (True, HL, 12; 12.0 → 12)"""
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _low_bits(k: np.ndarray) -> np.ndarray:
+    """Words with the lowest k bits set (k in 0..64)"""
+    k = k.astype(np.uint64)
+    return np.where(k >= 64, ALL_BITS, (np.uint64(1) << np.minimum(k, 63)) - np.uint64(1))
+
+
+def _ranges(offsets: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenated arange(offset, offset + length) for every pair"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.repeat(offsets - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return starts + np.arange(total)
+
+
+def _set_bits(words: np.ndarray, rows: np.ndarray):
+    """Set sorted, distinct row positions (one reduceat per touched word)"""
+    if len(rows) == 0:
+        return
+    word = rows >> 6
+    bits = np.uint64(1) << (rows & 63).astype(np.uint64)
+    first = np.flatnonzero(np.r_[True, word[1:] != word[:-1]])
+    words[word[first]] |= np.bitwise_or.reduceat(bits, first)
+
+
+def _set_runs(words: np.ndarray, start: np.ndarray, end: np.ndarray):
+    """Set rows [start, end) of every run: edge words by mask, inner words filled"""
+    if len(start) == 0:
+        return
+    first_word, last_word = start >> 6, (end - 1) >> 6
+    head = _low_bits(start & 63)
+    tail = _low_bits(((end - 1) & 63) + 1)
+    multi = first_word != last_word
+
+    # Edge masks (several runs can share a word): OR per word, then one update
+    word = np.concatenate([first_word, last_word[multi]])
+    mask = np.concatenate([np.where(multi, ~head, tail & ~head), tail[multi]])
+    order = np.argsort(word, kind="stable")
+    word, mask = word[order], mask[order]
+    first = np.flatnonzero(np.r_[True, word[1:] != word[:-1]])
+    words[word[first]] |= np.bitwise_or.reduceat(mask, first)
+
+    if multi.any():
+        inner = (np.bincount(first_word[multi] + 1, minlength=len(words) + 1)
+                 - np.bincount(last_word[multi], minlength=len(words) + 1))
+        words[np.cumsum(inner[:-1]) > 0] = ALL_BITS
+
+
+def encode_column(values: pd.Series) -> tuple:
+    """
+    Containers of one bitmap per distinct non-null value (value keys sorted
+    as text, so typed frames and CSV text read back index alike).
+    Returns (value keys, container arrays: bitmap id, chunk, kind, offset,
+    length per container; array data, run data, bitmap words).
+    """
+    codes, uniques = pd.factorize(values)
+    keys = np.array([value_key(v) for v in uniques], dtype=object)
+    key_order = np.argsort(keys, kind="stable")
+    key_rank = np.empty(len(keys), dtype=np.int64)
+    key_rank[key_order] = np.arange(len(keys))
+    codes = np.where(codes >= 0, key_rank[codes], -1)
+    keys = keys[key_order].tolist()
+    # Narrow codes: the stable sort of 8/16-bit keys is a radix sort
+    if len(uniques) < np.iinfo(np.int16).max:
+        codes = codes.astype(np.int8 if len(uniques) < np.iinfo(np.int8).max else np.int16)
+    rows = np.argsort(codes, kind="stable")
+    rows = rows[codes[rows] >= 0].astype(np.int64)
+    bitmap = codes[rows].astype(np.int64)
+
+    container_key = (bitmap << 32) | (rows >> CHUNK_BITS)
+    new_container = np.r_[True, container_key[1:] != container_key[:-1]]
+    first = np.flatnonzero(new_container)
+    card = np.diff(np.r_[first, len(rows)])
+    run_start = new_container | np.r_[True, rows[1:] != rows[:-1] + 1]
+    n_runs = np.add.reduceat(run_start, first) if len(first) else np.empty(0, dtype=np.int64)
+
+    # Smallest form in bytes (ties: array, then bitmap)
+    array_bytes = np.where(card <= ARRAY_MAX_CARD, 2 * card, np.iinfo(np.int64).max)
+    sizes = np.column_stack([array_bytes, np.full(len(card), BITMAP_BYTES), 4 * n_runs])
+    kind = np.argmin(sizes, axis=1).astype(np.uint8)
+    element_kind = np.repeat(kind, card)
+    low = (rows & (CHUNK_ROWS - 1)).astype(np.uint16)
+
+    array_data = low[element_kind == ARRAY]
+
+    in_run = element_kind == RUN
+    run_id = np.cumsum(run_start) - 1
+    run_length = np.bincount(run_id, minlength=int(run_start.sum()))
+    run_starts = np.flatnonzero(run_start & in_run)
+    run_data = np.column_stack([low[run_starts], (run_length[run_id[run_starts]] - 1)]).astype(np.uint16).ravel()
+
+    is_bitmap = kind == BITMAP
+    words = np.zeros(int(is_bitmap.sum()) * CHUNK_WORDS, dtype=np.uint64)
+    in_bitmap = element_kind == BITMAP
+    block = np.repeat(np.cumsum(is_bitmap) - 1, card)[in_bitmap]
+    _set_bits(words, block * CHUNK_ROWS + low[in_bitmap].astype(np.int64))
+
+    length = np.where(kind == ARRAY, card, np.where(kind == RUN, n_runs, 1))
+    offset = np.zeros(len(kind), dtype=np.int64)
+    for k in (ARRAY, BITMAP, RUN):
+        mask = kind == k
+        offset[mask] = np.r_[0, np.cumsum(length[mask])[:-1]]
+    containers = {
+        "bitmap": bitmap[first], "chunk": (rows[first] >> CHUNK_BITS),
+        "kind": kind, "offset": offset, "length": length,
+    }
+    return keys, containers, array_data, run_data, words
+
+
+def build_bitmap_indexes(tables: dict, output_dir: str, dim_equipment: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Write bitmap_index/<table>.npz for every indexed fact table in tables
+    (frames in export order; only the indexed columns are read) plus meta.json.
+    Returns a summary table (one row per table and column).
+    """
+    index_dir = os.path.join(output_dir, BITMAP_INDEX_DIR)
+    os.makedirs(index_dir, exist_ok=True)
+    sections = None
+    if dim_equipment is not None:
+        sections = pd.Series(dim_equipment["section"].to_numpy(),
+                             index=dim_equipment["equipment_id"].map(value_key).to_numpy())
+
+    meta, summary = {}, []
+    for table_name, columns in BITMAP_COLUMNS.items():
+        table_df = tables.get(table_name)
+        if table_df is None:
+            continue
+
+        parts = {name: [] for name in ["bitmap", "chunk", "kind", "offset", "length"]}
+        array_parts, run_parts, word_parts = [], [], []
+        table_meta = {"rows": int(len(table_df)), "columns": {}}
+        bitmap_base = 0
+        bases = {"array": 0, "run": 0, "bitmap": 0}
+        for col in columns:
+            if col in DERIVED_COLUMNS:
+                if sections is None or "equipment_id" not in table_df.columns:
+                    continue
+                values = table_df["equipment_id"].map(value_key).map(sections)
+            elif col in table_df.columns:
+                values = table_df[col]
+            else:
+                continue
+
+            keys, containers, array_data, run_data, words = encode_column(values)
+            kind = containers["kind"]
+            containers["bitmap"] = containers["bitmap"] + bitmap_base
+            containers["offset"] = containers["offset"] + np.select(
+                [kind == ARRAY, kind == RUN], [bases["array"], bases["run"] // 2], bases["bitmap"] // CHUNK_WORDS
+            )
+            for name, array in containers.items():
+                parts[name].append(array)
+            array_parts.append(array_data)
+            run_parts.append(run_data)
+            word_parts.append(words)
+            bases["array"] += len(array_data)
+            bases["run"] += len(run_data)
+            bases["bitmap"] += len(words)
+
+            table_meta["columns"][col] = {"first_bitmap": bitmap_base, "values": keys}
+            bitmap_base += len(keys)
+            summary.append({
+                "table": table_name, "column": col, "values": len(keys), "containers": len(kind),
+                **{f"{name}_containers": int((kind == k).sum()) for k, name in enumerate(CONTAINER_KINDS)},
+                "index_bytes": int(2 * len(array_data) + 2 * len(run_data) + 8 * len(words) + 21 * len(kind)),
+            })
+
+        container = {name: np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+                     for name, arrays in parts.items()}
+        bitmap_offsets = np.searchsorted(container["bitmap"], np.arange(bitmap_base + 1)).astype(np.int64)
+        with open(os.path.join(index_dir, f"{table_name}.npz"), "wb") as fh:
+            np.savez(
+                fh, bitmap_offsets=bitmap_offsets,
+                chunk=container["chunk"].astype(np.uint32), kind=container["kind"].astype(np.uint8),
+                offset=container["offset"].astype(np.int64), length=container["length"].astype(np.int32),
+                array_data=np.concatenate(array_parts or [np.empty(0, np.uint16)]).astype(np.uint16),
+                run_data=np.concatenate(run_parts or [np.empty(0, np.uint16)]).astype(np.uint16),
+                bitmap_words=np.concatenate(word_parts or [np.empty(0, np.uint64)]).astype(np.uint64),
+            )
+        meta[table_name] = table_meta
+
+    with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    return pd.DataFrame(summary)
+
+
+def read_index_columns(run_dir: str, dim_equipment: pd.DataFrame = None) -> dict:
+    """Indexed columns of the fact tables already written to run_dir (as CSV text)"""
+    tables = {}
+    for table_name, columns in BITMAP_COLUMNS.items():
+        path = os.path.join(run_dir, f"{table_name}.csv")
+        if os.path.exists(path):
+            header = pd.read_csv(path, nrows=0).columns
+            tables[table_name] = pd.read_csv(
+                path, usecols=[col for col in columns if col in header], dtype=str, keep_default_na=False,
+            ).replace("", None)
+    return tables
+
+
+class RowSet:
+    """Rows of one table as dense uint64 words (bit i of word w is row 64 * w + i)"""
+
+    def __init__(self, words: np.ndarray, n_rows: int):
+        self.words = words
+        self.n_rows = n_rows
+
+    def _tail_mask(self, words: np.ndarray) -> np.ndarray:
+        if self.n_rows % 64 and len(words):
+            words[-1] &= _low_bits(np.array([self.n_rows % 64]))[0]
+        return words
+
+    def __and__(self, other: "RowSet") -> "RowSet":
+        return RowSet(self.words & other.words, self.n_rows)
+
+    def __or__(self, other: "RowSet") -> "RowSet":
+        return RowSet(self.words | other.words, self.n_rows)
+
+    def __sub__(self, other: "RowSet") -> "RowSet":
+        return RowSet(self.words & ~other.words, self.n_rows)
+
+    def __invert__(self) -> "RowSet":
+        return RowSet(self._tail_mask(~self.words), self.n_rows)
+
+    def count(self) -> int:
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.words).sum(dtype=np.int64))
+        return int(BYTE_POPCOUNT[self.words.view(np.uint8)].sum(dtype=np.int64))
+
+    __len__ = count
+
+    def rows(self) -> np.ndarray:
+        """Selected row positions, ascending"""
+        word = np.flatnonzero(self.words)
+        data = self.words[word].view(np.uint8)
+        byte = np.flatnonzero(data)
+        bit = np.flatnonzero(np.unpackbits(data[byte], bitorder="little"))
+        byte = byte[bit >> 3]
+        return word[byte >> 3] * 64 + (byte & 7) * 8 + (bit & 7)
+
+
+class BitmapIndex:
+    """Bitmap filters over one fact table of a published run (or its staging directory)"""
+
+    def __init__(self, output_dir: str, table_name: str):
+        index_dir = os.path.join(resolve_current(output_dir), BITMAP_INDEX_DIR)
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as fh:
+            meta = json.load(fh)[table_name]
+        with np.load(os.path.join(index_dir, f"{table_name}.npz"), allow_pickle=False) as arrays:
+            for name in arrays.files:
+                setattr(self, name, arrays[name])
+
+        self.table_name = table_name
+        self.n_rows = meta["rows"]
+        self.n_words = -(-self.n_rows // 64)
+        self.columns = {
+            col: {key: info["first_bitmap"] + i for i, key in enumerate(info["values"])}
+            for col, info in meta["columns"].items()
+        }
+
+    def __len__(self):
+        return self.n_rows
+
+    def values(self, column: str) -> list:
+        return list(self._bitmaps(column))
+
+    def _bitmaps(self, column: str) -> dict:
+        if column not in self.columns:
+            raise KeyError(f"No bitmap index on {self.table_name}.{column}")
+        return self.columns[column]
+
+    def none(self) -> RowSet:
+        return RowSet(np.zeros(self.n_words, dtype=np.uint64), self.n_rows)
+
+    def all(self) -> RowSet:
+        return ~self.none()
+
+    def _decode(self, bitmap_ids: list) -> np.ndarray:
+        """OR of the given bitmaps as dense row words (touches only their containers)"""
+        n_chunks = -(-self.n_rows // CHUNK_ROWS)
+        words = np.zeros(n_chunks * CHUNK_WORDS, dtype=np.uint64)
+        if not bitmap_ids:
+            return words[:self.n_words]
+        ids = np.asarray(bitmap_ids, dtype=np.int64)
+        containers = _ranges(self.bitmap_offsets[ids], self.bitmap_offsets[ids + 1] - self.bitmap_offsets[ids])
+        chunk = self.chunk[containers].astype(np.int64)
+        kind = self.kind[containers]
+        offset = self.offset[containers]
+        length = self.length[containers].astype(np.int64)
+
+        # Dense and sparse containers one value at a time (a value's chunks are distinct, its rows sorted)
+        chunk_words = words.reshape(n_chunks, CHUNK_WORDS)
+        blocks = self.bitmap_words.reshape(-1, CHUNK_WORDS)
+        owner = np.repeat(ids, self.bitmap_offsets[ids + 1] - self.bitmap_offsets[ids])
+        for bitmap_id in ids:
+            mine = owner == bitmap_id
+            dense = mine & (kind == BITMAP)
+            if dense.any():
+                chunk_words[chunk[dense]] |= blocks[offset[dense]]
+            sparse = mine & (kind == ARRAY)
+            if sparse.any():
+                low = self.array_data[_ranges(offset[sparse], length[sparse])]
+                _set_bits(words, np.repeat(chunk[sparse] << CHUNK_BITS, length[sparse]) + low)
+
+        is_run = kind == RUN
+        if is_run.any():
+            pairs = _ranges(offset[is_run], length[is_run])
+            start = np.repeat(chunk[is_run] << CHUNK_BITS, length[is_run]) + self.run_data[2 * pairs]
+            _set_runs(words, start, start + self.run_data[2 * pairs + 1].astype(np.int64) + 1)
+        return words[:self.n_words]
+
+    def eq(self, column: str, *values) -> RowSet:
+        """Rows where column equals any of values (unknown values match nothing)"""
+        bitmaps = self._bitmaps(column)
+        ids = [bitmaps[key] for key in {value_key(v) for v in values} if key in bitmaps]
+        return RowSet(self._decode(sorted(ids)), self.n_rows)
+
+    def where(self, filters: dict, exclude: dict = None) -> RowSet:
+        """
+        AND over columns of (OR over each column's values), minus the rows
+        matching any exclude entry; a single value needs no list
+        """
+        def listed(value):
+            return value if isinstance(value, (list, tuple, set)) else [value]
+
+        selected = None
+        for column, values in filters.items():
+            rows = self.eq(column, *listed(values))
+            selected = rows if selected is None else selected & rows
+        selected = self.all() if selected is None else selected
+        for column, values in (exclude or {}).items():
+            selected -= self.eq(column, *listed(values))
+        return selected
+
+    def counts(self, column: str, within: RowSet = None) -> pd.Series:
+        """Row count per value of column (optionally inside a row set)"""
+        bitmaps = self._bitmaps(column)
+        counts = {}
+        for key, bitmap_id in bitmaps.items():
+            rows = RowSet(self._decode([bitmap_id]), self.n_rows)
+            counts[key] = (rows if within is None else rows & within).count()
+        return pd.Series(counts, name="rows")
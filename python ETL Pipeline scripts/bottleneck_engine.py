@@ -0,0 +1,208 @@
+# Bottleneck detection from the equipment event log (active-period method)
+#
+# A station is active while it is running or under repair (RUN/FAULT events).
+# At any instant the momentary bottleneck is the station whose current active
+# period is the longest. Where consecutive bottleneck periods overlap, both
+# stations are shifting bottlenecks; outside the overlaps the bottleneck is sole.
+# Everything is computed per time window (crew shift by default) so the
+# ranking can be recomputed every shift.
+
+import numpy as np
+import pandas as pd
+
+ACTIVE_EVENT_TYPES = ["RUN", "FAULT"]
+
+# Active intervals separated by at most this gap are one active period
+# (matches the 30s IDLE threshold used to build the event log)
+ACTIVE_MERGE_GAP_SEC = 30
+
+# Shift windows: 12 hours starting 06:00 / 18:00
+WINDOW_FREQ = "12h"
+WINDOW_OFFSET = "6h"
+
+# Candidates are the stations making up this share of total bottleneck time
+BOTTLENECK_PARETO_SHARE = 0.80
+
+
+def build_active_periods(events: pd.DataFrame,
+                         merge_gap_sec: float = ACTIVE_MERGE_GAP_SEC) -> pd.DataFrame:
+    """
+    Merge each station's RUN/FAULT intervals into active periods with one
+    sort by (equipment_id, event_start_ts) and a grouped running max of end time.
+    """
+    active = events[events["event_type"].isin(ACTIVE_EVENT_TYPES)]
+    equipment_id = active["equipment_id"].to_numpy(dtype=np.int64)
+    start_ns = active["event_start_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+    end_ns = active["event_end_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+
+    valid = (start_ns != np.iinfo(np.int64).min) & (end_ns != np.iinfo(np.int64).min)
+    equipment_id, start_ns, end_ns = equipment_id[valid], start_ns[valid], end_ns[valid]
+
+    order = np.lexsort((start_ns, equipment_id))
+    equipment_id, start_ns, end_ns = equipment_id[order], start_ns[order], end_ns[order]
+    if len(equipment_id) == 0:
+        return pd.DataFrame({"equipment_id": equipment_id, "start_ns": start_ns, "end_ns": end_ns})
+
+    running_end = pd.Series(end_ns).groupby(equipment_id).cummax().to_numpy()
+    new_station = np.r_[True, equipment_id[1:] != equipment_id[:-1]]
+    gap_ns = int(merge_gap_sec * 1e9)
+    new_period = new_station.copy()
+    new_period[1:] |= start_ns[1:] > running_end[:-1] + gap_ns
+
+    starts = np.flatnonzero(new_period)
+    return pd.DataFrame({
+        "equipment_id": equipment_id[starts],
+        "start_ns": start_ns[starts],
+        "end_ns": np.maximum.reduceat(end_ns, starts),
+    })
+
+
+def window_edges(start_ns: int, end_ns: int,
+                 freq: str = WINDOW_FREQ, offset: str = WINDOW_OFFSET) -> np.ndarray:
+    """Window boundaries (int64 ns) covering [start_ns, end_ns]"""
+    offset_td = pd.Timedelta(offset)
+    first = (pd.Timestamp(start_ns) - offset_td).floor(freq) + offset_td
+    last = (pd.Timestamp(end_ns) - offset_td).ceil(freq) + offset_td
+    if last <= pd.Timestamp(end_ns):
+        last += pd.Timedelta(freq)
+    return pd.date_range(first, last, freq=freq).asi8
+
+
+def split_at_windows(periods: pd.DataFrame, edges: np.ndarray) -> pd.DataFrame:
+    """Clip active periods to window boundaries (periods crossing an edge are split)"""
+    ps = periods["start_ns"].to_numpy()
+    pe = periods["end_ns"].to_numpy()
+    first_window = np.searchsorted(edges, ps, side="right") - 1
+    last_window = np.searchsorted(edges, pe, side="left") - 1
+    pieces = np.maximum(last_window - first_window + 1, 1)
+
+    src = np.repeat(np.arange(len(periods)), pieces)
+    within = np.arange(len(src)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    window_id = first_window[src] + within
+
+    piece_start = np.maximum(ps[src], edges[window_id])
+    piece_end = np.minimum(pe[src], edges[window_id + 1])
+    keep = piece_end > piece_start
+
+    return pd.DataFrame({
+        "equipment_id": periods["equipment_id"].to_numpy()[src][keep],
+        "window_id": window_id[keep],
+        "start_ns": piece_start[keep],
+        "end_ns": piece_end[keep],
+    })
+
+
+def momentary_bottlenecks(pieces: pd.DataFrame):
+    """
+    Elementary segments between all period boundaries, and for each segment
+    the piece index of the longest covering active period (-1 if none active).
+    Vectorized per station: each station's periods are disjoint and sorted.
+    """
+    boundaries = np.unique(np.r_[pieces["start_ns"].to_numpy(), pieces["end_ns"].to_numpy()])
+    seg_start, seg_end = boundaries[:-1], boundaries[1:]
+
+    durations = (pieces["end_ns"] - pieces["start_ns"]).to_numpy()
+    best_duration = np.full(len(seg_start), -1, dtype=np.int64)
+    best_piece = np.full(len(seg_start), -1, dtype=np.int64)
+
+    for _, idx in pieces.groupby("equipment_id", sort=True).indices.items():
+        idx = idx[np.argsort(pieces["start_ns"].to_numpy()[idx], kind="stable")]
+        st_start = pieces["start_ns"].to_numpy()[idx]
+        st_end = pieces["end_ns"].to_numpy()[idx]
+
+        pos = np.searchsorted(st_start, seg_start, side="right") - 1
+        pos_clipped = np.clip(pos, 0, None)
+        covered = (pos >= 0) & (st_end[pos_clipped] >= seg_end)
+        duration = np.where(covered, durations[idx[pos_clipped]], -1)
+
+        better = duration > best_duration
+        best_duration = np.where(better, duration, best_duration)
+        best_piece = np.where(better, idx[pos_clipped], best_piece)
+
+    return seg_start, seg_end, best_piece
+
+
+def detect_bottlenecks(events: pd.DataFrame,
+                       freq: str = WINDOW_FREQ,
+                       offset: str = WINDOW_OFFSET,
+                       merge_gap_sec: float = ACTIVE_MERGE_GAP_SEC) -> pd.DataFrame:
+    """
+    Sole and shifting bottleneck time per station and time window.
+    Returns one row per (window, equipment) with any bottleneck time.
+    """
+    columns = [
+        "window_start", "window_end", "equipment_id", "sole_bottleneck_sec",
+        "shifting_bottleneck_sec", "bottleneck_sec", "bottleneck_share_pct", "window_rank",
+    ]
+    periods = build_active_periods(events, merge_gap_sec)
+    if periods.empty:
+        return pd.DataFrame(columns=columns)
+
+    edges = window_edges(periods["start_ns"].min(), periods["end_ns"].max(), freq, offset)
+    pieces = split_at_windows(periods, edges)
+    _, _, best_piece = momentary_bottlenecks(pieces)
+
+    # Sequence of distinct bottleneck periods in time order
+    bn = best_piece[best_piece >= 0]
+    bn = bn[np.r_[True, bn[1:] != bn[:-1]]]
+
+    bn_start = pieces["start_ns"].to_numpy()[bn]
+    bn_end = pieces["end_ns"].to_numpy()[bn]
+    bn_window = pieces["window_id"].to_numpy()[bn]
+
+    # Overlap of consecutive bottleneck periods (same window) is shifting time
+    overlap_next = np.zeros(len(bn), dtype=np.int64)
+    if len(bn) > 1:
+        same_window = bn_window[1:] == bn_window[:-1]
+        overlap = np.minimum(bn_end[:-1], bn_end[1:]) - np.maximum(bn_start[:-1], bn_start[1:])
+        overlap_next[:-1] = np.where(same_window, np.clip(overlap, 0, None), 0)
+    overlap_prev = np.r_[0, overlap_next[:-1]]
+
+    shifting = overlap_prev + overlap_next
+    sole = np.clip((bn_end - bn_start) - shifting, 0, None)
+
+    result = (
+        pd.DataFrame({
+            "window_id": bn_window,
+            "equipment_id": pieces["equipment_id"].to_numpy()[bn],
+            "sole_bottleneck_sec": sole / 1e9,
+            "shifting_bottleneck_sec": shifting / 1e9,
+        })
+        .groupby(["window_id", "equipment_id"], as_index=False)
+        .sum()
+    )
+
+    result["bottleneck_sec"] = result["sole_bottleneck_sec"] + result["shifting_bottleneck_sec"]
+    window_sec = (edges[1:] - edges[:-1]) / 1e9
+    result["bottleneck_share_pct"] = 100 * result["bottleneck_sec"] / window_sec[result["window_id"]]
+    result["window_rank"] = (
+        result.groupby("window_id")["bottleneck_sec"].rank(method="first", ascending=False).astype(int)
+    )
+    result["window_start"] = pd.to_datetime(edges[result["window_id"]])
+    result["window_end"] = pd.to_datetime(edges[result["window_id"] + 1])
+
+    return result[columns].sort_values(["window_start", "window_rank"]).reset_index(drop=True)
+
+
+def bottleneck_candidates(bottleneck_windows: pd.DataFrame,
+                          pareto_share: float = BOTTLENECK_PARETO_SHARE) -> pd.DataFrame:
+    """
+    Rank stations by total bottleneck time; candidates are the stations that
+    together account for pareto_share of all bottleneck time.
+    """
+    totals = (
+        bottleneck_windows
+        .groupby("equipment_id")[["sole_bottleneck_sec", "shifting_bottleneck_sec", "bottleneck_sec"]]
+        .sum()
+        .sort_values("bottleneck_sec", ascending=False)
+    )
+    totals["share_of_bottleneck_time_pct"] = 100 * totals["bottleneck_sec"] / totals["bottleneck_sec"].sum()
+    totals["windows_as_primary"] = (
+        bottleneck_windows[bottleneck_windows["window_rank"] == 1]
+        .groupby("equipment_id").size()
+        .reindex(totals.index, fill_value=0)
+    )
+
+    cumulative_before = totals["share_of_bottleneck_time_pct"].cumsum() - totals["share_of_bottleneck_time_pct"]
+    totals["is_bottleneck_candidate"] = cumulative_before < 100 * pareto_share
+    return totals.reset_index()
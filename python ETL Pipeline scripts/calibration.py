@@ -0,0 +1,529 @@
+# Calibrate the line model's duration parameters to the observed MES tempo
+#
+# DURATION_RANGES, the product band speed factors and the crew multipliers in
+# line_model.py are priors. This fits them so that the line they describe
+# reproduces the observed inter-completion gaps (gap_from_prev_completion_min
+# after the 11 quality rules), per type_code and per crew:
+# - the line is simulated as the generator runs it (operation_model.py, 08/09):
+#   station durations are the generator's own draws, keyed by coil_id and the
+#   pipeline seed (--generator-seed), a coil's operations run back to back and
+#   a station serves one coil at a time, so consecutive completions are at
+#   least no_wait_spacing apart. Starved periods are an idle delay before entry
+#   (probability × exponential mean, fitted alongside; the pipeline's IDLE
+#   events are this slack). Completion times are floored to whole minutes, as
+#   in the extract
+# - parameters: a log scale per station (both ends of its range), per product
+#   band (the "other" band is the reference) and per crew (crew B is the
+#   reference), plus the idle probability and mean
+# - loss: squared distance between the observed and simulated gap CDFs on a
+#   0-60 min grid, per type_code and per crew group, weighted by coils, plus a
+#   small pull toward the prior (stations the gaps cannot tell apart keep
+#   their prior ratios)
+# - cross-entropy optimizer: each generation's candidates are simulated as one
+#   batch on common random numbers (the keyed durations are scaled per
+#   candidate, spacing and completions vectorized over candidates and coils);
+#   the population is split over a process pool that receives the coil inputs once
+# - the fit is written as a new versioned line-model file
+#   (line_models/line_model_vNNN.json) that the pipeline loads with
+#   --line-model (LINE_MODEL_FILE, see line_model.py; the scenario runner reads
+#   the fitted IDLE too)
+# - --check recomputes the fitted CDF distance from the operation durations of
+#   a run made with the line model (same extract and seed), so the file is known
+#   to describe what the generator produces
+#
+# Usage (in the directory holding the published tables):
+#   python calibration.py --generations 40 --population 64 --workers 4
+#   python pipeline.py --line-model line_models/line_model_v001.json
+#   python calibration.py --check line_models/line_model_v001.json
+
+import os
+import json
+import argparse
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import line_model
+from product_bands import MIX_BANDS
+from scenario_runner import prepare_coil_inputs
+from operation_model import coil_duration_units, operation_durations, no_wait_spacing, idle_delays
+
+LINE_MODEL_DIR = "line_models"
+DEFAULT_GENERATIONS = 40
+DEFAULT_POPULATION = 64
+DEFAULT_SEED = 2024
+DEFAULT_GENERATOR_SEED = 0
+ELITE_FRACTION = 0.2
+SMOOTHING = 0.7
+
+# Coils simulated per candidate: evenly spaced contiguous blocks of the history
+CALIBRATION_COILS = 20_000
+BLOCK_COILS = 500
+
+CANDIDATE_CHUNK = 8
+GAP_GRID_MIN = 60
+MIN_GROUP_COILS = 50
+PRIOR_WEIGHT = 1e-4
+REFERENCE_BAND = "other"
+REFERENCE_CREW = "B"
+
+# Starting point and search spread (log / logit space)
+INITIAL_IDLE_PROBABILITY = 0.2
+INITIAL_IDLE_MEAN_MIN = 10.0
+INITIAL_SPREAD = 0.3
+MIN_SPREAD = 0.01
+
+# --check: reproduced vs recorded fitted CDF distance (duration and minute rounding)
+CHECK_RTOL = 0.02
+CHECK_ATOL = 1e-5
+
+
+def prepare_calibration_inputs(coils: pd.DataFrame, stations: pd.DataFrame,
+                               max_coils: int = CALIBRATION_COILS,
+                               generator_seed: int = DEFAULT_GENERATOR_SEED) -> dict:
+    """
+    Coil sequence and observed gaps for the fit (published fact_production_coil
+    and dim_equipment): contiguous blocks in completion order, the first coil
+    of each block carries no gap. Extends prepare_coil_inputs (scenario_runner)
+    with coil ids (keyed draws), type_code and crew groups.
+    """
+    coils = coils[coils["completion_ts"].notna()].sort_values("completion_ts", kind="stable")
+    n_blocks = -(-min(max_coils, len(coils)) // BLOCK_COILS)
+    if len(coils) > max_coils:
+        starts = np.linspace(0, len(coils) - BLOCK_COILS, n_blocks).astype(np.int64)
+        picked = (starts[:, None] + np.arange(BLOCK_COILS)).ravel()
+        block_start = np.zeros(len(picked), dtype=bool)
+        block_start[::BLOCK_COILS] = True
+    else:
+        picked = np.arange(len(coils))
+        block_start = np.zeros(len(picked), dtype=bool)
+        block_start[:1] = True
+    coils = coils.iloc[picked].reset_index(drop=True)
+
+    inputs = prepare_coil_inputs(coils, stations)
+
+    observed = coils["gap_from_prev_completion_min"].to_numpy(dtype=np.float64, copy=True)
+    observed[block_start] = np.nan
+    used = ~np.isnan(observed)
+
+    type_counts = coils.loc[used, "type_code"].value_counts()
+    type_labels = sorted(type_counts.index[type_counts >= MIN_GROUP_COILS])
+    type_idx = coils["type_code"].map({t: i for i, t in enumerate(type_labels)}).fillna(-1).to_numpy(dtype=np.int64)
+    crew_labels = inputs["shift_labels"]
+    crew_idx = inputs["shift_idx"].astype(np.int64)
+
+    # Group ids: type_code groups, then crew groups (-1: not grouped)
+    group_labels = [("type_code", t) for t in type_labels] + [("crew", c) for c in crew_labels]
+    type_group = np.where(used & (type_idx >= 0), type_idx, -1)
+    crew_group = np.where(used & (crew_idx >= 0), len(type_labels) + crew_idx, -1)
+
+    observed_minutes = np.clip(np.floor(np.nan_to_num(observed)), 0, GAP_GRID_MIN + 1).astype(np.int64)
+    observed_cdf = gap_cdf(observed_minutes[None, :], [type_group, crew_group], len(group_labels))[0]
+    group_coils = np.bincount(type_group[type_group >= 0], minlength=len(group_labels)) + \
+        np.bincount(crew_group[crew_group >= 0], minlength=len(group_labels))
+
+    inputs.update({
+        "coil_id": coils["coil_id"].astype(str).to_numpy(),
+        "generator_seed": generator_seed,
+        "max_coils": max_coils,
+        "observed_gap_min": observed,
+        "groups": [type_group, crew_group],
+        "group_labels": group_labels,
+        "group_coils": group_coils,
+        "observed_cdf": observed_cdf,
+        "period": (str(coils["completion_ts"].min()), str(coils["completion_ts"].max())),
+    })
+    inputs.update(parameter_layout(inputs))
+    return inputs
+
+
+def parameter_layout(inputs: dict) -> dict:
+    """Names, prior (start) vector and penalized mask of the fitted parameters"""
+    names = [f"station:{name}" for name in inputs["station_names"]]
+    names += [f"band:{band}" for band in MIX_BANDS if band not in (REFERENCE_BAND, line_model.UNKNOWN_BAND)]
+    names += [f"crew:{crew}" for crew in inputs["shift_labels"] if crew != REFERENCE_CREW]
+    names += ["idle_probability", "idle_mean_min"]
+
+    prior = np.zeros(len(names))
+    prior[-2] = np.log(INITIAL_IDLE_PROBABILITY / (1 - INITIAL_IDLE_PROBABILITY))
+    prior[-1] = np.log(INITIAL_IDLE_MEAN_MIN)
+    penalized = np.ones(len(names), dtype=bool)
+    penalized[-2:] = False
+    return {"parameter_names": names, "prior_theta": prior, "penalized": penalized}
+
+
+def prior_durations(inputs: dict) -> np.ndarray:
+    """
+    Station durations (seconds, coils × stations) the generator draws for
+    these coils under the prior line model: the keyed draws of 08 with the
+    pipeline seed, so a candidate's durations are these times its factors
+    """
+    names = inputs["station_names"]
+    ranges = [line_model.DURATION_RANGES.get(n, line_model.DEFAULT_RANGE) for n in names]
+    shift_prior = np.array([line_model.SHIFT_MULTIPLIER.get(c, 1.0) for c in inputs["shift_labels"]])
+    constraint = np.where(inputs["is_constraint"], line_model.BOTTLENECK_DURATION_FACTOR, 1.0)
+    unit = coil_duration_units(inputs["coil_id"], len(names), inputs["generator_seed"])
+    return operation_durations(
+        unit, ranges, line_model.MIX_FACTOR_RANGES, inputs["band"], shift_prior[inputs["shift_idx"]], constraint,
+    )
+
+
+def draw_common_randoms(inputs: dict, seed: int, durations: np.ndarray = None) -> dict:
+    """
+    Candidate-independent inputs: station durations (the generator's prior
+    draws unless given), idle draws and the minute phase. Every candidate is
+    simulated on the same values.
+    """
+    rng = np.random.default_rng(seed)
+    n_coils = len(inputs["band"])
+    return {
+        "durations": prior_durations(inputs) if durations is None else durations,
+        "idle_unit": rng.uniform(size=n_coils),
+        "idle_exp": rng.exponential(size=n_coils),
+        "phase": rng.uniform(),
+    }
+
+
+def _factor_columns(inputs: dict, theta: np.ndarray, prefix: str, labels: list, codes: np.ndarray) -> np.ndarray:
+    """Per-coil multiplier (candidates × coils) from the fitted log factors (reference label: 1)"""
+    names = inputs["parameter_names"]
+    logs = np.zeros((len(theta), len(labels)))
+    for i, label in enumerate(labels):
+        key = f"{prefix}:{label}"
+        if key in names:
+            logs[:, i] = theta[:, names.index(key)]
+    return np.exp(logs)[:, codes]
+
+
+def simulate_gaps(inputs: dict, randoms: dict, theta: np.ndarray) -> np.ndarray:
+    """
+    Simulated inter-completion gaps (whole minutes, candidates × coils) for a
+    batch of parameter vectors: the common durations scaled per station and
+    per coil, no-wait spacing plus idle, cumulated into completion times
+    (candidates in chunks of CANDIDATE_CHUNK to bound memory).
+    """
+    theta = np.atleast_2d(theta)
+    n_stations = len(inputs["station_names"])
+    station_scale = np.exp(theta[:, :n_stations])
+    coil_factor = (
+        _factor_columns(inputs, theta, "band", MIX_BANDS, inputs["band"])
+        * _factor_columns(inputs, theta, "crew", inputs["shift_labels"], inputs["shift_idx"])
+    )
+    idle = idle_delays(
+        randoms["idle_unit"][None, :], randoms["idle_exp"][None, :],
+        (1 / (1 + np.exp(-theta[:, -2])))[:, None], np.exp(theta[:, -1])[:, None],
+    )
+
+    spacing = np.empty((len(theta), len(inputs["band"])))
+    for lo in range(0, len(theta), CANDIDATE_CHUNK):
+        hi = min(lo + CANDIDATE_CHUNK, len(theta))
+        durations = randoms["durations"][None] * station_scale[lo:hi, None, :] * coil_factor[lo:hi, :, None]
+        spacing[lo:hi] = no_wait_spacing(durations)
+
+    minutes = np.floor(np.cumsum(spacing + idle, axis=1) / 60.0 + randoms["phase"])
+    gaps = np.zeros(minutes.shape, dtype=np.int64)
+    gaps[:, 1:] = np.diff(minutes, axis=1)
+    return gaps
+
+
+def gap_cdf(gaps: np.ndarray, groups: list, n_groups: int) -> np.ndarray:
+    """Empirical CDF on the 0..GAP_GRID_MIN minute grid per candidate and group"""
+    n_bins = GAP_GRID_MIN + 2
+    gaps = np.clip(gaps, 0, n_bins - 1)
+    counts = np.zeros((len(gaps), n_groups, n_bins))
+    for group in groups:
+        rows = group >= 0
+        keys = (np.arange(len(gaps))[:, None] * n_groups + group[rows]) * n_bins + gaps[:, rows]
+        counts += np.bincount(keys.ravel(), minlength=counts.size).reshape(counts.shape)
+    totals = counts.sum(axis=2, keepdims=True)
+    return np.cumsum(counts, axis=2)[:, :, :-1] / np.maximum(totals, 1)
+
+
+def group_distances(inputs: dict, gaps: np.ndarray) -> np.ndarray:
+    """Mean squared CDF difference per candidate and group"""
+    simulated = gap_cdf(gaps, inputs["groups"], len(inputs["group_labels"]))
+    return ((simulated - inputs["observed_cdf"]) ** 2).mean(axis=2)
+
+
+def calibration_loss(inputs: dict, randoms: dict, theta: np.ndarray) -> np.ndarray:
+    """Coil-weighted CDF distance over the groups plus the prior pull, per candidate"""
+    theta = np.atleast_2d(theta)
+    weights = inputs["group_coils"] / max(inputs["group_coils"].sum(), 1)
+    distance = group_distances(inputs, simulate_gaps(inputs, randoms, theta)) @ weights
+    prior = PRIOR_WEIGHT * (((theta - inputs["prior_theta"]) * inputs["penalized"]) ** 2).sum(axis=1)
+    return distance + prior
+
+
+# Worker state: coil inputs and common draws are installed once per process
+_WORKER_STATE = None
+
+
+def _init_worker(inputs: dict, seed: int):
+    global _WORKER_STATE
+    _WORKER_STATE = (inputs, draw_common_randoms(inputs, seed))
+
+
+def _evaluate(theta: np.ndarray) -> np.ndarray:
+    inputs, randoms = _WORKER_STATE
+    return calibration_loss(inputs, randoms, theta)
+
+
+def calibrate(inputs: dict, generations: int = DEFAULT_GENERATIONS, population: int = DEFAULT_POPULATION,
+              seed: int = DEFAULT_SEED, workers: int = None, verbose: bool = True) -> tuple:
+    """
+    Cross-entropy search in log-parameter space from the prior: each
+    generation samples the population around the current mean (which is
+    re-evaluated as candidate 0), refits mean and spread to the elite and
+    keeps the best candidate seen. Returns (best theta, history DataFrame).
+    """
+    rng = np.random.default_rng(seed)
+    mean = inputs["prior_theta"].copy()
+    spread = np.full(len(mean), INITIAL_SPREAD)
+    n_elite = max(2, int(round(ELITE_FRACTION * population)))
+    best_theta, best_loss = mean.copy(), np.inf
+    history = []
+
+    workers = workers or os.cpu_count() or 1
+    pool = None
+    if workers == 1:
+        _init_worker(inputs, seed)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs, seed))
+    try:
+        for generation in range(generations):
+            candidates = mean + spread * rng.standard_normal((population, len(mean)))
+            candidates[0] = mean
+            if pool is None:
+                losses = _evaluate(candidates)
+            else:
+                losses = np.concatenate(list(pool.map(_evaluate, np.array_split(candidates, workers))))
+
+            order = np.argsort(losses)
+            if losses[order[0]] < best_loss:
+                best_theta, best_loss = candidates[order[0]].copy(), float(losses[order[0]])
+            elite = candidates[order[:n_elite]]
+            mean = SMOOTHING * elite.mean(axis=0) + (1 - SMOOTHING) * mean
+            spread = np.maximum(SMOOTHING * elite.std(axis=0) + (1 - SMOOTHING) * spread, MIN_SPREAD)
+
+            history.append({"generation": generation, "best_loss": best_loss,
+                            "elite_mean_loss": float(losses[order[:n_elite]].mean()),
+                            "mean_spread": float(spread.mean())})
+            if verbose:
+                print(f"  generation {generation:3d}: best {best_loss:.6f} "
+                      f"elite {history[-1]['elite_mean_loss']:.6f} spread {spread.mean():.3f}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return best_theta, pd.DataFrame(history)
+
+
+def fitted_parameters(inputs: dict, theta: np.ndarray) -> dict:
+    """Line model settings (line_model.py names) for a parameter vector"""
+    values = dict(zip(inputs["parameter_names"], theta))
+    duration_ranges = dict(line_model.DURATION_RANGES)
+    for name in inputs["station_names"]:
+        low, high = line_model.DURATION_RANGES.get(name, line_model.DEFAULT_RANGE)
+        scale = np.exp(values[f"station:{name}"])
+        duration_ranges[name] = [round(low * scale, 3), round(high * scale, 3)]
+
+    mix_factor_ranges = {}
+    for band, (low, high) in line_model.MIX_FACTOR_RANGES.items():
+        scale = np.exp(values.get(f"band:{band}", 0.0))
+        mix_factor_ranges[band] = [round(low * scale, 6), round(high * scale, 6)]
+
+    shift_multiplier = {
+        crew: round(line_model.SHIFT_MULTIPLIER.get(crew, 1.0) * np.exp(values.get(f"crew:{crew}", 0.0)), 6)
+        for crew in sorted(set(line_model.SHIFT_MULTIPLIER) | set(inputs["shift_labels"]))
+    }
+    return {
+        "DURATION_RANGES": {k: list(v) for k, v in duration_ranges.items()},
+        "MIX_FACTOR_RANGES": mix_factor_ranges,
+        "SHIFT_MULTIPLIER": shift_multiplier,
+        "BOTTLENECK_DURATION_FACTOR": line_model.BOTTLENECK_DURATION_FACTOR,
+        "IDLE": {
+            "probability": round(float(1 / (1 + np.exp(-values["idle_probability"]))), 6),
+            "mean_min": round(float(np.exp(values["idle_mean_min"])), 4),
+        },
+    }
+
+
+def fit_report(inputs: dict, theta: np.ndarray, seed: int) -> pd.DataFrame:
+    """
+    Observed vs simulated gap quantiles and CDF distance per group, for the
+    prior and the fit, on fresh idle draws and phase (not the ones the search
+    used; the durations are the generator's)
+    """
+    randoms = draw_common_randoms(inputs, seed + 1)
+    gaps = simulate_gaps(inputs, randoms, np.vstack([inputs["prior_theta"], theta]))
+    distances = group_distances(inputs, gaps)
+    observed = inputs["observed_gap_min"]
+
+    rows = []
+    for g, (kind, label) in enumerate(inputs["group_labels"]):
+        members = np.zeros(len(observed), dtype=bool)
+        for group in inputs["groups"]:
+            members |= group == g
+        if not members.any():
+            continue
+        row = {"group": kind, "value": label, "coils": int(members.sum())}
+        for name, values in [("observed", observed[members]), ("prior", gaps[0, members]),
+                             ("fitted", gaps[1, members])]:
+            row[f"{name}_p10"], row[f"{name}_p50"], row[f"{name}_p90"] = np.percentile(values, [10, 50, 90])
+        row["prior_cdf_distance"] = distances[0, g]
+        row["fitted_cdf_distance"] = distances[1, g]
+        rows.append(row)
+    report = pd.DataFrame(rows)
+    report.attrs["seed"] = seed + 1
+    return report
+
+
+def weighted_distance(inputs: dict, distances: np.ndarray) -> float:
+    """Coil-weighted mean of per-group CDF distances (groups without coils ignored)"""
+    return float(np.average(distances, weights=inputs["group_coils"]))
+
+
+def write_line_model(parameters: dict, inputs: dict, report: pd.DataFrame, history: pd.DataFrame,
+                     model_dir: str = LINE_MODEL_DIR) -> str:
+    """
+    Write the fit as the next line_model_vNNN.json (never overwrites: the
+    file is linked into place and the version retried if taken). Returns the path.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    versions = [int(name[12:15]) for name in os.listdir(model_dir)
+                if name.startswith("line_model_v") and name.endswith(".json") and name[12:15].isdigit()]
+    version = max(versions, default=0) + 1
+
+    document = {
+        "version": version,
+        "created_utc": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "prior": line_model.LINE_MODEL_FILE or "line_model.py",
+        "calibration": {
+            "coils": int((~np.isnan(inputs["observed_gap_min"])).sum()),
+            "period": list(inputs["period"]),
+            "max_coils": inputs["max_coils"],
+            "generator_seed": inputs["generator_seed"],
+            "report_seed": report.attrs["seed"],
+            "generations": len(history),
+            "loss": float(history["best_loss"].iloc[-1]) if len(history) else None,
+            "prior_cdf_distance": float(np.average(report["prior_cdf_distance"], weights=report["coils"])),
+            "fitted_cdf_distance": float(np.average(report["fitted_cdf_distance"], weights=report["coils"])),
+            "groups": json.loads(report.round(4).to_json(orient="records")),
+        },
+        "parameters": parameters,
+    }
+
+    tmp_path = os.path.join(model_dir, f".line_model.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2)
+    try:
+        while True:
+            path = os.path.join(model_dir, f"line_model_v{version:03d}.json")
+            try:
+                os.link(tmp_path, path)
+                break
+            except FileExistsError:
+                version += 1
+                document["version"] = version
+                with open(tmp_path, "w", encoding="utf-8") as fh:
+                    json.dump(document, fh, indent=2)
+    finally:
+        os.remove(tmp_path)
+    return path
+
+
+def run_durations(inputs: dict, operations: pd.DataFrame) -> np.ndarray:
+    """Operation durations (seconds, coils × stations) of a run's fact_coil_operation_cycle, in input order"""
+    durations = (
+        operations.set_index(["coil_id", "equipment_name"])["operation_duration_sec"].unstack()
+        .reindex(index=inputs["coil_id"], columns=inputs["station_names"])
+    )
+    if durations.isna().to_numpy().any():
+        raise ValueError("run is missing operations of calibration coils (different extract?)")
+    return durations.to_numpy(dtype=np.float64)
+
+
+def check_line_model(model_path: str, coils: pd.DataFrame, stations: pd.DataFrame,
+                     operations: pd.DataFrame) -> dict:
+    """
+    Recompute the fitted CDF distance of a line-model file from a run made
+    with it: the run's own operation durations, the file's idle fit and the
+    report's idle draws. Returns recorded and reproduced distance and whether
+    they agree within CHECK_RTOL / CHECK_ATOL.
+    """
+    with open(model_path, encoding="utf-8") as fh:
+        document = json.load(fh)
+    recorded = document["calibration"]
+    idle = document["parameters"]["IDLE"]
+
+    inputs = prepare_calibration_inputs(coils, stations, recorded["max_coils"], recorded["generator_seed"])
+    randoms = draw_common_randoms(inputs, recorded["report_seed"], run_durations(inputs, operations))
+    theta = np.zeros(len(inputs["parameter_names"]))
+    theta[-2] = np.log(idle["probability"] / (1 - idle["probability"]))
+    theta[-1] = np.log(idle["mean_min"])
+    reproduced = weighted_distance(inputs, group_distances(inputs, simulate_gaps(inputs, randoms, theta))[0])
+
+    expected = recorded["fitted_cdf_distance"]
+    return {
+        "recorded": expected,
+        "reproduced": reproduced,
+        "ok": bool(abs(reproduced - expected) <= CHECK_ATOL + CHECK_RTOL * abs(expected)),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from publish import resolve_current
+
+    parser = argparse.ArgumentParser(description="Calibrate line model durations to the observed completion gaps")
+    parser.add_argument("--output-dir", default="output_tables", help="Published tables to calibrate against")
+    parser.add_argument("--model-dir", default=LINE_MODEL_DIR)
+    parser.add_argument("--generations", type=int, default=DEFAULT_GENERATIONS)
+    parser.add_argument("--population", type=int, default=DEFAULT_POPULATION)
+    parser.add_argument("--coils", type=int, default=CALIBRATION_COILS, help="Coils simulated per candidate")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--generator-seed", type=int, default=DEFAULT_GENERATOR_SEED,
+                        help="Pipeline --seed the line model will run with (keyed operation draws)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--check", default=None,
+                        help="Line-model file: recompute its fitted CDF distance from a run made with it")
+    args = parser.parse_args()
+
+    snapshot_dir = resolve_current(args.output_dir)
+    coils = pd.read_csv(
+        os.path.join(snapshot_dir, "fact_production_coil.csv"),
+        usecols=["coil_id", "completion_ts", "parent_coil_id", "thickness_mm", "width_mm", "shift_code",
+                 "type_code", "gap_from_prev_completion_min"],
+        dtype={"coil_id": str}, parse_dates=["completion_ts"],
+    )
+    equipment = pd.read_csv(os.path.join(snapshot_dir, "dim_equipment.csv"))
+    stations = equipment.dropna(subset=["process_order"])
+
+    if args.check:
+        operations = pd.read_csv(
+            os.path.join(snapshot_dir, "fact_coil_operation_cycle.csv"),
+            usecols=["coil_id", "equipment_name", "operation_duration_sec"], dtype={"coil_id": str},
+        )
+        result = check_line_model(args.check, coils, stations, operations)
+        print(f"Fitted CDF distance: recorded {result['recorded']:.6f} | "
+              f"reproduced from run {os.path.basename(snapshot_dir)} {result['reproduced']:.6f}")
+        if not result["ok"]:
+            print("✗ The run does not reproduce the fit (made with another line model, seed or extract?)")
+            sys.exit(1)
+        print("✓ Run reproduces the fitted gap distribution")
+        sys.exit(0)
+
+    started = time.perf_counter()
+    inputs = prepare_calibration_inputs(coils, stations, args.coils, args.generator_seed)
+    print(f"Calibrating {len(inputs['parameter_names'])} parameters on {len(inputs['band']):,} coils "
+          f"({len(inputs['group_labels'])} groups), {args.generations} generations × {args.population}")
+
+    theta, history = calibrate(inputs, args.generations, args.population, args.seed, args.workers)
+    report = fit_report(inputs, theta, args.seed)
+    path = write_line_model(fitted_parameters(inputs, theta), inputs, report, history, args.model_dir)
+
+    print("\nGap quantiles (minutes) and CDF distance per group, prior vs fitted:")
+    print(report.round(4).to_string(index=False))
+    print(f"\n✓ Line model written to {path} in {time.perf_counter() - started:.1f}s")
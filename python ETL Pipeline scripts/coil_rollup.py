@@ -0,0 +1,76 @@
+# Parent coil rollup (timing, yield and transition gaps)
+# Used by 05 and, for completed parents of each month partition, by backfill.py
+
+import numpy as np
+import pandas as pd
+
+
+def build_parent_coil_rollup(coils: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate output pieces to parent coil level using NumPy segment
+    reductions over factorized parent_coil_id codes:
+    - First/last completion and parent cycle time
+    - Piece, prime and scrap counts, total mass
+    - Gap from the previous parent's last completion
+    Rows are returned in parent first-completion order.
+    """
+    codes, parent_ids = pd.factorize(coils["parent_coil_id"], sort=True)
+    ts = coils["completion_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+    ts_valid = ts != np.iinfo(np.int64).min
+
+    # Single stable sort by parent code; segment starts mark each parent
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+    ts_sorted = ts[order]
+    valid_sorted = ts_valid[order]
+    first_ns = np.minimum.reduceat(
+        np.where(valid_sorted, ts_sorted, np.iinfo(np.int64).max), starts
+    )
+    last_ns = np.maximum.reduceat(ts_sorted, starts)
+    has_ts = np.add.reduceat(valid_sorted.astype(np.int64), starts) > 0
+
+    total_pieces = np.diff(np.r_[starts, len(order)])
+    prime_pieces = np.add.reduceat(coils["is_prime"].to_numpy(dtype=np.int64)[order], starts)
+    scrap_pieces = np.add.reduceat(coils["is_scrap"].to_numpy(dtype=np.int64)[order], starts)
+    mass_out_tons = np.add.reduceat(
+        np.nan_to_num(coils["mass_out_tons"].to_numpy(dtype=np.float64)[order]), starts
+    )
+
+    first_ts = np.where(has_ts, first_ns, np.iinfo(np.int64).min).view("datetime64[ns]")
+    last_ts = np.where(has_ts, last_ns, np.iinfo(np.int64).min).view("datetime64[ns]")
+
+    rollup = pd.DataFrame({
+        "parent_coil_id": parent_ids[sorted_codes[starts]],
+        "parent_first_completion_ts": first_ts,
+        "parent_last_completion_ts": last_ts,
+        "total_pieces": total_pieces,
+        "prime_pieces": prime_pieces,
+        "scrap_pieces": scrap_pieces,
+        "mass_out_tons": mass_out_tons,
+    })
+
+    rollup["prime_rate_pct"] = 100 * rollup["prime_pieces"] / rollup["total_pieces"]
+    rollup["parent_cycle_min"] = (
+        (rollup["parent_last_completion_ts"] - rollup["parent_first_completion_ts"])
+        .dt.total_seconds() / 60.0
+    )
+
+    return add_transition_gaps(rollup)
+
+
+def add_transition_gaps(rollup: pd.DataFrame) -> pd.DataFrame:
+    """
+    Transition gap: previous parent (by first completion) last piece -> this
+    parent first piece. Expects rows in parent_coil_id order; returns them in
+    first-completion order (ties keep id order).
+    """
+    rollup = rollup.sort_values(
+        "parent_first_completion_ts", kind="stable"
+    ).reset_index(drop=True)
+    rollup["gap_from_prev_parent_min"] = (
+        (rollup["parent_first_completion_ts"] - rollup["parent_last_completion_ts"].shift(1))
+        .dt.total_seconds() / 60.0
+    )
+    return rollup
@@ -0,0 +1,290 @@
+# Fuzzy resolver: maintenance Sub Area / Hierachy names → line equipment
+#
+# Distinct raw names are matched against the line model (line_equipment
+# stations) by character trigram similarity. Candidates come from an inverted
+# trigram index (only stations sharing trigrams with a name are scored, no
+# all-pairs comparison); the score is the Dice coefficient of the trigram sets.
+#
+# Resolution order per name:
+# - exact: normalized name equals a line station (score 1.0)
+# - auto: best station scores >= ACCEPT_SCORE and beats the runner-up by AMBIGUITY_MARGIN
+# - exact support equipment (dim_equipment rows outside the line, as before)
+# - review: best station scores >= REVIEW_SCORE (reported, not applied)
+# - unmatched
+#
+# Every scored name is persisted in a CSV cache (RESOLVER_CACHE_FILE, in the
+# working directory) and only names not in the cache are scored. Rows marked
+# status=manual are engineer-approved mappings: they are never rescored. Other
+# rows are rescored when the line stations change (line_model fingerprint).
+# Support equipment matches are looked up per run (not cached).
+
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+RESOLVER_CACHE_FILE = "equipment_name_map.csv"
+CACHE_COLUMNS = ["raw_name", "equipment_name", "score", "runner_up_score", "status", "line_model"]
+
+NGRAM = 3
+ACCEPT_SCORE = 0.75
+REVIEW_SCORE = 0.5
+AMBIGUITY_MARGIN = 0.05
+
+# Statuses whose mapping is applied (support: exact dim_equipment match outside the line)
+LINE_STATUSES = ("exact", "auto", "manual")
+APPROVED_STATUSES = LINE_STATUSES + ("support",)
+
+# Candidate lookup skips trigrams held by more than this share of the
+# candidates (large line models only); the top RESCORE_CANDIDATES per name by
+# shared lookup trigrams are then scored exactly on all trigrams
+MAX_GRAM_SHARE = 0.05
+MIN_CANDIDATES_FOR_GRAM_CUTOFF = 50
+RESCORE_CANDIDATES = 8
+# Candidate pairs generated per block of names (bounds memory)
+PAIR_BLOCK = 2_000_000
+
+
+def normalize_name(names: pd.Series) -> pd.Series:
+    """Lower case, trailing "(n)" dropped, & → and, punctuation → single spaces"""
+    return (
+        names.fillna("").astype(str).str.lower()
+        .str.replace(r"\(\d+\)\s*$", "", regex=True)
+        .str.replace("&", " and ", regex=False)
+        .str.replace(r"[^a-z0-9]+", " ", regex=True)
+        .str.strip()
+    )
+
+
+def name_gram_set(name: str) -> set:
+    """Distinct trigrams of a normalized name (padded with spaces)"""
+    padded = f" {name} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def name_ngrams(normalized: list) -> tuple:
+    """(name position, trigram) pairs of distinct trigrams per name, sorted by position"""
+    positions, grams = [], []
+    for pos, name in enumerate(normalized):
+        name_grams = sorted(name_gram_set(name))
+        positions.extend([pos] * len(name_grams))
+        grams.extend(name_grams)
+    return np.array(positions, dtype=np.int64), np.array(grams, dtype=object)
+
+
+def line_model_fingerprint(line_names) -> str:
+    text = "\x1f".join(sorted(line_names))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class NgramIndex:
+    """Inverted trigram index over candidate names (CSR postings of candidate ids)"""
+
+    def __init__(self, names: list):
+        self.names = list(names)
+        normalized = normalize_name(pd.Series(self.names, dtype=object)).tolist()
+        self.gram_sets = [name_gram_set(name) for name in normalized]
+        positions, grams = name_ngrams(normalized)
+        gram_ids, self.vocab = pd.factorize(grams.astype(str), sort=True)
+
+        order = np.lexsort((positions, gram_ids))
+        self.post_candidates = positions[order]
+        self.post_offsets = np.searchsorted(gram_ids[order], np.arange(len(self.vocab) + 1))
+
+        document_frequency = np.diff(self.post_offsets)
+        self.lookup_gram = np.ones(len(self.vocab), dtype=bool)
+        if len(self.names) >= MIN_CANDIDATES_FOR_GRAM_CUTOFF:
+            self.lookup_gram = document_frequency <= MAX_GRAM_SHARE * len(self.names)
+
+    def shortlist(self, positions: np.ndarray, gram_pos: np.ndarray) -> tuple:
+        """(name, candidate) pairs: top RESCORE_CANDIDATES per name by shared lookup trigrams"""
+        lengths = self.post_offsets[gram_pos + 1] - self.post_offsets[gram_pos]
+        starts = np.repeat(self.post_offsets[gram_pos] - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+        candidates = self.post_candidates[starts + np.arange(lengths.sum())]
+        pair_keys, shared = np.unique(np.repeat(positions, lengths) * len(self.names) + candidates, return_counts=True)
+        pair_name, pair_candidate = pair_keys // len(self.names), pair_keys % len(self.names)
+
+        order = np.lexsort((pair_candidate, -shared, pair_name))
+        pair_name, pair_candidate = pair_name[order], pair_candidate[order]
+        group_start = np.flatnonzero(np.r_[True, pair_name[1:] != pair_name[:-1]]) if len(pair_name) else pair_name
+        rank = np.arange(len(pair_name)) - np.repeat(group_start, np.diff(np.r_[group_start, len(pair_name)]))
+        keep = rank < RESCORE_CANDIDATES
+        return pair_name[keep], pair_candidate[keep]
+
+    def best_matches(self, normalized: list) -> pd.DataFrame:
+        """Best candidate, its Dice score and the runner-up score for each name"""
+        n = len(normalized)
+        best = pd.DataFrame({
+            "candidate": np.full(n, -1), "score": np.zeros(n), "runner_up_score": np.zeros(n),
+        })
+        if n == 0 or not self.names:
+            return best
+
+        positions, grams = name_ngrams(normalized)
+        gram_pos = np.searchsorted(self.vocab, grams.astype(str))
+        found = gram_pos < len(self.vocab)
+        found[found] = self.vocab[gram_pos[found]] == grams[found]
+        found[found] = self.lookup_gram[gram_pos[found]]
+        positions, gram_pos = positions[found], gram_pos[found]
+
+        # Candidate pairs in blocks of names holding about PAIR_BLOCK postings each
+        postings = self.post_offsets[gram_pos + 1] - self.post_offsets[gram_pos]
+        block = np.cumsum(np.bincount(positions, weights=postings, minlength=n)) // PAIR_BLOCK
+        bounds = np.searchsorted(positions, np.searchsorted(block, np.unique(block)))
+        pair_name, pair_candidate = [], []
+        for lo, hi in zip(bounds, np.r_[bounds[1:], len(positions)]):
+            names, candidates = self.shortlist(positions[lo:hi], gram_pos[lo:hi])
+            pair_name.append(names)
+            pair_candidate.append(candidates)
+        pair_name, pair_candidate = np.concatenate(pair_name), np.concatenate(pair_candidate)
+        if not len(pair_name):
+            return best
+
+        # Exact Dice on all trigrams for the shortlisted pairs
+        query_sets = [name_gram_set(name) for name in normalized]
+        score = np.array([
+            2 * len(query_sets[q] & self.gram_sets[c]) / (len(query_sets[q]) + len(self.gram_sets[c]))
+            for q, c in zip(pair_name.tolist(), pair_candidate.tolist())
+        ])
+
+        # Per name: best by score (ties → first candidate), then the runner-up
+        order = np.lexsort((pair_candidate, -score, pair_name))
+        pair_name, pair_candidate, score = pair_name[order], pair_candidate[order], score[order]
+        first = np.flatnonzero(np.r_[True, pair_name[1:] != pair_name[:-1]])
+        best.loc[pair_name[first], "candidate"] = pair_candidate[first]
+        best.loc[pair_name[first], "score"] = score[first]
+        second = first + 1
+        has_second = second < len(pair_name)
+        has_second[has_second] = pair_name[second[has_second]] == pair_name[first[has_second]]
+        best.loc[pair_name[first[has_second]], "runner_up_score"] = score[second[has_second]]
+        return best
+
+
+class EquipmentResolver:
+    """
+    Maps raw maintenance equipment names to dim_equipment rows, fuzzy against
+    the line stations (line_equipment), exact for support equipment
+    """
+
+    def __init__(self, dim_equipment: pd.DataFrame, line_equipment: pd.DataFrame,
+                 cache_path: str = RESOLVER_CACHE_FILE):
+        self.cache_path = cache_path
+        self.line_names = line_equipment["equipment_name"].tolist()
+        self.equipment_ids = dict(zip(dim_equipment["equipment_name"], dim_equipment["equipment_id"]))
+        line_set = set(self.line_names)
+        support_names = [name for name in dim_equipment["equipment_name"] if name not in line_set]
+        self.line_model = line_model_fingerprint(self.line_names)
+
+        self.line_exact = dict(zip(normalize_name(pd.Series(self.line_names, dtype=object)), self.line_names))
+        self.support_exact = dict(zip(normalize_name(pd.Series(support_names, dtype=object)), support_names))
+        self.index = NgramIndex(self.line_names)
+        self.cache = self._load_cache()
+        self.scored = 0
+
+    def _load_cache(self) -> pd.DataFrame:
+        if self.cache_path and os.path.exists(self.cache_path):
+            cache = pd.read_csv(self.cache_path, dtype={"raw_name": str, "equipment_name": str,
+                                                        "status": str, "line_model": str},
+                                keep_default_na=False, na_values={"score": [""], "runner_up_score": [""]})
+            return cache.reindex(columns=CACHE_COLUMNS).drop_duplicates("raw_name", keep="last")
+        return pd.DataFrame(columns=CACHE_COLUMNS)
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        self.cache.sort_values("raw_name").to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def score_names(self, raw_names: list) -> pd.DataFrame:
+        """Cache rows for names matched against the line stations"""
+        normalized = normalize_name(pd.Series(raw_names, dtype=object))
+        best = self.index.best_matches(normalized.tolist())
+        best_name = np.array(self.line_names + [""], dtype=object)[best["candidate"].to_numpy()]
+
+        line_exact = normalized.map(self.line_exact).to_numpy(dtype=object)
+        score = best["score"].to_numpy()
+        runner_up = best["runner_up_score"].to_numpy()
+        is_exact = pd.notna(line_exact)
+        is_auto = ~is_exact & (score >= ACCEPT_SCORE) & (score - runner_up >= AMBIGUITY_MARGIN)
+        is_review = ~is_exact & ~is_auto & (score >= REVIEW_SCORE)
+
+        status = np.select([is_exact, is_auto, is_review], ["exact", "auto", "review"], "unmatched")
+        equipment_name = np.select([is_exact, is_auto | is_review], [line_exact, best_name], "")
+        return pd.DataFrame({
+            "raw_name": raw_names,
+            "equipment_name": equipment_name,
+            "score": np.where(is_exact, 1.0, score.round(4)),
+            "runner_up_score": np.where(is_exact, np.nan, runner_up.round(4)),
+            "status": status,
+            "line_model": self.line_model,
+        })
+
+    def mapping(self, raw_names) -> pd.DataFrame:
+        """
+        Mapping rows for the distinct raw names, scoring (and persisting) unseen
+        ones; names not mapped to a line station fall back to support equipment
+        """
+        distinct = pd.unique(pd.Series(raw_names, dtype=object).dropna().astype(str))
+        cached = self.cache[self.cache["raw_name"].isin(distinct)]
+        current = cached[(cached["status"] == "manual") | (cached["line_model"] == self.line_model)]
+        known = set(current["raw_name"])
+        unseen = [name for name in distinct if name not in known]
+        if unseen:
+            scored = self.score_names(unseen)
+            self.scored += len(scored)
+            self.cache = pd.concat(
+                [self.cache[~self.cache["raw_name"].isin(unseen)], scored], ignore_index=True
+            )
+            if self.cache_path:
+                self._save_cache()
+            current = pd.concat([current, scored], ignore_index=True)
+
+        current = current.set_index("raw_name")
+        support = normalize_name(current.index.to_series()).map(self.support_exact)
+        is_support = ~current["status"].isin(LINE_STATUSES).to_numpy() & support.notna().to_numpy()
+        current.loc[is_support, ["equipment_name", "status"]] = np.column_stack(
+            [support[is_support].to_numpy(dtype=object), np.full(is_support.sum(), "support", dtype=object)]
+        )
+        current.loc[is_support, ["score", "runner_up_score"]] = np.nan
+        return current
+
+    def resolve(self, raw_names: pd.Series, fallback_names: pd.Series = None) -> pd.DataFrame:
+        """
+        Per row (aligned with raw_names): equipment_id (NaN when unresolved),
+        equipment_name, match_score and match_status. Rows whose name is not
+        approved are retried with fallback_names (e.g. Hierachy).
+        """
+        names = [raw_names] + ([fallback_names] if fallback_names is not None else [])
+        mapping = self.mapping(pd.concat([n.astype(object) for n in names], ignore_index=True))
+        approved = mapping["status"].isin(APPROVED_STATUSES) & mapping["equipment_name"].isin(self.equipment_ids)
+
+        result = pd.DataFrame({
+            "equipment_id": np.nan, "equipment_name": raw_names.to_numpy(dtype=object),
+            "match_score": np.nan, "match_status": "unmatched",
+        }, index=raw_names.index)
+        unresolved = np.ones(len(result), dtype=bool)
+        for source in names:
+            keys = source.astype(object).where(source.notna(), None).to_numpy(dtype=object)
+            hit = unresolved & pd.Series(keys).map(approved).fillna(False).to_numpy(dtype=bool)
+            rows = mapping.loc[keys[hit]]
+            result.loc[hit, "equipment_name"] = rows["equipment_name"].to_numpy()
+            result.loc[hit, "equipment_id"] = rows["equipment_name"].map(self.equipment_ids).to_numpy(dtype=np.float64)
+            result.loc[hit, "match_score"] = rows["score"].to_numpy(dtype=np.float64)
+            result.loc[hit, "match_status"] = rows["status"].to_numpy()
+            unresolved &= ~hit
+
+        # Unresolved rows report the primary name's status (review / unmatched)
+        primary = raw_names.astype(object).where(raw_names.notna(), None).to_numpy(dtype=object)
+        known = unresolved & pd.Series(primary).isin(mapping.index).to_numpy()
+        result.loc[known, "match_status"] = mapping.loc[primary[known], "status"].to_numpy()
+        result.loc[known, "match_score"] = mapping.loc[primary[known], "score"].to_numpy(dtype=np.float64)
+        return result
+
+    def review_names(self, raw_names) -> pd.DataFrame:
+        """
+        Names awaiting approval (status review) with their proposed station and
+        confidence, including those currently applied as support equipment
+        """
+        mapping = self.mapping(raw_names)
+        pending = self.cache[self.cache["raw_name"].isin(mapping.index) & (self.cache["status"] == "review")]
+        return pending.sort_values(["score", "raw_name"], ascending=[False, True]).reset_index(drop=True)
@@ -0,0 +1,147 @@
+# Stable surrogate keys and change sets for the equipment event log
+#
+# event_id is a 64-bit hash of the natural key (equipment_id, event_type,
+# event_start_ts, coil_id) plus the occurrence number of that key, so duplicate
+# maintenance records still get distinct ids. The same event gets the same id in
+# every run. row_hash covers the remaining columns and detects updates.
+#
+# Each published run keeps its sorted (event_id, row_hash) arrays next to the
+# tables; the next run diffs against them with a sorted merge and exports only
+# inserted, updated and deleted events.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from time_model import from_day_number
+
+EVENT_KEY_COLUMNS = ["equipment_id", "event_type", "event_start_ts", "coil_id"]
+
+EVENT_VALUE_COLUMNS = [
+    "equipment_name", "event_end_ts", "event_duration_sec", "parent_coil_id",
+    "shift_code", "type_code", "is_prime", "is_scrap", "event_date",
+]
+
+EVENT_KEYS_FILE = "event_log_keys.npz"
+
+CHANGE_INSERT = "I"
+CHANGE_UPDATE = "U"
+CHANGE_DELETE = "D"
+
+
+def _normalized(events: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """Fixed dtypes per column so hashes do not depend on how the frame was built"""
+    out = {}
+    for col in columns:
+        values = events[col]
+        if col == "equipment_id":
+            out[col] = values.astype("float64").fillna(-1).astype("int64")
+        elif col in ("event_start_ts", "event_end_ts"):
+            out[col] = pd.to_datetime(values).to_numpy(dtype="datetime64[ns]").view("int64")
+        elif col == "event_date":
+            # int32 day number in the pipeline, date string in exported files
+            if pd.api.types.is_integer_dtype(values):
+                values = from_day_number(values)
+            out[col] = pd.to_datetime(values).to_numpy(dtype="datetime64[D]").view("int64")
+        elif col == "event_duration_sec":
+            out[col] = values.astype("float64").round(6).fillna(-1.0)
+        elif col in ("is_prime", "is_scrap"):
+            out[col] = values.fillna(False).astype(bool)
+        else:
+            out[col] = values.astype(object).where(values.notna(), "").astype(str)
+    return pd.DataFrame(out, index=events.index)
+
+
+def assign_event_ids(events: pd.DataFrame) -> pd.Series:
+    """Deterministic int64 event_id from the natural key and its occurrence number"""
+    keys = _normalized(events, EVENT_KEY_COLUMNS)
+    keys["occurrence"] = keys.groupby(EVENT_KEY_COLUMNS, sort=False).cumcount()
+    ids = pd.util.hash_pandas_object(keys, index=False).to_numpy().view("int64")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("event_id hash collision in fact_equipment_event_log")
+    return pd.Series(ids, index=events.index, name="event_id")
+
+
+def row_hashes(events: pd.DataFrame) -> np.ndarray:
+    """Hash of the non-key columns (change detection)"""
+    values = _normalized(events, EVENT_VALUE_COLUMNS)
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def save_event_keys(run_dir: str, events: pd.DataFrame) -> str:
+    """Persist (event_id, row_hash) sorted by event_id for the next run's diff"""
+    return write_event_keys(run_dir, events["event_id"].to_numpy(dtype=np.int64), row_hashes(events))
+
+
+def write_event_keys(run_dir: str, ids: np.ndarray, hashes: np.ndarray) -> str:
+    """Key file from (event_id, row_hash) arrays, e.g. collected partition by partition"""
+    order = np.argsort(ids, kind="stable")
+    path = os.path.join(run_dir, EVENT_KEYS_FILE)
+    with open(path, "wb") as fh:
+        np.savez(fh, event_id=ids[order], row_hash=hashes[order])
+    return path
+
+
+def load_event_keys(run_dir: str):
+    """(event_id, row_hash) of a published run, or None if it has no key file"""
+    path = os.path.join(run_dir, EVENT_KEYS_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as keys:
+        return keys["event_id"], keys["row_hash"]
+
+
+def diff_sorted_keys(prev_ids, prev_hashes, cur_ids, cur_hashes):
+    """
+    Sorted merge of two key sets (both sorted by id).
+    Returns positions into cur for inserts and updates, into prev for deletes.
+    """
+    if len(prev_ids) == 0:
+        return np.arange(len(cur_ids)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    pos = np.searchsorted(prev_ids, cur_ids)
+    pos_clipped = np.minimum(pos, len(prev_ids) - 1)
+    matched = (pos < len(prev_ids)) & (prev_ids[pos_clipped] == cur_ids)
+
+    inserts = np.flatnonzero(~matched)
+    updates = np.flatnonzero(matched & (prev_hashes[pos_clipped] != cur_hashes))
+
+    still_present = np.zeros(len(prev_ids), dtype=bool)
+    still_present[pos[matched]] = True
+    deletes = np.flatnonzero(~still_present)
+    return inserts, updates, deletes
+
+
+def event_log_changes(events: pd.DataFrame, previous_keys=None):
+    """
+    Change set of the event log against the previous run's keys.
+    Inserts and updates carry the full row; deletes carry only event_id.
+    Without previous keys every event is an insert (initial load).
+    Returns (changes frame, counts dict).
+    """
+    cur_ids = events["event_id"].to_numpy(dtype=np.int64)
+    cur_hashes = row_hashes(events)
+    order = np.argsort(cur_ids, kind="stable")
+
+    if previous_keys is None:
+        prev_ids = np.empty(0, dtype=np.int64)
+        prev_hashes = np.empty(0, dtype=np.uint64)
+    else:
+        prev_ids, prev_hashes = previous_keys
+
+    inserts, updates, deletes = diff_sorted_keys(prev_ids, prev_hashes, cur_ids[order], cur_hashes[order])
+
+    changed = events.iloc[np.r_[order[inserts], order[updates]]]
+    change_type = np.r_[
+        np.full(len(inserts), CHANGE_INSERT, dtype=object),
+        np.full(len(updates), CHANGE_UPDATE, dtype=object),
+    ]
+    upserts = changed.assign(change_type=change_type)
+    removed = pd.DataFrame({"event_id": prev_ids[deletes], "change_type": CHANGE_DELETE})
+
+    columns = ["change_type"] + list(events.columns)
+    changes = pd.concat([upserts, removed], ignore_index=True)[columns]
+    counts = {"inserts": len(inserts), "updates": len(updates), "deletes": len(deletes),
+              "unchanged": len(cur_ids) - len(inserts) - len(updates)}
+    return changes, counts
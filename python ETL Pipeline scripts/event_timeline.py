@@ -0,0 +1,294 @@
+# Compact encoding of the equipment event timeline
+#
+# fact_equipment_event_log as per-station state streams instead of full rows:
+# - events of each station in start order (stations concatenated, CSR offsets)
+# - state: uint8 code (RUN/IDLE/FAULT)
+# - start: int32 ms delta from the station's previous event start (first event
+#   from a per-station int64 base); deltas outside int32 are kept exactly in an
+#   int64 side list
+# - duration: int32 ms (same side list for long or missing ends)
+# - month: uint16 offset of the month 10 publishes the event in
+# - RUN events: int32 row reference into fact_production_coil (coil_id,
+#   parent_coil_id, shift_code, type_code, is_prime, is_scrap come from there)
+# - FAULT events: log rank among faults and shift code (maintenance order)
+#
+# About 15 bytes per event in memory (the DataFrame needs several hundred) and
+# a few bytes per event on disk (EVENT_TIMELINE_FILE, compressed npz next to the
+# published tables). decode() rebuilds the tabular log in its original row
+# order (10's sort key, checked when encoding); state_seconds() computes state
+# time per station directly from the encoded arrays.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from event_keys import assign_event_ids
+from time_model import (
+    MS_PER_SEC, NAT_MS, day_to_month_number, from_epoch_ms, to_day_number, to_epoch_ms, to_month_number,
+)
+
+EVENT_TIMELINE_FILE = "event_timeline.npz"
+
+STATES = ["RUN", "IDLE", "FAULT"]
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+COIL_COLUMNS = ["coil_id", "parent_coil_id", "shift_code", "type_code", "is_prime", "is_scrap"]
+
+INT32_MIN, INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+# Duration marker of events without an end (NaT)
+NO_END = INT32_MIN
+
+
+def _narrow(values: np.ndarray):
+    """int64 → int32 values plus (positions, int64 values) of those that do not fit"""
+    wide = (values < INT32_MIN + 1) | (values > INT32_MAX)
+    narrow = np.where(wide, 0, values).astype(np.int32)
+    return narrow, np.flatnonzero(wide).astype(np.int64), values[wide]
+
+
+def _widen(narrow: np.ndarray, wide_pos: np.ndarray, wide_values: np.ndarray) -> np.ndarray:
+    values = narrow.astype(np.int64)
+    values[wide_pos] = wide_values
+    return values
+
+
+class EventTimeline:
+    """Encoded event log (see module header); build with encode() or load()"""
+
+    ARRAYS = [
+        "equipment_ids", "equipment_names", "station_offsets", "station_base_ms", "month_base",
+        "state", "month", "start_delta", "start_wide_pos", "start_wide_ms",
+        "duration", "duration_wide_pos", "duration_wide_ms", "coil_ref",
+        "fault_rank", "fault_shift", "shift_values", "coil_count", "log_order",
+    ]
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self):
+        return len(self.state)
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(np.asarray(getattr(self, name)).nbytes for name in self.ARRAYS))
+
+    # ----------------------------
+    # Encoding
+    # ----------------------------
+
+    @classmethod
+    def encode(cls, events: pd.DataFrame, coils: pd.DataFrame, max_cycle_ms: int) -> "EventTimeline":
+        """
+        Encode the event log (10's order and columns); RUN events must reference
+        coils (fact_production_coil rows, day-number production_date) with
+        identical coil attributes. max_cycle_ms: 10's IDLE finality bound.
+        """
+        equipment_ids, station = np.unique(events["equipment_id"].to_numpy(dtype=np.int64), return_inverse=True)
+        names = pd.Series(events["equipment_name"].to_numpy(dtype=object)).groupby(station).agg(["first", "nunique"])
+        if (names["nunique"] > 1).any():
+            raise ValueError("equipment_id with several equipment_name values in the event log")
+
+        state = events["event_type"].map(STATE_CODES)
+        if state.isna().any():
+            raise ValueError(f"unknown event_type values: {sorted(events['event_type'][state.isna()].unique())}")
+        state = state.to_numpy(dtype=np.uint8)
+
+        start_ms = to_epoch_ms(events["event_start_ts"])
+        end_ms = to_epoch_ms(events["event_end_ts"])
+        if (start_ms == NAT_MS).any():
+            raise ValueError("events without event_start_ts cannot be encoded")
+        duration_ms = np.where(end_ms == NAT_MS, NO_END, end_ms - start_ms)
+
+        # Coil references (RUN only)
+        is_run = state == STATE_CODES["RUN"]
+        is_fault = state == STATE_CODES["FAULT"]
+        coil_pos = pd.Index(coils["coil_id"]).get_indexer(events["coil_id"].to_numpy()[is_run])
+        if (coil_pos < 0).any():
+            raise ValueError("RUN events reference coils missing from fact_production_coil")
+
+        # Month each event is published in (as in 10): RUN its coil's month,
+        # IDLE when the following RUN start + max coil cycle is reached, FAULT its start
+        month = to_month_number(np.where(is_fault, start_ms, end_ms + max_cycle_ms))
+        month[is_run] = day_to_month_number(coils["production_date"].to_numpy()[coil_pos])
+        month_base = int(month.min()) if len(month) else 0
+        run_rows = events[is_run]
+        for col in COIL_COLUMNS[1:]:
+            if not np.array_equal(
+                run_rows[col].to_numpy(dtype=object), coils[col].to_numpy(dtype=object)[coil_pos]
+            ):
+                raise ValueError(f"RUN event {col} differs from fact_production_coil")
+        coil_ref = np.full(len(events), -1, dtype=np.int32)
+        coil_ref[is_run] = coil_pos
+
+        # Station streams in start order (ties: log order)
+        position = np.arange(len(events))
+        order = np.lexsort((position, start_ms, station))
+        station_offsets = np.searchsorted(station[order], np.arange(len(equipment_ids) + 1)).astype(np.int64)
+        ordered_start = start_ms[order]
+        station_base_ms = ordered_start[station_offsets[:-1]] if len(events) else np.empty(0, dtype=np.int64)
+        delta = np.diff(ordered_start, prepend=0)
+        delta[station_offsets[:-1]] = 0
+        start_delta, start_wide_pos, start_wide_ms = _narrow(delta)
+        duration, duration_wide_pos, duration_wide_ms = _narrow(duration_ms[order])
+
+        # FAULT events: rank in the log and shift code
+        fault_rank = np.cumsum(is_fault) - 1
+        shift_codes, shift_values = pd.factorize(events["shift_code"].to_numpy(dtype=object)[is_fault])
+        fault_shift = np.full(len(events), -1, dtype=np.int32)
+        fault_shift[is_fault] = shift_codes
+        ordered_fault = is_fault[order]
+
+        timeline = cls(
+            equipment_ids=equipment_ids, equipment_names=np.asarray(names["first"], dtype=str),
+            station_offsets=station_offsets, station_base_ms=station_base_ms, month_base=np.int64(month_base),
+            state=state[order], month=(month[order] - month_base).astype(np.uint16),
+            start_delta=start_delta, start_wide_pos=start_wide_pos, start_wide_ms=start_wide_ms,
+            duration=duration, duration_wide_pos=duration_wide_pos, duration_wide_ms=duration_wide_ms,
+            coil_ref=coil_ref[order], fault_rank=fault_rank[order][ordered_fault].astype(np.int32),
+            fault_shift=fault_shift[order][ordered_fault], shift_values=np.asarray(shift_values, dtype=str),
+            coil_count=np.int64(len(coils)), log_order=np.empty(0, dtype=np.int64),
+        )
+
+        # Row order: 10's sort key, or an explicit permutation if it does not reproduce the log
+        derived = timeline.row_order()
+        if not np.array_equal(order[derived], position):
+            timeline.log_order = np.argsort(order, kind="stable")
+        return timeline
+
+    # ----------------------------
+    # Decoding
+    # ----------------------------
+
+    def station_index(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.equipment_ids)), np.diff(self.station_offsets))
+
+    def start_ms(self) -> np.ndarray:
+        """Absolute start per event (cumulative deltas per station)"""
+        delta = _widen(self.start_delta, self.start_wide_pos, self.start_wide_ms)
+        total = np.cumsum(delta)
+        station = self.station_index()
+        first = self.station_offsets[:-1][np.diff(self.station_offsets) > 0]
+        offset = np.repeat(self.station_base_ms[np.diff(self.station_offsets) > 0] - total[first],
+                           np.diff(np.r_[first, len(delta)]))
+        return total + offset if len(station) else total
+
+    def end_ms(self, start_ms: np.ndarray = None) -> np.ndarray:
+        start_ms = self.start_ms() if start_ms is None else start_ms
+        duration = _widen(self.duration, self.duration_wide_pos, self.duration_wide_ms)
+        return np.where(duration == NO_END, NAT_MS, start_ms + duration)
+
+    def row_order(self) -> np.ndarray:
+        """Encoded positions in log order: (month, FAULT last, station, RUN before IDLE, start) or fault rank"""
+        if len(self.log_order):
+            return self.log_order
+        is_fault = self.state == STATE_CODES["FAULT"]
+        rank = np.zeros(len(self), dtype=np.int64)
+        rank[is_fault] = self.fault_rank
+        no_key = ~is_fault
+        return np.lexsort((
+            np.arange(len(self)),
+            rank,
+            np.where(no_key, self.start_ms(), 0),
+            np.where(no_key, self.state, 0),
+            np.where(no_key, self.station_index(), 0),
+            is_fault,
+            self.month,
+        ))
+
+    def decode(self, coils: pd.DataFrame) -> pd.DataFrame:
+        """The event log as built by 10 (same columns, dtypes and row order)"""
+        if len(coils) != int(self.coil_count):
+            raise ValueError("coils table does not match the encoded timeline")
+        order = self.row_order()
+        station = self.station_index()[order]
+        state = self.state[order]
+        start_ms = self.start_ms()
+        end_ms = self.end_ms(start_ms)[order]
+        start_ms = start_ms[order]
+        coil_ref = self.coil_ref[order]
+        is_run = coil_ref >= 0
+
+        def coil_attr(col, fill):
+            # object columns with None outside RUN events (as 10 builds them)
+            values = np.full(len(order), fill, dtype=object)
+            values[is_run] = coils[col].to_numpy(dtype=object)[coil_ref[is_run]]
+            return pd.Series(values, dtype=object)
+
+        shift = coil_attr("shift_code", None).to_numpy(copy=True)
+        is_fault = state == STATE_CODES["FAULT"]
+        fault_shift = np.empty(int(is_fault.sum()), dtype=np.int32)
+        fault_shift[self.fault_rank] = self.fault_shift
+        shift_values = np.r_[self.shift_values.astype(object), None]
+        shift[is_fault] = shift_values[fault_shift]
+
+        events = pd.DataFrame({
+            "equipment_id": self.equipment_ids[station],
+            "equipment_name": self.equipment_names.astype(object)[station],
+            "event_type": np.array(STATES, dtype=object)[state],
+            "event_start_ts": from_epoch_ms(start_ms),
+            "event_end_ts": from_epoch_ms(end_ms),
+            "event_duration_sec": np.where(end_ms == NAT_MS, np.nan, (end_ms - start_ms) / MS_PER_SEC),
+            "coil_id": coil_attr("coil_id", None),
+            "parent_coil_id": coil_attr("parent_coil_id", None),
+            "shift_code": pd.Series(shift, dtype=object),
+            "type_code": coil_attr("type_code", None),
+            "is_prime": coil_attr("is_prime", False).to_numpy(dtype=bool),
+            "is_scrap": coil_attr("is_scrap", False).to_numpy(dtype=bool),
+        })
+        events["event_date"] = to_day_number(events["event_start_ts"].to_numpy().view(np.int64))
+        events.insert(0, "event_id", assign_event_ids(events))
+        return events
+
+    # ----------------------------
+    # Queries on the encoded arrays
+    # ----------------------------
+
+    def state_seconds(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Seconds per station and state, clipped to [start, end) (timestamps,
+        optional); equipment_id/equipment_name plus one column per state
+        """
+        start_ms = self.start_ms()
+        end_ms = self.end_ms(start_ms)
+        lo = -np.inf if start is None else to_epoch_ms(pd.Series([pd.Timestamp(start)]))[0]
+        hi = np.inf if end is None else to_epoch_ms(pd.Series([pd.Timestamp(end)]))[0]
+        has_end = end_ms != NAT_MS
+        overlap = np.where(
+            has_end, np.minimum(end_ms, hi) - np.maximum(start_ms, lo), 0
+        ).clip(min=0) / MS_PER_SEC
+
+        n_states = len(STATES)
+        seconds = np.bincount(
+            self.station_index() * n_states + self.state, weights=overlap,
+            minlength=len(self.equipment_ids) * n_states,
+        ).reshape(-1, n_states)
+        table = pd.DataFrame(seconds, columns=STATES)
+        table.insert(0, "equipment_name", self.equipment_names)
+        table.insert(0, "equipment_id", self.equipment_ids)
+        return table
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+
+    def save(self, output_dir: str) -> str:
+        path = os.path.join(output_dir, EVENT_TIMELINE_FILE)
+        with open(path, "wb") as fh:
+            np.savez_compressed(fh, **{name: getattr(self, name) for name in self.ARRAYS})
+        return path
+
+    @classmethod
+    def load(cls, output_dir: str) -> "EventTimeline":
+        with np.load(os.path.join(output_dir, EVENT_TIMELINE_FILE), allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in cls.ARRAYS})
+
+
+def load_event_log(run_dir: str) -> pd.DataFrame:
+    """Decode the event log of a published run from its timeline and fact_production_coil.csv"""
+    coils = pd.read_csv(
+        os.path.join(run_dir, "fact_production_coil.csv"),
+        usecols=COIL_COLUMNS, dtype={col: str for col in COIL_COLUMNS[:4]},
+    )
+    return EventTimeline.load(run_dir).decode(coils)
@@ -0,0 +1,535 @@
+# Golden-output regression harness for the pipeline stages
+#
+# Runs stages 01-13 on a fixed synthetic extract with a fixed seed (in a
+# temporary working directory) and compares the published run against the
+# golden copies in tests/golden/:
+# - rows are aligned on each table's key columns (plus an occurrence number
+#   for repeated keys); already aligned tables take a positional fast path
+# - columns are compared vectorized: numbers with rtol/atol, timestamps with
+#   a tolerance in ms, everything else exactly (missing == missing)
+# - the report lists schema changes, missing/extra rows and, per column, the
+#   number of differing rows, the largest difference and sample keys
+# - the binary artifacts (event keys, event timeline, text and bitmap
+#   indexes) are compared per array by content hash (npz entries carry
+#   timestamps, the files themselves are not byte-stable)
+# - --backfill compares a month-partitioned backfill (backfill.py) against
+#   the single-shot run on the same extract and seed, table by table and
+#   array by array (outputs only the next 13 run builds are left out)
+#
+# The synthetic extract follows the real line's tempo (minute-scale gaps,
+# stops, interleaved parent coils, delays concentrated on a few areas) and
+# crosses a month boundary, so every DQ rule, the tempo and bottleneck
+# windows and the Weibull fits show up in the goldens.
+#
+# Goldens are the published CSVs gzipped (both sides are read with the same
+# reader, so dtypes match) plus golden.json with the extract size, the seed
+# and the array hashes. Compare mode uses the recorded size and seed; the
+# goldens are small enough to commit and are checked by tests/test_golden.py.
+# Re-record them only for an intended output change:
+#   python golden_harness.py --update             # record goldens
+#   python golden_harness.py                      # compare (exit 1 on diffs)
+#   python golden_harness.py --coils 100000 --golden-dir /tmp/golden_large --update
+#   python golden_harness.py --backfill --coils 3000   # backfill vs single-shot run
+
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import line_model
+from raw_scan import PROD_FILE, MAINT_FILE, FILTER_START, FILTER_END
+from backfill import quiet_stdout
+from publish import resolve_current
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COILS = 200
+DEFAULT_SEED = 2024
+GOLDEN_DIR = os.path.join(SCRIPTS_DIR, "tests", "golden")
+GOLDEN_META_FILE = "golden.json"
+OUTPUT_DIR = "output_tables"
+BACKFILL_OUTPUT_DIR = "backfill_tables"
+
+# Published tables: table name -> key columns (None: compare by position)
+GOLDEN_TABLES = {
+    "raw_production_filtered": None,
+    "raw_maintenance_filtered": None,
+    "dim_equipment": ["equipment_id"],
+    "dim_date_crew_schedule": ["production_date"],
+    "dim_parent_coil": ["parent_coil_id"],
+    "fact_production_coil": ["coil_id"],
+    "fact_maintenance_event": None,
+    "fact_equipment_reliability": None,
+    "dq_rule_metrics": ["rule_name"],
+    "fact_coil_operation_cycle": ["coil_id", "equipment_id"],
+    "fact_equipment_event_log": ["event_id"],
+    "fact_bottleneck_window": ["window_start", "equipment_id"],
+    "fact_tempo_rolling": ["coil_id", "scope", "window"],
+    "fact_equipment_event_log_changes": ["event_id"],
+}
+# Binary artifacts of a run (glob patterns relative to the run directory)
+GOLDEN_ARRAYS = ["event_log_keys.npz", "event_timeline.npz", "text_index/*.npz", "bitmap_index/*.npz"]
+# Built by the next 13 run, not by a backfill (left out of --backfill comparisons)
+BACKFILL_SKIPPED = {"fact_equipment_event_log_changes", "event_timeline.npz"}
+# Exported timestamp columns (parsed so --time-tol-ms applies)
+TIME_COLUMN_SUFFIXES = ("_ts", "_datetime")
+TIME_COLUMNS = {"window_start", "window_end", "Start", "Production Date"}
+
+SAMPLE_KEYS = 3
+REPORT_COLUMNS = ["table", "kind", "column", "rows", "max_abs_diff", "sample_keys"]
+
+# Synthetic extract tempo (the real line: median gap 10 min, 5% of gaps over
+# 30 min, a few stops over 6 h); starts two days before a month boundary so
+# the goldens span two month partitions
+EXTRACT_START = "2024-05-30 06:00"
+GAP_MEAN_MIN = 11.0
+GAP_SHAPE = 3.0
+STOP_SHARE = 0.04
+STOP_RANGE_MIN = (30, 180)
+LONG_STOP_SHARE = 0.004
+LONG_STOP_RANGE_MIN = (360, 2_000)
+INTERLEAVED_SHARE = 0.01
+COILS_PER_DELAY = 10
+
+# Synthetic extract vocabulary
+PRIME_TYPES = ["HL", "HM", "98", "71", "72"]
+SCRAP_TYPES = ["HX", "HY", "HZ"]
+SUPPORT_AREAS = ["Crane 478", "General", "Services"]
+DELAY_CATEGORIES = ["Mechanical (M)", "Electrical Systems (C )", "Operational (O)"]
+
+
+def make_extract(work_dir: str, n_coils: int, seed: int = DEFAULT_SEED, start: str = EXTRACT_START):
+    """
+    Write a reproducible raw production and maintenance extract in the MES
+    export format (same column names and date formats as the real files).
+    Completions follow the real line's tempo from start on (minute-scale gaps,
+    occasional stops and rare long ones), compressed to fit the analysis
+    window for very large extracts.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(work_dir, exist_ok=True)
+
+    window_start = pd.Timestamp(start)
+    window_min = int((pd.Timestamp(FILTER_END) - window_start).total_seconds() // 60)
+
+    # Completion gaps (minutes, ties allowed): gamma with mean GAP_MEAN_MIN plus stops
+    gap_min = rng.gamma(GAP_SHAPE, GAP_MEAN_MIN / GAP_SHAPE, n_coils)
+    is_stop = rng.random(n_coils) < STOP_SHARE
+    gap_min[is_stop] += rng.uniform(*STOP_RANGE_MIN, is_stop.sum())
+    # At least one long stop (> 6 h: the completion gap rule) in every extract
+    is_long_stop = rng.random(n_coils) < LONG_STOP_SHARE
+    is_long_stop[n_coils // 2] = True
+    gap_min[is_long_stop] += rng.uniform(*LONG_STOP_RANGE_MIN, is_long_stop.sum())
+    completion_min = np.cumsum(gap_min)
+    completion_min = np.floor(completion_min * min(1.0, (window_min - 1) / completion_min[-1])).astype(np.int64)
+    completion = window_start + pd.to_timedelta(completion_min, unit="min")
+    span_min = int(completion_min[-1]) + 1
+
+    # Parent coils: consecutive runs of pieces; a few pieces complete after the
+    # next parent has started (interleaved parents, negative parent gaps)
+    parent_no = np.cumsum(rng.random(n_coils) < 0.55)
+    late_piece = (rng.random(n_coils) < INTERLEAVED_SHARE) & (parent_no > 1)
+    parent_no[late_piece] -= 1
+    piece_no = pd.Series(parent_no).groupby(parent_no).cumcount().to_numpy()
+    cid = 7_000_000 + parent_no
+
+    types = np.array(PRIME_TYPES + SCRAP_TYPES)[
+        np.where(rng.random(n_coils) < 0.9,
+                 rng.integers(0, len(PRIME_TYPES), n_coils),
+                 len(PRIME_TYPES) + rng.integers(0, len(SCRAP_TYPES), n_coils))
+    ]
+    seconds_of_day = (completion.hour * 60 + completion.minute).to_numpy() * 60 + rng.integers(0, 60, n_coils)
+
+    production = pd.DataFrame({
+        "Production Date": completion.strftime("%m/%d/%y %H:%M"),
+        "CID": cid,
+        "UID": [f"{c}_{p}" for c, p in zip(cid, piece_no)],
+        "Thickess": rng.choice([1.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0], n_coils),
+        "Width": rng.choice([1000.0, 1236.0, 1300.0, 1350.0, 1400.0, 1550.0], n_coils),
+        "Mass out tons": np.round(rng.uniform(0.5, 30.0, n_coils), 2),
+        "Type": types,
+        "Hours": [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds_of_day],
+        "Grade": rng.choice(["AC2 31", "CS 10", "HS 40"], n_coils),
+        "NextProcess": rng.choice([11, 13, 21], n_coils),
+        "Cast": rng.integers(1, 9, n_coils),
+        "Slab": rng.integers(1, 20, n_coils),
+    })
+    production.to_csv(os.path.join(work_dir, PROD_FILE), index=False)
+
+    # Maintenance over the same period: line stations (numbered sub areas) and support areas
+    n_events = max(n_coils // COILS_PER_DELAY, 20)
+    areas = np.array(list(line_model.DURATION_RANGES) + SUPPORT_AREAS)
+    # Delays concentrate on a few areas, as on the real line (Zipf-like weights)
+    area_weights = 1.0 / np.arange(1, len(areas) + 1)
+    area_idx = rng.permutation(len(areas))[rng.choice(len(areas), n_events, p=area_weights / area_weights.sum())]
+    start = window_start + pd.to_timedelta(np.sort(rng.integers(0, max(span_min // 5, 1), n_events)) * 5, unit="min")
+    hours = np.round(rng.choice([1, 2, 3, 4, 6, 9, 12, 18, 24], n_events) / 12, 3)
+    maintenance = pd.DataFrame({
+        "Start": start.strftime("%m/%d/%y %H:%M"),
+        "Hierachy": [f"SS{100 + i}*G" for i in area_idx],
+        "Decription": [f"Synthetic delay {i}" for i in range(n_events)],
+        "Duration": [f"{int(h * 60) // 60:02d}:{int(h * 60) % 60:02d}:00" for h in hours],
+        "Day": start.strftime("%d-%b"),
+        "Crew": rng.integers(1, 5, n_events),
+        "Shifts": rng.choice(["Caiphus", "Gerhard", "David", "Christo"], n_events),
+        "Time (Hours)": hours,
+        "Reasponsible": "G",
+        "Responsible": rng.choice(DELAY_CATEGORIES, n_events),
+        "Category": rng.choice(DELAY_CATEGORIES, n_events),
+        "Delay Type": rng.choice(["Internal delays", "External delays"], n_events),
+        "Area": "Temper Line (1)",
+        "Sub Area": [f"{a} ({n})" for a, n in zip(areas[area_idx], rng.integers(1, 9, n_events))],
+    })
+    maintenance.to_csv(os.path.join(work_dir, MAINT_FILE), index=False)
+
+
+def run_pipeline(work_dir: str, seed: int = DEFAULT_SEED, verbose: bool = False, concurrent: list = None):
+    """
+    Stages 01-13 on the extract in work_dir (fresh export directory; stages in
+    concurrent run side by side as with pipeline.py --concurrent); returns the
+    published run directory and the stage namespace
+    """
+    from pipeline import load_artifact, run_stages
+
+    artifact, _ = load_artifact()
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        # A previous export would turn the event log change set into a diff
+        shutil.rmtree(OUTPUT_DIR, ignore_errors=True)
+        with quiet_stdout(verbose):
+            namespace = run_stages(artifact, seed=seed, concurrent=concurrent)
+        return os.path.abspath(resolve_current(OUTPUT_DIR)), namespace
+    finally:
+        os.chdir(previous_dir)
+
+
+def run_backfill_pipeline(work_dir: str, seed: int = DEFAULT_SEED, verbose: bool = False) -> str:
+    """
+    Month-partitioned backfill on the extract in work_dir (fresh export
+    directory next to run_pipeline's); returns the published run directory
+    """
+    from backfill import run_backfill
+
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(work_dir)
+        shutil.rmtree(BACKFILL_OUTPUT_DIR, ignore_errors=True)
+        with quiet_stdout(verbose):
+            run_dir = run_backfill(BACKFILL_OUTPUT_DIR, seed=seed, verbose=verbose)
+        return os.path.abspath(run_dir)
+    finally:
+        os.chdir(previous_dir)
+
+
+def read_table(path: str) -> pd.DataFrame:
+    """An exported CSV (plain or gzipped), timestamp columns parsed"""
+    table_df = pd.read_csv(path)
+    for col in table_df.columns:
+        if col in TIME_COLUMNS or col.endswith(TIME_COLUMN_SUFFIXES):
+            table_df[col] = pd.to_datetime(table_df[col], format="ISO8601")
+    return table_df
+
+
+def read_run_tables(run_dir: str) -> dict:
+    return {
+        name: read_table(os.path.join(run_dir, f"{name}.csv"))
+        for name in GOLDEN_TABLES
+        if os.path.exists(os.path.join(run_dir, f"{name}.csv"))
+    }
+
+
+def array_hashes(run_dir: str) -> dict:
+    """sha256 per array of the run's npz artifacts ("<file>:<array>" -> hex digest)"""
+    hashes = {}
+    for pattern in GOLDEN_ARRAYS:
+        for path in sorted(glob.glob(os.path.join(run_dir, pattern))):
+            rel_path = os.path.relpath(path, run_dir).replace(os.sep, "/")
+            with np.load(path, allow_pickle=False) as arrays:
+                for name in sorted(arrays.files):
+                    values = np.ascontiguousarray(arrays[name])
+                    digest = hashlib.sha256(f"{values.dtype.str}{values.shape}".encode("utf-8"))
+                    digest.update(values.tobytes())
+                    hashes[f"{rel_path}:{name}"] = digest.hexdigest()
+    return hashes
+
+
+def save_goldens(run_dir: str, golden_dir: str, n_coils: int, seed: int):
+    """Gzipped copies of the published tables (mtime 0: stable bytes) and golden.json"""
+    os.makedirs(golden_dir, exist_ok=True)
+    for name in GOLDEN_TABLES:
+        with open(os.path.join(run_dir, f"{name}.csv"), "rb") as src, \
+                open(os.path.join(golden_dir, f"{name}.csv.gz"), "wb") as raw, \
+                gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=9, mtime=0) as dst:
+            shutil.copyfileobj(src, dst)
+    meta = {"coils": n_coils, "seed": seed, "arrays": array_hashes(run_dir)}
+    with open(os.path.join(golden_dir, GOLDEN_META_FILE), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+
+
+def load_golden_meta(golden_dir: str) -> dict:
+    path = os.path.join(golden_dir, GOLDEN_META_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def load_goldens(golden_dir: str) -> dict:
+    return {
+        name: read_table(os.path.join(golden_dir, f"{name}.csv.gz"))
+        for name in GOLDEN_TABLES
+        if os.path.exists(os.path.join(golden_dir, f"{name}.csv.gz"))
+    }
+
+
+def _row_keys(frame: pd.DataFrame, keys: list) -> pd.Index:
+    """Key columns, plus an occurrence number only when keys repeat"""
+    if not keys:
+        return pd.RangeIndex(len(frame), name="_row")
+    key_frame = frame[keys].reset_index(drop=True)
+    if len(keys) == 1:
+        index = pd.Index(key_frame[keys[0]].to_numpy(), name=keys[0])
+    else:
+        index = pd.MultiIndex.from_frame(key_frame)
+    if index.is_unique:
+        return index
+    occurrence = key_frame.groupby(keys, sort=False, dropna=False).cumcount().to_numpy()
+    return pd.MultiIndex.from_arrays(
+        [key_frame[k].to_numpy() for k in keys] + [occurrence], names=keys + ["_occurrence"]
+    )
+
+
+def align_rows(golden: pd.DataFrame, current: pd.DataFrame, keys: list):
+    """
+    Positions of matching rows in golden and current, plus the keys of
+    golden-only and current-only rows.
+    """
+    g_keys, c_keys = _row_keys(golden, keys), _row_keys(current, keys)
+    if g_keys.equals(c_keys):
+        positions = np.arange(len(golden))
+        return positions, positions, g_keys[:0], c_keys[:0]
+
+    common = g_keys.intersection(c_keys, sort=False)
+    return (
+        g_keys.get_indexer(common), c_keys.get_indexer(common),
+        g_keys.difference(c_keys, sort=False), c_keys.difference(g_keys, sort=False),
+    )
+
+
+def compare_column(golden: pd.Series, current: pd.Series,
+                   rtol: float, atol: float, time_tol_ms: float):
+    """Mismatch mask and largest absolute difference (None for exact kinds)"""
+    if pd.api.types.is_datetime64_any_dtype(golden) and pd.api.types.is_datetime64_any_dtype(current):
+        g = golden.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        c = current.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        g_null, c_null = g == np.iinfo(np.int64).min, c == np.iinfo(np.int64).min
+        both = ~g_null & ~c_null
+        diff_ms = np.where(both, np.abs(g - c), 0) / 1e6
+        mismatch = (g_null != c_null) | (diff_ms > time_tol_ms)
+        return mismatch, float(diff_ms.max()) if len(diff_ms) else 0.0
+
+    numeric = (
+        pd.api.types.is_numeric_dtype(golden) and pd.api.types.is_numeric_dtype(current)
+        and not isinstance(golden.dtype, pd.CategoricalDtype)
+    )
+    if numeric:
+        g = golden.to_numpy(dtype=np.float64, na_value=np.nan)
+        c = current.to_numpy(dtype=np.float64, na_value=np.nan)
+        mismatch = ~np.isclose(c, g, rtol=rtol, atol=atol, equal_nan=True)
+        with np.errstate(invalid="ignore"):
+            diff = np.abs(g - c)
+        return mismatch, float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+
+    g = golden.to_numpy(dtype=object)
+    c = current.to_numpy(dtype=object)
+    g_null, c_null = pd.isna(g), pd.isna(c)
+    mismatch = (g_null != c_null) | (~g_null & ~c_null & (g != c))
+    return mismatch, None
+
+
+def diff_table(name: str, golden: pd.DataFrame, current: pd.DataFrame, keys: list,
+               rtol: float = 1e-9, atol: float = 1e-9, time_tol_ms: float = 0.0) -> list:
+    """Findings for one table (empty list: identical within tolerance)"""
+    findings = []
+
+    def finding(kind, column=None, rows=0, max_diff=None, sample=None):
+        findings.append({
+            "table": name, "kind": kind, "column": column, "rows": int(rows),
+            "max_abs_diff": max_diff, "sample_keys": sample,
+        })
+
+    for col in golden.columns.difference(current.columns, sort=False):
+        finding("column_missing", col)
+    for col in current.columns.difference(golden.columns, sort=False):
+        finding("column_added", col)
+    shared = [col for col in golden.columns if col in current.columns]
+    for col in shared:
+        if golden[col].dtype != current[col].dtype:
+            finding("dtype_changed", col, sample=f"{golden[col].dtype} -> {current[col].dtype}")
+
+    if keys and not all(k in shared for k in keys):
+        keys = None
+    g_pos, c_pos, missing, extra = align_rows(golden, current, keys)
+    if len(missing):
+        finding("rows_missing", rows=len(missing), sample=list(missing[:SAMPLE_KEYS]))
+    if len(extra):
+        finding("rows_added", rows=len(extra), sample=list(extra[:SAMPLE_KEYS]))
+
+    g_rows = golden.iloc[g_pos].reset_index(drop=True)
+    c_rows = current.iloc[c_pos].reset_index(drop=True)
+    for col in shared:
+        mismatch, max_diff = compare_column(g_rows[col], c_rows[col], rtol, atol, time_tol_ms)
+        if mismatch.any():
+            bad = np.flatnonzero(mismatch)[:SAMPLE_KEYS]
+            key_rows = g_rows[keys].iloc[bad].to_numpy().tolist() if keys else g_pos[bad].tolist()
+            sample = [
+                (key if not keys or len(keys) > 1 else key[0], g_rows[col].iloc[i], c_rows[col].iloc[i])
+                for key, i in zip(key_rows, bad)
+            ]
+            finding("values_differ", col, mismatch.sum(), max_diff, sample)
+    return findings
+
+
+def compare_tables(goldens: dict, tables: dict, rtol: float = 1e-9, atol: float = 1e-9,
+                   time_tol_ms: float = 0.0) -> pd.DataFrame:
+    """Findings for every table as one report frame"""
+    findings = []
+    for name, keys in GOLDEN_TABLES.items():
+        if name not in goldens:
+            findings.append({"table": name, "kind": "golden_missing", "column": None, "rows": 0,
+                             "max_abs_diff": None, "sample_keys": None})
+            continue
+        if name not in tables:
+            findings.append({"table": name, "kind": "table_missing", "column": None, "rows": 0,
+                             "max_abs_diff": None, "sample_keys": None})
+            continue
+        findings += diff_table(name, goldens[name], tables[name], keys, rtol, atol, time_tol_ms)
+    return pd.DataFrame(findings, columns=REPORT_COLUMNS)
+
+
+def compare_arrays(golden_hashes: dict, hashes: dict) -> pd.DataFrame:
+    """Findings for the npz artifacts (one row per changed, missing or added array)"""
+    findings = []
+    for key in sorted(set(golden_hashes) | set(hashes)):
+        if key not in hashes:
+            kind = "array_missing"
+        elif key not in golden_hashes:
+            kind = "array_added"
+        elif hashes[key] != golden_hashes[key]:
+            kind = "array_changed"
+        else:
+            continue
+        path, array = key.split(":", 1)
+        findings.append({"table": path, "kind": kind, "column": array, "rows": 0,
+                         "max_abs_diff": None, "sample_keys": None})
+    return pd.DataFrame(findings, columns=REPORT_COLUMNS)
+
+
+def compare_run(run_dir: str, golden_dir: str = GOLDEN_DIR, rtol: float = 1e-9, atol: float = 1e-9,
+                time_tol_ms: float = 0.0) -> pd.DataFrame:
+    """Findings for a published run against the goldens (empty: identical within tolerance)"""
+    meta = load_golden_meta(golden_dir)
+    findings = [
+        compare_tables(load_goldens(golden_dir), read_run_tables(run_dir), rtol, atol, time_tol_ms),
+        compare_arrays(meta.get("arrays", {}), array_hashes(run_dir)),
+    ]
+    findings = [report for report in findings if not report.empty]
+    return pd.concat(findings, ignore_index=True) if findings else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+
+def compare_backfill(single_dir: str, backfill_dir: str, rtol: float = 1e-9, atol: float = 1e-9,
+                     time_tol_ms: float = 0.0) -> pd.DataFrame:
+    """
+    Findings for a backfill run against a single-shot run on the same extract
+    and seed (empty: partition equivalent); the single-shot run takes the
+    goldens' place, BACKFILL_SKIPPED outputs are left out
+    """
+    findings = [
+        compare_tables(read_run_tables(single_dir), read_run_tables(backfill_dir), rtol, atol, time_tol_ms),
+        compare_arrays(array_hashes(single_dir), array_hashes(backfill_dir)),
+    ]
+    findings = [report[~report["table"].isin(BACKFILL_SKIPPED)] for report in findings]
+    findings = [report for report in findings if not report.empty]
+    return pd.concat(findings, ignore_index=True) if findings else pd.DataFrame(columns=REPORT_COLUMNS)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Golden-output regression harness")
+    parser.add_argument("--update", action="store_true", help="Record the current outputs as goldens")
+    parser.add_argument("--coils", type=int, default=None,
+                        help=f"Synthetic extract size (default: the goldens' own, {DEFAULT_COILS} when recording)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help=f"Extract and generator seed (default: the goldens' own, {DEFAULT_SEED} when recording)")
+    parser.add_argument("--golden-dir", default=GOLDEN_DIR)
+    parser.add_argument("--work-dir", default=None, help="Keep the extract and export here (default: a temporary directory)")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--atol", type=float, default=1e-9)
+    parser.add_argument("--time-tol-ms", type=float, default=0.0)
+    parser.add_argument("--report", default=None, help="Write the findings to this CSV")
+    parser.add_argument("--concurrent", default=None, help="Run these tail stages in parallel processes (e.g. 12,13)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Compare a month-partitioned backfill against the single-shot run instead of the goldens")
+    parser.add_argument("--verbose", action="store_true", help="Show the stage scripts' output")
+    args = parser.parse_args()
+
+    if args.update and args.backfill:
+        parser.error("--backfill compares two runs; it does not record goldens")
+
+    meta = {} if args.update else load_golden_meta(args.golden_dir)
+    n_coils = args.coils or meta.get("coils", DEFAULT_COILS)
+    seed = args.seed if args.seed is not None else meta.get("seed", DEFAULT_SEED)
+
+    with tempfile.TemporaryDirectory(prefix="golden_work_") as temp_dir:
+        work_dir = args.work_dir or temp_dir
+
+        started = time.perf_counter()
+        make_extract(work_dir, n_coils, seed)
+        print(f"Synthetic extract: {n_coils:,} coils, seed {seed} ({time.perf_counter() - started:.1f}s)")
+
+        started = time.perf_counter()
+        concurrent = [number.strip().zfill(2) for number in args.concurrent.split(",")] if args.concurrent else None
+        run_dir, _ = run_pipeline(work_dir, seed, args.verbose, concurrent)
+        print(f"Pipeline 01-13: {time.perf_counter() - started:.1f}s")
+
+        if args.update:
+            save_goldens(run_dir, args.golden_dir, n_coils, seed)
+            print(f"✓ Goldens recorded in {args.golden_dir}/ ({len(GOLDEN_TABLES)} tables, "
+                  f"{len(array_hashes(run_dir))} arrays)")
+            sys.exit(0)
+
+        if args.backfill:
+            started = time.perf_counter()
+            backfill_dir = run_backfill_pipeline(work_dir, seed, args.verbose)
+            print(f"Backfill: {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        if args.backfill:
+            report = compare_backfill(run_dir, backfill_dir, args.rtol, args.atol, args.time_tol_ms)
+        else:
+            report = compare_run(run_dir, args.golden_dir, args.rtol, args.atol, args.time_tol_ms)
+        print(f"Diff: {time.perf_counter() - started:.1f}s")
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+
+    reference = "the single-shot run" if args.backfill else "the goldens"
+    compared = set(GOLDEN_TABLES) - BACKFILL_SKIPPED if args.backfill else set(GOLDEN_TABLES)
+    if report.empty:
+        print(f"✓ All {len(compared)} tables and the index arrays match {reference}")
+        sys.exit(0)
+
+    with pd.option_context("display.width", 200, "display.max_colwidth", 80):
+        print(report.to_string(index=False))
+    print(f"\n✗ {report['table'].nunique()} table(s) or artifact(s) differ from {reference}")
+    sys.exit(1)
@@ -0,0 +1,98 @@
+# Temper line model parameters shared by the pipeline stages and tools
+# (operation generator in 08/09, scenario runner, calibration)
+
+import os
+import json
+
+# Base operation durations (seconds) before adjustments
+DURATION_RANGES = {
+    "Entry Coil Car": (40, 80),
+    "Coil Prep Sattion": (30, 60),
+    "Decoiler": (60, 120),
+    "Entry Guide Table": (10, 20),
+    "Entry SnubberHold Down & Pressure Rolls": (20, 40),
+    "Entry & Exit Feed Table": (20, 40),
+    "Pinch Roll & Bending Unit": (30, 60),
+    "Flattener, Pinch & Deflator Rolls": (40, 90),
+    "Temper Mill Unit": (120, 240),
+    "Crop Shear": (20, 40),
+    "Recoiler": (60, 120),
+    "First Conveyor": (10, 20),
+    "Second Conveyor": (10, 20),
+    "Scale M65 (conveyor)": (40, 90),
+    "Delivery Conveyor": (20, 40),
+    "Exit Coil Car": (60, 120),
+    "Strapping Machine": (40, 80),
+}
+
+DEFAULT_RANGE = (20, 40)
+
+# Shift performance multipliers
+SHIFT_MULTIPLIER = {
+    "A": 1.05,
+    "B": 1.00,
+    "C": 0.95,
+    "D": 1.00,
+}
+
+# Modelled constraint equipment (slower operation and longer queues)
+MODELLED_CONSTRAINTS = {
+    "Temper Mill Unit": True,
+    "Decoiler": True,
+    "Recoiler": True,
+    "Exit Coil Car": True,
+    "Crop Shear": True,
+    "Scale M65 (conveyor)": True,
+}
+
+BOTTLENECK_DURATION_FACTOR = 1.10
+
+# Product mix bands (thickness mm × width mm)
+THIN_MAX_MM = 2.0
+NARROW_MAX_MM = 1300
+THICK_MIN_MM = 3.0
+WIDE_MIN_MM = 1400
+
+# Band grid: right-closed bins between breakpoints (≤2.0 | 2.0–3.0 | >3.0 mm),
+# rows = thickness bin, columns = width bin
+THICKNESS_BREAKPOINTS_MM = [THIN_MAX_MM, THICK_MIN_MM]
+WIDTH_BREAKPOINTS_MM = [NARROW_MAX_MM, WIDE_MIN_MM]
+BAND_GRID = [
+    ["thin_narrow", "other", "other"],
+    ["other", "other", "other"],
+    ["other", "other", "thick_wide"],
+]
+
+# Coils with missing thickness or width
+UNKNOWN_BAND = "unknown"
+
+# Speed multiplier range per product band
+MIX_FACTOR_RANGES = {
+    "thin_narrow": (0.5, 0.7),
+    "thick_wide": (1.1, 1.3),
+    "other": (0.9, 1.1),
+    UNKNOWN_BAND: (1.0, 1.0),
+}
+
+# Line starvation: share of coils that wait before entry and the mean wait
+# (exponential). The generator anchors to real completions, so it does not draw
+# these; the scenario runner does, and calibration.py fits them
+IDLE_PROBABILITY = 0.0
+IDLE_MEAN_MIN = 0.0
+
+# Calibrated line model (calibration.py): when LINE_MODEL_FILE names a
+# versioned line-model file, its fitted ranges and multipliers replace the
+# defaults above
+LINE_MODEL_FILE = os.environ.get("LINE_MODEL_FILE") or None
+
+if LINE_MODEL_FILE:
+    with open(LINE_MODEL_FILE, encoding="utf-8") as _fh:
+        _fitted = json.load(_fh)["parameters"]
+    DURATION_RANGES = {name: tuple(r) for name, r in _fitted["DURATION_RANGES"].items()}
+    SHIFT_MULTIPLIER = dict(_fitted["SHIFT_MULTIPLIER"])
+    MIX_FACTOR_RANGES = {band: tuple(_fitted["MIX_FACTOR_RANGES"].get(band, r))
+                         for band, r in MIX_FACTOR_RANGES.items()}
+    BOTTLENECK_DURATION_FACTOR = _fitted["BOTTLENECK_DURATION_FACTOR"]
+    if "IDLE" in _fitted:
+        IDLE_PROBABILITY = _fitted["IDLE"]["probability"]
+        IDLE_MEAN_MIN = _fitted["IDLE"]["mean_min"]
@@ -0,0 +1,83 @@
+# Synthetic operation model shared by the generator (08/09), the scenario
+# runner and the calibration
+#
+# - station duration (seconds) = U(base range) × U(product band range)
+#   × crew multiplier × constraint factor, from unit-uniform draws
+# - the generator's draws are keyed by coil (coil_unit_draws): splitmix64 of
+#   (coil_id hash, seed, draw number), so a coil gets the same durations in
+#   every run, month partition, sample or stream batch
+# - a coil's operations run back to back and a station serves one coil at a
+#   time, so consecutive completions are at least no_wait_spacing apart
+#   (no-wait flow line); starved periods add an idle delay before entry
+#   (IDLE_PROBABILITY × exponential IDLE_MEAN_MIN in line_model.py)
+
+import numpy as np
+import pandas as pd
+
+from product_bands import scale_mix_factors
+
+SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def coil_unit_draws(coil_ids, n_draws: int, seed: int = 0) -> np.ndarray:
+    """
+    Unit-uniform draws (coils × n_draws) that depend only on each coil's id,
+    the seed and the draw number: a coil's synthetic RUN / IDLE events (and
+    their event_id) are stable while the extract only grows
+    """
+    keys = pd.util.hash_pandas_object(
+        pd.Series(np.asarray(coil_ids), dtype=object).astype(str), index=False
+    ).to_numpy()
+    keys = keys ^ np.uint64(seed * int(SPLITMIX_GAMMA) % 2**64)
+    z = keys[:, None] + np.arange(1, n_draws + 1, dtype=np.uint64) * SPLITMIX_GAMMA
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+
+def coil_duration_units(coil_ids, n_stations: int, seed: int = 0) -> np.ndarray:
+    """Keyed unit draws laid out coils × (base, band) × stations, as the generator uses them"""
+    return coil_unit_draws(coil_ids, 2 * n_stations, seed).reshape(-1, 2, n_stations)
+
+
+def operation_durations(unit: np.ndarray, ranges, mix_factor_ranges: dict, band_codes,
+                        shift_factor, constraint_factor) -> np.ndarray:
+    """
+    Operation durations (seconds, coils × stations) from unit draws
+    (coils × 2 × stations): base range per station, band range per coil,
+    shift factor per coil, constraint factor per station
+    """
+    ranges = np.asarray(ranges, dtype=np.float64)
+    base = ranges[:, 0] + (ranges[:, 1] - ranges[:, 0]) * unit[:, 0]
+    mix = scale_mix_factors(np.asarray(band_codes), unit[:, 1], mix_factor_ranges)
+    return base * mix * np.asarray(shift_factor, dtype=np.float64)[:, None] * constraint_factor
+
+
+def no_wait_spacing(durations: np.ndarray, previous: np.ndarray = None) -> np.ndarray:
+    """
+    Shortest completion-to-completion time of each coil after the one before
+    it (seconds, durations are ... × coils × stations): max over stations k of
+    the coil's work from k on minus the previous coil's work after k. The
+    first coil follows previous (the last coil of an earlier batch) or an
+    empty line (its whole cycle).
+    """
+    remaining = np.cumsum(durations[..., ::-1], axis=-1)[..., ::-1]
+    after = np.concatenate([remaining[..., 1:], np.zeros_like(remaining[..., :1])], axis=-1)
+    if previous is None:
+        first = np.zeros_like(after[..., :1, :])
+    else:
+        prev_remaining = np.cumsum(np.asarray(previous)[..., ::-1], axis=-1)[..., ::-1]
+        first = np.broadcast_to(
+            np.concatenate([prev_remaining[..., 1:], np.zeros_like(prev_remaining[..., :1])], axis=-1),
+            after[..., :1, :].shape,
+        )
+    prev_after = np.concatenate([first, after[..., :-1, :]], axis=-2)
+    return (remaining - prev_after).max(axis=-1)
+
+
+def idle_delays(unit, exponential, probability, mean_min) -> np.ndarray:
+    """Idle seconds before entry: a share of coils waits an exponential time with the given mean"""
+    probability = np.asarray(probability, dtype=np.float64)
+    mean_sec = 60.0 * np.asarray(mean_min, dtype=np.float64)
+    return np.where(np.asarray(unit) < probability, np.asarray(exponential) * mean_sec, 0.0)
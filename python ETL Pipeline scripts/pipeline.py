@@ -0,0 +1,238 @@
+# Pipeline command line entry point (fast startup)
+#
+# Runs the numbered stage scripts (01-13) in one shared namespace, the
+# month-partitioned backfill (backfill.py), the streaming mode
+# (stream_service.py) or a stratified-sample preview of the validation
+# metrics (preview.py), optionally with a calibrated line-model file
+# (calibration.py). Read-only tail stages (12 validation, 13 export) can run
+# concurrently in separate processes on shared-memory tables
+# (stage_handoff.py). Startup stays cheap for scheduler health checks and
+# small runs:
+# - only the standard library is imported up front; pandas and the pipeline
+#   modules are loaded when a stage or the backfill actually runs
+# - the stage list, the compiled stage code and the line model / extract
+#   settings are cached in one binary artifact (__pycache__/pipeline_cli.*.bin)
+#   that is rebuilt only when one of its source files changes
+# - --list-stages and --dry-run never import pandas
+#
+# Usage (in the directory holding the raw extracts):
+#   python pipeline.py --list-stages
+#   python pipeline.py --dry-run --until 10
+#   python pipeline.py --seed 2024
+#   python pipeline.py --backfill --seed 2024
+#   python pipeline.py --stream
+#   python pipeline.py --preview --fraction 0.05 --seed 2024
+#   python pipeline.py --line-model line_models/line_model_v001.json --seed 2024
+#   python pipeline.py --concurrent 12,13 --seed 2024
+
+import os
+import re
+import sys
+import time
+import pickle
+import marshal
+import argparse
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(
+    SCRIPTS_DIR, "__pycache__", f"pipeline_cli.{sys.implementation.cache_tag}.bin"
+)
+CACHE_VERSION = 1
+
+# Configuration-only modules (no heavy imports at module level)
+CONFIG_MODULES = ["line_model", "raw_scan"]
+
+STAGE_FILE = re.compile(r"^(\d\d)_\w+\.py$")
+
+
+def stage_paths() -> list:
+    """Numbered stage scripts in execution order"""
+    return sorted(
+        os.path.join(SCRIPTS_DIR, name) for name in os.listdir(SCRIPTS_DIR) if STAGE_FILE.match(name)
+    )
+
+
+def stage_title(source: str) -> str:
+    """First descriptive comment line of a stage script"""
+    for line in source.splitlines():
+        text = line.lstrip("# ").strip()
+        if line.startswith("#") and text and set(text) != {"="}:
+            return text
+    return ""
+
+
+def source_stamps(paths: list) -> dict:
+    stamps = {}
+    for path in paths:
+        st = os.stat(path)
+        stamps[os.path.basename(path)] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+
+def module_config(name: str) -> dict:
+    """Upper-case settings of a configuration module"""
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    module = __import__(name)
+    return {key: value for key, value in vars(module).items() if key.isupper()}
+
+
+def build_artifact(stages: list, stamps: dict) -> dict:
+    """Compile every stage script and snapshot the configuration modules"""
+    artifact = {"version": CACHE_VERSION, "stamps": stamps, "stages": [], "code": {}, "config": {}}
+    for path in stages:
+        with open(path, encoding="utf-8") as fh:
+            source = fh.read()
+        number = os.path.basename(path)[:2]
+        artifact["stages"].append({
+            "number": number, "file": os.path.basename(path), "title": stage_title(source),
+        })
+        artifact["code"][number] = marshal.dumps(compile(source, path, "exec"))
+    for name in CONFIG_MODULES:
+        artifact["config"][name] = module_config(name)
+    return artifact
+
+
+def load_artifact(rebuild: bool = False):
+    """
+    Cached artifact if every source is unchanged (mtime and size), otherwise
+    a freshly built one (written back best effort). Returns (artifact, cached).
+    """
+    stages = stage_paths()
+    sources = stages + [os.path.join(SCRIPTS_DIR, f"{name}.py") for name in CONFIG_MODULES]
+    if os.environ.get("LINE_MODEL_FILE"):
+        sources.append(os.environ["LINE_MODEL_FILE"])
+    stamps = source_stamps(sources)
+
+    if not rebuild and os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, "rb") as fh:
+                artifact = pickle.load(fh)
+            if artifact.get("version") == CACHE_VERSION and artifact.get("stamps") == stamps:
+                return artifact, True
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+            pass
+
+    artifact = build_artifact(stages, stamps)
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        tmp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as fh:
+            pickle.dump(artifact, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, CACHE_FILE)
+    except OSError:
+        pass
+    return artifact, False
+
+
+def selected_stages(artifact: dict, until: str = None) -> list:
+    return [stage for stage in artifact["stages"] if until is None or stage["number"] <= until]
+
+
+def list_stages(artifact: dict):
+    for stage in artifact["stages"]:
+        print(f"  {stage['number']}  {stage['file']:40} {stage['title']}")
+
+
+def dry_run(artifact: dict, cached: bool, until: str = None):
+    """Run plan and effective settings (no data is read)"""
+    extract = artifact["config"]["raw_scan"]
+    model = artifact["config"]["line_model"]
+
+    print(f"Configuration artifact: {CACHE_FILE} ({'cached' if cached else 'rebuilt'})")
+    print("\nStages to run:")
+    for stage in selected_stages(artifact, until):
+        print(f"  {stage['number']}  {stage['file']:40} {stage['title']}")
+
+    print("\nRaw extracts (working directory):")
+    for key in ["PROD_FILE", "MAINT_FILE"]:
+        path = extract[key]
+        size = f"{os.path.getsize(path) / 1024 / 1024:.1f} MB" if os.path.exists(path) else "MISSING"
+        print(f"  {path:45} {size}")
+    print(f"  Window: {extract['FILTER_START']} to {extract['FILTER_END']} | "
+          f"scan chunk {extract['SCAN_CHUNK_ROWS']:,} rows")
+
+    print("\nLine model:" + (f" {model['LINE_MODEL_FILE']}" if model.get("LINE_MODEL_FILE") else ""))
+    print(f"  Stations with duration ranges: {len(model['DURATION_RANGES'])} (default {model['DEFAULT_RANGE']})")
+    print(f"  Modelled constraints: {sum(model['MODELLED_CONSTRAINTS'].values())} "
+          f"(duration factor {model['BOTTLENECK_DURATION_FACTOR']})")
+    print(f"  Shift multipliers: {model['SHIFT_MULTIPLIER']}")
+    print(f"  Product bands: {', '.join(model['MIX_FACTOR_RANGES'])}")
+    print(f"  Line idle before entry: {model['IDLE_PROBABILITY']:.0%} of coils, mean {model['IDLE_MEAN_MIN']:.1f} min")
+
+
+def run_stages(artifact: dict, until: str = None, seed: int = None, concurrent: list = None) -> dict:
+    """
+    Execute the stage scripts in one namespace; returns the namespace.
+    Stages listed in concurrent (they must only read earlier outputs) run
+    last, side by side in separate processes (stage_handoff.py).
+    """
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+
+    # Key of the per-coil operation draws (08): the same extract and seed give
+    # the same events, so an unchanged extract yields an empty change set
+    namespace = {"__name__": "__main__", "generator_seed": seed or 0}
+    stages = selected_stages(artifact, until)
+    parallel = [stage for stage in stages if stage["number"] in (concurrent or [])]
+    for stage in stages:
+        if stage in parallel:
+            continue
+        started = time.perf_counter()
+        exec(marshal.loads(artifact["code"][stage["number"]]), namespace)
+        print(f"\n##### {stage['file']} done in {time.perf_counter() - started:.2f}s\n")
+
+    if parallel:
+        from stage_handoff import run_concurrent_stages
+        run_concurrent_stages(namespace, [dict(stage, code=artifact["code"][stage["number"]]) for stage in parallel])
+    return namespace
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Temper line ETL pipeline")
+    parser.add_argument("--list-stages", action="store_true", help="List the stage scripts and exit")
+    parser.add_argument("--dry-run", action="store_true", help="Show the run plan and settings, read no data")
+    parser.add_argument("--until", default=None, help="Last stage number to run (e.g. 10)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Key of the per-coil operation draws (default 0: same extract, same events)")
+    parser.add_argument("--backfill", action="store_true", help="Month-partitioned run (backfill.py)")
+    parser.add_argument("--stream", action="store_true", help="Tail the extracts and extend the event log live (stream_service.py)")
+    parser.add_argument("--preview", action="store_true", help="Estimate the 12 metrics from a parent coil sample (preview.py)")
+    parser.add_argument("--fraction", type=float, default=None, help="Sampled share of parent coils for --preview")
+    parser.add_argument("--output-dir", default="output_tables", help="Publish directory for --backfill")
+    parser.add_argument("--line-model", default=None, help="Calibrated line-model file (calibration.py)")
+    parser.add_argument("--concurrent", default=None,
+                        help="Read-only tail stages to run in parallel processes on shared memory (e.g. 12,13)")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Recompile the configuration artifact")
+    args = parser.parse_args()
+
+    # Set before line_model is first imported (also inherited by worker processes)
+    if args.line_model:
+        os.environ["LINE_MODEL_FILE"] = os.path.abspath(args.line_model)
+
+    artifact, cached = load_artifact(rebuild=args.rebuild_cache)
+    until = args.until.zfill(2) if args.until else None
+
+    if args.list_stages:
+        list_stages(artifact)
+    elif args.dry_run:
+        dry_run(artifact, cached, until)
+    elif args.backfill:
+        if SCRIPTS_DIR not in sys.path:
+            sys.path.insert(0, SCRIPTS_DIR)
+        from backfill import run_backfill
+        run_backfill(args.output_dir, seed=args.seed)
+    elif args.stream:
+        if SCRIPTS_DIR not in sys.path:
+            sys.path.insert(0, SCRIPTS_DIR)
+        import asyncio
+        from stream_service import run_stream
+        asyncio.run(run_stream(seed=args.seed))
+    elif args.preview:
+        if SCRIPTS_DIR not in sys.path:
+            sys.path.insert(0, SCRIPTS_DIR)
+        from preview import PREVIEW_FRACTION, run_preview, print_report
+        print_report(run_preview(args.fraction or PREVIEW_FRACTION, seed=args.seed))
+    else:
+        concurrent = [number.strip().zfill(2) for number in args.concurrent.split(",")] if args.concurrent else None
+        run_stages(artifact, until, args.seed, concurrent)
@@ -0,0 +1,423 @@
+# Sharded multi-line execution: one pipeline run per line on a worker pool
+#
+# Plant manifest (JSON, data_dir relative to the manifest file):
+#   {"lines": [{"line_id": "TL1", "data_dir": "temper_1"},
+#              {"line_id": "HSM", "data_dir": "hot_strip"}]}
+# Each line directory holds that line's MES and maintenance extracts (file
+# names in raw_scan.py) and keeps its own output_tables/ publish tree and
+# equipment name map, exactly as a single-line run in that directory would:
+# the line equipment and crew rotation come from the line's own extracts.
+#
+# Shards: one per line running 01-13, or with by_month the month-partitioned
+# backfill of the line (backfill.py, bounded worker memory on long
+# histories). The months of one line stay in one shard: each month continues
+# from the previous month's boundary state.
+#
+# Workers:
+# - pool: local worker processes (ProcessPoolExecutor)
+# - queue: a directory queue (pending/ claimed/ done/). The coordinator writes
+#   one shard file per line; any worker that sees the directory claims shards
+#   by atomic rename (python plant_coordinator.py --worker --queue DIR), so
+#   workers can run on other nodes over a shared filesystem. local_workers
+#   starts that many queue workers next to the coordinator as a stand-in.
+#   A claim is a lease: the worker touches its claimed/ file every
+#   QUEUE_HEARTBEAT_SEC while the shard runs, and a claim not touched for
+#   QUEUE_LEASE_SEC (worker died or lost its node) is moved back to pending/
+#   by the coordinator or by any polling worker.
+#
+# Merge: once every shard is done, each line's published run is merged into
+# one plant run (publish.py layout under the plant output directory): every
+# table with line_id as first column (streamed as text, values unchanged),
+# plus plant_line_summary with per-line and plant-level totals (the lines run
+# side by side, so the plant's pieces_per_hour is the sum of the lines').
+#
+# Usage:
+#   python plant_coordinator.py --plant plant.json --output-dir plant_tables --workers 4 --seed 2024
+#   python plant_coordinator.py --plant plant.json --queue /shared/plant_queue --local-workers 2
+#   python plant_coordinator.py --worker --queue /shared/plant_queue
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+import contextlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from publish import open_staging, stage_table, stage_table_file, commit_run, load_manifest
+
+LINE_OUTPUT_DIR = "output_tables"
+PLANT_ID = "PLANT"
+LOG_DIR = "logs"
+QUEUE_DIRS = ["pending", "claimed", "done"]
+QUEUE_POLL_SEC = 1.0
+QUEUE_HEARTBEAT_SEC = 10.0
+QUEUE_LEASE_SEC = 120.0
+MERGE_CHUNK_ROWS = 250_000
+
+SUMMARY_COLUMNS = [
+    "line_id", "run_id", "coils", "parent_coils", "mass_out_tons", "prime_rate_pct",
+    "mean_cycle_min", "pieces_per_hour", "first_completion", "last_completion",
+    "station_run_hours", "station_idle_hours", "station_fault_hours", "fault_events", "run_share_pct",
+]
+
+
+def load_plant(path: str) -> list:
+    """Line entries of a plant manifest with absolute data directories"""
+    with open(path, encoding="utf-8") as fh:
+        lines = json.load(fh)["lines"]
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    line_ids = [line["line_id"] for line in lines]
+    duplicates = sorted({line_id for line_id in line_ids if line_ids.count(line_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate line_id in plant manifest: {duplicates}")
+    for line in lines:
+        line["data_dir"] = os.path.normpath(os.path.join(base_dir, line["data_dir"]))
+        if not os.path.isdir(line["data_dir"]):
+            raise ValueError(f"Line {line['line_id']}: data directory not found: {line['data_dir']}")
+    return lines
+
+
+def build_shards(lines: list, seed: int = None, by_month: bool = False) -> list:
+    """One shard per line (the same seed gives each line its standalone-run tables)"""
+    return [
+        {"shard_id": line["line_id"], "line_id": line["line_id"], "data_dir": line["data_dir"],
+         "seed": seed, "by_month": by_month}
+        for line in lines
+    ]
+
+
+def run_shard(shard: dict, log_dir: str) -> dict:
+    """
+    Run the pipeline for one line in its data directory (stage output goes
+    to <log_dir>/<shard_id>.log); returns the published run directory
+    """
+    started = time.perf_counter()
+    cwd = os.getcwd()
+    log_path = os.path.join(log_dir, f"{shard['shard_id']}.log")
+    try:
+        os.chdir(shard["data_dir"])
+        with open(log_path, "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+            if shard["by_month"]:
+                from backfill import run_backfill
+                run_dir = run_backfill(LINE_OUTPUT_DIR, seed=shard["seed"], verbose=True)
+            else:
+                from pipeline import load_artifact, run_stages
+                run_dir = run_stages(load_artifact()[0], seed=shard["seed"])["run_dir"]
+        run_dir = os.path.abspath(run_dir)
+    finally:
+        os.chdir(cwd)
+    return {"shard_id": shard["shard_id"], "line_id": shard["line_id"], "run_dir": run_dir,
+            "seconds": round(time.perf_counter() - started, 2), "log": log_path}
+
+
+# Directory queue (local stand-in for remote workers)
+
+def _write_json(path: str, payload: dict):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+    os.replace(tmp_path, path)
+
+
+def open_queue(queue_dir: str) -> str:
+    queue_dir = os.path.abspath(queue_dir)
+    for name in QUEUE_DIRS + [LOG_DIR]:
+        os.makedirs(os.path.join(queue_dir, name), exist_ok=True)
+    return queue_dir
+
+
+def enqueue(queue_dir: str, shards: list):
+    """Publish shard files to pending/ (a stale result of the same shard is removed first)"""
+    for shard in shards:
+        done_path = os.path.join(queue_dir, "done", f"{shard['shard_id']}.json")
+        if os.path.exists(done_path):
+            os.remove(done_path)
+        _write_json(os.path.join(queue_dir, "pending", f"{shard['shard_id']}.json"), shard)
+
+
+def claim_shard(queue_dir: str):
+    """Move the next pending shard to claimed/ (atomic rename: one worker wins); None when empty"""
+    for name in sorted(os.listdir(os.path.join(queue_dir, "pending"))):
+        if not name.endswith(".json"):
+            continue
+        claimed_path = os.path.join(queue_dir, "claimed", name)
+        try:
+            os.rename(os.path.join(queue_dir, "pending", name), claimed_path)
+            os.utime(claimed_path)
+            with open(claimed_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def requeue_stale_claims(queue_dir: str, lease_sec: float = QUEUE_LEASE_SEC) -> list:
+    """Move claims whose heartbeat is older than lease_sec back to pending/; returns their shard ids"""
+    requeued = []
+    now = time.time()
+    for name in sorted(os.listdir(os.path.join(queue_dir, "claimed"))):
+        claimed_path = os.path.join(queue_dir, "claimed", name)
+        try:
+            if not name.endswith(".json") or now - os.path.getmtime(claimed_path) < lease_sec:
+                continue
+            os.rename(claimed_path, os.path.join(queue_dir, "pending", name))
+        except FileNotFoundError:
+            continue
+        requeued.append(name[:-len(".json")])
+    return requeued
+
+
+@contextlib.contextmanager
+def heartbeat(claimed_path: str, interval: float = QUEUE_HEARTBEAT_SEC):
+    """Touch the claimed shard file every interval seconds while the block runs (renews the lease)"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(claimed_path)
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def queue_worker(queue_dir: str, idle_timeout: float = 0.0, lease_sec: float = QUEUE_LEASE_SEC) -> int:
+    """
+    Claim and run shards until the queue stays empty for idle_timeout seconds;
+    each result (or the failure traceback) goes to done/. Stale claims of
+    other workers are re-queued first. Returns shards run.
+    """
+    queue_dir = open_queue(queue_dir)
+    processed = 0
+    idle_since = time.monotonic()
+    while True:
+        requeue_stale_claims(queue_dir, lease_sec)
+        shard = claim_shard(queue_dir)
+        if shard is None:
+            if time.monotonic() - idle_since >= idle_timeout:
+                return processed
+            time.sleep(QUEUE_POLL_SEC)
+            continue
+
+        claimed_path = os.path.join(queue_dir, "claimed", f"{shard['shard_id']}.json")
+        try:
+            with heartbeat(claimed_path):
+                result = run_shard(shard, os.path.join(queue_dir, LOG_DIR))
+        except Exception:
+            result = {"shard_id": shard["shard_id"], "line_id": shard["line_id"], "error": traceback.format_exc()}
+        result["worker"] = f"{os.uname().nodename}:{os.getpid()}"
+        _write_json(os.path.join(queue_dir, "done", f"{shard['shard_id']}.json"), result)
+        # Gone if the lease expired and the shard was re-queued (its result is still valid)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(claimed_path)
+        processed += 1
+        idle_since = time.monotonic()
+
+
+def collect_results(queue_dir: str, shards: list, local_workers: list = (),
+                    lease_sec: float = QUEUE_LEASE_SEC) -> list:
+    """
+    Wait for every shard's done/ file, re-queueing claims whose lease expired
+    (fails if the local workers exit first)
+    """
+    pending = {shard["shard_id"] for shard in shards}
+    results = {}
+    while pending:
+        for shard_id in sorted(pending):
+            done_path = os.path.join(queue_dir, "done", f"{shard_id}.json")
+            if os.path.exists(done_path):
+                with open(done_path, encoding="utf-8") as fh:
+                    results[shard_id] = json.load(fh)
+                pending.discard(shard_id)
+        if pending:
+            for shard_id in requeue_stale_claims(queue_dir, lease_sec):
+                print(f"  Re-queued {shard_id}: claim lease expired (no heartbeat for {lease_sec:.0f}s)")
+            if local_workers and all(worker.poll() is not None for worker in local_workers):
+                raise RuntimeError(f"Queue workers exited with shards unfinished: {sorted(pending)}")
+            time.sleep(QUEUE_POLL_SEC)
+    return [results[shard["shard_id"]] for shard in shards]
+
+
+# Merge
+
+def _line_tables(results: list) -> tuple:
+    """Per-line manifests and the union of table names and columns (first-seen order)"""
+    manifests = {result["line_id"]: load_manifest(result["run_dir"]) for result in results}
+    schemas = {}
+    for manifest in manifests.values():
+        for table_name, entry in manifest["tables"].items():
+            schema = schemas.setdefault(table_name, {"line_id": "str"})
+            for col, dtype in entry["schema"].items():
+                schema.setdefault(col, dtype)
+    return manifests, schemas
+
+
+def merge_table(staging_dir: str, table_name: str, schema: dict, results: list, manifests: dict) -> int:
+    """Append every line's table file with its line_id into one staged CSV; returns rows"""
+    target = os.path.join(staging_dir, f"{table_name}.csv")
+    columns = list(schema)
+    pd.DataFrame(columns=columns).to_csv(target, index=False, encoding="utf-8")
+
+    rows = 0
+    for result in results:
+        entry = manifests[result["line_id"]]["tables"].get(table_name)
+        if entry is None:
+            continue
+        reader = pd.read_csv(
+            os.path.join(result["run_dir"], entry["file"]),
+            dtype=str, keep_default_na=False, chunksize=MERGE_CHUNK_ROWS,
+        )
+        for chunk in reader:
+            chunk.insert(0, "line_id", result["line_id"])
+            chunk.reindex(columns=columns, fill_value="").to_csv(
+                target, mode="a", header=False, index=False, encoding="utf-8"
+            )
+            rows += len(chunk)
+    return rows
+
+
+def line_totals(line_id: str, run_dir: str) -> dict:
+    """Additive production and station-state totals of one line's published run"""
+    coils = pd.read_csv(
+        os.path.join(run_dir, "fact_production_coil.csv"),
+        usecols=["parent_coil_id", "completion_ts", "mass_out_tons", "is_prime", "total_cycle_time_min"],
+        dtype={"parent_coil_id": str}, parse_dates=["completion_ts"],
+    )
+    events = pd.read_csv(
+        os.path.join(run_dir, "fact_equipment_event_log.csv"), usecols=["event_type", "event_duration_sec"]
+    )
+    state_sec = events.groupby("event_type")["event_duration_sec"].sum()
+    cycle = coils["total_cycle_time_min"]
+    return {
+        "line_id": line_id,
+        "run_id": os.path.basename(os.path.normpath(run_dir)),
+        "coils": len(coils),
+        "parent_coils": coils["parent_coil_id"].nunique(),
+        "mass_out_tons": coils["mass_out_tons"].sum(),
+        "prime_coils": int(coils["is_prime"].sum()),
+        "cycle_sum_min": cycle.sum(),
+        "cycle_count": int(cycle.notna().sum()),
+        "first_completion": coils["completion_ts"].min(),
+        "last_completion": coils["completion_ts"].max(),
+        "run_sec": state_sec.get("RUN", 0.0),
+        "idle_sec": state_sec.get("IDLE", 0.0),
+        "fault_sec": state_sec.get("FAULT", 0.0),
+        "fault_events": int((events["event_type"] == "FAULT").sum()),
+    }
+
+
+def plant_line_summary(totals: list) -> pd.DataFrame:
+    """Per-line rows plus the plant row (sums, coil-weighted rates)"""
+    summary = pd.DataFrame(totals)
+    plant = summary.drop(columns=["line_id", "run_id"]).agg({
+        col: ("min" if col == "first_completion" else "max" if col == "last_completion" else "sum")
+        for col in summary.columns if col not in ("line_id", "run_id")
+    })
+    summary = pd.concat([summary, plant.to_frame().T.assign(line_id=PLANT_ID, run_id=None)], ignore_index=True)
+
+    summary["prime_rate_pct"] = 100 * summary["prime_coils"] / summary["coils"].clip(lower=1)
+    summary["mean_cycle_min"] = summary["cycle_sum_min"] / summary["cycle_count"].replace(0, np.nan)
+    summary["pieces_per_hour"] = 60 / summary["mean_cycle_min"]
+    # Lines run in parallel: the plant's rate is the sum of the line rates
+    summary.loc[summary.index[-1], "pieces_per_hour"] = summary["pieces_per_hour"].iloc[:-1].sum()
+    for state in ["run", "idle", "fault"]:
+        summary[f"station_{state}_hours"] = summary[f"{state}_sec"] / 3600
+    state_total = summary[["run_sec", "idle_sec", "fault_sec"]].sum(axis=1).replace(0, np.nan)
+    summary["run_share_pct"] = 100 * summary["run_sec"] / state_total
+    return summary[SUMMARY_COLUMNS].infer_objects()
+
+
+def merge_line_runs(results: list, output_dir: str) -> str:
+    """Publish one plant run: every line table under line_id plus plant_line_summary"""
+    manifests, schemas = _line_tables(results)
+    staging_dir, run_manifest = open_staging(output_dir)
+    run_manifest["lines"] = {
+        result["line_id"]: {"run_dir": result["run_dir"], "run_id": manifests[result["line_id"]]["run_id"],
+                            "seconds": result["seconds"]}
+        for result in results
+    }
+    for table_name, schema in schemas.items():
+        rows = merge_table(staging_dir, table_name, schema, results, manifests)
+        stage_table_file(staging_dir, run_manifest, table_name, rows, schema)
+
+    summary = plant_line_summary([line_totals(result["line_id"], result["run_dir"]) for result in results])
+    stage_table(staging_dir, run_manifest, output_dir, "plant_line_summary", summary)
+    return commit_run(staging_dir, run_manifest, output_dir)
+
+
+def run_plant(plant_path: str, output_dir: str, workers: int = None, seed: int = None,
+              by_month: bool = False, queue_dir: str = None, local_workers: int = 0) -> str:
+    """Run every line shard (pool or queue), then merge the line runs into a plant run"""
+    started = time.perf_counter()
+    shards = build_shards(load_plant(plant_path), seed, by_month)
+    print(f"Plant run: {len(shards)} line shards ({'month-partitioned' if by_month else 'single-shot'})")
+
+    if queue_dir is None:
+        log_dir = os.path.abspath(os.path.join(output_dir, LOG_DIR))
+        os.makedirs(log_dir, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_shard, shards, [log_dir] * len(shards)))
+    else:
+        queue_dir = open_queue(queue_dir)
+        enqueue(queue_dir, shards)
+        print(f"  Enqueued in {queue_dir} ({local_workers} local workers)")
+        stand_ins = [
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), "--worker", "--queue", queue_dir])
+            for _ in range(local_workers)
+        ]
+        try:
+            results = collect_results(queue_dir, shards, stand_ins)
+        finally:
+            for worker in stand_ins:
+                worker.wait()
+        failed = [result for result in results if "error" in result]
+        if failed:
+            raise RuntimeError("Line shards failed:\n" + "\n".join(
+                f"[{result['line_id']}]\n{result['error']}" for result in failed
+            ))
+
+    for result in results:
+        print(f"  {result['line_id']:12} {result['seconds']:>8.1f}s  {result['run_dir']}")
+
+    run_dir = merge_line_runs(results, output_dir)
+    print(f"\n✓ Published plant run {os.path.basename(run_dir)} → {output_dir}/CURRENT "
+          f"({time.perf_counter() - started:.1f}s)")
+    return run_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded multi-line pipeline runs with a plant-level merge")
+    parser.add_argument("--plant", help="Plant manifest JSON: {\"lines\": [{\"line_id\", \"data_dir\"}, ...]}")
+    parser.add_argument("--output-dir", default="plant_tables", help="Publish directory for the merged plant run")
+    parser.add_argument("--workers", type=int, default=None, help="Local worker processes (pool mode)")
+    parser.add_argument("--seed", type=int, default=None, help="Key of every line's per-coil operation draws (default 0)")
+    parser.add_argument("--by-month", action="store_true", help="Run each line as a month-partitioned backfill")
+    parser.add_argument("--queue", default=None, help="Directory queue for (remote) workers instead of the pool")
+    parser.add_argument("--local-workers", type=int, default=0, help="Queue workers started by the coordinator")
+    parser.add_argument("--worker", action="store_true", help="Run as a queue worker (needs --queue)")
+    parser.add_argument("--idle-timeout", type=float, default=0.0, help="Worker: seconds to wait on an empty queue")
+    args = parser.parse_args()
+
+    if args.worker:
+        if not args.queue:
+            parser.error("--worker needs --queue")
+        queue_worker(args.queue, args.idle_timeout)
+    elif args.plant:
+        plant_dir = run_plant(args.plant, args.output_dir, args.workers, args.seed,
+                              args.by_month, args.queue, args.local_workers)
+        print(pd.read_csv(os.path.join(plant_dir, "plant_line_summary.csv")).round(2).to_string(index=False))
+    else:
+        parser.error("--plant or --worker is required")
@@ -0,0 +1,310 @@
+# Stratified-sample preview run for fast iteration on the line model
+#
+# Tuning DURATION_RANGES / SHIFT_MULTIPLIER (line_model.py) or the gap rules
+# in 11 needs the validation metrics of 12 after every change, and a full
+# 09-12 run grows with the extract (the rolling tempo in 11 dominates). The
+# preview runs 09-12 on a stratified sample of parent coils and reports the
+# same metrics as estimates with 95% confidence intervals:
+# - strata: type_code × product band × month of the parent's first piece;
+#   PREVIEW_FRACTION of each stratum's parents, at least MIN_STRATUM_PARENTS
+# - whole parents are sampled (every piece of a parent or none), so the parent
+#   rollup, prime rates and parent cycle times stay those of real parents
+# - 01-08 run on the whole extract: completion and parent transition gaps are
+#   gaps to the previous coil / parent of the full timeline, which 05 derives
+#   in one vectorized pass; the sample is drawn from its output
+# - means and shares are stratified ratio estimators over parent clusters
+#   (weights N_h / n_h) with linearized variance and finite population
+#   correction; station RUN hours are expanded totals
+# IDLE time, bottleneck windows and rolling tempo depend on neighbouring
+# coils and are not estimated from a sample.
+#
+# Usage (in the directory holding the raw extracts):
+#   python preview.py --fraction 0.05 --seed 2024
+#   python preview.py --fraction 0.05 --check     (also runs 09-12 in full)
+
+import os
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from backfill import stage_code, quiet_stdout
+from time_model import day_to_month_number, month_label
+
+PREVIEW_FRACTION = 0.05
+MIN_STRATUM_PARENTS = 2
+DEFAULT_SAMPLE_SEED = 7
+Z_95 = 1.96
+
+# Stated accuracy: a metric is reported as within tolerance when its 95% CI
+# half-width is at most this share of the estimate and enough sampled parents
+# contribute for the normal approximation. CIs cover the sampling error only;
+# the generator's own run-to-run noise (scenario_runner.py) comes on top.
+PREVIEW_TOLERANCE_PCT = 2.0
+MIN_TOLERANCE_PARENTS = 30
+
+# Tables 09-12 update in place (10 re-flags the detected bottlenecks, 11 the
+# parent gaps): each run works on its own copies
+RUN_LOCAL_TABLES = ["dim_equipment", "line_equipment", "dim_parent_coil"]
+
+ALL_GROUP = "ALL"
+STRATUM_COLUMNS = ["type_code", "product_band", "month"]
+REPORT_COLUMNS = [
+    "metric", "group", "parents", "estimate", "ci95_low", "ci95_high", "half_width_pct", "within_tolerance",
+]
+
+
+def parent_strata(coils: pd.DataFrame) -> pd.DataFrame:
+    """Stratum of every parent coil from its first piece (coils sorted by completion, as 05 leaves them)"""
+    first = coils.drop_duplicates("parent_coil_id").set_index("parent_coil_id")
+    strata = pd.DataFrame({
+        "type_code": first["type_code"].astype(str),
+        "product_band": first["product_band"].astype(str),
+        "month": day_to_month_number(first["production_date"].to_numpy()),
+    }, index=first.index)
+    strata["stratum"] = strata.groupby(STRATUM_COLUMNS, sort=True).ngroup()
+    return strata
+
+
+def draw_sample(strata: pd.DataFrame, fraction: float, seed: int = DEFAULT_SAMPLE_SEED):
+    """
+    Simple random sample of parents within each stratum:
+    n_h = min(N_h, max(MIN_STRATUM_PARENTS, ceil(fraction * N_h))).
+    Returns (design: stratum and weight per sampled parent, stratum sizes N / n).
+    """
+    rng = np.random.default_rng(seed)
+    stratum = strata["stratum"]
+    rank = pd.Series(rng.random(len(strata)), index=strata.index).groupby(stratum).rank(method="first")
+
+    sizes = stratum.value_counts().sort_index().to_frame("N")
+    sizes["n"] = np.minimum(sizes["N"], np.maximum(MIN_STRATUM_PARENTS, np.ceil(fraction * sizes["N"]))).astype(int)
+
+    selected = rank <= stratum.map(sizes["n"])
+    design = pd.DataFrame({"stratum": stratum[selected]})
+    design["weight"] = design["stratum"].map(sizes["N"] / sizes["n"])
+    return design, sizes
+
+
+def census_design(parent_ids) -> tuple:
+    """Design of a full run: every parent in one stratum with weight 1 (no sampling error)"""
+    design = pd.DataFrame({"stratum": 0, "weight": 1.0}, index=pd.Index(parent_ids, name="parent_coil_id"))
+    sizes = pd.DataFrame({"N": [len(design)], "n": [len(design)]})
+    return design, sizes
+
+
+def _by_parent(parent_ids, values, groups=None) -> pd.DataFrame:
+    """Sum of values per parent (rows) and group label (columns; ALL without groups)"""
+    table = pd.DataFrame({
+        "parent_coil_id": np.asarray(parent_ids),
+        "group": ALL_GROUP if groups is None else np.asarray(groups, dtype=object),
+        "value": np.asarray(values, dtype=np.float64),
+    })
+    return table.pivot_table(index="parent_coil_id", columns="group", values="value",
+                             aggfunc="sum", fill_value=0.0)
+
+
+def _grouped_by_parent(coils: pd.DataFrame, values, weights) -> tuple:
+    """(y, m) per parent for the whole line, each type_code and each product band"""
+    parent_ids = coils["parent_coil_id"]
+    y, m = [_by_parent(parent_ids, values)], [_by_parent(parent_ids, weights)]
+    for column in ["type_code", "product_band"]:
+        labels = column + "=" + coils[column].astype(str)
+        y.append(_by_parent(parent_ids, values, labels))
+        m.append(_by_parent(parent_ids, weights, labels))
+    return pd.concat(y, axis=1), pd.concat(m, axis=1)
+
+
+def parent_totals(ns: dict, gap_counts_before: pd.DataFrame) -> dict:
+    """
+    Per-parent totals of the validation metrics after 12:
+    {metric: (kind, y, m)} with kind "ratio" (estimate sum y / sum m) or
+    "total" (estimate sum y; m unused). y and m are parents × groups.
+    """
+    coils = ns["fact_production_coil"]
+    operations = ns["fact_coil_operation_cycle"]
+    parents = ns["dim_parent_coil"]
+    parent_ids = coils["parent_coil_id"]
+
+    cycle = coils["total_cycle_time_min"]
+    totals = {"cycle_time_min": ("ratio",) + _grouped_by_parent(coils, cycle.fillna(0), cycle.notna())}
+    totals["prime_rate_pct"] = (
+        "ratio", _by_parent(parent_ids, 100 * coils["is_prime"].astype(float)), _by_parent(parent_ids, 1.0)
+    )
+
+    for gap_col, metric in [("gap_from_prev_completion_min", "completion_gap_min"),
+                            ("gap_from_prev_parent_min", "parent_gap_min")]:
+        gaps = coils[gap_col]
+        kept = _by_parent(parent_ids, gaps.notna())
+        totals[metric] = ("ratio", _by_parent(parent_ids, gaps.fillna(0)), kept)
+        totals[metric.replace("_min", "_kept_pct")] = (
+            "ratio", 100 * kept, gap_counts_before[[gap_col]].set_axis([ALL_GROUP], axis=1)
+        )
+
+    parent_cycle = parents["parent_cycle_min"]
+    totals["parent_cycle_min"] = (
+        "ratio", _by_parent(parents["parent_coil_id"], parent_cycle.fillna(0)),
+        _by_parent(parents["parent_coil_id"], parent_cycle.notna()),
+    )
+
+    op_parents, stations = operations["parent_coil_id"], operations["equipment_name"]
+    op_sec = operations["operation_duration_sec"]
+    line_sec = _by_parent(op_parents, op_sec)[ALL_GROUP]
+    station_sec = _by_parent(op_parents, op_sec, stations)
+    totals["operation_min"] = ("ratio", station_sec / 60, _by_parent(op_parents, 1.0, stations))
+    totals["line_time_share_pct"] = (
+        "ratio", 100 * station_sec, pd.DataFrame({c: line_sec for c in station_sec.columns})
+    )
+    totals["run_hours"] = ("total", station_sec / 3600, None)
+    return totals
+
+
+def _stratified_variance(values: pd.DataFrame, design: pd.DataFrame, sizes: pd.DataFrame) -> np.ndarray:
+    """Variance of the expanded totals of each column: sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h"""
+    s2 = values.groupby(design["stratum"].to_numpy()).var(ddof=1).fillna(0.0)
+    strata = sizes.loc[s2.index]
+    factor = (strata["N"] ** 2 * (1 - strata["n"] / strata["N"]) / strata["n"]).to_numpy()
+    return factor @ s2.to_numpy()
+
+
+def estimate_metrics(totals: dict, design: pd.DataFrame, sizes: pd.DataFrame) -> pd.DataFrame:
+    """Point estimates and 95% CIs of every metric and group from per-parent totals"""
+    weights = design["weight"].to_numpy()
+    rows = []
+    for metric, (kind, y, m) in totals.items():
+        y = y.reindex(design.index, fill_value=0.0)
+        y_hat = weights @ y.to_numpy()
+        parents = (y != 0).sum().to_numpy()
+        if kind == "total":
+            estimate, variance = y_hat, _stratified_variance(y, design, sizes)
+        else:
+            m = m.reindex(index=design.index, columns=y.columns, fill_value=0.0)
+            m_hat = weights @ m.to_numpy()
+            parents = (m != 0).sum().to_numpy()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                estimate = y_hat / m_hat
+                residual = y - m * np.nan_to_num(estimate)
+                variance = _stratified_variance(residual, design, sizes) / m_hat ** 2
+        half_width = Z_95 * np.sqrt(variance)
+        rows.append(pd.DataFrame({
+            "metric": metric, "group": y.columns.astype(str), "parents": parents,
+            "estimate": estimate, "ci95_low": estimate - half_width, "ci95_high": estimate + half_width,
+        }))
+
+    report = pd.concat(rows, ignore_index=True).dropna(subset=["estimate"])
+
+    # Tempo from the mean cycle time (CI endpoints map through 60 / x)
+    cycle = report[report["metric"] == "cycle_time_min"]
+    tempo = cycle.assign(
+        metric="pieces_per_hour",
+        estimate=60 / cycle["estimate"], ci95_low=60 / cycle["ci95_high"], ci95_high=60 / cycle["ci95_low"],
+    )
+    report = pd.concat([report, tempo], ignore_index=True)
+
+    report["half_width_pct"] = 100 * (report["ci95_high"] - report["ci95_low"]) / 2 / report["estimate"].abs()
+    report["within_tolerance"] = (
+        (report["half_width_pct"] <= PREVIEW_TOLERANCE_PCT) & (report["parents"] >= MIN_TOLERANCE_PARENTS)
+    )
+    return report[REPORT_COLUMNS]
+
+
+def run_sample_stages(base: dict, coils: pd.DataFrame, parents: pd.DataFrame) -> dict:
+    """Execute 09-12 on coils / parents from 05 (dimensions from 03-08 in base); returns the per-parent totals"""
+    ns = dict(base, fact_production_coil=coils, dim_parent_coil=parents)
+    ns.update({name: ns[name].copy() for name in RUN_LOCAL_TABLES})
+    gap_columns = ["gap_from_prev_completion_min", "gap_from_prev_parent_min"]
+    gap_counts_before = pd.concat(
+        [_by_parent(coils["parent_coil_id"], coils[col].notna()).set_axis([col], axis=1) for col in gap_columns],
+        axis=1,
+    )
+    for number in ["09", "10", "11", "12"]:
+        exec(stage_code(number), ns)
+    return parent_totals(ns, gap_counts_before)
+
+
+def compare_to_full(report: pd.DataFrame, reference: pd.DataFrame) -> pd.DataFrame:
+    """Add the full-run value, the relative error and CI coverage to a preview report"""
+    full = reference.set_index(["metric", "group"])["estimate"].rename("full_run")
+    report = report.join(full, on=["metric", "group"])
+    report["error_pct"] = 100 * (report["estimate"] - report["full_run"]) / report["full_run"].abs()
+    report["full_in_ci"] = report["full_run"].between(report["ci95_low"], report["ci95_high"])
+    return report
+
+
+def run_preview(fraction: float = PREVIEW_FRACTION, seed: int = None,
+                sample_seed: int = DEFAULT_SAMPLE_SEED, check: bool = False, verbose: bool = False) -> pd.DataFrame:
+    """
+    Run 01-08 on the whole extract and 09-12 on a stratified parent sample;
+    returns the metric estimates (with the full-run values when check=True).
+    """
+    started = time.perf_counter()
+
+    base = {"__name__": "__main__", "generator_seed": seed or 0}
+    with quiet_stdout(verbose):
+        for number in ["01", "02", "03", "04", "05", "06", "07", "08"]:
+            exec(stage_code(number), base)
+
+    coils, parents = base["fact_production_coil"], base["dim_parent_coil"]
+    strata = parent_strata(coils)
+    design, sizes = draw_sample(strata, fraction, sample_seed)
+
+    sample_coils = coils[coils["parent_coil_id"].isin(design.index)].reset_index(drop=True)
+    sample_parents = parents[parents["parent_coil_id"].isin(design.index)].reset_index(drop=True)
+    with quiet_stdout(verbose):
+        totals = run_sample_stages(base, sample_coils, sample_parents)
+    report = estimate_metrics(totals, design, sizes)
+    elapsed = time.perf_counter() - started
+
+    sampled_coils = len(sample_coils)
+    print(f"Preview: {len(design):,} of {len(strata):,} parent coils in {len(sizes):,} strata "
+          f"({sampled_coils:,} of {len(coils):,} coils, {100 * sampled_coils / max(len(coils), 1):.1f}%) "
+          f"| months {month_label(strata['month'].min())} to {month_label(strata['month'].max())} "
+          f"| {elapsed:.1f}s")
+
+    if check:
+        with quiet_stdout(verbose):
+            full_totals = run_sample_stages(base, coils, parents)
+        reference = estimate_metrics(full_totals, *census_design(coils["parent_coil_id"].unique()))
+        report = compare_to_full(report, reference)
+        print(f"Full 09-12 run: {time.perf_counter() - started - elapsed:.1f}s")
+    return report
+
+
+def print_report(report: pd.DataFrame):
+    line = report[report["group"] == ALL_GROUP].set_index("metric")
+    columns = [c for c in ["parents", "estimate", "ci95_low", "ci95_high", "half_width_pct", "full_run", "error_pct"]
+               if c in report.columns]
+
+    print("\nLine metrics (95% CI):")
+    print(line[columns].round(3).to_string())
+
+    for metric, title in [("cycle_time_min", "Cycle time by type_code and product band (min)"),
+                          ("line_time_share_pct", "Station share of line time (%)"),
+                          ("run_hours", "Station RUN hours")]:
+        rows = report[(report["metric"] == metric) & (report["group"] != ALL_GROUP)]
+        print(f"\n{title}:")
+        print(rows.set_index("group")[columns].sort_values("estimate", ascending=False).round(3).head(10).to_string())
+
+    within = report["within_tolerance"]
+    print(f"\n{int(within.sum())} of {len(report)} estimates within ±{PREVIEW_TOLERANCE_PCT:g}% (95% CI half-width)")
+    if "full_in_ci" in report.columns:
+        print(f"Full-run value inside the CI: {int(report['full_in_ci'].sum())} of {len(report)} | "
+              f"max |error| {report['error_pct'].abs().max():.2f}% "
+              f"(line metrics {report.loc[report['group'] == ALL_GROUP, 'error_pct'].abs().max():.2f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stratified-sample preview of the validation metrics")
+    parser.add_argument("--fraction", type=float, default=PREVIEW_FRACTION, help="Share of parent coils per stratum")
+    parser.add_argument("--seed", type=int, default=None, help="Key of the per-coil operation draws (default 0)")
+    parser.add_argument("--sample-seed", type=int, default=DEFAULT_SAMPLE_SEED)
+    parser.add_argument("--check", action="store_true", help="Also run 09-12 in full and compare")
+    parser.add_argument("--out", default=None, help="Write the estimates to this CSV")
+    parser.add_argument("--verbose", action="store_true", help="Show the stage scripts' output")
+    args = parser.parse_args()
+
+    preview_report = run_preview(args.fraction, args.seed, args.sample_seed, args.check, args.verbose)
+    print_report(preview_report)
+    if args.out:
+        preview_report.to_csv(args.out, index=False)
+        print(f"\n✓ Preview estimates written to {args.out}")
@@ -0,0 +1,48 @@
+# Product mix banding (thickness × width) for all coils at once
+#
+# Band codes index MIX_BANDS; breakpoints and the band grid live in
+# line_model.py. Used by 05 (persisted product_band), the operation
+# generator (08/09) and the scenario runner.
+
+import numpy as np
+import pandas as pd
+
+import line_model
+
+MIX_BANDS = list(line_model.MIX_FACTOR_RANGES)
+UNKNOWN_CODE = MIX_BANDS.index(line_model.UNKNOWN_BAND)
+
+
+def band_codes(thickness_mm, width_mm,
+               thickness_breakpoints=line_model.THICKNESS_BREAKPOINTS_MM,
+               width_breakpoints=line_model.WIDTH_BREAKPOINTS_MM,
+               grid=line_model.BAND_GRID) -> np.ndarray:
+    """
+    Band code per coil: np.digitize into right-closed thickness and width
+    bins, then a lookup in the band grid. Missing dimensions → unknown band.
+    """
+    thickness = np.asarray(thickness_mm, dtype=np.float64)
+    width = np.asarray(width_mm, dtype=np.float64)
+
+    grid_codes = np.array([[MIX_BANDS.index(band) for band in row] for row in grid], dtype=np.int8)
+    t_bin = np.digitize(thickness, thickness_breakpoints, right=True)
+    w_bin = np.digitize(width, width_breakpoints, right=True)
+
+    known = ~(np.isnan(thickness) | np.isnan(width))
+    codes = np.full(len(thickness), UNKNOWN_CODE, dtype=np.int8)
+    codes[known] = grid_codes[t_bin[known], w_bin[known]]
+    return codes
+
+
+def band_labels(codes) -> pd.Categorical:
+    """Band names for band codes"""
+    return pd.Categorical.from_codes(np.asarray(codes), categories=MIX_BANDS)
+
+
+def scale_mix_factors(codes, unit, ranges: dict = None) -> np.ndarray:
+    """Speed multipliers from unit-uniform samples (coils × stations) and each coil's band range"""
+    ranges = line_model.MIX_FACTOR_RANGES if ranges is None else ranges
+    low = np.array([ranges[band][0] for band in MIX_BANDS])[codes]
+    high = np.array([ranges[band][1] for band in MIX_BANDS])[codes]
+    return low[:, None] + (high - low)[:, None] * unit
+
@@ -0,0 +1,260 @@
+# Versioned, atomic publishing of output tables
+#
+# Layout under the export directory:
+#   runs/<run_id>/<table>.csv      immutable per-run table files
+#   runs/<run_id>/manifest.json    row counts, checksums, schema
+#   CURRENT                        run_id of the active run (atomic replace)
+#   latest -> runs/<run_id>        convenience symlink (where supported; not
+#                                  "current", which is the same entry as
+#                                  CURRENT on case-insensitive filesystems)
+#
+# Readers resolve CURRENT once and read every table from that run directory,
+# so they always see one consistent snapshot without locks. Tables whose
+# content is unchanged since the previous run are hard-linked, not rewritten.
+
+import os
+import json
+import shutil
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+RUNS_DIR = "runs"
+CURRENT_POINTER = "CURRENT"
+LATEST_LINK = "latest"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_RETENTION = 5
+
+
+def table_content_hash(table_df: pd.DataFrame) -> str:
+    """
+    Hash of table values and schema (cheaper than writing and checksumming the CSV).
+    Columns attached from shared memory hash with their producer dtype.
+    """
+    digest = hashlib.sha256()
+    source_dtypes = table_df.attrs.get("source_dtypes", {})
+    digest.update(json.dumps(
+        [[str(col), source_dtypes.get(col, str(dtype))] for col, dtype in table_df.dtypes.items()]
+    ).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(table_df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 of a published file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def current_run_id(output_dir: str):
+    """Run id of the active run, or None if nothing has been published yet"""
+    pointer = os.path.join(output_dir, CURRENT_POINTER)
+    if not os.path.exists(pointer):
+        return None
+    if os.path.islink(pointer):
+        # Written by older publishes on case-insensitive filesystems, where the
+        # "current" symlink replaced this file (the next publish restores it)
+        return os.path.basename(os.path.normpath(os.readlink(pointer)))
+    with open(pointer, encoding="utf-8") as fh:
+        return fh.read().strip() or None
+
+
+def resolve_current(output_dir: str) -> str:
+    """
+    Directory holding the active snapshot.
+    Falls back to output_dir itself for the legacy flat layout.
+    """
+    run_id = current_run_id(output_dir)
+    if run_id is None:
+        return output_dir
+    return os.path.join(output_dir, RUNS_DIR, run_id)
+
+
+def load_manifest(run_dir: str) -> dict:
+    path = os.path.join(run_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _run_sort_key(run_id: str):
+    """Order run ids by timestamp, then numerically by the same-second suffix"""
+    stamp, _, suffix = run_id.partition("_")
+    return stamp, int(suffix) if suffix.isdigit() else 1
+
+
+def _claim_staging(runs_root: str):
+    """
+    Pick the next run id and create its staging directory.
+    Same-second ids take a suffix above every published or staging run with
+    that timestamp, so a new run always sorts last even after retention has
+    pruned earlier ones; makedirs is the atomic claim between processes.
+    """
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    taken = [
+        _run_sort_key(name.strip(".").removesuffix(".staging"))[1]
+        for name in os.listdir(runs_root)
+        if name.strip(".").startswith(run_id)
+    ]
+    suffix = max(taken, default=0) + 1
+    while True:
+        candidate = run_id if suffix == 1 else f"{run_id}_{suffix}"
+        staging_dir = os.path.join(runs_root, f".{candidate}.staging")
+        if not os.path.exists(os.path.join(runs_root, candidate)):
+            try:
+                os.makedirs(staging_dir)
+                return candidate, staging_dir
+            except FileExistsError:
+                pass
+        suffix += 1
+
+
+def open_staging(output_dir: str):
+    """
+    Create the hidden staging directory for a new run.
+    Returns (staging_dir, manifest); tables are added with stage_table or
+    stage_table_file, then commit_run makes the run visible.
+    """
+    runs_root = os.path.join(output_dir, RUNS_DIR)
+    os.makedirs(runs_root, exist_ok=True)
+
+    run_id, staging_dir = _claim_staging(runs_root)
+
+    manifest = {
+        "run_id": run_id,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "previous_run_id": current_run_id(output_dir),
+        "tables": {},
+    }
+    return staging_dir, manifest
+
+
+def stage_table(staging_dir: str, manifest: dict, output_dir: str,
+                table_name: str, table_df: pd.DataFrame) -> dict:
+    """
+    Write one table into the staging directory.
+    Unchanged tables (same content hash as the active run) are hard-linked.
+    """
+    previous_id = manifest["previous_run_id"]
+    previous_dir = os.path.join(output_dir, RUNS_DIR, previous_id) if previous_id else None
+    previous = load_manifest(previous_dir)["tables"].get(table_name) if previous_dir else None
+
+    file_name = f"{table_name}.csv"
+    target = os.path.join(staging_dir, file_name)
+    content_hash = table_content_hash(table_df)
+
+    reused = False
+    if previous and previous["content_hash"] == content_hash:
+        source = os.path.join(previous_dir, previous["file"])
+        if os.path.exists(source):
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+            reused = True
+
+    if not reused:
+        table_df.to_csv(target, index=False, encoding="utf-8")
+
+    entry = {
+        "file": file_name,
+        "rows": int(len(table_df)),
+        "columns": int(len(table_df.columns)),
+        "schema": {str(col): str(dtype) for col, dtype in table_df.dtypes.items()},
+        "content_hash": content_hash,
+        "sha256": previous["sha256"] if reused else file_checksum(target),
+        "size_bytes": os.path.getsize(target),
+        "reused_from": previous_id if reused else None,
+    }
+    manifest["tables"][table_name] = entry
+    return entry
+
+
+def stage_table_file(staging_dir: str, manifest: dict, table_name: str,
+                     rows: int, schema: dict) -> dict:
+    """
+    Register a table already written (e.g. appended partition by partition)
+    as <table_name>.csv in the staging directory. Without a content hash it
+    is never reused by later runs.
+    """
+    file_name = f"{table_name}.csv"
+    target = os.path.join(staging_dir, file_name)
+    entry = {
+        "file": file_name,
+        "rows": int(rows),
+        "columns": int(len(schema)),
+        "schema": {str(col): str(dtype) for col, dtype in schema.items()},
+        "content_hash": None,
+        "sha256": file_checksum(target),
+        "size_bytes": os.path.getsize(target),
+        "reused_from": None,
+    }
+    manifest["tables"][table_name] = entry
+    return entry
+
+
+def stage_run(tables: dict, output_dir: str):
+    """
+    Write all tables for a new run into a hidden staging directory.
+    Unchanged tables (same content hash as the active run) are hard-linked.
+    Returns (staging_dir, manifest); call commit_run to make it visible.
+    """
+    staging_dir, manifest = open_staging(output_dir)
+    for table_name, table_df in tables.items():
+        stage_table(staging_dir, manifest, output_dir, table_name, table_df)
+    return staging_dir, manifest
+
+
+def _replace_pointer(output_dir: str, run_id: str):
+    """Atomically switch CURRENT (and the latest symlink) to run_id"""
+    pointer = os.path.join(output_dir, CURRENT_POINTER)
+    tmp_pointer = pointer + ".tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as fh:
+        fh.write(run_id + "\n")
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_pointer, pointer)
+
+    link = os.path.join(output_dir, LATEST_LINK)
+    tmp_link = link + ".tmp"
+    try:
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.join(RUNS_DIR, run_id), tmp_link, target_is_directory=True)
+        os.replace(tmp_link, link)
+    except (OSError, NotImplementedError):
+        # Symlinks unavailable (e.g. Windows without privilege) - CURRENT is authoritative
+        pass
+
+
+def apply_retention(output_dir: str, retention: int = DEFAULT_RETENTION) -> list:
+    """Delete the oldest published runs beyond retention (never the active run)"""
+    runs_root = os.path.join(output_dir, RUNS_DIR)
+    active = current_run_id(output_dir)
+    runs = sorted(
+        (name for name in os.listdir(runs_root)
+         if not name.startswith(".") and os.path.isdir(os.path.join(runs_root, name))),
+        key=_run_sort_key,
+    )
+    expired = [name for name in runs[:max(len(runs) - retention, 0)] if name != active]
+    for name in expired:
+        shutil.rmtree(os.path.join(runs_root, name))
+    return expired
+
+
+def commit_run(staging_dir: str, manifest: dict, output_dir: str,
+               retention: int = DEFAULT_RETENTION) -> str:
+    """Write the manifest, move the staged run into place and switch CURRENT"""
+    with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+
+    run_dir = os.path.join(output_dir, RUNS_DIR, manifest["run_id"])
+    os.replace(staging_dir, run_dir)
+    _replace_pointer(output_dir, manifest["run_id"])
+    apply_retention(output_dir, retention)
+    return run_dir
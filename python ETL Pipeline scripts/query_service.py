@@ -0,0 +1,375 @@
+# Local HTTP query service over the exported fact and dimension tables
+#
+# Loads output_tables/ once, answers common aggregation queries as JSON and
+# keeps a bounded LRU cache of results keyed by the normalized query. The
+# cache (and loaded tables) are refreshed when a new pipeline run publishes
+# (the CURRENT run pointer written by publish.py changes).
+#
+# Usage:
+#   python query_service.py --output-dir output_tables --port 8765
+#
+# Endpoints (GET):
+#   /health
+#   /cycle-time?type_code=HL,HM            cycle time stats by type_code
+#   /utilization?start=...&end=...         RUN/IDLE/FAULT share per station in window
+#   /top-faults?limit=10&start=...&end=... downtime ranking by equipment
+#   /search?q=hydraulic+leak&equipment_name=...&start=...&end=...
+#                                          maintenance events by description terms
+#   /slice?table=fact_equipment_event_log&shift_code=A,B&section=Exit&event_type=!IDLE&by=equipment_id
+#                                          row counts of a bitmap-index filter (! excludes)
+
+import os
+import json
+import asyncio
+import argparse
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+import pandas as pd
+
+from publish import current_run_id, resolve_current
+from text_index import TEXT_INDEX_DIR, MaintenanceSearch
+from event_timeline import EVENT_TIMELINE_FILE, EventTimeline
+from bitmap_index import BITMAP_INDEX_DIR, BITMAP_COLUMNS, BitmapIndex
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_SLICE_TABLE = "fact_equipment_event_log"
+SLICE_COLUMNS = sorted({col for columns in BITMAP_COLUMNS.values() for col in columns})
+
+# Tables loaded at startup with their datetime columns
+SERVICE_TABLES = {
+    "dim_equipment": [],
+    "fact_production_coil": ["completion_ts", "start_datetime", "end_datetime"],
+    "fact_maintenance_event": ["start_datetime"],
+    "fact_equipment_event_log": ["event_start_ts", "event_end_ts"],
+}
+
+
+class LRUCache:
+    """Bounded least-recently-used result cache"""
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+def publish_version(output_dir: str):
+    """
+    Identifier of the published snapshot: the active run id, or the latest
+    table modification time for the legacy flat layout
+    """
+    run_id = current_run_id(output_dir)
+    if run_id is not None:
+        return run_id
+    mtimes = [
+        os.path.getmtime(os.path.join(output_dir, f"{name}.csv"))
+        for name in SERVICE_TABLES
+        if os.path.exists(os.path.join(output_dir, f"{name}.csv"))
+    ]
+    return str(max(mtimes)) if mtimes else None
+
+
+def load_tables(output_dir: str) -> dict:
+    """
+    Read the served tables once from the active published snapshot (the event
+    log as its encoded timeline when the run has one)
+    """
+    snapshot_dir = resolve_current(output_dir)
+    tables = {}
+    if os.path.exists(os.path.join(snapshot_dir, EVENT_TIMELINE_FILE)):
+        tables["event_timeline"] = EventTimeline.load(snapshot_dir)
+    for name, date_cols in SERVICE_TABLES.items():
+        if name == "fact_equipment_event_log" and "event_timeline" in tables:
+            continue
+        path = os.path.join(snapshot_dir, f"{name}.csv")
+        if os.path.exists(path):
+            tables[name] = pd.read_csv(path, parse_dates=date_cols, low_memory=False)
+    if "fact_maintenance_event" in tables and os.path.isdir(os.path.join(snapshot_dir, TEXT_INDEX_DIR)):
+        tables["maintenance_search"] = MaintenanceSearch(snapshot_dir, events=tables["fact_maintenance_event"])
+    if os.path.isdir(os.path.join(snapshot_dir, BITMAP_INDEX_DIR)):
+        tables["bitmap_indexes"] = {name: BitmapIndex(snapshot_dir, name) for name in BITMAP_COLUMNS}
+    return tables
+
+
+# ============================
+# QUERY HANDLERS
+# ============================
+
+def _split_list(value):
+    return sorted(v.strip() for v in value.split(",") if v.strip())
+
+
+def normalize_query(path: str, params: dict) -> tuple:
+    """Canonical cache key: path plus sorted, type-normalized parameters"""
+    normalized = {}
+    for key, value in params.items():
+        if key in ("start", "end"):
+            normalized[key] = pd.Timestamp(value).isoformat()
+        elif key == "limit":
+            normalized[key] = int(value)
+        elif key == "q":
+            normalized[key] = " ".join(value.lower().split())
+        elif key in ("type_code", "equipment_name", "category", "delay_type") or key in SLICE_COLUMNS:
+            normalized[key] = ",".join(_split_list(value.upper() if key == "type_code" else value))
+        else:
+            normalized[key] = value
+    return (path.rstrip("/") or "/", tuple(sorted(normalized.items())))
+
+
+def cycle_time_stats(tables: dict, params: dict) -> list:
+    """Cycle time statistics (minutes) by type_code"""
+    coils = tables["fact_production_coil"]
+    if "type_code" in params:
+        index = tables.get("bitmap_indexes", {}).get("fact_production_coil")
+        if index is not None:
+            coils = coils.iloc[index.eq("type_code", *params["type_code"].split(",")).rows()]
+        else:
+            coils = coils[coils["type_code"].isin(params["type_code"].split(","))]
+
+    stats = (
+        coils.groupby("type_code")["total_cycle_time_min"]
+        .agg(["count", "mean", "median", "min", "max"])
+    )
+    stats["p90"] = coils.groupby("type_code")["total_cycle_time_min"].quantile(0.90)
+    stats["pieces_per_hour"] = 60 / stats["mean"]
+    return stats.round(3).reset_index().to_dict(orient="records")
+
+
+def station_utilization(tables: dict, params: dict) -> list:
+    """RUN/IDLE/FAULT time per station, clipped to the [start, end) window"""
+    if "event_timeline" in tables:
+        # State seconds straight from the encoded timeline
+        seconds = tables["event_timeline"].state_seconds(params["start"], params["end"])
+        pivot = seconds.set_index("equipment_name")[["FAULT", "IDLE", "RUN"]]
+        pivot = pivot.loc[pivot.sum(axis=1) > 0, pivot.sum() > 0]
+        pivot.columns.name = "event_type"
+    else:
+        events = tables["fact_equipment_event_log"]
+        start_ns = pd.Timestamp(params["start"]).value
+        end_ns = pd.Timestamp(params["end"]).value
+
+        ev_start = events["event_start_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+        ev_end = events["event_end_ts"].to_numpy(dtype="datetime64[ns]").view("int64")
+        overlap_sec = (np.minimum(ev_end, end_ns) - np.maximum(ev_start, start_ns)) / 1e9
+        in_window = overlap_sec > 0
+
+        window_events = pd.DataFrame({
+            "equipment_name": events["equipment_name"].to_numpy()[in_window],
+            "event_type": events["event_type"].to_numpy()[in_window],
+            "seconds": overlap_sec[in_window],
+        })
+
+        pivot = window_events.pivot_table(
+            index="equipment_name", columns="event_type",
+            values="seconds", aggfunc="sum", fill_value=0
+        )
+    for col in ["RUN", "IDLE", "FAULT"]:
+        if col not in pivot.columns:
+            pivot[col] = 0.0
+    pivot["total"] = pivot[["RUN", "IDLE", "FAULT"]].sum(axis=1)
+    for col in ["RUN", "IDLE", "FAULT"]:
+        pivot[col + "_%"] = 100 * pivot[col] / pivot["total"]
+
+    pivot = pivot.sort_values("RUN_%", ascending=False)
+    return pivot.round(3).reset_index().to_dict(orient="records")
+
+
+def top_faults(tables: dict, params: dict) -> list:
+    """Maintenance downtime ranking by equipment"""
+    maint = tables["fact_maintenance_event"]
+    if "start" in params:
+        maint = maint[maint["start_datetime"] >= pd.Timestamp(params["start"])]
+    if "end" in params:
+        maint = maint[maint["start_datetime"] < pd.Timestamp(params["end"])]
+
+    ranking = (
+        maint.groupby("equipment_name")
+        .agg(events=("duration_hours", "size"),
+             downtime_hours=("duration_hours", "sum"),
+             mean_duration_hours=("duration_hours", "mean"))
+        .sort_values("downtime_hours", ascending=False)
+        .head(int(params.get("limit", 10)))
+    )
+    return ranking.round(3).reset_index().to_dict(orient="records")
+
+
+def search_maintenance(tables: dict, params: dict) -> list:
+    """Maintenance events matching description terms and equipment/date filters (text index)"""
+    search = tables.get("maintenance_search")
+    if search is None:
+        raise ValueError("no text index in the published run")
+    fields = {
+        field: params[field].split(",")
+        for field in ("equipment_name", "category", "delay_type") if field in params
+    }
+    events = search.search(
+        params.get("q"), mode=params.get("mode", "all"),
+        start=params.get("start"), end=params.get("end"), **fields,
+    )
+    events = events.head(int(params.get("limit", 100)))
+    return events.astype(object).where(events.notna(), None).to_dict(orient="records")
+
+
+def slice_counts(tables: dict, params: dict) -> list:
+    """Rows matching indexed column filters (AND over columns, OR within, ! excludes), optionally by a column"""
+    table_name = params.get("table", DEFAULT_SLICE_TABLE)
+    index = tables.get("bitmap_indexes", {}).get(table_name)
+    if index is None:
+        raise ValueError(f"no bitmap index for {table_name} in the published run")
+
+    filters, exclude = {}, {}
+    for column in SLICE_COLUMNS:
+        if column in params and column in index.columns:
+            for value in params[column].split(","):
+                target = exclude if value.startswith("!") else filters
+                target.setdefault(column, []).append(value.lstrip("!"))
+    rows = index.where(filters, exclude)
+
+    if "by" not in params:
+        return [{"table": table_name, "rows": rows.count(), "total_rows": len(index)}]
+    counts = index.counts(params["by"], within=rows)
+    counts = counts[counts > 0].sort_values(ascending=False)
+    return [{params["by"]: value, "rows": int(count)} for value, count in counts.items()]
+
+
+QUERY_HANDLERS = {
+    "/cycle-time": cycle_time_stats,
+    "/utilization": station_utilization,
+    "/top-faults": top_faults,
+    "/search": search_maintenance,
+    "/slice": slice_counts,
+}
+
+
+# ============================
+# HTTP SERVER
+# ============================
+
+class QueryService:
+    """Serves cached aggregations over tables loaded from one pipeline run"""
+
+    def __init__(self, output_dir: str, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.output_dir = output_dir
+        self.cache = LRUCache(cache_size)
+        self.version = None
+        self.tables = {}
+        self._reload_lock = asyncio.Lock()
+
+    async def refresh_if_published(self):
+        """Reload tables and drop cached results when a new run has published"""
+        version = publish_version(self.output_dir)
+        if version == self.version:
+            return
+        async with self._reload_lock:
+            if version == self.version:
+                return
+            loop = asyncio.get_running_loop()
+            self.tables = await loop.run_in_executor(None, load_tables, self.output_dir)
+            self.cache.clear()
+            self.version = version
+            print(f"Loaded tables from {self.output_dir} (version {version})")
+
+    async def handle_query(self, path: str, params: dict):
+        await self.refresh_if_published()
+
+        if path == "/health":
+            return 200, {
+                "status": "ok",
+                "version": self.version,
+                "tables": {name: len(df) for name, df in self.tables.items()},
+                "cache": {"size": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+            }
+
+        handler = QUERY_HANDLERS.get(path)
+        if handler is None:
+            return 404, {"error": f"unknown endpoint {path}"}
+
+        key = normalize_query(path, params)
+        result = self.cache.get(key)
+        if result is None:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, handler, self.tables, dict(key[1]))
+            self.cache.put(key, result)
+        return 200, {"query": dict(key[1]), "rows": result}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Drain headers (no request bodies are accepted)
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            url = urlsplit(target)
+            params = dict(parse_qsl(url.query))
+
+            if method != "GET":
+                status, body = 405, {"error": "only GET is supported"}
+            else:
+                try:
+                    status, body = await self.handle_query(url.path.rstrip("/") or "/", params)
+                except (KeyError, ValueError) as exc:
+                    status, body = 400, {"error": f"bad query: {exc}"}
+        except ValueError:
+            status, body = 400, {"error": "malformed request"}
+        except Exception as exc:
+            # Anything else (a handler bug, an OSError reloading a pruned run)
+            # still gets a response instead of a silently dropped connection
+            status, body = 500, {"error": f"internal error: {type(exc).__name__}: {exc}"}
+
+        try:
+            payload = json.dumps(body, default=str).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        await self.refresh_if_published()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Query service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local query service over pipeline output tables")
+    parser.add_argument("--output-dir", default="output_tables")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE)
+    args = parser.parse_args()
+
+    service = QueryService(args.output_dir, cache_size=args.cache_size)
+    asyncio.run(service.serve(args.host, args.port))
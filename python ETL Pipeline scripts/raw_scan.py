@@ -0,0 +1,103 @@
+# Raw extract scanning with projection and predicate pushdown
+# (used by 01 for single-shot runs and by backfill.py for month partitions)
+#
+# Configuration only at import time: pandas is imported when a scan runs, so
+# the pipeline CLI can read the extract settings without loading it.
+#
+# raw_production_filtered / raw_maintenance_filtered are exported from the
+# scanned frames, so they hold the projected columns below (plus the columns
+# 03 derives), not every column of the extract; 01 lists any extract column
+# that is left out.
+
+PROD_FILE = "coil_production_mar_september_2024.csv"
+MAINT_FILE = "maintenance_downtime_jan_oct_2024.csv"
+
+# Production window (date filter is applied inside the CSV scan)
+FILTER_START = "2024-05-01"
+FILTER_END = "2024-09-30"
+
+# Column projections: only columns used downstream or exported are materialized
+PROD_COLUMNS = [
+    "Production Date", "CID", "UID", "Thickess", "Thick", "Width", "Mass out tons",
+    "Type", "Hours", "Grade", "NextProcess", "Cast", "Slab",
+]
+
+MAINT_COLUMNS = [
+    "Start", "Time (Hours)", "Duration", "Crew", "Shifts", "Category", "Delay Type",
+    "Area", "Sub Area", "Hierachy", "Decription", "Day", "Reasponsible", "Responsible",
+]
+
+# Extract columns that are only passed through to the export: the working fact
+# frames carry a source_row position into df_prod / df_maint instead, and the
+# values are attached when the tables are exported (attach_passthrough)
+PASSTHROUGH_COLUMNS = {
+    "fact_production_coil": ["Cast", "Slab"],
+    "fact_maintenance_event": ["Decription", "Reasponsible", "Responsible"],
+}
+SOURCE_ROW = "source_row"
+
+SCAN_CHUNK_ROWS = 250_000
+SCAN_DATE_FORMAT = "%m/%d/%y %H:%M"
+
+
+def iter_scan_chunks(path: str, columns: list, date_col: str, start: str, end: str,
+                     chunk_rows: int = SCAN_CHUNK_ROWS):
+    """
+    Stream a raw extract in chunks:
+    - Only projected columns are parsed (names matched after whitespace strip)
+    - The datetime column is parsed once, per chunk
+    - Rows outside [start, end] are dropped per chunk
+    Yields (filtered chunk, rows scanned in the chunk); the chunk index is the
+    row position in the file.
+    """
+    import pandas as pd
+
+    wanted = set(columns)
+    reader = pd.read_csv(
+        path,
+        encoding="utf-8-sig",
+        usecols=lambda c: c.strip() in wanted,
+        chunksize=chunk_rows,
+    )
+
+    for chunk in reader:
+        chunk.columns = chunk.columns.str.strip()
+        chunk[date_col] = pd.to_datetime(chunk[date_col], format=SCAN_DATE_FORMAT, errors="coerce")
+        in_window = (chunk[date_col] >= start) & (chunk[date_col] <= end)
+        yield chunk[in_window], len(chunk)
+
+
+def scan_csv(path: str, columns: list, date_col: str, start: str, end: str):
+    """Filtered extract as one frame; returns (frame, total rows scanned)"""
+    import pandas as pd
+
+    chunks = []
+    scanned_rows = 0
+    for chunk, rows in iter_scan_chunks(path, columns, date_col, start, end):
+        chunks.append(chunk)
+        scanned_rows += rows
+    return pd.concat(chunks, ignore_index=True), scanned_rows
+
+
+def unprojected_columns(path: str, columns: list) -> list:
+    """Extract columns (header only) that the projection leaves out"""
+    import pandas as pd
+
+    header = pd.read_csv(path, encoding="utf-8-sig", nrows=0).columns.str.strip()
+    wanted = set(columns)
+    return [col for col in header if col not in wanted]
+
+
+def attach_passthrough(table_df, raw_df, table_name: str, base_columns: list):
+    """
+    Export form of a working fact frame: source_row replaced by the raw extract
+    values. Columns follow base_columns (the table as built, pass-through
+    columns in place), then the columns later stages appended.
+    """
+    rows = table_df[SOURCE_ROW].to_numpy()
+    values = {
+        col: raw_df[col].iloc[rows].set_axis(table_df.index)
+        for col in PASSTHROUGH_COLUMNS[table_name]
+    }
+    appended = [col for col in table_df.columns if col not in base_columns and col != SOURCE_ROW]
+    return table_df.drop(columns=SOURCE_ROW).assign(**values)[list(base_columns) + appended]
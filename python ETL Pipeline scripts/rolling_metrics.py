@@ -0,0 +1,210 @@
+# Rolling-window tempo metrics over the sorted completion timeline
+#
+# For every completed coil, tempo over the window that ends at its completion,
+# per scope (whole line, crew shift_code, type_code):
+# - pieces/hour, mass tons/hour, prime rate, median and max completion gap
+# Windows: trailing 15 min and 1 h, and the running crew shift (starting at
+# 06:00 / 18:00, as the crew assignment in 09).
+#
+# Each scope group is one sorted completion array. Window starts are
+# non-decreasing along it, so the window's first coil follows from one merge of
+# the window starts into the array (two pointers, done by searchsorted). Counts
+# are index differences; mass is summed per window with one reduceat over
+# interleaved (first, last + 1) bounds, so a window's sum depends only on its
+# own coils (no prefix-sum rounding drift). Gap median/max read each window
+# from a padded block (windows hold few coils; blocks bound the memory), or,
+# for groups with long windows, from one sorted-list sweep.
+#
+# Used by 11 (after gap cleaning); backfill.py passes the previous month's last
+# shift of coils as history so windows continue across month partitions.
+
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from time_model import MS_PER_MIN, NAT_MS, from_epoch_ms, to_epoch_ms
+
+# Window name -> trailing length in minutes (None: running crew shift)
+ROLLING_WINDOWS = {"15min": 15, "1h": 60, "shift": None}
+ROLLING_SCOPES = ["line", "shift_code", "type_code"]
+LINE_SCOPE_VALUE = "ALL"
+
+SHIFT_HOURS = 12
+SHIFT_START_HOUR = 6
+# Running shift rates use at least this much elapsed time (first coils of a shift)
+MIN_SHIFT_ELAPSED_MIN = 15
+
+# Coils kept as history for the next partition (longest window)
+LOOKBACK_MS = max(SHIFT_HOURS * 60, *(w for w in ROLLING_WINDOWS.values() if w)) * MS_PER_MIN
+
+# Window gap medians: padded blocks (cells) up to this many coils per window,
+# a sorted-list sweep beyond
+GAP_BLOCK_CELLS = 4_000_000
+PADDED_WINDOW_MAX = 256
+
+ROLLING_COLUMNS = [
+    "coil_id", "completion_ts", "production_date", "shift_code", "type_code",
+    "mass_out_tons", "is_prime", "gap_from_prev_completion_min",
+]
+
+
+def shift_start_ms(ts_ms: np.ndarray) -> np.ndarray:
+    """Start of the 12-hour crew shift containing each timestamp"""
+    shift_ms = SHIFT_HOURS * 60 * MS_PER_MIN
+    offset_ms = SHIFT_START_HOUR * 60 * MS_PER_MIN
+    return (ts_ms - offset_ms) // shift_ms * shift_ms + offset_ms
+
+
+def _window_gap_stats(first: np.ndarray, gaps: np.ndarray):
+    """Median and max of gaps[first[i]:i + 1] for every position i (NaN-aware)"""
+    n = len(first)
+    median = np.full(n, np.nan)
+    maximum = np.full(n, np.nan)
+    if n == 0:
+        return median, maximum
+
+    length = np.arange(n) - first + 1
+    if length.max() > PADDED_WINDOW_MAX:
+        return _sweep_gap_stats(first, gaps)
+
+    # Rows sorted with NaN last: median and max by each row's valid count
+    block = max(1, GAP_BLOCK_CELLS // int(length.max()))
+    for lo in range(0, n, block):
+        hi = min(n, lo + block)
+        idx = first[lo:hi, None] + np.arange(int(length[lo:hi].max()))
+        values = np.sort(
+            np.where(idx <= np.arange(lo, hi)[:, None], gaps[np.minimum(idx, n - 1)], np.nan), axis=1
+        )
+        valid = (~np.isnan(values)).sum(axis=1)
+        rows = np.flatnonzero(valid)
+        low = values[rows, (valid[rows] - 1) // 2]
+        high = values[rows, valid[rows] // 2]
+        median[lo + rows] = (low + high) / 2
+        maximum[lo + rows] = values[rows, valid[rows] - 1]
+    return median, maximum
+
+
+def _sweep_gap_stats(first: np.ndarray, gaps: np.ndarray):
+    """
+    Same as _window_gap_stats for long windows: one two-pointer sweep keeping
+    the window's gaps in a sorted list (insert on entry, remove on exit)
+    """
+    n = len(first)
+    median = np.full(n, np.nan)
+    maximum = np.full(n, np.nan)
+    window = []
+    left = 0
+    gap_list = gaps.tolist()
+    for i, lo in enumerate(first.tolist()):
+        if gap_list[i] == gap_list[i]:
+            bisect.insort(window, gap_list[i])
+        while left < lo:
+            if gap_list[left] == gap_list[left]:
+                del window[bisect.bisect_left(window, gap_list[left])]
+            left += 1
+        size = len(window)
+        if size:
+            half = size // 2
+            median[i] = window[half] if size % 2 else (window[half - 1] + window[half]) / 2
+            maximum[i] = window[-1]
+    return median, maximum
+
+
+def _group_windows(ts_ms, mass, prime, gaps):
+    """Metrics of every window for one sorted scope group: {window: columns}"""
+    n = len(ts_ms)
+    position = np.arange(n)
+    mass_padded = np.r_[mass, 0.0]
+    prime_sum = np.r_[0, np.cumsum(prime)]
+
+    results = {}
+    for window, minutes in ROLLING_WINDOWS.items():
+        if minutes is None:
+            window_start = shift_start_ms(ts_ms)
+            first = np.searchsorted(ts_ms, window_start, side="left")
+            hours = np.maximum(ts_ms - window_start, MIN_SHIFT_ELAPSED_MIN * MS_PER_MIN) / (60 * MS_PER_MIN)
+        else:
+            window_start = ts_ms - minutes * MS_PER_MIN
+            first = np.searchsorted(ts_ms, window_start, side="right")
+            hours = np.full(n, minutes / 60)
+
+        pieces = position - first + 1
+        mass_tons = np.add.reduceat(mass_padded, np.column_stack([first, position + 1]).ravel())[::2]
+        median_gap, max_gap = _window_gap_stats(first, gaps)
+        results[window] = {
+            "window_start_ts": window_start,
+            "pieces": pieces,
+            "mass_tons": mass_tons,
+            "pieces_per_hour": pieces / hours,
+            "mass_tons_per_hour": mass_tons / hours,
+            "prime_rate_pct": 100 * (prime_sum[position + 1] - prime_sum[first]) / pieces,
+            "median_gap_min": median_gap,
+            "max_gap_min": max_gap,
+        }
+    return results
+
+
+def build_tempo_rolling(coils: pd.DataFrame, history: pd.DataFrame = None):
+    """
+    Rolling tempo table for the coils (sorted by completion_ts; coils without
+    a completion are skipped), one row per coil × scope × window in coil order.
+    history: earlier coils (ROLLING_COLUMNS) that windows may reach back into;
+    no rows are emitted for them.
+    Returns (table, history for the next partition).
+    """
+    frame = coils[ROLLING_COLUMNS]
+    ts_ms = to_epoch_ms(frame["completion_ts"])
+    frame, ts_ms = frame[ts_ms != NAT_MS], ts_ms[ts_ms != NAT_MS]
+    emitted = 0
+    if history is not None and len(history):
+        frame = pd.concat([history, frame], ignore_index=True)
+        ts_ms = np.r_[to_epoch_ms(history["completion_ts"]), ts_ms]
+        emitted = len(history)
+    frame = frame.reset_index(drop=True)
+
+    mass = np.nan_to_num(frame["mass_out_tons"].to_numpy(dtype=np.float64))
+    prime = frame["is_prime"].to_numpy(dtype=np.int64)
+    gaps = frame["gap_from_prev_completion_min"].to_numpy(dtype=np.float64)
+
+    parts = []
+    for scope_rank, scope in enumerate(ROLLING_SCOPES):
+        if scope == "line":
+            groups = [(LINE_SCOPE_VALUE, np.arange(len(frame)))]
+        else:
+            codes, values = pd.factorize(frame[scope].astype(str), sort=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.flatnonzero(np.r_[True, codes[order][1:] != codes[order][:-1], True])
+            groups = [(values[codes[order[lo]]], order[lo:hi]) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+        for scope_value, rows in groups:
+            keep = rows >= emitted
+            for window_rank, (window, metrics) in enumerate(
+                _group_windows(ts_ms[rows], mass[rows], prime[rows], gaps[rows]).items()
+            ):
+                part = {col: column[keep] for col, column in metrics.items()}
+                part.update(row=rows[keep], scope_rank=scope_rank, window_rank=window_rank,
+                            scope=scope, scope_value=scope_value, window=window)
+                parts.append(pd.DataFrame(part))
+
+    columns = [
+        "coil_id", "completion_ts", "production_date", "shift_code", "scope", "scope_value", "window",
+        "window_start_ts", "pieces", "mass_tons", "pieces_per_hour", "mass_tons_per_hour",
+        "prime_rate_pct", "median_gap_min", "max_gap_min",
+    ]
+    if parts:
+        table = pd.concat(parts, ignore_index=True)
+        table = table.iloc[np.lexsort((table["window_rank"], table["scope_rank"], table["row"]))]
+        rows = table["row"].to_numpy()
+        table = table.assign(
+            coil_id=frame["coil_id"].to_numpy()[rows],
+            completion_ts=from_epoch_ms(ts_ms[rows]),
+            production_date=frame["production_date"].to_numpy()[rows],
+            shift_code=frame["shift_code"].to_numpy()[rows],
+            window_start_ts=from_epoch_ms(table["window_start_ts"].to_numpy(dtype=np.int64)),
+        )[columns].reset_index(drop=True)
+    else:
+        table = pd.DataFrame(columns=columns)
+
+    carry = frame[ts_ms >= ts_ms[-1] - LOOKBACK_MS] if len(frame) else frame
+    return table, carry.reset_index(drop=True)
@@ -0,0 +1,283 @@
+# Monte Carlo what-if scenarios for the synthetic operation model
+#
+# Each scenario is a set of overrides on the line model (line_model.py). The
+# operation model (operation_model.py, as in 08/09 and the calibration) is
+# re-run N times per scenario with independent seeds, fully vectorized over
+# coils × stations: station durations, the no-wait spacing of consecutive
+# completions and the idle delay before entry. The metrics are summarised with
+# confidence intervals. Scenarios are distributed over a process pool; the
+# coil inputs are sent to each worker once, not per scenario.
+#
+# Override keys:
+#   duration_scale.<station>       multiply the station's base duration range
+#   duration_range.<station>       replace the base range, e.g. [100, 200]
+#   shift_multiplier.<crew>        crew performance multiplier
+#   mix_factor_range.<band>        thin_narrow / thick_wide / other, e.g. [0.6, 0.8]
+#   bottleneck_factor              duration factor for modelled constraints
+#   idle_probability, idle_mean_min  line starvation before entry
+#
+# Usage (in the pipeline session after 07, reusing the cleaned coils):
+#   from scenario_runner import prepare_coil_inputs, build_scenarios, run_scenarios
+#   inputs = prepare_coil_inputs(fact_production_coil, line_equipment, date_to_crews)
+#   grid = {"duration_scale.Temper Mill Unit": [1.0, 0.85]}
+#   summary = run_scenarios(inputs, build_scenarios(grid), n_runs=200)
+#
+# Or from the published tables:
+#   python scenario_runner.py --grid grid.json --runs 200 --workers 8
+
+import os
+import json
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import line_model
+from product_bands import MIX_BANDS, band_codes
+from operation_model import operation_durations, no_wait_spacing, idle_delays
+from time_model import to_day_number, to_epoch_ms
+
+DEFAULT_RUNS = 100
+DEFAULT_SEED = 2024
+COIL_CHUNK_ROWS = 200_000
+
+
+def base_parameters() -> dict:
+    """Line model parameters as a plain (picklable, overridable) dict"""
+    return {
+        "duration_ranges": {k: tuple(v) for k, v in line_model.DURATION_RANGES.items()},
+        "default_range": tuple(line_model.DEFAULT_RANGE),
+        "shift_multiplier": dict(line_model.SHIFT_MULTIPLIER),
+        "mix_factor_ranges": {k: tuple(v) for k, v in line_model.MIX_FACTOR_RANGES.items()},
+        "bottleneck_factor": line_model.BOTTLENECK_DURATION_FACTOR,
+        "idle_probability": line_model.IDLE_PROBABILITY,
+        "idle_mean_min": line_model.IDLE_MEAN_MIN,
+    }
+
+
+def apply_overrides(params: dict, overrides: dict) -> dict:
+    """Return a copy of params with scenario overrides applied"""
+    params = json.loads(json.dumps(params))
+    for key, value in overrides.items():
+        kind, _, target = key.partition(".")
+        if kind == "duration_scale":
+            low, high = params["duration_ranges"].get(target, params["default_range"])
+            params["duration_ranges"][target] = (low * value, high * value)
+        elif kind == "duration_range":
+            params["duration_ranges"][target] = tuple(value)
+        elif kind == "shift_multiplier":
+            params["shift_multiplier"][target] = value
+        elif kind == "mix_factor_range":
+            if target not in MIX_BANDS:
+                raise ValueError(f"Unknown product mix band: {target}")
+            params["mix_factor_ranges"][target] = tuple(value)
+        elif kind in ("bottleneck_factor", "idle_probability", "idle_mean_min"):
+            params[kind] = value
+        else:
+            raise ValueError(f"Unknown scenario override: {key}")
+    return params
+
+
+def build_scenarios(grid: dict) -> list:
+    """Cartesian product of override values -> list of {name, overrides}"""
+    keys = list(grid)
+    scenarios = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        overrides = dict(zip(keys, values))
+        name = ", ".join(f"{k}={v}" for k, v in overrides.items()) or "baseline"
+        scenarios.append({"name": name, "overrides": overrides})
+    return scenarios
+
+
+def prepare_coil_inputs(coils: pd.DataFrame, stations: pd.DataFrame, date_to_crews: dict = None) -> dict:
+    """
+    Extract the arrays the generator needs, once:
+    - product band code per coil, factorized shift code per coil
+    - station names and modelled constraint flags in process order
+    - observed production span (hours) for utilization
+    Shift codes come from date_to_crews (as in 09) or the coil shift_code column.
+    """
+    coils = coils[coils["completion_ts"].notna()]
+    band = band_codes(coils["thickness_mm"], coils["width_mm"])
+
+    completion_ts = pd.to_datetime(coils["completion_ts"])
+    if date_to_crews is not None:
+        days = to_day_number(to_epoch_ms(completion_ts))
+        crews = [date_to_crews.get(d, ("A", "B")) for d in days.tolist()]
+        is_day = ((completion_ts.dt.hour >= 6) & (completion_ts.dt.hour < 18)).to_numpy()
+        shift_code = np.where(is_day, [c[0] for c in crews], [c[1] for c in crews])
+    else:
+        shift_code = coils["shift_code"].astype(str).to_numpy()
+
+    shift_idx, shift_labels = pd.factorize(pd.Series(shift_code))
+    stations = stations.sort_values("process_order")
+    span_hours = (completion_ts.max() - completion_ts.min()).total_seconds() / 3600.0
+
+    return {
+        "band": band,
+        "shift_idx": shift_idx,
+        "shift_labels": list(shift_labels),
+        "station_names": stations["equipment_name"].tolist(),
+        "is_constraint": stations["equipment_name"].map(line_model.MODELLED_CONSTRAINTS).fillna(False).to_numpy(dtype=bool),
+        "span_hours": max(span_hours, 1e-9),
+    }
+
+
+def simulate_run(inputs: dict, params: dict, rng: np.random.Generator) -> dict:
+    """
+    One run of the operation model (operation_model.py, as in 08/09):
+    duration = U(base range) × U(mix band range) × shift factor × constraint factor,
+    completions no_wait_spacing apart plus the idle delay before entry.
+    Returns line and per-station metrics.
+    """
+    names = inputs["station_names"]
+    ranges = [params["duration_ranges"].get(n, params["default_range"]) for n in names]
+    station_factor = np.where(inputs["is_constraint"], params["bottleneck_factor"], 1.0)
+
+    shift_lookup = params["shift_multiplier"]
+    shift_factor_all = np.array(
+        [shift_lookup.get(c, 1.0) for c in inputs["shift_labels"]]
+    )[inputs["shift_idx"]]
+
+    n_coils = len(inputs["band"])
+    cycle_sec_sum = gap_sec_sum = 0.0
+    station_sec = np.zeros(len(names))
+    previous = None
+
+    for start in range(0, n_coils, COIL_CHUNK_ROWS):
+        stop = min(start + COIL_CHUNK_ROWS, n_coils)
+        unit = rng.uniform(size=(stop - start, 2, len(names)))
+        durations = operation_durations(
+            unit, ranges, params["mix_factor_ranges"], inputs["band"][start:stop],
+            shift_factor_all[start:stop], station_factor,
+        )
+        idle = idle_delays(rng.uniform(size=stop - start), rng.exponential(size=stop - start),
+                           params["idle_probability"], params["idle_mean_min"])
+
+        station_sec += durations.sum(axis=0)
+        cycle_sec_sum += durations.sum()
+        gap_sec_sum += (no_wait_spacing(durations, previous) + idle).sum()
+        previous = durations[-1]
+
+    mean_cycle_min = cycle_sec_sum / max(n_coils, 1) / 60.0
+    mean_gap_min = gap_sec_sum / max(n_coils, 1) / 60.0
+    station_mean_sec = station_sec / max(n_coils, 1)
+
+    return {
+        "mean_cycle_time_min": mean_cycle_min,
+        "mean_completion_gap_min": mean_gap_min,
+        "implied_pieces_per_hour": 60.0 / mean_gap_min,
+        "bottleneck_capacity_pph": 3600.0 / station_mean_sec.max(),
+        "station_utilization_pct": 100 * station_sec / 3600.0 / inputs["span_hours"],
+    }
+
+
+# Worker state: coil inputs are installed once per process by the pool initializer
+_WORKER_INPUTS = None
+
+
+def _init_worker(inputs: dict):
+    global _WORKER_INPUTS
+    _WORKER_INPUTS = inputs
+
+
+def _run_scenario(task: tuple) -> list:
+    scenario_id, params, n_runs, seed_seq = task
+    rows = []
+    for run_id, child in enumerate(seed_seq.spawn(n_runs)):
+        metrics = simulate_run(_WORKER_INPUTS, params, np.random.default_rng(child))
+        row = {"scenario_id": scenario_id, "run_id": run_id}
+        row.update({k: v for k, v in metrics.items() if k != "station_utilization_pct"})
+        for name, util in zip(_WORKER_INPUTS["station_names"], metrics["station_utilization_pct"]):
+            row[f"util_pct::{name}"] = util
+        rows.append(row)
+    return rows
+
+
+def summarise_runs(runs: pd.DataFrame, scenarios: list) -> pd.DataFrame:
+    """Mean, 95% CI of the mean and 2.5–97.5% run interval per scenario and metric"""
+    metric_cols = [c for c in runs.columns if c not in ("scenario_id", "run_id")]
+    long = runs.melt(id_vars=["scenario_id"], value_vars=metric_cols, var_name="metric")
+    grouped = long.groupby(["scenario_id", "metric"])["value"]
+
+    summary = grouped.agg(["count", "mean", "std"])
+    summary["p025"] = grouped.quantile(0.025)
+    summary["p975"] = grouped.quantile(0.975)
+    half_width = 1.96 * summary["std"] / np.sqrt(summary["count"])
+    summary["ci95_low"] = summary["mean"] - half_width
+    summary["ci95_high"] = summary["mean"] + half_width
+    summary = summary.reset_index()
+
+    summary["scenario"] = summary["scenario_id"].map({i: s["name"] for i, s in enumerate(scenarios)})
+    station = summary["metric"].str.partition("::")[2]
+    summary["station"] = station.where(station != "")
+    summary["metric"] = summary["metric"].str.partition("::")[0]
+    return summary[[
+        "scenario_id", "scenario", "metric", "station", "count",
+        "mean", "std", "ci95_low", "ci95_high", "p025", "p975",
+    ]]
+
+
+def run_scenarios(inputs: dict, scenarios: list, n_runs: int = DEFAULT_RUNS,
+                  seed: int = DEFAULT_SEED, workers: int = None,
+                  base_params: dict = None) -> pd.DataFrame:
+    """
+    Run every scenario n_runs times with independent seeds (one SeedSequence
+    per scenario, one child per run) and summarise the metrics.
+    """
+    base_params = base_params or base_parameters()
+    seed_seqs = np.random.SeedSequence(seed).spawn(len(scenarios))
+    tasks = [
+        (i, apply_overrides(base_params, s["overrides"]), n_runs, seed_seqs[i])
+        for i, s in enumerate(scenarios)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(inputs)
+        results = [_run_scenario(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(inputs,)) as pool:
+            results = list(pool.map(_run_scenario, tasks))
+
+    runs = pd.DataFrame([row for rows in results for row in rows])
+    return summarise_runs(runs, scenarios)
+
+
+if __name__ == "__main__":
+    from publish import resolve_current
+
+    parser = argparse.ArgumentParser(description="Monte Carlo what-if scenarios over the line model")
+    parser.add_argument("--grid", required=True, help="JSON file: {override_key: [values, ...]}")
+    parser.add_argument("--output-dir", default="output_tables")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="scenario_summary.csv")
+    args = parser.parse_args()
+
+    snapshot_dir = resolve_current(args.output_dir)
+    coils = pd.read_csv(
+        os.path.join(snapshot_dir, "fact_production_coil.csv"),
+        usecols=["completion_ts", "thickness_mm", "width_mm", "shift_code"],
+        parse_dates=["completion_ts"],
+    )
+    equipment = pd.read_csv(os.path.join(snapshot_dir, "dim_equipment.csv"))
+    stations = equipment.dropna(subset=["process_order"])
+
+    with open(args.grid, encoding="utf-8") as fh:
+        grid = json.load(fh)
+
+    scenarios = build_scenarios(grid)
+    print(f"Running {len(scenarios)} scenarios × {args.runs} runs on {len(coils):,} coils")
+
+    summary = run_scenarios(prepare_coil_inputs(coils, stations), scenarios,
+                            n_runs=args.runs, seed=args.seed, workers=args.workers)
+    summary.to_csv(args.out, index=False)
+
+    line_metrics = summary[summary["station"].isna()]
+    print(line_metrics.pivot(index="scenario", columns="metric", values="mean").round(3))
+    print(f"\n✓ Scenario summary written to {args.out}")
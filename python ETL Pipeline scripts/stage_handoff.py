@@ -0,0 +1,525 @@
+# Zero-copy handoff of stage output tables between processes (shared memory)
+#
+# A stage's DataFrames are published once into named shared memory: every
+# column buffer is packed into one segment per table, described by a small
+# JSON descriptor. Consumer processes attach by name and get read-only
+# DataFrames whose columns are views on the segment: nothing is pickled or
+# copied, however many consumers attach.
+# - numeric, bool and datetime columns: the raw NumPy buffer
+# - nullable (masked) columns: values and mask buffers
+# - categorical columns: the codes; string / object columns are published
+#   dictionary-encoded (sorted categories) and attach as categoricals (their
+#   producer dtypes in frame.attrs["source_dtypes"]). The codes are shared;
+#   only the dictionary is decoded in each consumer. Consumers that persist
+#   tables (13) call restore_source_dtypes first, so what they write does not
+#   depend on the execution mode
+# - RangeIndex as parameters, a numeric / datetime index as a buffer,
+#   any other flat index pickled (labels of small aggregate tables)
+# Arrow / pyarrow is not used: it is not a dependency of the pipeline.
+#
+# Lifetime is reference counted with lease files next to the descriptor
+# (<registry>/<name>.refs/<pid>-<token>): the publisher and every attached
+# consumer hold one lease; whoever drops the last one unlinks the segment.
+# Leases of dead processes are reaped before the next publish, so a crashed
+# stage does not leak shared memory. Attaching after the count reached zero
+# fails (the descriptor is gone).
+#
+# run_concurrent_stages runs stage scripts (e.g. 12 validation and 13
+# export) in parallel processes on the shared tables of one namespace.
+#
+# Usage:
+#   from stage_handoff import publish, attach
+#   producer = publish(fact_equipment_event_log, "event_log")   # holds a lease
+#   with attach("event_log") as handoff:                         # another process
+#       events = handoff.frame
+#   producer.release()
+#
+#   python pipeline.py --concurrent 12,13 --seed 2024
+
+import os
+import sys
+import json
+import time
+import types
+import pickle
+import marshal
+import secrets
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), "stage_handoff")
+ALIGN_BYTES = 64
+NUMPY_KINDS = "biufcmM"
+
+# Mappings whose buffers are still exported (views alive) when released;
+# closed on a later release instead of raising in SharedMemory.__del__
+_PINNED = []
+
+
+def _open_segment(name: str, size: int = 0, create: bool = False) -> shared_memory.SharedMemory:
+    """Shared memory segment whose lifetime is ours (lease counted), not the resource tracker's"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _unlink_segment(name: str):
+    try:
+        if sys.version_info >= (3, 13):
+            segment = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            # Left registered: unlink() unregisters it from the resource tracker again
+            segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    segment.close()
+    segment.unlink()
+
+
+def _close_segment(segment: shared_memory.SharedMemory):
+    _PINNED.append(segment)
+    for pinned in list(_PINNED):
+        try:
+            pinned.close()
+            _PINNED.remove(pinned)
+        except BufferError:
+            pass
+
+
+# ============================
+# COLUMN ENCODING
+# ============================
+
+def _code_dtype(n_categories: int):
+    """Categorical code width pandas uses itself (so codes attach without a copy)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _values_parts(values) -> tuple:
+    """Plain values (categories, index labels) as (spec, buffers)"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in NUMPY_KINDS:
+        return {"kind": "numpy"}, [np.ascontiguousarray(values)]
+    values = np.asarray(values, dtype=object)
+    if all(isinstance(v, str) for v in values):
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(v) for v in encoded], out=offsets[1:])
+        return {"kind": "utf8"}, [offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+    return {"kind": "pickle"}, [np.frombuffer(pickle.dumps(values), dtype=np.uint8)]
+
+
+def _column_parts(series: pd.Series) -> tuple:
+    """
+    One column as (spec, buffers): spec is JSON-able and describes how the
+    buffers (contiguous arrays copied into the segment) become the column
+    """
+    values = series.array
+    if hasattr(values, "_mask"):
+        return {"kind": "masked", "dtype": str(series.dtype)}, [np.asarray(values._data), np.asarray(values._mask)]
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in NUMPY_KINDS:
+        return {"kind": "numpy"}, [np.ascontiguousarray(series.to_numpy())]
+
+    if not isinstance(values, pd.Categorical):
+        # str / object columns: dictionary-encoded, sorted so category order is lexical order
+        objects = series.to_numpy(dtype=object)
+        try:
+            codes, uniques = pd.factorize(objects, sort=True)
+        except TypeError:
+            codes, uniques = pd.factorize(objects)
+        dtype = series.dtype if series.dtype == "str" else object
+        values = pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=dtype), validate=False)
+
+    categories, parts = _values_parts(values.categories.to_numpy())
+    codes = values.codes.astype(_code_dtype(len(values.categories)), copy=False)
+    spec = {"kind": "category", "ordered": bool(values.ordered), "source_dtype": str(series.dtype),
+            "categories": categories, "categories_dtype": str(values.categories.dtype)}
+    return spec, [codes] + parts
+
+
+def _view(buffer, layout: dict) -> np.ndarray:
+    array = np.ndarray(layout["shape"], dtype=np.dtype(layout["dtype"]), buffer=buffer, offset=layout["offset"])
+    array.flags.writeable = False
+    return array
+
+
+def _decode_values(spec: dict, arrays: list):
+    """Column values from a spec and its buffer views (consumes arrays in order)"""
+    kind = spec["kind"]
+    if kind == "numpy":
+        return arrays.pop(0)
+    if kind == "masked":
+        data, mask = arrays.pop(0), arrays.pop(0)
+        return pd.api.types.pandas_dtype(spec["dtype"]).construct_array_type()(data, mask)
+    if kind == "category":
+        codes = arrays.pop(0)
+        categories = pd.Index(_decode_values(spec["categories"], arrays), dtype=spec["categories_dtype"])
+        dtype = pd.CategoricalDtype(categories, ordered=spec["ordered"])
+        return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    if kind == "utf8":
+        offsets, blob = arrays.pop(0).tolist(), arrays.pop(0).tobytes()
+        return np.array([blob[a:b].decode("utf-8") for a, b in zip(offsets[:-1], offsets[1:])], dtype=object)
+    if kind == "pickle":
+        return pickle.loads(arrays.pop(0).tobytes())
+    raise ValueError(f"Unknown handoff column kind: {kind}")
+
+
+def shareable(obj) -> bool:
+    """Frames / series with flat string labels and a flat index (others are pickled by callers)"""
+    if isinstance(obj, pd.Series):
+        obj = obj.to_frame(name="__series__")
+    if not isinstance(obj, pd.DataFrame):
+        return False
+    return (not isinstance(obj.index, pd.MultiIndex) and not isinstance(obj.columns, pd.MultiIndex)
+            and all(isinstance(c, str) for c in obj.columns) and obj.columns.is_unique)
+
+
+# ============================
+# PUBLISH / ATTACH
+# ============================
+
+def _paths(name: str, registry_dir: str) -> tuple:
+    return os.path.join(registry_dir, f"{name}.json"), os.path.join(registry_dir, f"{name}.refs")
+
+
+def _add_lease(refs_dir: str) -> str:
+    path = os.path.join(refs_dir, f"{os.getpid()}-{secrets.token_hex(4)}")
+    with open(path, "x"):
+        pass
+    return path
+
+
+def _leases(refs_dir: str) -> list:
+    try:
+        return os.listdir(refs_dir)
+    except FileNotFoundError:
+        return []
+
+
+def _drop_lease(lease_path: str, descriptor: dict, registry_dir: str):
+    """Remove one lease; the holder of the last one removes the descriptor, then the segment"""
+    descriptor_path, refs_dir = _paths(descriptor["name"], registry_dir)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(lease_path)
+    if _leases(refs_dir):
+        return
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(descriptor_path)
+    # Re-check after the descriptor is gone: a consumer that leased in between owns the cleanup
+    if not _leases(refs_dir):
+        _unlink_segment(descriptor["segment"])
+        with contextlib.suppress(OSError):
+            os.rmdir(refs_dir)
+
+
+class Handoff:
+    """One lease on a published table: the publisher's or a consumer's read-only view"""
+
+    def __init__(self, descriptor: dict, lease_path: str, registry_dir: str, segment=None):
+        self.descriptor = descriptor
+        self.name = descriptor["name"]
+        self.registry_dir = registry_dir
+        self.lease_path = lease_path
+        self.segment = segment
+        self.frame = None
+        if segment is not None:
+            self.frame = _decode_frame(descriptor, segment.buf)
+
+    def release(self):
+        """Drop this lease (idempotent). Views handed out must not be used afterwards."""
+        if self.lease_path is None:
+            return
+        self.frame = None
+        if self.segment is not None:
+            _close_segment(self.segment)
+            self.segment = None
+        _drop_lease(self.lease_path, self.descriptor, self.registry_dir)
+        self.lease_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __repr__(self):
+        return f"Handoff({self.name!r}, {self.descriptor['rows']:,} rows, {self.descriptor['size']:,} bytes)"
+
+
+def _decode_frame(descriptor: dict, buffer):
+    arrays = [_view(buffer, layout) for layout in descriptor["buffers"]]
+    columns = {}
+    for column in descriptor["columns"]:
+        columns[column["name"]] = _decode_values(column["spec"], arrays)
+
+    index = descriptor["index"]
+    if index["kind"] == "range":
+        frame = pd.DataFrame(columns, index=pd.RangeIndex(index["start"], index["stop"], index["step"]), copy=False)
+    else:
+        frame = pd.DataFrame(columns, index=pd.Index(_decode_values(index["spec"], arrays), copy=False),
+                             copy=False)
+    frame.index.name = index["name"]
+
+    # Producer dtypes of dictionary-encoded columns (publish.table_content_hash
+    # hashes the schema as produced, so reuse across runs is unaffected)
+    frame.attrs["source_dtypes"] = {
+        column["name"]: column["spec"]["source_dtype"] for column in descriptor["columns"]
+        if column["spec"]["kind"] == "category"
+    }
+    if descriptor["kind"] == "series":
+        return frame["__series__"].rename(descriptor["series_name"])
+    return frame
+
+
+def restore_source_dtypes(frame):
+    """
+    An attached frame with its dictionary-encoded columns decoded back to the
+    producer dtypes (only those columns are copied); any other object as is
+    """
+    source_dtypes = frame.attrs.get("source_dtypes") if isinstance(frame, pd.DataFrame) else None
+    if not source_dtypes:
+        return frame
+    def decoded(col, dtype):
+        values = frame[col].astype(dtype)
+        # object columns: missing values as None (as the stages build them)
+        return values.where(values.notna(), None) if dtype == "object" else values
+
+    restored = frame.assign(**{
+        col: decoded(col, dtype) for col, dtype in source_dtypes.items() if str(frame[col].dtype) != dtype
+    })
+    restored.attrs = {key: value for key, value in frame.attrs.items() if key != "source_dtypes"}
+    return restored
+
+
+def publish(obj, name: str, registry_dir: str = REGISTRY_DIR) -> Handoff:
+    """
+    Copy a DataFrame (or Series) into one shared memory segment and register
+    it under name. Returns the publisher's lease; release it once consumers
+    have attached (or are done).
+    """
+    if not shareable(obj):
+        raise TypeError(f"{name}: only flat DataFrames / Series with string column labels can be shared")
+    os.makedirs(registry_dir, exist_ok=True)
+    reap_handoffs(registry_dir)
+
+    kind, series_name = "frame", None
+    if isinstance(obj, pd.Series):
+        kind, series_name, obj = "series", obj.name, obj.to_frame(name="__series__")
+
+    columns, buffers = [], []
+    for label in obj.columns:
+        spec, parts = _column_parts(obj[label])
+        columns.append({"name": label, "spec": spec})
+        buffers += parts
+    if isinstance(obj.index, pd.RangeIndex):
+        index = {"kind": "range", "start": obj.index.start, "stop": obj.index.stop, "step": obj.index.step}
+    elif isinstance(obj.index.dtype, np.dtype) and obj.index.dtype.kind in NUMPY_KINDS:
+        index = {"kind": "values", "spec": {"kind": "numpy"}}
+        buffers.append(np.ascontiguousarray(obj.index.to_numpy()))
+    else:
+        # String, categorical, interval ... labels: the Index object itself
+        index = {"kind": "values", "spec": {"kind": "pickle"}}
+        buffers.append(np.frombuffer(pickle.dumps(obj.index), dtype=np.uint8))
+    index["name"] = obj.index.name
+
+    layouts, offset = [], 0
+    for array in buffers:
+        layouts.append({"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str})
+        offset += -(-max(array.nbytes, 1) // ALIGN_BYTES) * ALIGN_BYTES
+
+    segment_name = f"hs{secrets.token_hex(6)}"
+    segment = _open_segment(segment_name, size=max(offset, 1), create=True)
+    for array, layout in zip(buffers, layouts):
+        target = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf, offset=layout["offset"])
+        target[...] = array
+        del target
+    segment.close()
+
+    descriptor = {
+        "name": name, "kind": kind, "series_name": series_name, "segment": segment_name,
+        "size": offset, "rows": len(obj), "publisher_pid": os.getpid(),
+        "columns": columns, "index": index, "buffers": layouts,
+    }
+    descriptor_path, refs_dir = _paths(name, registry_dir)
+    os.makedirs(refs_dir, exist_ok=True)
+    lease_path = _add_lease(refs_dir)
+
+    # Register without overwriting: link a complete descriptor file into place
+    tmp_path = f"{descriptor_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(descriptor, fh)
+    try:
+        os.link(tmp_path, descriptor_path)
+    except FileExistsError:
+        os.remove(lease_path)
+        _unlink_segment(segment_name)
+        raise FileExistsError(f"handoff {name!r} is already published in {registry_dir}")
+    finally:
+        os.remove(tmp_path)
+    return Handoff(descriptor, lease_path, registry_dir)
+
+
+def attach(name: str, registry_dir: str = REGISTRY_DIR) -> Handoff:
+    """Take a lease on a published table and map it read-only (Handoff.frame)"""
+    descriptor_path, refs_dir = _paths(name, registry_dir)
+    try:
+        lease_path = _add_lease(refs_dir)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"handoff {name!r} is not published in {registry_dir}") from None
+
+    descriptor = None
+    try:
+        with open(descriptor_path, encoding="utf-8") as fh:
+            descriptor = json.load(fh)
+        segment = _open_segment(descriptor["segment"])
+    except FileNotFoundError:
+        # Released while we leased: our lease may now be the last one
+        if descriptor is not None:
+            _drop_lease(lease_path, descriptor, registry_dir)
+        else:
+            os.remove(lease_path)
+        raise FileNotFoundError(f"handoff {name!r} was released") from None
+    return Handoff(descriptor, lease_path, registry_dir, segment)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def reap_handoffs(registry_dir: str = REGISTRY_DIR) -> int:
+    """Drop leases held by processes that no longer exist; returns the number reaped"""
+    if not os.path.isdir(registry_dir):
+        return 0
+    reaped = 0
+    for entry in os.listdir(registry_dir):
+        if not entry.endswith(".json"):
+            continue
+        descriptor_path = os.path.join(registry_dir, entry)
+        try:
+            with open(descriptor_path, encoding="utf-8") as fh:
+                descriptor = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+        refs_dir = _paths(descriptor["name"], registry_dir)[1]
+        stale = [lease for lease in _leases(refs_dir) if not _pid_alive(int(lease.split("-")[0]))]
+        for lease in stale:
+            _drop_lease(os.path.join(refs_dir, lease), descriptor, registry_dir)
+            reaped += 1
+    return reaped
+
+
+# ============================
+# CONCURRENT STAGES
+# ============================
+
+def _global_names(code: types.CodeType) -> set:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+
+def _run_stage_process(task: dict) -> dict:
+    """Worker: attach the shared tables, exec one stage, return its simple results"""
+    handoffs = {}
+    started = time.perf_counter()
+    with open(task["log_path"], "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        try:
+            namespace = {"__name__": "__main__"}
+            namespace.update({var: __import__(module) for var, module in task["modules"].items()})
+            namespace.update({var: pickle.loads(value) for var, value in task["values"].items()})
+            for var, handoff_name in task["tables"].items():
+                if handoff_name not in handoffs:
+                    handoffs[handoff_name] = attach(handoff_name, task["registry_dir"])
+                namespace[var] = handoffs[handoff_name].frame
+            inputs = set(namespace)
+
+            exec(marshal.loads(task["code"]), namespace)
+            results = {
+                var: value for var, value in namespace.items()
+                if var not in inputs and isinstance(value, (str, int, float, bool)) and not var.startswith("__")
+            }
+        finally:
+            namespace = None
+            for handoff in handoffs.values():
+                handoff.release()
+    return {"number": task["number"], "results": results, "seconds": time.perf_counter() - started}
+
+
+def run_concurrent_stages(namespace: dict, stages: list, registry_dir: str = REGISTRY_DIR,
+                          log_dir: str = None) -> dict:
+    """
+    Run stages ({number, file, code}) in parallel processes over one
+    namespace: the DataFrames / Series each stage reads are published once
+    and attached zero-copy by every stage; modules are re-imported and the
+    remaining (picklable) globals are sent as is. Stage output is printed in
+    stage order when all are done; their simple results (str / number globals,
+    e.g. run_dir) are merged back into namespace.
+    """
+    log_dir = log_dir or tempfile.mkdtemp(prefix="stage_logs_")
+    run_token = secrets.token_hex(4)
+    published, tables_by_id, tasks = [], {}, []
+    try:
+        for stage in stages:
+            tables, modules, values = {}, {}, {}
+            for var in sorted(_global_names(marshal.loads(stage["code"])) & set(namespace)):
+                value = namespace[var]
+                if isinstance(value, types.ModuleType):
+                    modules[var] = value.__name__
+                elif isinstance(value, (pd.DataFrame, pd.Series)) and shareable(value):
+                    if id(value) not in tables_by_id:
+                        handoff = publish(value, f"{run_token}-{var}", registry_dir)
+                        published.append(handoff)
+                        tables_by_id[id(value)] = handoff.name
+                    tables[var] = tables_by_id[id(value)]
+                else:
+                    # Stage-local functions and other unpicklable globals stay behind
+                    try:
+                        values[var] = pickle.dumps(value)
+                    except Exception:
+                        continue
+            tasks.append({
+                "number": stage["number"], "code": stage["code"], "tables": tables, "modules": modules,
+                "values": values, "registry_dir": registry_dir,
+                "log_path": os.path.join(log_dir, f"{stage['file']}.log"),
+            })
+
+        shared_mb = sum(h.descriptor["size"] for h in published) / 1024 / 1024
+        print(f"Running stages {', '.join(s['number'] for s in stages)} concurrently "
+              f"({len(published)} shared tables, {shared_mb:,.1f} MB)")
+        with ProcessPoolExecutor(max_workers=len(tasks), mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(_run_stage_process, task) for task in tasks]
+            outcomes = []
+            for stage, task, future in zip(stages, tasks, futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception as exc:
+                    raise RuntimeError(f"stage {stage['file']} failed (log: {task['log_path']})") from exc
+    finally:
+        for handoff in published:
+            handoff.release()
+
+    for stage, task, outcome in zip(stages, tasks, outcomes):
+        with open(task["log_path"], encoding="utf-8") as fh:
+            print(fh.read(), end="")
+        print(f"\n##### {stage['file']} done in {outcome['seconds']:.2f}s (concurrent)\n")
+        namespace.update(outcome["results"])
+    return {outcome["number"]: outcome for outcome in outcomes}
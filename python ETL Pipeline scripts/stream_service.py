@@ -0,0 +1,536 @@
+# Near-real-time streaming mode: tail MES completions and extend the event log live
+#
+# The batch pipeline rebuilds the RUN/IDLE/FAULT timeline from the whole
+# extract. The stream service keeps it open instead:
+# - completion and maintenance records arrive from the tailed raw extracts
+#   and/or a local socket (one JSON object per line); both feed one bounded
+#   queue, which the line state consumes in micro-batches
+# - records outside the analysis window (FILTER_START..FILTER_END, as the
+#   batch scan) are dropped on arrival
+# - each coil's station operations are generated on arrival (same duration
+#   model, per-coil keyed draws and anchoring as 08/09; with the same seed, a
+#   replay of a sorted extract produces the batch RUN events)
+# - RUN events are final on arrival. A station's IDLE gap closes once no later
+#   coil can start an operation inside it (next operation start + max coil
+#   cycle <= latest completion, the rule 10 uses for month partitions)
+# - FAULT windows open when the maintenance record arrives
+# - rolling KPIs (pieces/hour, mass/hour, prime rate, current and last gap,
+#   station states) over a sliding time window
+#
+# Memory stays bounded: per station only the operations within one max coil
+# cycle of the latest completion, the KPI window, and the queue (backpressure).
+# Events are appended to the stream event log CSV per micro-batch; the KPI
+# snapshot is rewritten atomically for dashboards.
+#
+# Usage (in the directory holding the raw extracts):
+#   python stream_service.py                               # tail new records
+#   python stream_service.py --port 8766                   # plus socket feed
+#   python stream_service.py --from-start --no-follow      # replay and exit
+#
+# Socket records: {"source": "production", "Production Date": "09/30/24 14:05", "CID": ..., ...}
+#                 {"source": "maintenance", "Start": "...", "Sub Area": "...", "Time (Hours)": ...}
+
+import os
+import re
+import csv
+import json
+import bisect
+import asyncio
+import argparse
+from collections import deque
+from datetime import datetime, time, timedelta
+
+import numpy as np
+import pandas as pd
+
+from raw_scan import PROD_FILE, MAINT_FILE, FILTER_START, FILTER_END, MAINT_COLUMNS, SCAN_DATE_FORMAT, scan_csv
+from product_bands import band_codes
+from event_keys import assign_event_ids
+from equipment_resolver import EquipmentResolver
+from time_model import MS_PER_SEC, MS_PER_MIN, MS_PER_DAY, NAT_MS, from_epoch_ms, to_epoch_ms
+
+STREAM_DIR = "stream_output"
+EVENT_LOG_FILE = "fact_equipment_event_log_stream.csv"
+KPI_FILE = "line_kpis.json"
+
+DEFAULT_PORT = 8766
+QUEUE_BATCHES = 64
+READ_BLOCK_BYTES = 1 << 20
+POLL_SEC = 1.0
+KPI_WINDOW_MIN = 60
+MIN_IDLE_SEC = 30
+
+# Type classification (as in 05)
+PRIME_TYPES = ["HL", "HM", "98", "71", "72", "74", "75", "76", "77", "70"]
+SCRAP_TYPES = ["HX", "HY", "HZ", "HC", "HH", "HR"]
+
+EVENT_COLUMNS = [
+    "event_id", "equipment_id", "equipment_name", "event_type", "event_start_ts", "event_end_ts",
+    "event_duration_sec", "coil_id", "parent_coil_id", "shift_code", "type_code",
+    "is_prime", "is_scrap", "event_date",
+]
+
+SOURCES = ("production", "maintenance")
+
+
+def load_line_model(verbose: bool = False, seed: int = None) -> dict:
+    """
+    Equipment dimensions, crew-independent duration model and fault mapping:
+    runs 03, 04, 06 and 08 once over the maintenance extract (as backfill.py)
+    """
+    from backfill import stage_code, quiet_stdout
+
+    ns = {"__name__": "__main__", "pd": pd, "np": np, "re": re,
+          "datetime": datetime, "time": time, "timedelta": timedelta, "backfill_state": None,
+          "generator_seed": seed or 0}
+    ns["df_maint"], ns["maint_rows_scanned"] = scan_csv(
+        MAINT_FILE, MAINT_COLUMNS, "Start", FILTER_START, FILTER_END
+    )
+    with quiet_stdout(verbose):
+        for number in ["03", "04", "06", "08"]:
+            exec(stage_code(number), ns)
+    return ns
+
+
+class LineStream:
+    """Open line timeline and rolling KPIs, extended record batch by record batch"""
+
+    def __init__(self, model: dict, kpi_window_min: float = KPI_WINDOW_MIN, min_idle_sec: float = MIN_IDLE_SEC):
+        line_equipment = model["line_equipment"]
+        self.station_ids = line_equipment["equipment_id"].to_numpy(dtype=np.int64)
+        self.station_names = line_equipment["equipment_name"].to_numpy()
+        self.station_bottleneck = line_equipment["is_bottleneck_candidate"].to_numpy()
+        self.draw_duration_matrix = model["draw_duration_matrix"]
+        self.clean_subarea = model["clean_subarea"]
+        self.max_cycle_ms = int(np.ceil(model["MAX_COIL_CYCLE_SEC"] * MS_PER_SEC))
+        self.min_idle_ms = int(min_idle_sec * MS_PER_SEC)
+        # Analysis window of the batch scan (inclusive bounds)
+        self.window_start_ms, self.window_end_ms = to_epoch_ms(
+            pd.Series(pd.to_datetime([FILTER_START, FILTER_END]))
+        ).tolist()
+
+        # FAULT events: maintenance names resolved as in 10 (shared mapping cache)
+        self.fault_resolver = EquipmentResolver(model["dim_equipment"], line_equipment)
+
+        # Per station, operations sorted by (start, seq): [0] is the last
+        # operation whose following gap is final, the rest can still reorder
+        self.timelines = [[] for _ in self.station_ids]
+        self.fault_windows = {}
+        self.seq = 0
+
+        # Crew rotation (07): production days in arrival order
+        self.day_crews = {}
+
+        # Rolling KPI window: (completion_ms, mass_tons, is_prime)
+        self.kpi_window_ms = int(kpi_window_min * MS_PER_MIN)
+        self.window = deque()
+        self.window_mass = 0.0
+        self.window_prime = 0
+
+        self.last_completion_ms = NAT_MS
+        self.last_gap_ms = None
+        self.counts = {"coils": 0, "faults": 0, "skipped_faults": 0, "rejected": 0, "out_of_window": 0,
+                       "late_operations": 0, "RUN": 0, "IDLE": 0, "FAULT": 0}
+
+    # ---------- records ----------
+
+    def in_window(self, ts_ms: np.ndarray) -> np.ndarray:
+        """Parsed timestamps inside the analysis window; the others are counted as out of window"""
+        parsed = ts_ms != NAT_MS
+        inside = parsed & (ts_ms >= self.window_start_ms) & (ts_ms <= self.window_end_ms)
+        self.counts["out_of_window"] += int((parsed & ~inside).sum())
+        return inside
+
+    def crews(self, day: int):
+        if day not in self.day_crews:
+            idx = len(self.day_crews)
+            self.day_crews[day] = ("ABCD"[idx % 4], "ABCD"[(idx + 1) % 4])
+        return self.day_crews[day]
+
+    def add_completions(self, rows: list) -> pd.DataFrame:
+        """Generate operations for a batch of completion records; returns final events"""
+        records = pd.DataFrame(rows)
+        completion = pd.to_datetime(records.get("Production Date"), format=SCAN_DATE_FORMAT, errors="coerce")
+        completion_ms = to_epoch_ms(completion)
+        self.counts["rejected"] += int((completion_ms == NAT_MS).sum())
+        valid = self.in_window(completion_ms)
+        order = np.flatnonzero(valid)[np.argsort(completion_ms[valid], kind="stable")]
+        if not len(order):
+            return self.close_idle_gaps()
+        records, completion_ms = records.iloc[order].reset_index(drop=True), completion_ms[order]
+
+        def numeric(col):
+            if col not in records.columns:
+                return np.full(len(records), np.nan)
+            return pd.to_numeric(records[col], errors="coerce").to_numpy(dtype=np.float64)
+
+        thickness = numeric("Thickess") if "Thickess" in records.columns else numeric("Thick")
+        mass = numeric("Mass out tons")
+        type_code = records.get("Type", pd.Series("", index=records.index)).astype(str).str.strip().str.upper()
+        is_prime = type_code.isin(PRIME_TYPES).to_numpy()
+        is_scrap = type_code.isin(SCRAP_TYPES).to_numpy()
+
+        day = completion_ms // MS_PER_DAY
+        is_day_shift = (completion_ms // 3_600_000 % 24 >= 6) & (completion_ms // 3_600_000 % 24 < 18)
+        shift_codes = np.array([self.crews(int(d))[0 if is_day else 1] for d, is_day in zip(day, is_day_shift)])
+
+        # Operations anchored to completion (as in 09)
+        coil_id = records["UID"].astype(str).str.strip().to_numpy()
+        durations = self.draw_duration_matrix(
+            self.station_names.tolist(), self.station_bottleneck, shift_codes,
+            band_codes(thickness, numeric("Width")), coil_id,
+        )
+        duration_ms = np.rint(durations * MS_PER_SEC).astype(np.int64)
+        elapsed_ms = np.cumsum(duration_ms, axis=1)
+        op_end_ms = (completion_ms - elapsed_ms[:, -1])[:, None] + elapsed_ms
+        op_start_ms = op_end_ms - duration_ms
+        n_coils, n_stations = duration_ms.shape
+        op_seq = self.seq + np.arange(n_coils * n_stations).reshape(n_coils, n_stations)
+        self.seq += n_coils * n_stations
+
+        for s, timeline in enumerate(self.timelines):
+            for start, seq, end in zip(op_start_ms[:, s].tolist(), op_seq[:, s].tolist(), op_end_ms[:, s].tolist()):
+                position = bisect.bisect(timeline, (start, seq, end))
+                if position == 0 and timeline:
+                    # Before the station's final anchor: its gaps are already out
+                    self.counts["late_operations"] += 1
+                    continue
+                timeline.insert(position, (start, seq, end))
+
+        run_events = pd.DataFrame({
+            "equipment_id": np.tile(self.station_ids, n_coils),
+            "equipment_name": np.tile(self.station_names, n_coils),
+            "event_type": "RUN",
+            "event_start_ts": from_epoch_ms(op_start_ms.ravel()),
+            "event_end_ts": from_epoch_ms(op_end_ms.ravel()),
+            "event_duration_sec": duration_ms.ravel() / MS_PER_SEC,
+            "coil_id": np.repeat(coil_id, n_stations),
+            "parent_coil_id": np.repeat(records["CID"].astype(str).str.strip().to_numpy(), n_stations),
+            "shift_code": np.repeat(shift_codes, n_stations),
+            "type_code": np.repeat(type_code.to_numpy(), n_stations),
+            "is_prime": np.repeat(is_prime, n_stations),
+            "is_scrap": np.repeat(is_scrap, n_stations),
+        })
+
+        self._update_kpis(completion_ms, mass, is_prime)
+        self.counts["coils"] += n_coils
+        self.counts["RUN"] += len(run_events)
+        return pd.concat([run_events, self.close_idle_gaps()], ignore_index=True)
+
+    def add_faults(self, rows: list) -> pd.DataFrame:
+        """FAULT windows for a batch of maintenance records (line equipment only)"""
+        records = pd.DataFrame(rows)
+        start = pd.to_datetime(records.get("Start"), format=SCAN_DATE_FORMAT, errors="coerce")
+        if "Time (Hours)" in records.columns:
+            hours = pd.to_numeric(records["Time (Hours)"], errors="coerce")
+        else:
+            hours = pd.to_timedelta(records.get("Duration"), errors="coerce").dt.total_seconds() / 3600
+        names = records.get("Sub Area", pd.Series(None, index=records.index)).map(self.clean_subarea)
+        match = self.fault_resolver.resolve(
+            names, fallback_names=records.get("Hierachy", pd.Series(None, index=records.index))
+        )
+        equipment_id, names = match["equipment_id"], match["equipment_name"]
+
+        complete = start.notna().to_numpy() & hours.notna().to_numpy()
+        self.counts["rejected"] += int((~complete).sum())
+        complete &= self.in_window(to_epoch_ms(start))
+        in_line = complete & equipment_id.notna().to_numpy()
+        self.counts["skipped_faults"] += int((complete & ~in_line).sum())
+        self.counts["faults"] += int(in_line.sum())
+
+        start_ms = to_epoch_ms(start[in_line])
+        end_ms = start_ms + np.rint(hours[in_line].to_numpy(dtype=np.float64) * 60 * MS_PER_MIN).astype(np.int64)
+        equipment = equipment_id[in_line].to_numpy(dtype=np.int64)
+        for eq, start, end in zip(equipment.tolist(), start_ms.tolist(), end_ms.tolist()):
+            self.fault_windows.setdefault(eq, []).append((start, end))
+
+        shifts = records["Shifts"] if "Shifts" in records.columns else pd.Series(None, index=records.index)
+        self.counts["FAULT"] += len(start_ms)
+        return pd.DataFrame({
+            "equipment_id": equipment,
+            "equipment_name": names[in_line].to_numpy(),
+            "event_type": "FAULT",
+            "event_start_ts": from_epoch_ms(start_ms),
+            "event_end_ts": from_epoch_ms(end_ms),
+            "event_duration_sec": (end_ms - start_ms) / MS_PER_SEC,
+            "coil_id": None, "parent_coil_id": None,
+            "shift_code": shifts[in_line].to_numpy(),
+            "type_code": None, "is_prime": False, "is_scrap": False,
+        })
+
+    def close_idle_gaps(self, flush: bool = False) -> pd.DataFrame:
+        """
+        IDLE events for gaps that became final: the following operation starts
+        at least one max coil cycle before the latest completion (flush: all)
+        """
+        final_before_ms = self.last_completion_ms - self.max_cycle_ms
+        idle = []
+        for s, timeline in enumerate(self.timelines):
+            closed = 0
+            while closed + 1 < len(timeline) and (flush or timeline[closed + 1][0] <= final_before_ms):
+                (_, _, end), (start, _, _) = timeline[closed], timeline[closed + 1]
+                if start - end > self.min_idle_ms:
+                    idle.append((s, end, start))
+                closed += 1
+            del timeline[:closed]
+
+        station, start_ms, end_ms = (np.array(v, dtype=np.int64) for v in zip(*idle)) if idle else (
+            np.empty(0, dtype=np.int64),) * 3
+        self.counts["IDLE"] += len(idle)
+        return pd.DataFrame({
+            "equipment_id": self.station_ids[station],
+            "equipment_name": self.station_names[station],
+            "event_type": "IDLE",
+            "event_start_ts": from_epoch_ms(start_ms),
+            "event_end_ts": from_epoch_ms(end_ms),
+            "event_duration_sec": (end_ms - start_ms) / MS_PER_SEC,
+            "coil_id": None, "parent_coil_id": None, "shift_code": None, "type_code": None,
+            "is_prime": False, "is_scrap": False,
+        })
+
+    # ---------- rolling KPIs ----------
+
+    def _update_kpis(self, completion_ms, mass, is_prime):
+        for ms, tons, prime in zip(completion_ms.tolist(), np.nan_to_num(mass).tolist(), is_prime.tolist()):
+            if ms >= self.last_completion_ms:
+                if self.last_completion_ms != NAT_MS:
+                    self.last_gap_ms = ms - self.last_completion_ms
+                self.last_completion_ms = ms
+            self.window.append((ms, tons, prime))
+            self.window_mass += tons
+            self.window_prime += prime
+        self._evict(self.last_completion_ms)
+
+    def _evict(self, now_ms: int):
+        while self.window and self.window[0][0] <= now_ms - self.kpi_window_ms:
+            _, tons, prime = self.window.popleft()
+            self.window_mass -= tons
+            self.window_prime -= prime
+
+    def kpis(self, now_ms: int = None) -> dict:
+        """Snapshot at now_ms (default: latest completion)"""
+        now_ms = self.last_completion_ms if now_ms is None else now_ms
+        self._evict(now_ms)
+        hours = self.kpi_window_ms / (60 * MS_PER_MIN)
+        pieces = len(self.window)
+
+        # Fault windows that ended are dropped
+        self.fault_windows = {
+            eq: kept for eq, windows in self.fault_windows.items()
+            if (kept := [w for w in windows if w[1] > now_ms])
+        }
+
+        stations = []
+        for s, timeline in enumerate(self.timelines):
+            last_end = max((end for _, _, end in timeline), default=NAT_MS)
+            running = any(start <= now_ms < end for start, _, end in timeline)
+            windows = self.fault_windows.get(int(self.station_ids[s]), [])
+            fault_until = max((end for start, end in windows if start <= now_ms), default=NAT_MS)
+            state = "FAULT" if fault_until != NAT_MS else "RUN" if running else "IDLE"
+            stations.append({
+                "equipment_id": int(self.station_ids[s]),
+                "equipment_name": self.station_names[s],
+                "state": state,
+                "idle_min": round((now_ms - last_end) / MS_PER_MIN, 2) if state == "IDLE" and last_end != NAT_MS else None,
+                "fault_until": str(from_epoch_ms([fault_until])[0]) if state == "FAULT" else None,
+                "open_operations": len(timeline),
+            })
+
+        return {
+            "as_of": str(from_epoch_ms([now_ms])[0]) if now_ms != NAT_MS else None,
+            "window_min": self.kpi_window_ms / MS_PER_MIN,
+            "pieces_in_window": pieces,
+            "pieces_per_hour": round(pieces / hours, 2),
+            "mass_tons_per_hour": round(self.window_mass / hours, 2),
+            "prime_rate_pct": round(100 * self.window_prime / pieces, 2) if pieces else None,
+            "current_gap_min": round((now_ms - self.last_completion_ms) / MS_PER_MIN, 2)
+            if self.last_completion_ms != NAT_MS else None,
+            "last_gap_min": round(self.last_gap_ms / MS_PER_MIN, 2) if self.last_gap_ms is not None else None,
+            "counts": dict(self.counts),
+            "stations": stations,
+        }
+
+
+# ============================
+# RECORD SOURCES
+# ============================
+
+async def tail_csv(path: str, source: str, queue: asyncio.Queue, follow: bool, from_start: bool,
+                   poll_sec: float = POLL_SEC):
+    """
+    Follow a raw extract: complete new lines are parsed against the header and
+    queued as (source, rows) batches. A file that shrinks (rotated/rewritten)
+    is read again from its first data row.
+    """
+    while not os.path.exists(path):
+        if not follow:
+            return
+        await asyncio.sleep(poll_sec)
+
+    with open(path, "rb") as fh:
+        header = [col.strip() for col in next(csv.reader([fh.readline().decode("utf-8-sig")]))]
+        data_start = fh.tell()
+        if not from_start:
+            fh.seek(0, os.SEEK_END)
+        position, pending = fh.tell(), b""
+
+        while True:
+            block = fh.read(READ_BLOCK_BYTES)
+            if block:
+                position += len(block)
+                lines = (pending + block).split(b"\n")
+                pending = lines.pop()
+                rows = [dict(zip(header, row)) for row in csv.reader(
+                    line.decode("utf-8").rstrip("\r") for line in lines) if row]
+                if rows:
+                    await queue.put((source, rows))
+                continue
+            if not follow:
+                if pending.strip():
+                    rows = [dict(zip(header, row)) for row in csv.reader([pending.decode("utf-8").rstrip("\r")])]
+                    await queue.put((source, rows))
+                return
+            if os.path.getsize(path) < position:
+                fh.seek(data_start)
+                position, pending = data_start, b""
+            await asyncio.sleep(poll_sec)
+
+
+async def serve_socket(queue: asyncio.Queue, host: str, port: int):
+    """Local feed: one JSON record per line with a "source" field"""
+
+    async def handle(reader, writer):
+        while line := await reader.readline():
+            try:
+                record = json.loads(line)
+                source = record.pop("source")
+                if source not in SOURCES:
+                    raise ValueError(source)
+            except (ValueError, KeyError, AttributeError):
+                writer.write(b'{"error": "expected a JSON object with source production|maintenance"}\n')
+                continue
+            await queue.put((source, [{key: "" if value is None else str(value) for key, value in record.items()}]))
+            writer.write(b'{"status": "queued"}\n')
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Stream feed listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# ============================
+# SERVICE
+# ============================
+
+class StreamWriter:
+    """Appends final events to the stream event log and publishes KPI snapshots"""
+
+    def __init__(self, stream_dir: str):
+        os.makedirs(stream_dir, exist_ok=True)
+        self.event_path = os.path.join(stream_dir, EVENT_LOG_FILE)
+        self.kpi_path = os.path.join(stream_dir, KPI_FILE)
+        self.header = True
+
+    def write_events(self, events: pd.DataFrame):
+        if not len(events):
+            return
+        events = events.assign(event_date=events["event_start_ts"].dt.date)
+        events.insert(0, "event_id", assign_event_ids(events))
+        # Fixed millisecond format (pandas would pick one per micro-batch)
+        events = events.assign(**{
+            col: events[col].dt.strftime("%Y-%m-%d %H:%M:%S.%f").str[:-3]
+            for col in ["event_start_ts", "event_end_ts"]
+        })
+        events[EVENT_COLUMNS].to_csv(
+            self.event_path, mode="w" if self.header else "a", header=self.header, index=False
+        )
+        self.header = False
+
+    def write_kpis(self, kpis: dict):
+        tmp_path = f"{self.kpi_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(kpis, fh, indent=2, default=str)
+        os.replace(tmp_path, self.kpi_path)
+
+
+def kpi_line(kpis: dict) -> str:
+    return (f"[{kpis['as_of']}] coils {kpis['counts']['coils']:,} | "
+            f"{kpis['pieces_per_hour']:.1f} pcs/h | {kpis['mass_tons_per_hour']:.1f} t/h | "
+            f"gap {kpis['current_gap_min']} min (last {kpis['last_gap_min']}) | "
+            f"faulted {sum(s['state'] == 'FAULT' for s in kpis['stations'])} | "
+            f"events RUN {kpis['counts']['RUN']:,} IDLE {kpis['counts']['IDLE']:,} FAULT {kpis['counts']['FAULT']:,}")
+
+
+async def run_stream(stream_dir: str = STREAM_DIR, follow: bool = True, from_start: bool = False,
+                     port: int = None, host: str = "127.0.0.1", seed: int = None,
+                     kpi_window_min: float = KPI_WINDOW_MIN, wall_clock: bool = False, verbose: bool = False):
+    line = LineStream(load_line_model(verbose, seed), kpi_window_min=kpi_window_min)
+    writer = StreamWriter(stream_dir)
+    queue = asyncio.Queue(maxsize=QUEUE_BATCHES)
+    print(f"Streaming line state: {len(line.station_ids)} stations | max coil cycle "
+          f"{line.max_cycle_ms / MS_PER_MIN:.1f} min | KPI window {kpi_window_min:g} min")
+
+    tails = [
+        asyncio.create_task(tail_csv(PROD_FILE, "production", queue, follow, from_start)),
+        asyncio.create_task(tail_csv(MAINT_FILE, "maintenance", queue, follow, from_start)),
+    ]
+    server = asyncio.create_task(serve_socket(queue, host, port)) if port else None
+
+    def now_ms():
+        return int(pd.Timestamp.now().value // 1_000_000) if wall_clock else None
+
+    while True:
+        try:
+            batches = [await asyncio.wait_for(queue.get(), timeout=POLL_SEC)]
+        except asyncio.TimeoutError:
+            if server is None and all(task.done() for task in tails) and queue.empty():
+                break
+            if wall_clock:
+                writer.write_kpis(line.kpis(now_ms()))
+            continue
+        while not queue.empty():
+            batches.append(queue.get_nowait())
+
+        events = []
+        for source, rows in batches:
+            events.append(line.add_completions(rows) if source == "production" else line.add_faults(rows))
+        writer.write_events(pd.concat(events, ignore_index=True))
+        kpis = line.kpis(now_ms())
+        writer.write_kpis(kpis)
+        print(kpi_line(kpis), flush=True)
+
+    for task in tails:
+        task.result()
+
+    # End of input: every remaining gap is final
+    writer.write_events(line.close_idle_gaps(flush=True))
+    kpis = line.kpis(now_ms())
+    writer.write_kpis(kpis)
+    print(kpi_line(kpis))
+    print(f"\n✓ Stream event log: {writer.event_path}")
+    print(f"  Late operations (not placed on the timeline): {line.counts['late_operations']:,}")
+    print(f"  Faults skipped (equipment not in line): {line.counts['skipped_faults']:,}")
+    print(f"  Records outside {FILTER_START} to {FILTER_END} (dropped): {line.counts['out_of_window']:,}")
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming line timeline and rolling KPIs")
+    parser.add_argument("--stream-dir", default=STREAM_DIR)
+    parser.add_argument("--from-start", action="store_true", help="Read the extracts from the first record")
+    parser.add_argument("--no-follow", action="store_true", help="Stop at the end of the extracts")
+    parser.add_argument("--port", type=int, default=None, help=f"Also accept JSON-lines records (e.g. {DEFAULT_PORT})")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--kpi-window-min", type=float, default=KPI_WINDOW_MIN)
+    parser.add_argument("--wall-clock", action="store_true", help="KPIs as of now instead of the latest completion")
+    parser.add_argument("--verbose", action="store_true", help="Show the stage scripts' output")
+    args = parser.parse_args()
+
+    asyncio.run(run_stream(
+        args.stream_dir, follow=not args.no_follow, from_start=args.from_start, port=args.port,
+        host=args.host, seed=args.seed, kpi_window_min=args.kpi_window_min,
+        wall_clock=args.wall_clock, verbose=args.verbose,
+    ))
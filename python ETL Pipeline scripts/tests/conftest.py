@@ -0,0 +1,21 @@
+# Stage support modules live next to the numbered scripts (imported as top-level modules)
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def golden_run(tmp_path_factory):
+    """Pipeline 01-13 on the goldens' synthetic extract: (published run directory, stage namespace)"""
+    from golden_harness import GOLDEN_DIR, load_golden_meta, make_extract, run_pipeline
+
+    meta = load_golden_meta(GOLDEN_DIR)
+    work_dir = str(tmp_path_factory.mktemp("golden_work"))
+    make_extract(work_dir, meta["coils"], meta["seed"])
+    return run_pipeline(work_dir, meta["seed"])
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from golden_harness import compare_backfill, make_extract, run_backfill_pipeline, run_pipeline
+
+
+def test_backfill_matches_single_shot_run(tmp_path):
+    # Month boundary four hours in: open parents, station tails, shift windows
+    # and rolling tempo windows all carry over from June into July
+    work_dir = str(tmp_path)
+    make_extract(work_dir, 400, seed=7, start="2024-06-30 20:00")
+    single_dir, namespace = run_pipeline(work_dir, seed=7)
+    backfill_dir = run_backfill_pipeline(work_dir, seed=7)
+
+    completion = namespace["fact_production_coil"]["completion_ts"]
+    assert completion.dt.month.nunique() == 2
+
+    report = compare_backfill(single_dir, backfill_dir)
+    with pd.option_context("display.width", 200):
+        assert report.empty, report.to_string(index=False)
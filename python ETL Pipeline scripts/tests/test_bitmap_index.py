@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from bitmap_index import (
+    ARRAY, BITMAP, RUN, CHUNK_ROWS, BitmapIndex, RowSet, build_bitmap_indexes, encode_column,
+)
+
+
+def _synthetic_coils(n_rows=3 * CHUNK_ROWS + 123, seed=5):
+    """Columns that need every container kind across several chunks"""
+    rng = np.random.default_rng(seed)
+    shift = np.array(["A", "B", "C", "D"])[np.arange(n_rows) * 4 // n_rows]      # long runs
+    type_code = rng.choice(["HL", "HM", "98", "HX"], n_rows).astype(object)        # dense: bitmaps
+    is_scrap = rng.random(n_rows) < 0.002                                          # sparse: arrays
+    type_code[rng.random(n_rows) < 0.01] = None
+    return pd.DataFrame({
+        "coil_id": np.arange(n_rows).astype(str), "shift_code": shift, "type_code": type_code,
+        "is_prime": ~is_scrap, "is_scrap": is_scrap,
+    })
+
+
+def _decode_rows(containers, array_data, run_data, words, bitmap_id):
+    """Reference decode of one value's containers (row positions, ascending)"""
+    rows = []
+    for i in np.flatnonzero(containers["bitmap"] == bitmap_id):
+        base = int(containers["chunk"][i]) * CHUNK_ROWS
+        offset, length = int(containers["offset"][i]), int(containers["length"][i])
+        if containers["kind"][i] == ARRAY:
+            rows.append(base + array_data[offset:offset + length].astype(np.int64))
+        elif containers["kind"][i] == RUN:
+            pairs = run_data.reshape(-1, 2)[offset:offset + length].astype(np.int64)
+            rows += [base + np.arange(start, start + extra + 1) for start, extra in pairs]
+        else:
+            block = words[offset * (CHUNK_ROWS // 64):(offset + 1) * (CHUNK_ROWS // 64)]
+            bits = np.unpackbits(block.view(np.uint8), bitorder="little")
+            rows.append(base + np.flatnonzero(bits))
+    return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+
+def test_encode_column_round_trips_every_value():
+    coils = _synthetic_coils()
+    for col in ["shift_code", "type_code", "is_scrap"]:
+        keys, containers, array_data, run_data, words = encode_column(coils[col])
+        values = coils[col].map(str).where(coils[col].notna())
+        assert keys == sorted(values.dropna().unique().tolist())
+        for bitmap_id, key in enumerate(keys):
+            expected = np.flatnonzero((values == key).to_numpy())
+            assert np.array_equal(_decode_rows(containers, array_data, run_data, words, bitmap_id), expected)
+
+    kinds = {col: set(encode_column(coils[col])[1]["kind"].tolist()) for col in ["shift_code", "type_code", "is_scrap"]}
+    assert RUN in kinds["shift_code"] and BITMAP in kinds["type_code"] and ARRAY in kinds["is_scrap"]
+
+
+def test_bitmap_index_filters_match_masks(tmp_path):
+    coils = _synthetic_coils()
+    build_bitmap_indexes({"fact_production_coil": coils}, str(tmp_path))
+    index = BitmapIndex(str(tmp_path), "fact_production_coil")
+    assert len(index) == len(coils)
+
+    rows = index.where({"shift_code": ["B", "D"], "type_code": "HL"}, exclude={"is_scrap": True})
+    mask = coils["shift_code"].isin(["B", "D"]) & (coils["type_code"] == "HL") & ~coils["is_scrap"]
+    assert np.array_equal(rows.rows(), np.flatnonzero(mask.to_numpy()))
+    assert rows.count() == mask.sum()
+
+    missing = ~index.eq("type_code", "HL", "HM", "98", "HX")
+    assert np.array_equal(missing.rows(), np.flatnonzero(coils["type_code"].isna().to_numpy()))
+    assert index.counts("shift_code").sum() == len(coils)
+    assert index.eq("shift_code", "Z").count() == 0
+
+
+def test_rowset_algebra():
+    n_rows = 200
+    rng = np.random.default_rng(2)
+    a_mask, b_mask = rng.random(n_rows) < 0.3, rng.random(n_rows) < 0.5
+
+    def row_set(mask):
+        bits = np.packbits(np.r_[mask, np.zeros(-n_rows % 64, dtype=bool)], bitorder="little")
+        return RowSet(bits.view(np.uint64).copy(), n_rows)
+
+    a, b = row_set(a_mask), row_set(b_mask)
+    assert np.array_equal((a & b).rows(), np.flatnonzero(a_mask & b_mask))
+    assert np.array_equal((a | b).rows(), np.flatnonzero(a_mask | b_mask))
+    assert np.array_equal((a - b).rows(), np.flatnonzero(a_mask & ~b_mask))
+    assert np.array_equal((~a).rows(), np.flatnonzero(~a_mask))
+    assert (~a).count() == n_rows - a_mask.sum()
@@ -0,0 +1,37 @@
+import pandas as pd
+
+from bottleneck_engine import bottleneck_candidates, build_active_periods, detect_bottlenecks
+
+EVENT_COLUMNS = ["equipment_id", "event_type", "event_start_ts", "event_end_ts"]
+
+
+def _events(rows):
+    events = pd.DataFrame(rows, columns=EVENT_COLUMNS)
+    events["equipment_id"] = events["equipment_id"].astype("int64")
+    for col in ["event_start_ts", "event_end_ts"]:
+        events[col] = pd.to_datetime(events[col])
+    return events
+
+
+def test_empty_event_log():
+    for events in [_events([]), _events([(1, "IDLE", "2024-05-01 06:00", "2024-05-01 07:00")])]:
+        assert build_active_periods(events).empty
+        windows = detect_bottlenecks(events)
+        assert windows.empty and "bottleneck_sec" in windows.columns
+        assert bottleneck_candidates(windows).empty
+
+
+def test_longest_active_period_is_the_bottleneck():
+    events = _events([
+        (1, "RUN", "2024-05-01 07:00:00", "2024-05-01 07:10:00"),
+        (1, "RUN", "2024-05-01 07:10:20", "2024-05-01 07:30:00"),  # merged: gap under 30 s
+        (2, "RUN", "2024-05-01 07:05:00", "2024-05-01 07:08:00"),
+        (2, "FAULT", "2024-05-01 08:00:00", "2024-05-01 08:20:00"),
+    ])
+    periods = build_active_periods(events)
+    assert periods["equipment_id"].tolist() == [1, 2, 2]
+
+    windows = detect_bottlenecks(events).set_index("equipment_id")
+    assert windows.loc[1, "bottleneck_sec"] == 30 * 60
+    assert windows.loc[2, "bottleneck_sec"] == 20 * 60
+    assert windows.loc[1, "window_rank"] == 1
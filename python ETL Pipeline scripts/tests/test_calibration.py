@@ -0,0 +1,65 @@
+import os
+import sys
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SCRIPTS_DIR
+from operation_model import coil_unit_draws, no_wait_spacing, idle_delays
+
+PIPELINE = os.path.join(SCRIPTS_DIR, "pipeline.py")
+CALIBRATION = os.path.join(SCRIPTS_DIR, "calibration.py")
+
+
+def test_coil_unit_draws_depend_on_coil_not_batch():
+    ids = np.array(["7000001_0", "7000001_1", "7000002_0"])
+    together = coil_unit_draws(ids, 4, seed=3)
+    alone = coil_unit_draws(ids[1:2], 4, seed=3)
+    assert np.array_equal(together[1], alone[0])
+    assert ((together >= 0) & (together < 1)).all()
+    assert not np.array_equal(together, coil_unit_draws(ids, 4, seed=4))
+
+
+def test_no_wait_spacing_matches_station_by_station_schedule():
+    rng = np.random.default_rng(1)
+    durations = rng.uniform(10, 100, size=(50, 5))
+
+    # Reference: each coil as late as its back-to-back operations allow, one coil per station
+    completion = np.zeros(len(durations))
+    station_free = np.zeros(durations.shape[1])
+    for i, row in enumerate(durations):
+        offsets = np.r_[0, np.cumsum(row)[:-1]]
+        start = max(0.0, (station_free - offsets).max())
+        station_free = start + offsets + row
+        completion[i] = station_free[-1]
+
+    spacing = no_wait_spacing(durations)
+    assert np.allclose(np.cumsum(spacing), completion)
+    assert np.allclose(no_wait_spacing(durations[10:], durations[9]), spacing[10:])
+
+
+def test_idle_delays_share_of_coils():
+    unit = np.linspace(0, 1, 1000, endpoint=False)
+    idle = idle_delays(unit, np.ones(1000), 0.25, 2.0)
+    assert (idle > 0).mean() == pytest.approx(0.25)
+    assert idle.max() == 120.0
+
+
+def _run(args, cwd):
+    subprocess.run([sys.executable] + args, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+def test_line_model_run_reproduces_fitted_distance(tmp_path):
+    from golden_harness import make_extract
+
+    make_extract(str(tmp_path), 3_000)
+    _run([PIPELINE], tmp_path)
+    _run([CALIBRATION, "--generations", "4", "--population", "12", "--workers", "1"], tmp_path)
+    model = os.path.join("line_models", "line_model_v001.json")
+    _run([PIPELINE, "--line-model", model], tmp_path)
+
+    check = subprocess.run([sys.executable, CALIBRATION, "--check", model], cwd=tmp_path,
+                           capture_output=True, text=True)
+    assert check.returncode == 0, check.stdout + check.stderr
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from equipment_resolver import EquipmentResolver
+
+LINE = ["Entry Coil Car", "Coil Prep Station", "Temper Mill Unit", "Exit Shear", "Exit Coil Car"]
+DIM_EQUIPMENT = pd.DataFrame({
+    "equipment_id": np.arange(1, len(LINE) + 2),
+    "equipment_name": LINE + ["Crane 478"],
+})
+
+
+def _resolver(cache_path=None):
+    return EquipmentResolver(DIM_EQUIPMENT, pd.DataFrame({"equipment_name": LINE}), cache_path=cache_path)
+
+
+def test_resolution_order():
+    raw = pd.Series(["Temper Mill Unit (2)", "Coil Prep Sattion", "crane 478", "Canteen", None, "Coil Car"])
+    result = _resolver().resolve(raw)
+    assert result["match_status"].tolist() == ["exact", "auto", "support", "unmatched", "unmatched", "review"]
+    assert result["equipment_name"].tolist()[:3] == ["Temper Mill Unit", "Coil Prep Station", "Crane 478"]
+    assert result["equipment_id"].tolist()[:3] == [3.0, 2.0, 6.0]
+    # Review and unmatched names are reported, not applied
+    assert result["equipment_id"][3:].isna().all()
+    assert result["match_score"][0] == 1.0 and 0.75 <= result["match_score"][1] < 1.0
+
+
+def test_fallback_names_fill_unresolved_rows():
+    raw = pd.Series(["Canteen", "Exit Shear"])
+    fallback = pd.Series(["Exit Coil Car", "Temper Mill Unit"])
+    result = _resolver().resolve(raw, fallback)
+    assert result["equipment_name"].tolist() == ["Exit Coil Car", "Exit Shear"]
+    assert result["match_status"].tolist() == ["exact", "exact"]
+
+
+def test_cache_scores_once_and_keeps_manual_rows(tmp_path):
+    cache_path = str(tmp_path / "equipment_name_map.csv")
+    first = _resolver(cache_path)
+    first.resolve(pd.Series(["Coil Prep Sattion", "Canteen"]))
+    assert first.scored == 2
+
+    cache = pd.read_csv(cache_path)
+    cache.loc[cache["raw_name"] == "Canteen", ["equipment_name", "status"]] = ["Exit Shear", "manual"]
+    cache.to_csv(cache_path, index=False)
+
+    second = _resolver(cache_path)
+    result = second.resolve(pd.Series(["Canteen", "Coil Prep Sattion"]))
+    assert second.scored == 0
+    assert result["equipment_name"].tolist() == ["Exit Shear", "Coil Prep Station"]
+    assert result["match_status"].tolist() == ["manual", "auto"]
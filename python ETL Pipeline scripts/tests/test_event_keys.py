@@ -0,0 +1,30 @@
+import numpy as np
+
+from event_keys import diff_sorted_keys
+
+
+def test_diff_sorted_keys():
+    prev_ids = np.array([-5, 1, 4, 9, 12], dtype=np.int64)
+    prev_hashes = np.array([10, 11, 14, 19, 22], dtype=np.uint64)
+    cur_ids = np.array([-7, 1, 4, 12, 30], dtype=np.int64)
+    cur_hashes = np.array([0, 11, 99, 22, 0], dtype=np.uint64)
+
+    inserts, updates, deletes = diff_sorted_keys(prev_ids, prev_hashes, cur_ids, cur_hashes)
+    assert cur_ids[inserts].tolist() == [-7, 30]
+    assert cur_ids[updates].tolist() == [4]
+    assert prev_ids[deletes].tolist() == [-5, 9]
+
+
+def test_diff_sorted_keys_initial_load_and_unchanged():
+    ids = np.array([2, 3, 8], dtype=np.int64)
+    hashes = np.array([1, 2, 3], dtype=np.uint64)
+    empty = np.empty(0, dtype=np.int64)
+
+    inserts, updates, deletes = diff_sorted_keys(empty, empty.astype(np.uint64), ids, hashes)
+    assert inserts.tolist() == [0, 1, 2] and len(updates) == 0 and len(deletes) == 0
+
+    inserts, updates, deletes = diff_sorted_keys(ids, hashes, ids, hashes)
+    assert len(inserts) == len(updates) == len(deletes) == 0
+
+    inserts, updates, deletes = diff_sorted_keys(ids, hashes, empty, empty.astype(np.uint64))
+    assert len(inserts) == len(updates) == 0 and deletes.tolist() == [0, 1, 2]
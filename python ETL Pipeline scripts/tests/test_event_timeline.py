@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from event_timeline import EventTimeline, load_event_log
+from time_model import MS_PER_SEC
+
+
+def _encode(namespace):
+    return EventTimeline.encode(
+        namespace["fact_equipment_event_log"], namespace["fact_production_coil"],
+        max_cycle_ms=int(np.ceil(namespace["MAX_COIL_CYCLE_SEC"] * MS_PER_SEC)),
+    )
+
+
+def test_encode_decode_round_trip(golden_run):
+    _, namespace = golden_run
+    events = namespace["fact_equipment_event_log"]
+    timeline = _encode(namespace)
+    assert len(timeline) == len(events)
+    pd.testing.assert_frame_equal(timeline.decode(namespace["fact_production_coil"]), events.reset_index(drop=True))
+
+
+def test_save_load_round_trip(golden_run, tmp_path):
+    run_dir, namespace = golden_run
+    timeline = _encode(namespace)
+    timeline.save(str(tmp_path))
+    loaded = EventTimeline.load(str(tmp_path))
+    for name in EventTimeline.ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(timeline, name)), name
+    pd.testing.assert_frame_equal(loaded.state_seconds(), timeline.state_seconds())
+
+    # The published timeline decodes to the published event log
+    published = pd.read_csv(f"{run_dir}/fact_equipment_event_log.csv")
+    decoded = load_event_log(run_dir)
+    assert decoded["event_id"].tolist() == published["event_id"].tolist()
+    assert decoded["event_type"].tolist() == published["event_type"].tolist()
+
+
+def test_state_seconds_match_event_durations(golden_run):
+    _, namespace = golden_run
+    events = namespace["fact_equipment_event_log"]
+    seconds = _encode(namespace).state_seconds().set_index("equipment_id")
+    expected = events.pivot_table(index="equipment_id", columns="event_type", values="event_duration_sec",
+                                  aggfunc="sum", fill_value=0.0)
+    for state in expected.columns:
+        np.testing.assert_allclose(seconds.loc[expected.index, state], expected[state], rtol=1e-9, atol=1e-3)
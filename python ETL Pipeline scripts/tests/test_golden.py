@@ -0,0 +1,22 @@
+import numpy as np
+
+from golden_harness import GOLDEN_DIR, GOLDEN_TABLES, compare_run, diff_table, load_goldens
+
+
+def test_published_run_matches_goldens(golden_run):
+    run_dir, _ = golden_run
+    report = compare_run(run_dir)
+    assert report.empty, report.to_string(index=False)
+
+
+def test_diff_table_reports_changed_and_missing_rows():
+    golden = load_goldens(GOLDEN_DIR)["fact_production_coil"]
+    current = golden.drop(index=[0]).reset_index(drop=True)
+    current.loc[5, "mass_out_tons"] += 0.5
+
+    findings = {f["kind"]: f for f in diff_table("fact_production_coil", golden, current,
+                                                  GOLDEN_TABLES["fact_production_coil"])}
+    assert findings["rows_missing"]["rows"] == 1
+    assert findings["rows_missing"]["sample_keys"] == [golden["coil_id"][0]]
+    assert findings["values_differ"]["column"] == "mass_out_tons"
+    assert np.isclose(findings["values_differ"]["max_abs_diff"], 0.5)
@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+import pytest
+
+import rolling_metrics
+from rolling_metrics import _window_gap_stats
+
+
+def _reference(first, gaps):
+    median, maximum = np.full(len(first), np.nan), np.full(len(first), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for i, lo in enumerate(first):
+            median[i] = np.nanmedian(gaps[lo:i + 1])
+            maximum[i] = np.nanmax(gaps[lo:i + 1])
+    return median, maximum
+
+
+def _windows(n, max_length, rng):
+    # Sliding windows: first is nondecreasing and first[i] <= i
+    first = np.maximum.accumulate(np.arange(n) - rng.integers(0, max_length, n) + 1).clip(min=0)
+    return np.minimum(first, np.arange(n))
+
+
+@pytest.mark.parametrize("max_length", [1, 5, 40, 200])
+def test_window_gap_stats_match_nan_aware_reference(max_length):
+    rng = np.random.default_rng(max_length)
+    n = 2_000
+    gaps = rng.exponential(3.0, n).round(1)
+    gaps[rng.random(n) < 0.15] = np.nan
+    gaps[:3] = np.nan
+    first = _windows(n, max_length, rng)
+
+    median, maximum = _window_gap_stats(first, gaps)
+    ref_median, ref_maximum = _reference(first, gaps)
+    np.testing.assert_allclose(median, ref_median, equal_nan=True)
+    np.testing.assert_allclose(maximum, ref_maximum, equal_nan=True)
+
+
+def test_long_windows_match_reference_on_both_paths():
+    rng = np.random.default_rng(7)
+    n = 1_500
+    gaps = rng.exponential(3.0, n)
+    gaps[rng.random(n) < 0.1] = np.nan
+    length = rolling_metrics.PADDED_WINDOW_MAX + 50
+    first = np.maximum(np.arange(n) - length + 1, 0)
+
+    ref_median, ref_maximum = _reference(first, gaps)
+    for stats in (_window_gap_stats, rolling_metrics._sweep_gap_stats):
+        median, maximum = stats(first, gaps)
+        np.testing.assert_allclose(median, ref_median, equal_nan=True)
+        np.testing.assert_allclose(maximum, ref_maximum, equal_nan=True)
+
+
+def test_window_gap_stats_empty():
+    median, maximum = _window_gap_stats(np.empty(0, dtype=np.int64), np.empty(0))
+    assert len(median) == len(maximum) == 0
@@ -0,0 +1,51 @@
+import os
+import glob
+import json
+
+import numpy as np
+import pandas as pd
+
+from stage_handoff import attach, publish, restore_source_dtypes
+
+
+def test_attached_frame_restores_producer_dtypes(tmp_path):
+    frame = pd.DataFrame({
+        "coil_id": pd.Series(["a", "b", None, "a"], dtype="str"),
+        "shift_code": pd.Series(["A", None, "B", "A"], dtype=object),
+        "band": pd.Categorical(["thin", "wide", "thin", "thin"]),
+        "mass": [1.0, 2.0, np.nan, 4.0],
+    })
+    producer = publish(frame, "restore", str(tmp_path))
+    try:
+        with attach("restore", str(tmp_path)) as handoff:
+            attached = handoff.frame
+            assert isinstance(attached["coil_id"].dtype, pd.CategoricalDtype)
+            restored = restore_source_dtypes(attached)
+            assert restored.dtypes.astype(str).tolist() == frame.dtypes.astype(str).tolist()
+            assert "source_dtypes" not in restored.attrs
+            pd.testing.assert_frame_equal(restored, frame, check_dtype=False)
+    finally:
+        producer.release()
+    assert restore_source_dtypes(frame) is frame
+
+
+def _published_metadata(run_dir):
+    with open(os.path.join(run_dir, "manifest.json"), encoding="utf-8") as fh:
+        tables = json.load(fh)["tables"]
+    blocks = {
+        os.path.relpath(path, run_dir): pd.read_pickle(path).dtypes.astype(str).to_dict()
+        for path in sorted(glob.glob(os.path.join(run_dir, "time_index", "*", "block_*.pkl")))
+    }
+    return {name: (entry["schema"], entry["content_hash"], entry["sha256"]) for name, entry in tables.items()}, blocks
+
+
+def test_concurrent_export_publishes_the_sequential_metadata(golden_run, tmp_path):
+    from golden_harness import GOLDEN_DIR, compare_run, load_golden_meta, make_extract, run_pipeline
+
+    meta = load_golden_meta(GOLDEN_DIR)
+    make_extract(str(tmp_path), meta["coils"], meta["seed"])
+    run_dir, _ = run_pipeline(str(tmp_path), meta["seed"], concurrent=["12", "13"])
+
+    assert _published_metadata(run_dir) == _published_metadata(golden_run[0])
+    report = compare_run(run_dir)
+    assert report.empty, report.to_string(index=False)
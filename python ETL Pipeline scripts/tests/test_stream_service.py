@@ -0,0 +1,40 @@
+import os
+import asyncio
+
+import pandas as pd
+
+from golden_harness import make_extract
+from raw_scan import PROD_FILE, MAINT_FILE, SCAN_DATE_FORMAT
+from stream_service import EVENT_LOG_FILE, run_stream
+
+
+def _shift_rows(path, date_col, rows, offset, where):
+    """Copy rows of an extract with their dates moved by offset (outside the analysis window)"""
+    extract = pd.read_csv(path, dtype=str)
+    moved = extract.iloc[rows].copy()
+    moved[date_col] = (pd.to_datetime(moved[date_col], format=SCAN_DATE_FORMAT) + offset).dt.strftime(SCAN_DATE_FORMAT)
+    if "UID" in moved.columns:
+        moved["UID"] = moved["UID"] + "_moved"
+    parts = [moved, extract] if where == "head" else [extract, moved]
+    pd.concat(parts, ignore_index=True).to_csv(path, index=False)
+
+
+def test_replay_reproduces_batch_run_events(tmp_path, monkeypatch):
+    from golden_harness import run_pipeline
+
+    make_extract(str(tmp_path), 300)
+    _shift_rows(tmp_path / PROD_FILE, "Production Date", slice(0, 40), pd.Timedelta(days=-45), "head")
+    _shift_rows(tmp_path / PROD_FILE, "Production Date", slice(-40, None), pd.Timedelta(days=150), "tail")
+    _shift_rows(tmp_path / MAINT_FILE, "Start", slice(0, 10), pd.Timedelta(days=-45), "head")
+
+    _, namespace = run_pipeline(str(tmp_path), seed=3)
+    batch = namespace["fact_equipment_event_log"]
+
+    monkeypatch.chdir(tmp_path)
+    line = asyncio.run(run_stream("stream_output", follow=False, from_start=True, seed=3))
+    stream = pd.read_csv(os.path.join("stream_output", EVENT_LOG_FILE))
+
+    assert line.counts["out_of_window"] == 90
+    for event_type in ["RUN", "FAULT"]:
+        assert sorted(stream.loc[stream["event_type"] == event_type, "event_id"]) == sorted(
+            batch.loc[batch["event_type"] == event_type, "event_id"]), event_type
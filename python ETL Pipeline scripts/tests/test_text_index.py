@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from text_index import MaintenanceSearch, build_text_index, intersect_postings
+
+
+def test_intersect_postings():
+    a = np.array([1, 3, 5, 7, 9, 11], dtype=np.int32)
+    b = np.array([0, 3, 4, 9, 11, 20], dtype=np.int32)
+    c = np.array([3, 11, 12], dtype=np.int32)
+    assert intersect_postings([a, b, c]).tolist() == [3, 11]
+    assert intersect_postings([a]).tolist() == a.tolist()
+    assert intersect_postings([a, np.empty(0, dtype=np.int32)]).tolist() == []
+    assert intersect_postings([np.array([20], dtype=np.int32), a]).tolist() == []
+    assert intersect_postings([]).tolist() == []
+
+
+def test_search_terms_fields_and_prefixes(tmp_path):
+    events = pd.DataFrame({
+        "start_datetime": pd.to_datetime(["2024-05-01 08:00", "2024-05-02 09:00", "2024-05-03 10:00", "2024-05-04 11:00"]),
+        "Decription": ["Bearing replaced on mill", "Mill roll change", "Crane hook jammed", "Bearings greased"],
+        "equipment_name": ["Temper Mill Unit", "Temper Mill Unit", "Crane 478", "Exit Shear"],
+        "Category": ["Mechanical (M)", "Operational (O)", "Mechanical (M)", "Mechanical (M)"],
+        "Delay Type": ["Internal delays"] * 4,
+    })
+    build_text_index(events, str(tmp_path))
+    search = MaintenanceSearch(str(tmp_path), events=events)
+
+    assert search.search("bearing", columns=["Decription"])["Decription"].tolist() == [
+        "Bearing replaced on mill", "Bearings greased",
+    ]
+    assert search.count("mill bearing") == 1
+    assert search.count("crane OR roll", mode="any") == 2
+    assert search.count("bear*") == 2
+    assert search.count(category="Mechanical (M)") == 3
+    assert search.count("bearing", equipment_name="Exit Shear") == 1
+    assert search.count(start="2024-05-02", end="2024-05-04") == 2
+    # Field keys are not text terms: a text prefix never matches them
+    assert search.count("category*") == 0
@@ -0,0 +1,314 @@
+# Inverted token index over maintenance fault descriptions
+#
+# Documents are the rows of fact_maintenance_event, numbered in start_datetime
+# order, so a date range is one contiguous doc id range. Postings are sorted
+# int32 doc id arrays stored in one CSR layout (sorted vocabulary, offsets,
+# concatenated postings):
+# - text tokens of Decription: lower case, accents folded, alphanumeric runs,
+#   stop words dropped, plural "s" stripped ("Bearings" → "bearing")
+# - field keys for exact filters: equipment_name=recoiler, category=..., delay_type=...
+#   (same sorted vocabulary; text prefix queries skip keys containing "=")
+#
+# The index is written next to the published tables (text_index/) and updated
+# incrementally: documents whose content hash matches the previous run reuse
+# their stored tokens, only new or changed descriptions are tokenized.
+#
+# Usage (ad-hoc analysis):
+#   from text_index import MaintenanceSearch
+#   search = MaintenanceSearch("output_tables")
+#   search.search("hydraulic leak", equipment_name="Recoiler", start="2024-06-01", end="2024-07-01")
+#   search.search("bearing* OR gearbox", mode="any")
+
+import os
+import json
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from publish import resolve_current
+
+TEXT_INDEX_DIR = "text_index"
+INDEX_FILE = "postings.npz"
+META_FILE = "meta.json"
+
+TEXT_COLUMN = "Decription"
+TIME_COLUMN = "start_datetime"
+
+# Field key prefix -> table column (exact-match filters)
+FIELD_COLUMNS = {
+    "equipment_name": "equipment_name",
+    "category": "Category",
+    "delay_type": "Delay Type",
+}
+
+# Columns that identify a document's content (incremental reuse)
+DOC_HASH_COLUMNS = [TIME_COLUMN, TEXT_COLUMN] + list(FIELD_COLUMNS.values())
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "the", "to", "was", "were", "with",
+}
+
+TOKEN_PATTERN = r"[a-z0-9]+"
+
+NAT_NS = np.iinfo(np.int64).min
+
+
+def normalize_terms(text: pd.Series) -> pd.Series:
+    """Token lists per text value (vectorized string ops; None → no tokens)"""
+    folded = text.fillna("").astype(str).map(
+        lambda value: unicodedata.normalize("NFKD", value).encode("ascii", "ignore").decode("ascii")
+    )
+    tokens = folded.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    tokens = tokens[~tokens.isin(STOP_WORDS)]
+    plural = (tokens.str.len() > 3) & tokens.str.endswith("s") & ~tokens.str.endswith("ss")
+    return tokens.where(~plural, tokens.str[:-1])
+
+
+def normalize_term(term: str) -> str:
+    """One query term normalized like the indexed text (trailing * kept)"""
+    prefix = term.endswith("*")
+    tokens = normalize_terms(pd.Series([term.rstrip("*")])).tolist()
+    if not tokens:
+        return ""
+    return tokens[0] + ("*" if prefix else "")
+
+
+def field_key(field: str, value) -> str:
+    return f"{field}={str(value).strip().lower()}"
+
+
+def _doc_hashes(events: pd.DataFrame) -> np.ndarray:
+    values = pd.DataFrame({col: events[col].astype(str) for col in DOC_HASH_COLUMNS if col in events.columns})
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+def _load_arrays(index_dir: str):
+    path = os.path.join(index_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as arrays:
+        return {key: arrays[key] for key in arrays.files}
+
+
+def _previous_doc_tokens(previous: dict, doc_hash: np.ndarray):
+    """
+    (current doc positions, token strings) for documents whose hash is in the
+    previous index (sorted merge on doc_hash), plus the mask of reused docs
+    """
+    prev_hash = previous["doc_hash"]
+    order = np.argsort(prev_hash, kind="stable")
+    pos = np.searchsorted(prev_hash[order], doc_hash)
+    pos_clipped = np.minimum(pos, len(prev_hash) - 1)
+    matched = (pos < len(prev_hash)) & (prev_hash[order][pos_clipped] == doc_hash)
+
+    prev_doc = order[pos_clipped[matched]]
+    offsets = previous["doc_token_offsets"]
+    counts = offsets[prev_doc + 1] - offsets[prev_doc]
+    token_pos = np.repeat(offsets[prev_doc] - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+    tokens = previous["vocab"][previous["doc_token_ids"][token_pos]]
+    return np.repeat(np.flatnonzero(matched), counts), tokens, matched
+
+
+def build_text_index(events: pd.DataFrame, output_dir: str, previous_dir: str = None) -> dict:
+    """
+    Write the inverted index of events (exported fact_maintenance_event rows)
+    to output_dir/text_index/. Documents unchanged since the index in
+    previous_dir reuse their tokens. Returns a summary dict.
+    """
+    start_ns = pd.to_datetime(events[TIME_COLUMN]).to_numpy(dtype="datetime64[ns]").view("int64")
+    doc_row = np.argsort(start_ns, kind="stable").astype(np.int32)
+    docs = events.iloc[doc_row]
+    doc_hash = _doc_hashes(docs)
+    n_docs = len(docs)
+
+    # Text tokens: reused for unchanged documents, tokenized (once per distinct description) otherwise
+    previous = _load_arrays(os.path.join(previous_dir, TEXT_INDEX_DIR)) if previous_dir else None
+    if previous is not None and len(previous["doc_hash"]):
+        reused_docs, reused_tokens, reused = _previous_doc_tokens(previous, doc_hash)
+    else:
+        reused_docs, reused_tokens, reused = np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.zeros(n_docs, dtype=bool)
+
+    new_docs = np.flatnonzero(~reused)
+    desc_codes, descriptions = pd.factorize(docs[TEXT_COLUMN].iloc[new_docs].astype(object).where(
+        docs[TEXT_COLUMN].iloc[new_docs].notna(), None
+    ))
+    desc_tokens = normalize_terms(pd.Series(descriptions, dtype=object))
+    desc_offsets = np.r_[0, np.cumsum(np.bincount(desc_tokens.index.to_numpy(), minlength=len(descriptions)))]
+    desc_token_values = desc_tokens.to_numpy(dtype=object)
+    counts = np.where(desc_codes >= 0, desc_offsets[desc_codes + 1] - desc_offsets[np.maximum(desc_codes, 0)], 0)
+    starts = desc_offsets[np.maximum(desc_codes, 0)]
+    token_pos = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+    new_tokens = desc_token_values[token_pos]
+
+    text_docs = np.r_[reused_docs, np.repeat(new_docs, counts)].astype(np.int64)
+    text_tokens = np.r_[reused_tokens.astype(object), new_tokens]
+
+    # Field keys (cheap, rebuilt every time)
+    field_docs, field_tokens = [], []
+    for field, col in FIELD_COLUMNS.items():
+        if col not in docs.columns:
+            continue
+        values = docs[col]
+        present = values.notna().to_numpy()
+        keys = (field + "=" + values[present].astype(str).str.strip().str.lower()).to_numpy(dtype=object)
+        field_docs.append(np.flatnonzero(present))
+        field_tokens.append(keys)
+
+    # Invert: unique (token, doc) pairs sorted by token, then doc
+    all_docs = np.concatenate([text_docs] + field_docs).astype(np.int64)
+    token_ids, vocab = pd.factorize(np.concatenate([text_tokens] + field_tokens).astype(str), sort=True)
+    pairs = np.unique(token_ids.astype(np.int64) * max(n_docs, 1) + all_docs)
+    pair_token, pair_doc = pairs // max(n_docs, 1), pairs % max(n_docs, 1)
+    post_offsets = np.searchsorted(pair_token, np.arange(len(vocab) + 1)).astype(np.int64)
+
+    # Per-document text tokens (reused by the next build)
+    is_text = np.ones(len(pairs), dtype=bool)
+    vocab_is_field = np.array(["=" in token for token in vocab], dtype=bool)
+    is_text &= ~vocab_is_field[pair_token]
+    doc_order = np.lexsort((pair_token[is_text], pair_doc[is_text]))
+    doc_token_ids = pair_token[is_text][doc_order].astype(np.int32)
+    doc_token_offsets = np.searchsorted(pair_doc[is_text][doc_order], np.arange(n_docs + 1)).astype(np.int64)
+
+    index_dir = os.path.join(output_dir, TEXT_INDEX_DIR)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, INDEX_FILE), "wb") as fh:
+        np.savez(
+            fh, vocab=np.asarray(vocab, dtype=str), post_offsets=post_offsets,
+            post_docs=pair_doc.astype(np.int32), doc_row=doc_row, doc_start_ns=start_ns[doc_row],
+            doc_hash=doc_hash, doc_token_offsets=doc_token_offsets, doc_token_ids=doc_token_ids,
+        )
+
+    summary = {
+        "documents": int(n_docs),
+        "reused_documents": int(reused.sum()),
+        "tokenized_documents": int(len(new_docs)),
+        "distinct_descriptions_tokenized": int(len(descriptions)),
+        "text_terms": int((~vocab_is_field).sum()),
+        "field_keys": int(vocab_is_field.sum()),
+        "postings": int(len(pairs)),
+    }
+    with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, indent=2)
+    return summary
+
+
+def intersect_postings(postings: list) -> np.ndarray:
+    """Intersection of sorted doc id arrays (smallest first, binary search into the rest)"""
+    if not postings:
+        return np.empty(0, dtype=np.int32)
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        if not len(result):
+            break
+        pos = np.minimum(np.searchsorted(other, result), max(len(other) - 1, 0))
+        result = result[other[pos] == result] if len(other) else result[:0]
+    return result
+
+
+class MaintenanceSearch:
+    """
+    Term, field and date queries over the text index of a published run.
+    output_dir may be the export root (the active run is used) or a run directory.
+    """
+
+    def __init__(self, output_dir: str = "output_tables", events: pd.DataFrame = None):
+        self.run_dir = resolve_current(output_dir)
+        arrays = _load_arrays(os.path.join(self.run_dir, TEXT_INDEX_DIR))
+        if arrays is None:
+            raise FileNotFoundError(f"No text index in {self.run_dir}")
+        self.vocab = arrays["vocab"]
+        # Text terms only (sorted, with their vocabulary positions) for prefix queries
+        self.text_ids = np.flatnonzero(np.char.find(self.vocab, "=") < 0) if len(self.vocab) else np.empty(0, dtype=np.int64)
+        self.text_vocab = self.vocab[self.text_ids]
+        self.post_offsets = arrays["post_offsets"]
+        self.post_docs = arrays["post_docs"]
+        self.doc_row = arrays["doc_row"]
+        self.doc_start_ns = arrays["doc_start_ns"]
+        self._events = events
+
+    def __len__(self):
+        return len(self.doc_row)
+
+    @property
+    def events(self) -> pd.DataFrame:
+        """fact_maintenance_event of the run (rows addressed by doc_row), read on first use"""
+        if self._events is None:
+            self._events = pd.read_csv(
+                os.path.join(self.run_dir, "fact_maintenance_event.csv"),
+                parse_dates=[TIME_COLUMN], low_memory=False,
+            )
+        return self._events
+
+    def postings(self, key: str) -> np.ndarray:
+        """
+        Sorted doc ids of one vocabulary key; a trailing * unions all keys with
+        that prefix (text terms only, unless the prefix itself is a field key)
+        """
+        if key.endswith("*"):
+            prefix = key[:-1]
+            vocab, ids = (self.vocab, None) if "=" in prefix else (self.text_vocab, self.text_ids)
+            lo = np.searchsorted(vocab, prefix, side="left")
+            hi = np.searchsorted(vocab, prefix + "￿", side="left")
+            ids = np.arange(lo, hi) if ids is None else ids[lo:hi]
+            if len(ids) == 1:
+                return self.post_docs[self.post_offsets[ids[0]]:self.post_offsets[ids[0] + 1]]
+            counts = self.post_offsets[ids + 1] - self.post_offsets[ids]
+            pos = np.repeat(self.post_offsets[ids] - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+            return np.unique(self.post_docs[pos])
+        pos = np.searchsorted(self.vocab, key)
+        if pos >= len(self.vocab) or self.vocab[pos] != key:
+            return np.empty(0, dtype=np.int32)
+        return self.post_docs[self.post_offsets[pos]:self.post_offsets[pos + 1]]
+
+    def _date_range(self, start, end):
+        lo = 0 if start is None else int(np.searchsorted(self.doc_start_ns, pd.Timestamp(start).value, side="left"))
+        hi = len(self.doc_row) if end is None else int(np.searchsorted(self.doc_start_ns, pd.Timestamp(end).value, side="left"))
+        return lo, hi
+
+    def match(self, text: str = None, mode: str = "all", start=None, end=None, **fields) -> np.ndarray:
+        """
+        Doc ids (date order) matching the text terms and filters:
+        - text: whitespace-separated terms ("OR" separators allowed); term* is a prefix
+        - mode: "all" (every term) or "any" (at least one term)
+        - start/end: start_datetime in [start, end)
+        - fields: equipment_name=, category=, delay_type= (value or list of values)
+        """
+        lists = []
+        if text:
+            terms = [normalize_term(term) for term in text.split() if term.upper() != "OR"]
+            term_postings = [self.postings(term) for term in terms if term]
+            if term_postings:
+                if mode == "all":
+                    lists.append(intersect_postings(term_postings))
+                elif mode == "any":
+                    lists.append(np.unique(np.concatenate(term_postings)))
+                else:
+                    raise ValueError(f"Unknown search mode: {mode}")
+
+        for field, value in fields.items():
+            if field not in FIELD_COLUMNS:
+                raise KeyError(f"Unknown search field '{field}' (expected one of {list(FIELD_COLUMNS)})")
+            values = value if pd.api.types.is_list_like(value) else [value]
+            lists.append(np.unique(np.concatenate(
+                [self.postings(field_key(field, v)) for v in values] or [np.empty(0, dtype=np.int32)]
+            )))
+
+        lo, hi = self._date_range(start, end)
+        if not lists:
+            return np.arange(lo, hi, dtype=np.int32)
+        docs = intersect_postings(lists)
+        return docs[np.searchsorted(docs, lo):np.searchsorted(docs, hi)]
+
+    def search(self, text: str = None, mode: str = "all", start=None, end=None,
+               columns: list = None, **fields) -> pd.DataFrame:
+        """Matching maintenance events in start_datetime order"""
+        result = self.events.iloc[self.doc_row[self.match(text, mode, start, end, **fields)]]
+        if columns is not None:
+            result = result[columns]
+        return result.reset_index(drop=True)
+
+    def count(self, text: str = None, mode: str = "all", start=None, end=None, **fields) -> int:
+        return int(len(self.match(text, mode, start, end, **fields)))
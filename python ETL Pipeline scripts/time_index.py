@@ -0,0 +1,216 @@
+# Block-partitioned time index over exported fact tables
+#
+# Each fact table is stored sorted by its time column in fixed-size blocks,
+# with a per-block min/max zone map. Range queries binary-search the zone map,
+# load only the overlapping blocks and binary-search inside them.
+#
+# Usage (ad-hoc analysis):
+#   from time_index import TimeIndex
+#   idx = TimeIndex("output_tables")
+#   window = idx.window("2024-06-03 06:00", "2024-06-03 18:00", equipment_id=9)
+#   window["fact_equipment_event_log"]
+
+import os
+import json
+import shutil
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from publish import resolve_current
+
+TIME_INDEX_DIR = "time_index"
+DEFAULT_BLOCK_ROWS = 50_000
+
+# Fact table -> time column used for sort order and zone maps
+TIME_INDEX_COLUMNS = {
+    "fact_production_coil": "completion_ts",
+    "fact_coil_operation_cycle": "operation_start_ts",
+    "fact_equipment_event_log": "event_start_ts",
+}
+
+NAT_NS = np.iinfo(np.int64).min
+
+
+def _to_ns(ts) -> int:
+    """Convert a timestamp-like value to int64 nanoseconds"""
+    return pd.Timestamp(ts).value
+
+
+def _time_keys(series: pd.Series) -> np.ndarray:
+    """Return datetime column as int64 nanoseconds (NaT as int64 min)"""
+    return pd.to_datetime(series).to_numpy(dtype="datetime64[ns]").view("int64")
+
+
+def build_time_index(tables: dict,
+                     output_dir: str,
+                     block_rows: int = DEFAULT_BLOCK_ROWS) -> pd.DataFrame:
+    """
+    Write sorted, block-partitioned copies of the fact tables:
+    - One pickle file per block of block_rows rows
+    - zone_map.csv with row range and min/max time per block
+    - meta.json with sort column, schema and excluded (null time) rows
+    Returns a summary table (one row per indexed fact table).
+    """
+    index_root = os.path.join(output_dir, TIME_INDEX_DIR)
+    summary = []
+
+    for table_name, ts_col in TIME_INDEX_COLUMNS.items():
+        table_df = tables.get(table_name)
+        if table_df is None or ts_col not in table_df.columns:
+            continue
+
+        keys = _time_keys(table_df[ts_col])
+        valid = keys != NAT_NS
+        order = np.flatnonzero(valid)[np.argsort(keys[valid], kind="stable")]
+        sorted_df = table_df.iloc[order].reset_index(drop=True)
+        sorted_keys = keys[order]
+
+        # Rebuild table directory so stale blocks never survive a re-run
+        table_dir = os.path.join(index_root, table_name)
+        if os.path.exists(table_dir):
+            shutil.rmtree(table_dir)
+        os.makedirs(table_dir)
+
+        zone_rows = []
+        for block_id, row_start in enumerate(range(0, len(sorted_df), block_rows)):
+            row_end = min(row_start + block_rows, len(sorted_df))
+            block_file = f"block_{block_id:05d}.pkl"
+            sorted_df.iloc[row_start:row_end].to_pickle(os.path.join(table_dir, block_file))
+            zone_rows.append({
+                "block_id": block_id,
+                "row_start": row_start,
+                "row_count": row_end - row_start,
+                "min_ns": int(sorted_keys[row_start]),
+                "max_ns": int(sorted_keys[row_end - 1]),
+                "file": block_file,
+            })
+
+        zone_map = pd.DataFrame(
+            zone_rows,
+            columns=["block_id", "row_start", "row_count", "min_ns", "max_ns", "file"]
+        )
+        zone_map.to_csv(os.path.join(table_dir, "zone_map.csv"), index=False)
+
+        meta = {
+            "table": table_name,
+            "sort_column": ts_col,
+            "rows": int(len(sorted_df)),
+            "excluded_null_rows": int((~valid).sum()),
+            "block_rows": block_rows,
+            "columns": sorted_df.columns.tolist(),
+        }
+        with open(os.path.join(table_dir, "meta.json"), "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2)
+
+        summary.append({
+            "table": table_name,
+            "sort_column": ts_col,
+            "rows": meta["rows"],
+            "blocks": len(zone_map),
+            "excluded_null_rows": meta["excluded_null_rows"],
+        })
+
+    return pd.DataFrame(summary)
+
+
+class TimeIndex:
+    """
+    Read-only range queries over a time index built by build_time_index.
+    output_dir may be the export root (the active published run is used)
+    or a specific run directory.
+    """
+
+    def __init__(self, output_dir: str = "output_tables", max_cached_blocks: int = 64):
+        self.index_root = os.path.join(resolve_current(output_dir), TIME_INDEX_DIR)
+        self.max_cached_blocks = max_cached_blocks
+        self._meta = {}
+        self._zone_maps = {}
+        self._blocks = OrderedDict()
+
+    def tables(self) -> list:
+        """List indexed fact tables"""
+        if not os.path.isdir(self.index_root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.index_root)
+            if os.path.exists(os.path.join(self.index_root, name, "meta.json"))
+        )
+
+    def _load_table(self, table: str):
+        if table not in self._meta:
+            table_dir = os.path.join(self.index_root, table)
+            with open(os.path.join(table_dir, "meta.json"), encoding="utf-8") as fh:
+                self._meta[table] = json.load(fh)
+            self._zone_maps[table] = pd.read_csv(os.path.join(table_dir, "zone_map.csv"))
+        return self._meta[table], self._zone_maps[table]
+
+    def _block(self, table: str, block_id: int):
+        """Load one block (LRU-cached) with its sorted int64 time keys"""
+        cache_key = (table, block_id)
+        if cache_key in self._blocks:
+            self._blocks.move_to_end(cache_key)
+            return self._blocks[cache_key]
+
+        meta, zone_map = self._load_table(table)
+        block_df = pd.read_pickle(
+            os.path.join(self.index_root, table, zone_map.at[block_id, "file"])
+        )
+        entry = (block_df, _time_keys(block_df[meta["sort_column"]]))
+
+        self._blocks[cache_key] = entry
+        if len(self._blocks) > self.max_cached_blocks:
+            self._blocks.popitem(last=False)
+        return entry
+
+    def query(self, table: str, start, end, columns: list = None, **filters) -> pd.DataFrame:
+        """
+        Return rows of table with start <= sort column < end.
+        Keyword filters are equality (scalar) or membership (list-like) tests
+        applied after the time range is resolved, e.g. equipment_id=9.
+        """
+        meta, zone_map = self._load_table(table)
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+
+        # Zone maps are monotonic because blocks are written in time order
+        first_block = int(np.searchsorted(zone_map["max_ns"].to_numpy(), start_ns, side="left"))
+        last_block = int(np.searchsorted(zone_map["min_ns"].to_numpy(), end_ns, side="left"))
+
+        parts = []
+        for block_id in range(first_block, last_block):
+            block_df, keys = self._block(table, block_id)
+            lo = np.searchsorted(keys, start_ns, side="left")
+            hi = np.searchsorted(keys, end_ns, side="left")
+            if hi > lo:
+                parts.append(block_df.iloc[lo:hi])
+
+        if parts:
+            result = pd.concat(parts, ignore_index=True)
+        else:
+            result = pd.DataFrame(columns=meta["columns"])
+
+        for col, value in filters.items():
+            if col not in result.columns:
+                raise KeyError(f"{table} has no column '{col}'")
+            if pd.api.types.is_list_like(value):
+                result = result[result[col].isin(value)]
+            else:
+                result = result[result[col] == value]
+
+        if columns is not None:
+            result = result[columns]
+
+        return result.reset_index(drop=True)
+
+    def window(self, start, end, **filters) -> dict:
+        """
+        Query every indexed fact table for the same time window.
+        Filters are only applied to tables that carry the filter column.
+        """
+        results = {}
+        for table in self.tables():
+            meta, _ = self._load_table(table)
+            table_filters = {k: v for k, v in filters.items() if k in meta["columns"]}
+            results[table] = self.query(table, start, end, **table_filters)
+        return results
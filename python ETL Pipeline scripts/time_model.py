@@ -0,0 +1,84 @@
+# Internal time model for the pipeline stages
+#
+# Timestamps: int64 epoch milliseconds. Hot paths (09, 10) do all arithmetic,
+# sorting and grouping on these arrays; frames hold them as datetime64[ms]
+# columns, which are the same int64 buffer (.view("int64") is free).
+# Dates: int32 day numbers (days since 1970-01-01) instead of Python date
+# objects. Day numbers are converted to dates only when tables are exported.
+
+import numpy as np
+import pandas as pd
+
+MS_PER_SEC = 1_000
+MS_PER_MIN = 60_000
+MS_PER_DAY = 86_400_000
+
+# Missing values (NaT) in the int representations
+NAT_MS = np.iinfo(np.int64).min
+NO_DAY = np.iinfo(np.int32).min
+
+# Columns holding day numbers (converted to dates at export)
+DAY_COLUMNS = ["production_date", "event_date"]
+
+
+def to_epoch_ms(values) -> np.ndarray:
+    """Datetime-like values → int64 epoch ms (NaT → NAT_MS)"""
+    return np.asarray(pd.to_datetime(values)).astype("datetime64[ms]").view(np.int64)
+
+
+def from_epoch_ms(ms) -> np.ndarray:
+    """int64 epoch ms → datetime64[ms] (same buffer, NAT_MS → NaT)"""
+    return np.asarray(ms, dtype=np.int64).view("datetime64[ms]")
+
+
+def to_day_number(ms) -> np.ndarray:
+    """int64 epoch ms → int32 day numbers (NAT_MS → NO_DAY)"""
+    ms = np.asarray(ms, dtype=np.int64)
+    return np.where(ms == NAT_MS, NO_DAY, ms // MS_PER_DAY).astype(np.int32)
+
+
+def from_day_number(days) -> pd.DatetimeIndex:
+    """int32 day numbers → midnight timestamps (NO_DAY → NaT)"""
+    days = np.asarray(days, dtype=np.int64)
+    ms = np.where(days == NO_DAY, NAT_MS, days * MS_PER_DAY)
+    return pd.DatetimeIndex(from_epoch_ms(ms))
+
+
+def to_month_number(ms) -> np.ndarray:
+    """int64 epoch ms → int32 calendar month numbers (months since 1970-01)"""
+    ms = np.asarray(ms, dtype=np.int64)
+    months = ms.view("datetime64[ms]").astype("datetime64[M]").view(np.int64)
+    return np.where(ms == NAT_MS, NO_DAY, months).astype(np.int32)
+
+
+def month_start_ms(months) -> np.ndarray:
+    """Month numbers → int64 epoch ms of the first instant of each month"""
+    months = np.asarray(months, dtype=np.int64)
+    return months.view("datetime64[M]").astype("datetime64[ms]").view(np.int64)
+
+
+def day_to_month_number(days) -> np.ndarray:
+    """int32 day numbers → int32 month numbers"""
+    days = np.asarray(days, dtype=np.int64)
+    return to_month_number(np.where(days == NO_DAY, NAT_MS, days * MS_PER_DAY))
+
+
+def month_label(month) -> str:
+    """Month number as YYYY-MM (for printing)"""
+    return str(np.datetime64(int(month), "M"))
+
+
+def day_label(day) -> str:
+    """Day number as YYYY-MM-DD (for printing)"""
+    return str(np.datetime64(int(day), "D"))
+
+
+def export_frame(frame: pd.DataFrame, day_columns: list = DAY_COLUMNS) -> pd.DataFrame:
+    """Frame with day-number columns converted to dates (other columns shared)"""
+    present = [
+        col for col in day_columns
+        if col in frame.columns and pd.api.types.is_integer_dtype(frame[col])
+    ]
+    if not present:
+        return frame
+    return frame.assign(**{col: from_day_number(frame[col]).date for col in present})